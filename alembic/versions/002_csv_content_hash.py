@@ -0,0 +1,31 @@
+"""Add content hash to csv_analyses
+
+Revision ID: 002_csv_content_hash
+Revises: 001_initial
+Create Date: 2026-10-16 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '002_csv_content_hash'
+down_revision: Union[str, None] = '001_initial'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - хэш содержимого CSV для повторного использования отчетов"""
+    
+    op.add_column('csv_analyses', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index('ix_csv_analyses_content_hash', 'csv_analyses', ['content_hash'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление хэша содержимого"""
+    
+    op.drop_index('ix_csv_analyses_content_hash', table_name='csv_analyses')
+    op.drop_column('csv_analyses', 'content_hash')
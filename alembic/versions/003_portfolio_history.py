@@ -0,0 +1,95 @@
+"""Add sales history and portfolio rollups
+
+Revision ID: 003_portfolio_history
+Revises: 002_csv_content_hash
+Create Date: 2026-10-16 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '003_portfolio_history'
+down_revision: Union[str, None] = '002_csv_content_hash'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - история продаж и накопительные агрегаты портфолио"""
+    
+    # Create sale_facts table
+    op.create_table(
+        'sale_facts',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('asset_id', sa.String(length=255), nullable=False),
+        sa.Column('sold_at', sa.DateTime(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('purchase_type', sa.String(length=50), nullable=False),
+        sa.Column('revenue', sa.Numeric(precision=14, scale=4), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('impressions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('downloads', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('csv_analysis_id', sa.Integer(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['csv_analysis_id'], ['csv_analyses.id'], ondelete='SET NULL'),
+        sa.UniqueConstraint(
+            'user_id', 'asset_id', 'sold_at', 'purchase_type', 'revenue',
+            name='uq_sale_facts_sale',
+        ),
+    )
+    op.create_index('ix_sale_facts_user_id', 'sale_facts', ['user_id'], unique=False)
+    
+    # Create portfolio_daily table
+    op.create_table(
+        'portfolio_daily',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sales', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Numeric(precision=18, scale=4), nullable=False, server_default='0'),
+        sa.Column('impressions', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('downloads', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'day'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+    
+    # Create portfolio_assets table
+    op.create_table(
+        'portfolio_assets',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('asset_id', sa.String(length=255), nullable=False),
+        sa.Column('title', sa.String(length=255), nullable=False),
+        sa.Column('sales', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Numeric(precision=18, scale=4), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('user_id', 'asset_id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+    
+    # Create portfolio_categories table
+    op.create_table(
+        'portfolio_categories',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type_key', sa.String(length=50), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sales', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Numeric(precision=18, scale=4), nullable=False, server_default='0'),
+        sa.Column('first_seen_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'type_key'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление истории продаж"""
+    
+    op.drop_table('portfolio_categories')
+    op.drop_table('portfolio_assets')
+    op.drop_table('portfolio_daily')
+    op.drop_index('ix_sale_facts_user_id', table_name='sale_facts')
+    op.drop_table('sale_facts')
@@ -0,0 +1,31 @@
+"""Add Telegram file_unique_id to csv_analyses
+
+Revision ID: 004_csv_file_unique_id
+Revises: 003_portfolio_history
+Create Date: 2026-10-16 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '004_csv_file_unique_id'
+down_revision: Union[str, None] = '003_portfolio_history'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - file_unique_id для поиска отчета без скачивания файла"""
+    
+    op.add_column('csv_analyses', sa.Column('file_unique_id', sa.String(length=255), nullable=True))
+    op.create_index('ix_csv_analyses_file_unique_id', 'csv_analyses', ['file_unique_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление file_unique_id"""
+    
+    op.drop_index('ix_csv_analyses_file_unique_id', table_name='csv_analyses')
+    op.drop_column('csv_analyses', 'file_unique_id')
@@ -0,0 +1,48 @@
+"""Add dense per-category ordinal to theme_templates
+
+Revision ID: 005_theme_template_ordinal
+Revises: 004_csv_file_unique_id
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '005_theme_template_ordinal'
+down_revision: Union[str, None] = '004_csv_file_unique_id'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - порядковый номер темы для случайного выбора по индексу"""
+    
+    op.add_column('theme_templates', sa.Column('ordinal', sa.Integer(), nullable=True))
+    
+    # Нумерация активных тем 1..N внутри категории
+    op.execute("""
+        UPDATE theme_templates AS t
+        SET ordinal = numbered.ordinal
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY category ORDER BY id) AS ordinal
+            FROM theme_templates
+            WHERE is_active
+        ) AS numbered
+        WHERE t.id = numbered.id
+    """)
+    
+    op.create_unique_constraint(
+        'uq_theme_templates_category_ordinal',
+        'theme_templates',
+        ['category', 'ordinal'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление порядкового номера"""
+    
+    op.drop_constraint('uq_theme_templates_category_ordinal', 'theme_templates', type_='unique')
+    op.drop_column('theme_templates', 'ordinal')
@@ -0,0 +1,39 @@
+"""Add per-user theme cursors
+
+Revision ID: 006_theme_cursors
+Revises: 005_theme_template_ordinal
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '006_theme_cursors'
+down_revision: Union[str, None] = '005_theme_template_ordinal'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - позиции пользователей в перестановках тем"""
+    
+    op.create_table(
+        'theme_cursors',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('category', sa.String(length=50), nullable=False),
+        sa.Column('seed', sa.BigInteger(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('catalog_size', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('user_id', 'category'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление позиций в перестановках тем"""
+    
+    op.drop_table('theme_cursors')
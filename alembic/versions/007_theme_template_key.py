@@ -0,0 +1,73 @@
+"""Add normalized theme key to theme_templates for deduplication
+
+Revision ID: 007_theme_template_key
+Revises: 006_theme_cursors
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '007_theme_template_key'
+down_revision: Union[str, None] = '006_theme_cursors'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _theme_key(theme: str) -> str:
+    """Ключ темы, как src.core.utils.themes_loader.make_theme_key на момент миграции"""
+    normalized = " ".join(theme.split()).casefold()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade migration - ключ дедупликации тем и уникальность (category, theme_key)"""
+    
+    op.add_column('theme_templates', sa.Column('theme_key', sa.String(length=32), nullable=True))
+    
+    connection = op.get_bind()
+    rows = connection.execute(sa.text("SELECT id, theme FROM theme_templates")).all()
+    if rows:
+        connection.execute(
+            sa.text("UPDATE theme_templates SET theme_key = :theme_key WHERE id = :id"),
+            [{"id": row.id, "theme_key": _theme_key(row.theme or "")} for row in rows],
+        )
+    
+    # Из дубликатов остается самая ранняя тема
+    op.execute("""
+        DELETE FROM theme_templates AS t
+        USING theme_templates AS kept
+        WHERE t.category = kept.category
+          AND t.theme_key = kept.theme_key
+          AND t.id > kept.id
+    """)
+    
+    # Удаление могло оставить пропуски в нумерации активных тем
+    op.execute("UPDATE theme_templates SET ordinal = NULL WHERE ordinal IS NOT NULL")
+    op.execute("""
+        UPDATE theme_templates AS t
+        SET ordinal = numbered.ordinal
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY category ORDER BY id) AS ordinal
+            FROM theme_templates
+            WHERE is_active
+        ) AS numbered
+        WHERE t.id = numbered.id
+    """)
+    
+    op.create_unique_constraint(
+        'uq_theme_templates_category_theme_key',
+        'theme_templates',
+        ['category', 'theme_key'],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление ключа дедупликации"""
+    
+    op.drop_constraint('uq_theme_templates_category_theme_key', 'theme_templates', type_='unique')
+    op.drop_column('theme_templates', 'theme_key')
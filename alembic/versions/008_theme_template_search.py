@@ -0,0 +1,41 @@
+"""Add full-text and trigram search indexes to theme_templates
+
+Revision ID: 008_theme_template_search
+Revises: 007_theme_template_key
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '008_theme_template_search'
+down_revision: Union[str, None] = '007_theme_template_key'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - индексы поиска тем по словам и подстроке"""
+    
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    
+    # Выражение совпадает с search_document() в ThemeTemplateRepository
+    op.execute("""
+        CREATE INDEX ix_theme_templates_search ON theme_templates
+        USING gin (to_tsvector('simple'::regconfig, coalesce(theme, '') || ' ' || coalesce(CAST(keywords AS TEXT), '')))
+    """)
+    
+    # Ускоряет ILIKE '%...%' по тексту темы
+    op.execute("""
+        CREATE INDEX ix_theme_templates_theme_trgm ON theme_templates
+        USING gin (theme gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление индексов поиска"""
+    
+    op.drop_index('ix_theme_templates_theme_trgm', table_name='theme_templates')
+    op.drop_index('ix_theme_templates_search', table_name='theme_templates')
@@ -0,0 +1,36 @@
+"""Add precomputed theme recommendations per user
+
+Revision ID: 009_theme_recommendations
+Revises: 008_theme_template_search
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '009_theme_recommendations'
+down_revision: Union[str, None] = '008_theme_template_search'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - рекомендованные темы пользователей"""
+    
+    op.create_table(
+        'theme_recommendations',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('theme_ids', sa.JSON(), nullable=True),
+        sa.Column('computed_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление рекомендаций"""
+    
+    op.drop_table('theme_recommendations')
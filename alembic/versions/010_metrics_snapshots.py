@@ -0,0 +1,52 @@
+"""Add admin metrics snapshots
+
+Revision ID: 010_metrics_snapshots
+Revises: 009_theme_recommendations
+Create Date: 2026-10-20 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '010_metrics_snapshots'
+down_revision: Union[str, None] = '009_theme_recommendations'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - снимки метрик админ-панели"""
+    
+    op.create_table(
+        'metrics_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('total_users', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('new_users_24h', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_users_7d', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('free_users', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pro_users', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('ultra_users', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('referrals_total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('payments_today', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('payments_month', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue_today', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('revenue_month', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('revenue_total', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('total_analyses', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_reports', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('avg_cpm', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('top_users_by_analyses', sa.JSON(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_metrics_snapshots_taken_at', 'metrics_snapshots', ['taken_at'])
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление снимков метрик"""
+    
+    op.drop_index('ix_metrics_snapshots_taken_at', table_name='metrics_snapshots')
+    op.drop_table('metrics_snapshots')
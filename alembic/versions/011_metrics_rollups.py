@@ -0,0 +1,44 @@
+"""Add hourly and daily metrics rollups
+
+Revision ID: 011_metrics_rollups
+Revises: 010_metrics_snapshots
+Create Date: 2026-10-21 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '011_metrics_rollups'
+down_revision: Union[str, None] = '010_metrics_snapshots'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - агрегаты метрик по часам и дням"""
+    
+    op.create_table(
+        'metrics_rollups',
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('metric', sa.String(length=32), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('dimension', sa.String(length=32), nullable=False, server_default=''),
+        sa.Column('value', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('granularity', 'metric', 'bucket', 'dimension'),
+    )
+    
+    # Агрегация оплаченных платежей по completed_at за последние интервалы
+    op.create_index('ix_payments_completed_at', 'payments', ['completed_at'])
+    
+    # Первичное заполнение выполняет worker (rollup_metrics): при пустой
+    # таблице агрегаты считаются по всей истории
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление агрегатов метрик"""
+    
+    op.drop_index('ix_payments_completed_at', table_name='payments')
+    op.drop_table('metrics_rollups')
@@ -0,0 +1,37 @@
+"""Add indexes for admin user listing
+
+Revision ID: 012_users_listing_indexes
+Revises: 011_metrics_rollups
+Create Date: 2026-10-22 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '012_users_listing_indexes'
+down_revision: Union[str, None] = '011_metrics_rollups'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - индексы списка пользователей админ-панели"""
+    
+    # Keyset-пагинация: ORDER BY created_at DESC, id DESC и (created_at, id) < курсор
+    op.create_index('ix_users_created_at_id', 'users', ['created_at', 'id'])
+    
+    # Ускоряет ILIKE '%...%' по username (расширение pg_trgm - миграция 008)
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute("""
+        CREATE INDEX ix_users_username_trgm ON users
+        USING gin (username gin_trgm_ops)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление индексов списка пользователей"""
+    
+    op.drop_index('ix_users_username_trgm', table_name='users')
+    op.drop_index('ix_users_created_at_id', table_name='users')
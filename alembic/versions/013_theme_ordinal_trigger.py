@@ -0,0 +1,48 @@
+"""Clear theme ordinal on deactivation
+
+Revision ID: 013_theme_ordinal_trigger
+Revises: 012_users_listing_indexes
+Create Date: 2026-10-23 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '013_theme_ordinal_trigger'
+down_revision: Union[str, None] = '012_users_listing_indexes'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade migration - выключенная тема теряет порядковый номер"""
+    
+    # Темы выключают и SQL в обход приложения: номер выключенной темы
+    # иначе попадал бы в выдачу тем (ThemeService._deal_theme) как пропуск
+    op.execute("""
+        CREATE FUNCTION theme_templates_clear_ordinal() RETURNS trigger AS $$
+        BEGIN
+            IF NOT NEW.is_active THEN
+                NEW.ordinal := NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER trg_theme_templates_clear_ordinal
+        BEFORE INSERT OR UPDATE OF is_active, ordinal ON theme_templates
+        FOR EACH ROW EXECUTE FUNCTION theme_templates_clear_ordinal()
+    """)
+    
+    # Номера уже выключенных тем
+    op.execute("UPDATE theme_templates SET ordinal = NULL WHERE NOT is_active AND ordinal IS NOT NULL")
+
+
+def downgrade() -> None:
+    """Downgrade migration - удаление триггера номеров тем"""
+    
+    op.execute("DROP TRIGGER IF EXISTS trg_theme_templates_clear_ordinal ON theme_templates")
+    op.execute("DROP FUNCTION IF EXISTS theme_templates_clear_ordinal()")
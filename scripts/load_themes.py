@@ -6,91 +6,43 @@
 """
 
 import asyncio
-import csv
-import io
 from pathlib import Path
 
-from sqlalchemy.ext.asyncio import AsyncSession
-
 from src.config.logging import get_logger
-from src.config.settings import settings
+from src.core.cache.connection import close_redis
+from src.core.utils.themes_loader import ThemesLoader
 from src.database.connection import AsyncSessionLocal, engine
-from src.database.models import ThemeTemplate
 
 logger = get_logger(__name__)
 
 
-async def load_themes_from_csv(csv_path: str, category: str = "photos") -> int:
+async def load_themes_from_csv(csv_path: str, category: str = "photos") -> dict[str, int]:
     """
     Загрузить темы из CSV файла в базу данных
     
+    Повторный запуск с тем же файлом ничего не добавляет.
+    
     Args:
         csv_path: Путь к CSV файлу
-        category: Категория тем (по умолчанию photos)
+        category: Категория тем без категории в файле (по умолчанию photos)
         
     Returns:
-        Количество загруженных тем
+        Словарь с количеством добавленных и пропущенных тем
     """
-    loaded_count = 0
-    
     async with AsyncSessionLocal() as session:
-        try:
-            # Читаем CSV файл
-            with open(csv_path, 'r', encoding='utf-8-sig') as f:
-                content = f.read()
-            
-            # Парсим CSV
-            reader = csv.reader(io.StringIO(content))
-            rows = list(reader)
-            
-            for row in rows:
-                if not row or not row[0]:
-                    continue
-                
-                theme_text = row[0].strip()
-                
-                if not theme_text:
-                    continue
-                
-                # Проверяем, существует ли уже такая тема
-                from sqlalchemy import select
-                statement = select(ThemeTemplate).where(
-                    ThemeTemplate.theme == theme_text,
-                    ThemeTemplate.category == category,
-                )
-                result = await session.execute(statement)
-                existing = result.scalar_one_or_none()
-                
-                if existing:
-                    continue  # Пропускаем дубликаты
-                
-                # Создаем шаблон темы
-                template = ThemeTemplate(
-                    category=category,
-                    theme=theme_text,
-                    description=None,
-                    keywords=None,
-                    is_active=True,
-                )
-                
-                session.add(template)
-                loaded_count += 1
-            
-            await session.commit()
-            
-            logger.info(
-                "themes_loaded",
-                csv_path=csv_path,
-                category=category,
-                count=loaded_count,
+        with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+            report = await ThemesLoader.import_themes(
+                session,
+                ThemesLoader.iter_themes(f, default_category=category),
             )
-        
-        except Exception as e:
-            await session.rollback()
-            logger.error("themes_load_error", error=str(e), exc_info=True)
-            raise
     
-    return loaded_count
+    logger.info(
+        "themes_loaded",
+        csv_path=csv_path,
+        category=category,
+        **report,
+    )
+    return report
 
 
 async def main():
@@ -109,14 +61,17 @@ async def main():
         "photos": csv_path,
     }
     
-    total_loaded = 0
+    total_inserted = 0
+    total_skipped = 0
     
     for category, path in categories.items():
-        count = await load_themes_from_csv(str(path), category=category)
-        total_loaded += count
-        logger.info("category_loaded", category=category, count=count)
+        report = await load_themes_from_csv(str(path), category=category)
+        total_inserted += report["inserted"]
+        total_skipped += report["skipped"]
+    
+    await close_redis()
     
-    logger.info("themes_load_complete", total=total_loaded)
+    logger.info("themes_load_complete", inserted=total_inserted, skipped=total_skipped)
     
     await engine.dispose()
 
@@ -4,27 +4,22 @@
 Загружает темы из CSV файла небольшими пакетами через Supabase MCP
 """
 
-import csv
 from pathlib import Path
 
+from src.core.utils.themes_loader import ThemesLoader, make_theme_key
+
 CSV_FILE = "Стоки 2(ТЕМЫ ИТОГ).csv"
 BATCH_SIZE = 50  # Размер пакета для вставки
 
 def read_csv_themes(csv_path: str) -> list[str]:
-    """Читает темы из CSV файла"""
-    themes = []
+    """Читает темы из CSV файла (без дубликатов)"""
+    themes = {}
     
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if not row or not row[0]:
-                continue
-            
-            theme_text = row[0].strip()
-            if theme_text:
-                themes.append(theme_text)
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        for item in ThemesLoader.iter_themes(f):
+            themes.setdefault(make_theme_key(item['theme']), item['theme'])
     
-    return themes
+    return list(themes.values())
 
 def generate_insert_sql(themes: list[str], category: str = "photos") -> str:
     """Генерирует SQL для вставки тем"""
@@ -33,12 +28,12 @@ def generate_insert_sql(themes: list[str], category: str = "photos") -> str:
     for theme in themes:
         # Экранируем одинарные кавычки
         theme_escaped = theme.replace("'", "''")
-        values.append(f"('{category}', '{theme_escaped}', true, NOW())")
+        values.append(f"('{category}', '{theme_escaped}', '{make_theme_key(theme)}', true, NOW())")
     
     sql = f"""
-INSERT INTO theme_templates (category, theme, is_active, created_at)
+INSERT INTO theme_templates (category, theme, theme_key, is_active, created_at)
 VALUES {', '.join(values)}
-ON CONFLICT DO NOTHING;
+ON CONFLICT (category, theme_key) DO NOTHING;
 """
     return sql
 
@@ -10,7 +10,7 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 
 from src.admin.auth import get_admin
-from src.admin.views import analytics, broadcasts, dashboard, lexicon, payments, users
+from src.admin.views import analytics, broadcasts, dashboard, lexicon, metrics, payments, users
 from src.config.logging import get_logger
 
 logger = get_logger(__name__)
@@ -55,6 +55,12 @@ app.include_router(
     tags=["Analytics"],
     dependencies=[Depends(get_admin)],
 )
+app.include_router(
+    metrics.router,
+    prefix="/admin/metrics",
+    tags=["Metrics"],
+    dependencies=[Depends(get_admin)],
+)
 app.include_router(
     broadcasts.router,
     prefix="/admin/broadcasts",
@@ -7,11 +7,13 @@ Pydantic модели для админ-панели
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 from src.database.models import (
     BroadcastStatus,
     PaymentStatus,
+    RollupGranularity,
+    RollupMetric,
     SubscriptionTier,
 )
 
@@ -19,6 +21,8 @@ from src.database.models import (
 # User Models
 class UserResponse(BaseModel):
     """Модель ответа для пользователя"""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     telegram_id: int
     username: Optional[str] = None
@@ -35,8 +39,9 @@ class UserListResponse(BaseModel):
     """Модель ответа для списка пользователей"""
     users: list[UserResponse]
     total: int
-    page: int
+    total_estimated: bool = False  # total - оценка по статистике таблицы
     limit: int
+    next_cursor: Optional[str] = None  # None - последняя страница
 
 
 class ExtendSubscriptionRequest(BaseModel):
@@ -53,6 +58,8 @@ class BanUserRequest(BaseModel):
 # Payment Models
 class PaymentResponse(BaseModel):
     """Модель ответа для платежа"""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     user_id: int
     tribute_transaction_id: str
@@ -69,9 +76,10 @@ class PaymentListResponse(BaseModel):
     """Модель ответа для списка платежей"""
     payments: list[PaymentResponse]
     total: int
+    total_estimated: bool = False  # total - оценка по статистике таблицы
     total_revenue: float
-    page: int
     limit: int
+    next_cursor: Optional[str] = None  # None - последняя страница
 
 
 # Analytics Models
@@ -100,6 +108,21 @@ class DashboardStatsResponse(BaseModel):
     total_analyses: int
 
 
+# Metrics Models
+class MetricsSeriesPoint(BaseModel):
+    """Модель точки ряда метрики"""
+    bucket: datetime
+    value: int
+    breakdown: dict[str, int] = Field(default_factory=dict)
+
+
+class MetricsSeriesResponse(BaseModel):
+    """Модель ответа для ряда метрики"""
+    metric: RollupMetric
+    granularity: RollupGranularity
+    points: list[MetricsSeriesPoint]
+
+
 # Broadcast Models
 class BroadcastCreateRequest(BaseModel):
     """Модель запроса на создание рассылки"""
@@ -2,6 +2,6 @@
 Views для админ-панели
 """
 
-from . import analytics, broadcasts, dashboard, lexicon, payments, users
+from . import analytics, broadcasts, dashboard, lexicon, metrics, payments, users
 
-__all__ = ["analytics", "broadcasts", "dashboard", "lexicon", "payments", "users"]
+__all__ = ["analytics", "broadcasts", "dashboard", "lexicon", "metrics", "payments", "users"]
@@ -18,6 +18,7 @@ from src.database.repositories.analytics_repo import (
 )
 from src.services.admin_service import AdminService
 from src.database.repositories.user_repo import UserRepository
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
 from src.database.repositories.payment_repo import PaymentRepository
 
 logger = get_logger(__name__)
@@ -41,9 +42,10 @@ async def get_analytics_stats(
                 payment_repo,
                 csv_analysis_repo,
                 analytics_report_repo,
+                MetricsSnapshotRepository(),
             )
             
-            stats = await admin_service.get_analytics_stats(session)
+            stats = await admin_service.get_analytics_snapshot(session)
             
             return AnalyticsStatsResponse(**stats)
         
@@ -14,6 +14,7 @@ from src.database.repositories.analytics_repo import (
     CSVAnalysisRepository,
     AnalyticsReportRepository,
 )
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
 from src.database.repositories.payment_repo import PaymentRepository
 from src.database.repositories.user_repo import UserRepository
 from src.services.admin_service import AdminService
@@ -39,9 +40,10 @@ async def get_dashboard(
                 payment_repo,
                 csv_analysis_repo,
                 analytics_report_repo,
+                MetricsSnapshotRepository(),
             )
             
-            stats = await admin_service.get_dashboard_stats(session)
+            stats = await admin_service.get_dashboard_snapshot(session)
             
             return DashboardStatsResponse(**stats)
         
@@ -0,0 +1,58 @@
+"""
+Metrics view для админ-панели
+
+Ряды метрик по часам и дням для графиков
+"""
+
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from src.admin.auth import get_admin
+from src.admin.models import MetricsSeriesPoint, MetricsSeriesResponse
+from src.config.logging import get_logger
+from src.database.connection import get_session
+from src.database.models import RollupGranularity, RollupMetric
+from src.database.repositories.analytics_repo import CSVAnalysisRepository
+from src.database.repositories.metrics_rollup_repo import MetricsRollupRepository
+from src.database.repositories.payment_repo import PaymentRepository
+from src.database.repositories.user_repo import UserRepository
+from src.services.metrics_rollup_service import MetricsRollupService
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+
+@router.get("/{metric}", response_model=MetricsSeriesResponse)
+async def get_metric_series(
+    metric: RollupMetric,
+    start: datetime = Query(...),
+    end: datetime = Query(...),
+    granularity: RollupGranularity = Query(RollupGranularity.DAY),
+    admin: dict = Depends(get_admin),
+):
+    """Получить ряд метрики за период"""
+    async for session in get_session():
+        try:
+            rollup_service = MetricsRollupService(
+                UserRepository(),
+                PaymentRepository(),
+                CSVAnalysisRepository(),
+                MetricsRollupRepository(),
+            )
+            
+            points = await rollup_service.get_series(session, metric, granularity, start, end)
+            
+            return MetricsSeriesResponse(
+                metric=metric,
+                granularity=granularity,
+                points=[MetricsSeriesPoint(**point) for point in points],
+            )
+        
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error("metric_series_error", metric=metric.value, error=str(e), exc_info=True)
+            raise HTTPException(status_code=500, detail="Ошибка получения метрики")
+        finally:
+            break
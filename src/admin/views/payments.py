@@ -4,76 +4,71 @@ Payments view для админ-панели
 Управление платежами
 """
 
+import csv
+import io
+import json
 from datetime import datetime
-from typing import Optional
+from typing import Any, AsyncIterator, Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from src.admin.auth import get_admin
 from src.admin.models import PaymentListResponse, PaymentResponse
 from src.config.logging import get_logger
 from src.core.exceptions import PaymentException
-from src.database.connection import get_session
-from src.database.models import PaymentStatus
+from src.database.connection import AsyncSessionLocal, get_session
+from src.database.models import PaymentStatus, SubscriptionTier
+from src.database.repositories.listing import naive_utc
 from src.database.repositories.payment_repo import PaymentRepository
 from src.services.payment_service import PaymentService
 
 logger = get_logger(__name__)
 router = APIRouter()
 
+# Колонки CSV выгрузки
+EXPORT_FIELDS = list(PaymentResponse.model_fields)
+
+# Примерный размер блока потокового ответа (символов)
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 
 @router.get("/", response_model=PaymentListResponse)
 async def get_payments(
     status: Optional[PaymentStatus] = Query(None),
-    from_date: Optional[str] = Query(None),
-    to_date: Optional[str] = Query(None),
-    page: int = Query(1, ge=1),
+    subscription_tier: Optional[SubscriptionTier] = Query(None),
+    from_date: Optional[datetime] = Query(None),
+    to_date: Optional[datetime] = Query(None),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100),
     admin: dict = Depends(get_admin),
 ):
-    """Получить список платежей"""
+    """Получить список платежей (от новых к старым, страницы по курсору)"""
+    filters = _filters(status, subscription_tier, from_date, to_date)
     async for session in get_session():
         try:
             payment_repo = PaymentRepository()
             
-            # Получаем платежи
-            if status:
-                payments = await payment_repo.get_by_status(session, status, limit=10000)
-            else:
-                payments = await payment_repo.get_all(session, limit=10000)
-            
-            # Фильтруем по датам
-            if from_date:
-                from_date_obj = datetime.fromisoformat(from_date)
-                payments = [
-                    p for p in payments
-                    if p.created_at >= from_date_obj
-                ]
-            
-            if to_date:
-                to_date_obj = datetime.fromisoformat(to_date)
-                payments = [
-                    p for p in payments
-                    if p.created_at <= to_date_obj
-                ]
-            
-            # Подсчитываем общий доход
-            total_revenue = sum(p.amount for p in payments if p.status == PaymentStatus.COMPLETED) / 100
-            
-            # Пагинация
-            total = len(payments)
-            start = (page - 1) * limit
-            end = start + limit
-            payments_page = payments[start:end]
+            # Фильтры, пагинация и суммы выполняются в БД
+            payments, next_cursor = await payment_repo.get_page(
+                session,
+                cursor=cursor,
+                limit=limit,
+                **filters,
+            )
+            totals = await payment_repo.get_filtered_totals(session, **filters)
             
             return PaymentListResponse(
-                payments=[PaymentResponse.model_validate(p) for p in payments_page],
-                total=total,
-                total_revenue=total_revenue,
-                page=page,
+                payments=[PaymentResponse.model_validate(p) for p in payments],
+                total=totals["total"],
+                total_estimated=totals["total_estimated"],
+                total_revenue=totals["revenue"] / 100,
                 limit=limit,
+                next_cursor=next_cursor,
             )
         
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error("payments_list_error", error=str(e), exc_info=True)
             raise HTTPException(status_code=500, detail="Ошибка получения платежей")
@@ -81,6 +76,72 @@ async def get_payments(
             break
 
 
+@router.get("/export")
+async def export_payments(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    status: Optional[PaymentStatus] = Query(None),
+    subscription_tier: Optional[SubscriptionTier] = Query(None),
+    from_date: Optional[datetime] = Query(None),
+    to_date: Optional[datetime] = Query(None),
+    admin: dict = Depends(get_admin),
+):
+    """Выгрузить платежи по фильтрам в CSV или NDJSON (потоком, от старых к новым)"""
+    filters = _filters(status, subscription_tier, from_date, to_date)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_chunks(format, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="payments.{format}"'},
+    )
+
+
+def _filters(
+    status: Optional[PaymentStatus],
+    subscription_tier: Optional[SubscriptionTier],
+    from_date: Optional[datetime],
+    to_date: Optional[datetime],
+) -> dict[str, Any]:
+    """Фильтры платежей для репозитория (даты - UTC без часового пояса)"""
+    return {
+        "status": status,
+        "subscription_tier": subscription_tier,
+        "from_date": naive_utc(from_date) if from_date else None,
+        "to_date": naive_utc(to_date) if to_date else None,
+    }
+
+
+async def _export_chunks(format: str, filters: dict[str, Any]) -> AsyncIterator[str]:
+    """
+    Строки выгрузки, собранные в блоки около EXPORT_CHUNK_SIZE символов
+    
+    Сессия открывается на время выгрузки: ответ отправляется после
+    выхода из обработчика, серверный курсор живет до последнего блока.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if format == "csv":
+        writer.writerow(EXPORT_FIELDS)
+    
+    exported = 0
+    async with AsyncSessionLocal() as session:
+        async for payment in PaymentRepository().stream_filtered(session, **filters):
+            row = PaymentResponse.model_validate(payment).model_dump(mode="json")
+            if format == "csv":
+                writer.writerow([row[field] for field in EXPORT_FIELDS])
+            else:
+                buffer.write(json.dumps(row, ensure_ascii=False) + "\n")
+            exported += 1
+            
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
+    logger.info("payments_exported", format=format, payments=exported)
+
+
 @router.post("/{payment_id}/refund")
 async def refund_payment(
     payment_id: int,
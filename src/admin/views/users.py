@@ -29,48 +29,41 @@ router = APIRouter()
 
 @router.get("/", response_model=UserListResponse)
 async def get_users(
-    page: int = Query(1, ge=1),
+    cursor: Optional[str] = Query(None),
     limit: int = Query(50, ge=1, le=100),
     subscription_tier: Optional[SubscriptionTier] = Query(None),
     search: Optional[str] = Query(None),
     admin: dict = Depends(get_admin),
 ):
-    """Получить список пользователей"""
+    """Получить список пользователей (от новых к старым, страницы по курсору)"""
     async for session in get_session():
         try:
             user_repo = UserRepository()
             
-            # Получаем всех пользователей
-            all_users = await user_repo.get_all(session, limit=10000)
-            
-            # Фильтруем по подписке
-            if subscription_tier:
-                all_users = [u for u in all_users if u.subscription_tier == subscription_tier]
-            
-            # Поиск по telegram_id или username
-            if search:
-                try:
-                    search_id = int(search)
-                    all_users = [u for u in all_users if u.telegram_id == search_id]
-                except ValueError:
-                    all_users = [
-                        u for u in all_users
-                        if search.lower() in (u.username or "").lower()
-                    ]
-            
-            # Пагинация
-            total = len(all_users)
-            start = (page - 1) * limit
-            end = start + limit
-            users_page = all_users[start:end]
+            # Фильтры и пагинация выполняются в БД
+            users, next_cursor = await user_repo.get_page(
+                session,
+                cursor=cursor,
+                limit=limit,
+                subscription_tier=subscription_tier,
+                search=search,
+            )
+            total, total_estimated = await user_repo.count_filtered(
+                session,
+                subscription_tier=subscription_tier,
+                search=search,
+            )
             
             return UserListResponse(
-                users=[UserResponse.model_validate(u) for u in users_page],
+                users=[UserResponse.model_validate(u) for u in users],
                 total=total,
-                page=page,
+                total_estimated=total_estimated,
                 limit=limit,
+                next_cursor=next_cursor,
             )
         
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error("users_list_error", error=str(e), exc_info=True)
             raise HTTPException(status_code=500, detail="Ошибка получения пользователей")
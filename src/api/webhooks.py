@@ -13,6 +13,7 @@ from src.database.connection import get_session
 from src.database.repositories.payment_repo import PaymentRepository
 from src.database.repositories.user_repo import UserRepository
 from src.database.repositories.limits_repo import LimitsRepository
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
 from src.services.payment_service import PaymentService
 from src.services.user_service import UserService
 from src.services.referral_service import ReferralService
@@ -42,7 +43,7 @@ async def tribute_webhook(
         data = json.loads(payload.decode('utf-8'))
         
         # Проверяем подпись
-        payment_service = PaymentService(PaymentRepository())
+        payment_service = PaymentService(PaymentRepository(), MetricsSnapshotRepository())
         if not payment_service.verify_tribute_signature(payload, x_signature or ""):
             logger.warning("tribute_signature_invalid", signature=x_signature)
             raise HTTPException(status_code=401, detail="Неверная подпись")
@@ -7,19 +7,15 @@ Handler для админ-команд
 from aiogram import Router
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.bot.keyboards.factories import get_back_keyboard
 from src.bot.lexicon.lexicon_ru import LEXICON_RU
 from src.config.logging import get_logger
 from src.config.settings import settings
-from src.database.connection import get_session
-from src.services.admin_service import AdminService
-from src.database.repositories.user_repo import UserRepository
-from src.database.repositories.payment_repo import PaymentRepository
-from src.database.repositories.analytics_repo import (
-    CSVAnalysisRepository,
-    AnalyticsReportRepository,
-)
+from src.database.models import AnalysisStatus
+from src.services.container import ServiceContainer
+from src.workers.queue import JobQueue
 
 logger = get_logger(__name__)
 router = Router(name=__name__)
@@ -45,49 +41,77 @@ async def cmd_admin(message: Message):
 
 
 @router.callback_query(lambda c: c.data == "admin_stats")
-async def callback_admin_stats(callback: CallbackQuery):
+async def callback_admin_stats(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    services: ServiceContainer,
+):
     """Обработчик статистики админ-панели"""
     if not is_admin(callback.from_user.id):
         await callback.answer("У вас нет доступа", show_alert=True)
         return
     
-    async for session in get_session():
-        try:
-            user_repo = UserRepository()
-            payment_repo = PaymentRepository()
-            csv_analysis_repo = CSVAnalysisRepository()
-            analytics_report_repo = AnalyticsReportRepository()
-            
-            admin_service = AdminService(
-                user_repo,
-                payment_repo,
-                csv_analysis_repo,
-                analytics_report_repo,
-            )
-            
-            stats = await admin_service.get_dashboard_stats(session)
-            
-            await callback.message.edit_text(
-                LEXICON_RU["admin_stats"].format(
-                    total_users=stats["total_users"],
-                    new_users_24h=stats["new_users_24h"],
-                    active_users_7d=stats["active_users_7d"],
-                    free_users=stats["free_users"],
-                    pro_users=stats["pro_users"],
-                    ultra_users=stats["ultra_users"],
-                    payments_today=int(stats["total_revenue_today"]),
-                    payments_month=int(stats["total_revenue_month"]),
-                    payments_total=int(stats["total_revenue"]),
-                    referrals_total=stats["referrals_total"],
-                    referral_conversion=round(stats["referrals_total"] / stats["total_users"] * 100, 1) if stats["total_users"] > 0 else 0,
-                ),
-                reply_markup=get_back_keyboard("main_menu"),
-            )
-            await callback.answer()
+    try:
+        stats = await services.admin_service.get_dashboard_snapshot(session)
         
-        except Exception as e:
-            logger.error("admin_stats_error", error=str(e), exc_info=True)
-            await callback.answer("Ошибка загрузки статистики", show_alert=True)
-        finally:
-            break
+        await callback.message.edit_text(
+            LEXICON_RU["admin_stats"].format(
+                total_users=stats["total_users"],
+                new_users_24h=stats["new_users_24h"],
+                active_users_7d=stats["active_users_7d"],
+                free_users=stats["free_users"],
+                pro_users=stats["pro_users"],
+                ultra_users=stats["ultra_users"],
+                payments_today=int(stats["total_revenue_today"]),
+                payments_month=int(stats["total_revenue_month"]),
+                payments_total=int(stats["total_revenue"]),
+                referrals_total=stats["referrals_total"],
+                referral_conversion=round(stats["referrals_total"] / stats["total_users"] * 100, 1) if stats["total_users"] > 0 else 0,
+            ),
+            reply_markup=get_back_keyboard("main_menu"),
+        )
+        await callback.answer()
+    
+    except Exception as e:
+        logger.error("admin_stats_error", error=str(e), exc_info=True)
+        await callback.answer("Ошибка загрузки статистики", show_alert=True)
+
 
+@router.message(Command("reprocess"))
+async def cmd_reprocess(
+    message: Message,
+    session: AsyncSession,
+    services: ServiceContainer,
+    job_queue: JobQueue,
+):
+    """Обработчик команды /reprocess - повторная обработка анализов с ошибкой"""
+    if not is_admin(message.from_user.id):
+        await message.answer("У вас нет доступа к этой команде")
+        return
+    
+    try:
+        # Статус сбрасывается до постановки: повторный /reprocess не возьмет
+        # те же анализы, а пользователь видит, что анализ снова в очереди
+        analysis_ids = await services.csv_analysis_repo.reset_status(
+            session,
+            AnalysisStatus.FAILED,
+            AnalysisStatus.PENDING,
+        )
+        
+        # Все задачи ставятся пачкой через общее соединение бота;
+        # _job_id, как при загрузке, защищает от дублей при повторе
+        enqueued = await job_queue.enqueue_many(
+            "process_csv",
+            [(analysis_id,) for analysis_id in analysis_ids],
+            job_id=lambda analysis_id: f"process_csv:{analysis_id}",
+        )
+        
+        logger.info("admin_reprocess_enqueued", admin_id=message.from_user.id, count=enqueued)
+        await message.answer(
+            LEXICON_RU["admin_reprocess_started"].format(count=enqueued),
+            reply_markup=get_back_keyboard("main_menu"),
+        )
+    
+    except Exception as e:
+        logger.error("admin_reprocess_error", error=str(e), exc_info=True)
+        await message.answer("Ошибка постановки задач в очередь")
@@ -10,17 +10,15 @@ from typing import Optional
 from aiogram import Bot, Router
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.bot.keyboards.factories import get_main_menu_keyboard
 from src.bot.lexicon.lexicon_ru import LEXICON_RU
 from src.config.logging import get_logger
 from src.config.settings import settings
 from src.core.exceptions import UserNotFoundException
-from src.database.connection import get_session
-from src.database.repositories.limits_repo import LimitsRepository
-from src.database.repositories.user_repo import UserRepository
-from src.services.referral_service import ReferralService
-from src.services.user_service import UserService
+from src.database.models import Limits, User
+from src.services.container import ServiceContainer
 
 logger = get_logger(__name__)
 router = Router(name=__name__)
@@ -49,93 +47,93 @@ async def check_channel_subscription(bot: Bot, user_id: int) -> bool:
 
 
 @router.message(CommandStart())
-async def cmd_start(message: Message, bot: Bot):
+async def cmd_start(
+    message: Message,
+    session: AsyncSession,
+    user: User | None,
+    limits: Limits | None,
+    services: ServiceContainer,
+):
     """Обработчик команды /start"""
-    async for session in get_session():
-        try:
-            # Парсим реферальный код
-            referrer_id = parse_referral_code(message.text or "")
-            
-            # Проверка подписки на канал отключена для упрощения тестирования
-            # TODO: Включить проверку подписки в production
-            
-            # Создаем сервисы
-            user_repo = UserRepository()
-            limits_repo = LimitsRepository()
-            user_service = UserService(user_repo, limits_repo)
-            
-            # Создаем или получаем пользователя
-            user = await user_service.get_or_create(
+    try:
+        # Парсим реферальный код
+        referrer_id = parse_referral_code(message.text or "")
+        
+        # Проверка подписки на канал отключена для упрощения тестирования
+        # TODO: Включить проверку подписки в production
+        
+        # Пользователь уже загружен DatabaseMiddleware - get_or_create нужен
+        # только для регистрации или смены username
+        username = message.from_user.username
+        if user is None or (username and user.username != username):
+            user = await services.user_service.get_or_create(
                 session,
                 message.from_user.id,
-                message.from_user.username,
+                username,
                 referrer_id,
             )
+            limits = await services.limits_repo.get_by_user_id(session, user.id)
+        
+        if not limits:
+            # Создаем дефолтные лимиты если нет
+            limits = await services.limits_repo.create_default(
+                session,
+                user.id,
+                user.subscription_tier,
+            )
+        
+        # Проверяем новый ли пользователь
+        is_new_user = user.created_at == user.updated_at
+        
+        if is_new_user:
+            # Новый пользователь
+            await message.answer(
+                LEXICON_RU["start"].format(
+                    username=message.from_user.username or "Пользователь"
+                ),
+                reply_markup=get_main_menu_keyboard(),
+            )
+        else:
+            # Возвращающийся пользователь
+            analytics_left = (
+                limits.analytics_limit - limits.analytics_used
+                if limits.analytics_limit != -1
+                else "∞"
+            )
+            analytics_limit = limits.analytics_limit if limits.analytics_limit != -1 else "∞"
             
-            # Получаем лимиты
-            limits = await limits_repo.get_by_user_id(session, user.id)
-            if not limits:
-                # Создаем дефолтные лимиты если нет
-                limits = await limits_repo.create_default(
-                    session,
-                    user.id,
-                    user.subscription_tier,
-                )
-            
-            # Проверяем новый ли пользователь
-            is_new_user = user.created_at == user.updated_at
-            
-            if is_new_user:
-                # Новый пользователь
-                await message.answer(
-                    LEXICON_RU["start"].format(
-                        username=message.from_user.username or "Пользователь"
-                    ),
-                    reply_markup=get_main_menu_keyboard(),
-                )
-            else:
-                # Возвращающийся пользователь
-                analytics_left = (
-                    limits.analytics_limit - limits.analytics_used
-                    if limits.analytics_limit != -1
-                    else "∞"
-                )
-                analytics_limit = limits.analytics_limit if limits.analytics_limit != -1 else "∞"
-                
-                themes_left = (
-                    limits.themes_limit - limits.themes_used
-                    if limits.themes_limit != -1
-                    else "∞"
-                )
-                themes_limit = limits.themes_limit if limits.themes_limit != -1 else "∞"
-                
-                await message.answer(
-                    LEXICON_RU["start_registered"].format(
-                        username=message.from_user.username or "Пользователь",
-                        subscription=user.subscription_tier.value.upper(),
-                        analytics_left=analytics_left,
-                        analytics_limit=analytics_limit,
-                        themes_left=themes_left,
-                        themes_limit=themes_limit,
-                    ),
-                    reply_markup=get_main_menu_keyboard(),
-                )
+            themes_left = (
+                limits.themes_limit - limits.themes_used
+                if limits.themes_limit != -1
+                else "∞"
+            )
+            themes_limit = limits.themes_limit if limits.themes_limit != -1 else "∞"
             
-            logger.info(
-                "user_started",
-                user_id=user.id,
-                telegram_id=user.telegram_id,
-                is_new=is_new_user,
+            await message.answer(
+                LEXICON_RU["start_registered"].format(
+                    username=message.from_user.username or "Пользователь",
+                    subscription=user.subscription_tier.value.upper(),
+                    analytics_left=analytics_left,
+                    analytics_limit=analytics_limit,
+                    themes_left=themes_left,
+                    themes_limit=themes_limit,
+                ),
+                reply_markup=get_main_menu_keyboard(),
             )
         
-        except Exception as e:
-            logger.error(
-                "start_handler_error",
-                telegram_id=message.from_user.id,
-                error=str(e),
-                exc_info=True,
-            )
-            await message.answer(LEXICON_RU["error_generic"].format(error_code="START_001"))
-        finally:
-            break
+        logger.info(
+            "user_started",
+            user_id=user.id,
+            telegram_id=user.telegram_id,
+            is_new=is_new_user,
+        )
+    
+    except Exception as e:
+        logger.error(
+            "start_handler_error",
+            telegram_id=message.from_user.id,
+            error=str(e),
+            exc_info=True,
+        )
+        await message.answer(LEXICON_RU["error_generic"].format(error_code="START_001"))
 
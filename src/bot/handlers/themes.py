@@ -4,25 +4,41 @@ Handler для генерации тем
 Выбор категории и генерация тем для контента
 """
 
-from aiogram import Router
-from aiogram.types import CallbackQuery
+from html import escape
+from typing import Iterable
+
+from aiogram import F, Router
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.bot.keyboards.factories import get_back_keyboard, get_theme_categories_keyboard
 from src.bot.lexicon.lexicon_ru import LEXICON_RU
+from src.bot.states.fsm import ThemeStates
 from src.config.logging import get_logger
 from src.core.exceptions import LimitExceededException
-from src.database.connection import get_session
-from src.database.repositories.limits_repo import LimitsRepository
-from src.database.repositories.theme_repo import ThemeRepository
-from src.services.theme_service import ThemeService
+from src.database.models import Limits, User
+from src.services.container import ServiceContainer
 
 logger = get_logger(__name__)
 router = Router(name=__name__)
 
+CATEGORY_NAMES = {
+    "vectors": "Векторные иллюстрации",
+    "photos": "Фотографии",
+    "videos": "Видео",
+    "audio": "Аудио",
+    "templates": "Шаблоны дизайна",
+}
+
+# Тем в одном сообщении поиска и рекомендаций
+THEME_LIST_LIMIT = 10
+
 
 @router.callback_query(lambda c: c.data == "themes")
-async def callback_themes(callback: CallbackQuery):
+async def callback_themes(callback: CallbackQuery, state: FSMContext):
     """Обработчик раздела тем"""
+    await state.clear()
     await callback.message.edit_text(
         LEXICON_RU["themes_start"],
         reply_markup=get_theme_categories_keyboard(),
@@ -31,88 +47,154 @@ async def callback_themes(callback: CallbackQuery):
 
 
 @router.callback_query(lambda c: c.data.startswith("theme_"))
-async def callback_theme_category(callback: CallbackQuery):
+async def callback_theme_category(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    user: User | None,
+    limits: Limits | None,
+    services: ServiceContainer,
+):
     """Обработчик выбора категории темы"""
-    async for session in get_session():
-        try:
-            # Определяем категорию
-            category_map = {
-                "theme_vectors": "vectors",
-                "theme_photos": "photos",
-                "theme_videos": "videos",
-                "theme_audio": "audio",
-                "theme_templates": "templates",
-            }
-            
-            category = category_map.get(callback.data, "photos")
-            
-            # Создаем сервисы
-            theme_repo = ThemeRepository()
-            limits_repo = LimitsRepository()
-            from src.database.repositories.theme_template_repo import ThemeTemplateRepository
-            theme_template_repo = ThemeTemplateRepository()
-            theme_service = ThemeService(theme_repo, limits_repo, theme_template_repo)
-            
-            # Получаем пользователя
-            from src.database.repositories.user_repo import UserRepository
-            user_repo = UserRepository()
-            user = await user_repo.get_by_telegram_id(session, callback.from_user.id)
-            if not user:
-                await callback.answer("Пользователь не найден", show_alert=True)
-                return
-            
-            # Проверяем лимиты
-            if not await theme_service.can_use_themes(session, user.id):
-                limits = await limits_repo.get_by_user_id(session, user.id)
-                reset_date = limits.reset_at.strftime("%d.%m.%Y") if limits.reset_at else "N/A"
-                await callback.message.edit_text(
-                    LEXICON_RU["themes_limit_reached"].format(
-                        used=limits.themes_used,
-                        limit=limits.themes_limit if limits.themes_limit != -1 else "∞",
-                        reset_date=reset_date,
-                    ),
-                    reply_markup=get_back_keyboard("themes"),
-                )
-                await callback.answer()
-                return
-            
-            # Генерируем тему
-            theme_request = await theme_service.generate_theme(session, user.id, category)
-            
-            # Формируем ответ
-            category_names = {
-                "vectors": "Векторные иллюстрации",
-                "photos": "Фотографии",
-                "videos": "Видео",
-                "audio": "Аудио",
-                "templates": "Шаблоны дизайна",
-            }
-            
-            category_name = category_names.get(category, category)
-            
-            # Парсим тему для отображения
-            theme_text = theme_request.theme
-            description = "Актуальная тема для создания контента"
-            relevance = "Тренд на рынке стоков"
-            keywords = "ключевые слова, теги, SEO"
-            
-            await callback.message.edit_text(
-                LEXICON_RU["theme_generated"].format(
-                    category=category_name,
-                    theme=theme_text,
-                    description=description,
-                    relevance=relevance,
-                    keywords=keywords,
-                ),
-                reply_markup=get_theme_categories_keyboard(),
-            )
-            await callback.answer("✅ Тема сгенерирована!")
+    try:
+        # Определяем категорию
+        category_map = {
+            "theme_vectors": "vectors",
+            "theme_photos": "photos",
+            "theme_videos": "videos",
+            "theme_audio": "audio",
+            "theme_templates": "templates",
+        }
+        
+        category = category_map.get(callback.data, "photos")
+        
+        theme_service = services.theme_service
+        
+        if not user:
+            await callback.answer("Пользователь не найден", show_alert=True)
+            return
         
-        except LimitExceededException as e:
+        # Генерируем тему: лимит проверяется и списывается одним запросом
+        theme_request = await theme_service.generate_theme(session, user.id, category)
+        
+        # Формируем ответ
+        category_name = CATEGORY_NAMES.get(category, category)
+        
+        # Парсим тему для отображения
+        theme_text = theme_request.theme
+        description = "Актуальная тема для создания контента"
+        relevance = "Тренд на рынке стоков"
+        keywords = "ключевые слова, теги, SEO"
+        
+        await callback.message.edit_text(
+            LEXICON_RU["theme_generated"].format(
+                category=category_name,
+                theme=theme_text,
+                description=description,
+                relevance=relevance,
+                keywords=keywords,
+            ),
+            reply_markup=get_theme_categories_keyboard(),
+        )
+        await callback.answer("✅ Тема сгенерирована!")
+    
+    except LimitExceededException as e:
+        if limits is None:
             await callback.answer(str(e), show_alert=True)
-        except Exception as e:
-            logger.error("theme_handler_error", error=str(e), exc_info=True)
-            await callback.answer("Ошибка генерации темы", show_alert=True)
-        finally:
-            break
+            return
+        reset_date = limits.reset_at.strftime("%d.%m.%Y") if limits.reset_at else "N/A"
+        await callback.message.edit_text(
+            LEXICON_RU["themes_limit_reached"].format(
+                used=limits.themes_used,
+                limit=limits.themes_limit if limits.themes_limit != -1 else "∞",
+                reset_date=reset_date,
+            ),
+            reply_markup=get_back_keyboard("themes"),
+        )
+        await callback.answer()
+    except Exception as e:
+        logger.error("theme_handler_error", error=str(e), exc_info=True)
+        await callback.answer("Ошибка генерации темы", show_alert=True)
 
+
+@router.callback_query(lambda c: c.data == "themes_search")
+async def callback_themes_search(callback: CallbackQuery, state: FSMContext):
+    """Обработчик начала поиска тем"""
+    await state.set_state(ThemeStates.waiting_for_query)
+    await callback.message.edit_text(
+        LEXICON_RU["themes_search_prompt"],
+        reply_markup=get_back_keyboard("themes"),
+    )
+    await callback.answer()
+
+
+@router.message(ThemeStates.waiting_for_query, F.text)
+async def handle_themes_search_query(
+    message: Message,
+    session: AsyncSession,
+    services: ServiceContainer,
+):
+    """Обработчик запроса поиска тем (состояние сохраняется для следующего запроса)"""
+    query = " ".join(message.text.split())
+    
+    try:
+        results = await services.theme_service.search_themes(
+            session,
+            query,
+            limit=THEME_LIST_LIMIT,
+        )
+    except Exception as e:
+        logger.error("themes_search_error", error=str(e), exc_info=True)
+        await message.answer("Ошибка поиска тем", reply_markup=get_back_keyboard("themes"))
+        return
+    
+    if not results:
+        await message.answer(
+            LEXICON_RU["themes_search_empty"].format(query=escape(query)),
+            reply_markup=get_back_keyboard("themes"),
+        )
+        return
+    
+    await message.answer(
+        LEXICON_RU["themes_search_results"].format(
+            query=escape(query),
+            results=_format_themes((category, theme) for _, category, theme in results),
+        ),
+        reply_markup=get_back_keyboard("themes"),
+    )
+
+
+@router.callback_query(lambda c: c.data == "themes_recommended")
+async def callback_themes_recommended(
+    callback: CallbackQuery,
+    session: AsyncSession,
+    user: User | None,
+    services: ServiceContainer,
+):
+    """Обработчик рекомендованных тем по продажам пользователя"""
+    if not user:
+        await callback.answer("Пользователь не найден", show_alert=True)
+        return
+    
+    templates = await services.theme_service.get_recommended_themes(
+        session,
+        user.id,
+        limit=THEME_LIST_LIMIT,
+    )
+    
+    if templates:
+        text = LEXICON_RU["themes_recommended"].format(
+            results=_format_themes((template.category, template.theme) for template in templates),
+        )
+    else:
+        text = LEXICON_RU["themes_recommended_empty"]
+    
+    await callback.message.edit_text(text, reply_markup=get_back_keyboard("themes"))
+    await callback.answer()
+
+
+def _format_themes(themes: Iterable[tuple[str, str]]) -> str:
+    """Нумерованный список тем (category, theme) для сообщения"""
+    return "\n".join(
+        f"{number}. <b>{escape(theme)}</b> · {CATEGORY_NAMES.get(category, category)}"
+        for number, (category, theme) in enumerate(themes, start=1)
+    )
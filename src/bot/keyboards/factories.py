@@ -122,6 +122,12 @@ def get_analytics_keyboard() -> InlineKeyboardMarkup:
             callback_data="my_reports"
         ),
     )
+    builder.row(
+        InlineKeyboardButton(
+            text=LEXICON_COMMANDS_RU["portfolio_report"],
+            callback_data="portfolio_report"
+        ),
+    )
     builder.row(
         InlineKeyboardButton(
             text=LEXICON_COMMANDS_RU["main_menu"],
@@ -161,6 +167,16 @@ def get_theme_categories_keyboard() -> InlineKeyboardMarkup:
             text=LEXICON_COMMANDS_RU["theme_templates"],
             callback_data="theme_templates"
         ),
+        InlineKeyboardButton(
+            text=LEXICON_COMMANDS_RU["themes_search"],
+            callback_data="themes_search"
+        ),
+    )
+    builder.row(
+        InlineKeyboardButton(
+            text=LEXICON_COMMANDS_RU["themes_recommended"],
+            callback_data="themes_recommended"
+        ),
     )
     builder.row(
         InlineKeyboardButton(
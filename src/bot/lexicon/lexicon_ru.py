@@ -154,12 +154,22 @@ LEXICON_RU: dict[str, str] = {
     "analytics_file_received": (
         "✅ <b>Файл получен!</b>\n\n"
         "📂 Название: {filename}\n"
-        "📏 Размер: {size}\n"
-        "📊 Строк данных: {rows}\n\n"
+        "📏 Размер: {size}\n\n"
         "Начинаю обработку... ⏳\n"
         "Это может занять до 30 секунд."
     ),
     
+    "analytics_cached_report": (
+        "♻️ Этот файл уже анализировался - показываю готовый отчет.\n"
+        "Лимит анализов не списан.\n\n"
+        "{summary}"
+    ),
+    
+    "portfolio_empty": (
+        "📚 История продаж пока пуста.\n\n"
+        "Загрузи CSV файл - продажи из каждой выгрузки накапливаются в истории."
+    ),
+    
     "analytics_processing": (
         "⏳ <b>Обработка данных...</b>\n\n"
         "Анализирую твое портфолио:\n"
@@ -198,6 +208,12 @@ LEXICON_RU: dict[str, str] = {
         "Попробуй экспортировать файл заново и отправь еще раз."
     ),
     
+    "analytics_queue_error": (
+        "❌ <b>Не удалось начать анализ</b>\n\n"
+        "Сервис обработки файлов временно недоступен. "
+        "Анализ не списан - отправь файл еще раз через несколько минут."
+    ),
+    
     "analytics_limit_reached": (
         "⚠️ <b>Лимит анализов исчерпан</b>\n\n"
         "Ты использовал все доступные анализы в этом месяце.\n\n"
@@ -245,6 +261,35 @@ LEXICON_RU: dict[str, str] = {
         "Переходи на PRO (100 тем/мес) или ULTRA (безлимит)! 🚀"
     ),
     
+    "themes_search_prompt": (
+        "🔍 <b>Поиск тем</b>\n\n"
+        "Напиши слово или фразу, например «accounting» или «active seniors».\n\n"
+        "Можно вводить начало слова - я найду подходящие темы во всех категориях 👇"
+    ),
+    
+    "themes_search_results": (
+        "🔍 <b>Темы по запросу «{query}»</b>\n\n"
+        "{results}\n\n"
+        "Напиши другой запрос, чтобы продолжить поиск 👇"
+    ),
+    
+    "themes_search_empty": (
+        "🔍 По запросу «{query}» ничего не нашлось.\n\n"
+        "Попробуй другое слово или начало слова 👇"
+    ),
+    
+    "themes_recommended": (
+        "🔥 <b>Темы по твоим продажам</b>\n\n"
+        "Похожи на твои самые доходные работы:\n\n"
+        "{results}"
+    ),
+    
+    "themes_recommended_empty": (
+        "🔥 <b>Темы по твоим продажам</b>\n\n"
+        "Пока рекомендовать нечего: загрузи CSV с продажами в разделе "
+        "«Анализ CSV», и я подберу темы, похожие на твои бестселлеры 📊"
+    ),
+    
     # === Уроки ===
     "lessons_start": (
         "📚 <b>Обучающие материалы</b>\n\n"
@@ -487,6 +532,11 @@ LEXICON_RU: dict[str, str] = {
         "• Конверсия: {referral_conversion}%"
     ),
     
+    "admin_reprocess_started": (
+        "🔁 <b>Повторная обработка</b>\n\n"
+        "Поставлено в очередь анализов с ошибкой: {count}"
+    ),
+    
     "broadcast_start": (
         "📢 <b>Рассылка сообщений</b>\n\n"
         "Отправь мне текст сообщения для рассылки.\n\n"
@@ -604,6 +654,7 @@ LEXICON_COMMANDS_RU: dict[str, str] = {
     "new_analysis": "📊 Новый анализ",
     "upload_csv": "📤 Загрузить CSV",
     "my_reports": "📋 Мои отчеты",
+    "portfolio_report": "📚 Вся история",
     "last_report": "📊 Последний отчет",
     
     # === Темы ===
@@ -614,6 +665,8 @@ LEXICON_COMMANDS_RU: dict[str, str] = {
     "theme_audio": "🎵 Аудио",
     "theme_templates": "📐 Шаблоны",
     "another_theme": "🔄 Еще тему",
+    "themes_search": "🔍 Найти тему",
+    "themes_recommended": "🔥 Темы по твоим продажам",
     
     # === Уроки ===
     "lessons_basics": "1️⃣ Основы Adobe Stock",
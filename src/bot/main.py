@@ -25,8 +25,17 @@ from src.bot.handlers import (
     start,
     themes,
 )
+from src.bot.middlewares import DatabaseMiddleware
 from src.config.logging import get_logger
 from src.config.settings import settings
+from src.core.cache.connection import close_redis, get_redis
+from src.core.cache.report_cache import ReportCache
+from src.core.cache.user_cache import listen_invalidations, user_cache
+from src.core.quota.engine import QuotaEngine
+from src.core.themes.index import ThemeIndex, listen_theme_changes
+from src.database.connection import AsyncSessionLocal
+from src.services.container import ServiceContainer
+from src.workers.queue import JobQueue
 
 logger = get_logger(__name__)
 
@@ -39,8 +48,48 @@ async def main():
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
     
+    # Очередь задач: одно соединение на процесс, доступно handlers как job_queue
+    job_queue = JobQueue()
+    try:
+        await job_queue.connect()
+    except Exception as e:
+        # Бот работает и без Redis - соединение восстановится при первой задаче
+        logger.warning("job_queue_connect_failed", error=str(e))
+    
     # Инициализация диспетчера
-    dp = Dispatcher(storage=MemoryStorage())
+    dp = Dispatcher(storage=MemoryStorage(), job_queue=job_queue)
+    
+    # Темы в памяти: выбор случайной темы без запроса к БД
+    theme_index = ThemeIndex()
+    try:
+        async with AsyncSessionLocal() as session:
+            await theme_index.load(session)
+    except Exception as e:
+        # Без индекса темы выбираются в БД
+        logger.warning("theme_index_load_failed", error=str(e))
+    
+    # Сессия БД, пользователь с лимитами и сервисы для каждого update
+    dp.update.outer_middleware(
+        DatabaseMiddleware(
+            AsyncSessionLocal,
+            ServiceContainer(
+                ReportCache(get_redis()),
+                QuotaEngine(get_redis()) if settings.quota.enabled else None,
+                theme_index,
+            ),
+            user_cache=user_cache,
+        )
+    )
+    
+    # Инвалидации кэша пользователей из других процессов (admin, API, реплики бота)
+    invalidation_listener = None
+    if settings.cache.user_pubsub:
+        invalidation_listener = asyncio.create_task(listen_invalidations(get_redis()))
+    
+    # Перезагрузка индекса тем после их изменения
+    theme_listener = asyncio.create_task(
+        listen_theme_changes(get_redis(), theme_index, AsyncSessionLocal)
+    )
     
     # Регистрация handlers
     dp.include_router(start.router)
@@ -64,6 +113,11 @@ async def main():
     except Exception as e:
         logger.error("bot_error", error=str(e), exc_info=True)
     finally:
+        if invalidation_listener is not None:
+            invalidation_listener.cancel()
+        theme_listener.cancel()
+        await job_queue.close()
+        await close_redis()
         await bot.session.close()
 
 
@@ -0,0 +1,9 @@
+"""
+Middlewares для IQStocker v2.0
+"""
+
+from .database import DatabaseMiddleware
+
+__all__ = [
+    "DatabaseMiddleware",
+]
@@ -0,0 +1,115 @@
+"""
+Middleware сессии БД для handlers
+
+Одна AsyncSession на update: пользователь и его лимиты загружаются
+одним запросом (или берутся из UserCache) и передаются handlers вместе
+с контейнером сервисов
+"""
+
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User as TelegramUser
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config.logging import get_logger
+from src.core.cache.user_cache import UserCache
+from src.database.models import Limits, User
+from src.services.container import ServiceContainer
+
+logger = get_logger(__name__)
+
+
+class DatabaseMiddleware(BaseMiddleware):
+    """
+    Outer middleware: сессия, пользователь, лимиты и сервисы для handlers
+    
+    В data handler попадают:
+        session: AsyncSession на время обработки update
+        user: User или None, если пользователь не зарегистрирован
+        limits: Limits или None
+        services: ServiceContainer
+        
+    После обработки сессия фиксируется, при исключении handler -
+    откатывается.
+    """
+    
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        services: ServiceContainer,
+        user_cache: UserCache | None = None,
+    ):
+        """
+        Инициализация middleware
+        
+        Args:
+            session_factory: Фабрика сессий
+            services: Контейнер сервисов
+            user_cache: Кэш пользователей (None - всегда из БД)
+        """
+        self.session_factory = session_factory
+        self.services = services
+        self.user_cache = user_cache
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        async with self.session_factory() as session:
+            user = limits = None
+            from_user: TelegramUser | None = data.get("event_from_user")
+            if from_user is not None:
+                user, limits = await self._load_user(session, from_user.id)
+            
+            data["session"] = session
+            data["user"] = user
+            data["limits"] = limits
+            data["services"] = self.services
+            
+            # Исключение handler откатывает сессию при выходе из контекста
+            result = await handler(event, data)
+            
+            try:
+                await session.commit()
+            except SQLAlchemyError as e:
+                # Handler мог перехватить ошибку БД и уже ответить пользователю
+                await session.rollback()
+                logger.warning("db_session_commit_failed", error=str(e))
+            return result
+    
+    async def _load_user(
+        self,
+        session: AsyncSession,
+        telegram_id: int,
+    ) -> tuple[User | None, Limits | None]:
+        """
+        Получить пользователя и лимиты из кэша или из БД
+        
+        Args:
+            session: AsyncSession
+            telegram_id: Telegram ID пользователя
+            
+        Returns:
+            Кортеж (User или None, Limits или None), привязанные к сессии
+        """
+        if self.user_cache is None:
+            return await self.services.user_repo.get_with_limits(session, telegram_id)
+        
+        cached = self.user_cache.get(telegram_id)
+        if cached is not None:
+            user, limits = cached
+            # Detached экземпляры становятся persistent без SELECT
+            session.add(user)
+            if limits is not None:
+                session.add(limits)
+            return user, limits
+        
+        epoch = self.user_cache.epoch
+        user, limits = await self.services.user_repo.get_with_limits(session, telegram_id)
+        if user is not None:
+            self.user_cache.set(user, limits, epoch)
+        return user, limits
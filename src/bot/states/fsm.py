@@ -15,6 +15,7 @@ class AnalyticsStates(StatesGroup):
 class ThemeStates(StatesGroup):
     """Состояния для генерации тем"""
     selecting_category = State()
+    waiting_for_query = State()
 
 
 class BroadcastStates(StatesGroup):
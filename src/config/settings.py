@@ -4,6 +4,7 @@
 Использует Pydantic Settings для загрузки переменных окружения
 """
 
+import os
 from typing import List
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -46,6 +47,28 @@ class RedisSettings(BaseSettings):
         return f"redis://{self.host}:{self.port}/{self.db}"
 
 
+class CacheSettings(BaseSettings):
+    """Настройки кэша"""
+    
+    model_config = SettingsConfigDict(env_prefix="CACHE_", env_file=".env", extra="ignore")
+    
+    report_ttl_seconds: int = 30 * 24 * 3600
+    report_max_per_user: int = 20
+    user_ttl_seconds: int = 60
+    user_max_size: int = 10000
+    user_pubsub: bool = False
+
+
+class QuotaSettings(BaseSettings):
+    """Настройки квот в Redis"""
+    
+    model_config = SettingsConfigDict(env_prefix="QUOTA_", env_file=".env", extra="ignore")
+    
+    enabled: bool = False  # Списание лимитов через Redis вместо таблицы limits
+    key_ttl_seconds: int = 7 * 24 * 3600  # Счетчики без обращений удаляются из Redis
+    flush_batch_size: int = 500  # Пользователей за один UPDATE при записи в limits
+
+
 class AdminSettings(BaseSettings):
     """Настройки админ-панели"""
     
@@ -66,6 +89,21 @@ class TributeSettings(BaseSettings):
     base_url: str = "https://api.tribute.tg"
 
 
+class WorkerSettings(BaseSettings):
+    """Настройки ARQ worker"""
+    
+    model_config = SettingsConfigDict(env_prefix="WORKER_", env_file=".env", extra="ignore")
+    
+    max_jobs: int = 10
+    process_pool_size: int = 0  # 0 - по числу ядер
+    inline_max_bytes: int = 256 * 1024  # Части файла меньше разбираются без пула процессов
+    download_timeout: int = 120  # Таймаут скачивания файла из Telegram, секунды
+    
+    def get_process_pool_size(self) -> int:
+        """Возвращает размер пула процессов"""
+        return self.process_pool_size or os.cpu_count() or 1
+
+
 class AppSettings(BaseSettings):
     """Настройки приложения"""
     
@@ -84,8 +122,11 @@ class Settings:
         self.bot = BotSettings()
         self.database = DatabaseSettings()
         self.redis = RedisSettings()
+        self.cache = CacheSettings()
+        self.quota = QuotaSettings()
         self.admin = AdminSettings()
         self.tribute = TributeSettings()
+        self.worker = WorkerSettings()
         self.app = AppSettings()
 
 
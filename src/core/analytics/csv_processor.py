@@ -4,16 +4,25 @@
 Парсит CSV файлы и извлекает данные для анализа
 """
 
+import codecs
 import csv
 import io
-from datetime import datetime
-from typing import Any
+import math
+from typing import Any, BinaryIO, Iterator, TextIO
 
 from src.config.logging import get_logger
+from src.core.analytics.date_parser import DateParser
+from src.core.analytics.sales_frame import SalesFrame
 from src.core.exceptions import CSVValidationException
 
 logger = get_logger(__name__)
 
+# Размер блока при потоковом чтении файла
+READ_CHUNK_SIZE = 64 * 1024
+
+# Значения первой строки, по которым определяется формат с заголовками
+HEADER_MARKERS = ('date', 'asset id', 'title', 'type', 'revenue')
+
 
 class CSVProcessor:
     """Процессор CSV файлов"""
@@ -27,6 +36,8 @@ class CSVProcessor:
         1. С заголовками: Date,Asset ID,Title,Type,Impressions,Downloads,Revenue
         2. Без заголовков (формат Adobe Stock): Date,Asset ID,Title,Type,Revenue,Category,Filename,Studio,Size
         
+        Для больших файлов используйте iter_rows - он не держит файл в памяти целиком.
+        
         Args:
             content: Содержимое CSV файла (bytes или str)
             
@@ -37,178 +48,361 @@ class CSVProcessor:
             CSVValidationException: Ошибка парсинга CSV
         """
         try:
-            # Конвертируем bytes в строку если нужно
             if isinstance(content, bytes):
-                content_str = content.decode('utf-8-sig')  # Поддержка BOM
+                stream: BinaryIO | TextIO = io.BytesIO(content)
             else:
-                content_str = content
+                stream = io.StringIO(content)
             
-            # Парсим CSV
-            reader = csv.reader(io.StringIO(content_str))
-            rows = list(reader)
+            return list(CSVProcessor.iter_rows(stream))
+        
+        except CSVValidationException:
+            raise
+        except Exception as e:
+            logger.error("csv_processing_error", error=str(e), exc_info=True)
+            raise CSVValidationException(f"Ошибка обработки CSV: {str(e)}")
+    
+    @staticmethod
+    def iter_rows(
+        stream: BinaryIO | TextIO,
+        chunk_size: int = READ_CHUNK_SIZE,
+        date_parser: DateParser | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Потоково парсить CSV и выдавать нормализованные строки
+        
+        Файл читается блоками по chunk_size байт с инкрементальным
+        декодированием utf-8-sig, поэтому потребление памяти не зависит
+        от размера выгрузки. Формат (с заголовками или Adobe Stock)
+        определяется только по первой строке.
+        
+        Строки с нераспознанной датой пропускаются и учитываются
+        в статистике date_parser.
+        
+        Args:
+            stream: Бинарный файловый объект (или текстовый)
+            chunk_size: Размер блока чтения в байтах
+            date_parser: Парсер дат файла (для получения статистики)
             
-            if not rows:
+        Yields:
+            Нормализованные словари с данными строк
+            
+        Raises:
+            CSVValidationException: Файл пуст или не является корректным CSV
+        """
+        reader = csv.reader(CSVProcessor._iter_lines(stream, chunk_size))
+        if date_parser is None:
+            date_parser = DateParser()
+        
+        try:
+            first_row = next(reader, None)
+            if first_row is None:
                 raise CSVValidationException("CSV файл пуст")
             
-            # Пытаемся определить формат по первой строке
-            first_row = rows[0]
+            headers = CSVProcessor.detect_headers(first_row)
+            if headers is None:
+                # Формат Adobe Stock без заголовков - первая строка уже данные
+                normalized = CSVProcessor._parse_adobe_stock_row(first_row, date_parser)
+                if normalized:
+                    yield normalized
             
-            # Проверяем наличие заголовков
-            has_header = any(
-                header.lower() in ['date', 'asset id', 'title', 'type', 'revenue']
-                for header in first_row
+            for row in reader:
+                normalized = CSVProcessor._parse_row(row, headers, date_parser)
+                if normalized:
+                    yield normalized
+        
+        except csv.Error as e:
+            logger.error("csv_parse_error", error=str(e), exc_info=True)
+            raise CSVValidationException(f"Ошибка парсинга CSV: {str(e)}")
+        
+        if date_parser.failed_count:
+            logger.warning(
+                "csv_date_parse_failures",
+                failed=date_parser.failed_count,
+                samples=date_parser.failed_samples,
             )
+    
+    @staticmethod
+    def iter_chunk_rows(
+        stream: BinaryIO | TextIO,
+        headers: list[str] | None,
+        date_parser: DateParser | None = None,
+        chunk_size: int = READ_CHUNK_SIZE,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Потоково парсить часть CSV файла с уже известным форматом
+        
+        Часть должна начинаться с начала записи CSV и не содержать
+        строку заголовков (см. parallel.split_chunks).
+        
+        Args:
+            stream: Бинарный файловый объект (или текстовый)
+            headers: Нормализованные заголовки или None для формата Adobe Stock
+            date_parser: Парсер дат (для получения статистики)
+            chunk_size: Размер блока чтения в байтах
             
-            if has_header:
-                # Формат с заголовками
-                return CSVProcessor._parse_with_headers(rows)
-            else:
-                # Формат Adobe Stock без заголовков
-                return CSVProcessor._parse_adobe_stock_format(rows)
+        Yields:
+            Нормализованные словари с данными строк
+            
+        Raises:
+            CSVValidationException: Часть не является корректным CSV
+        """
+        reader = csv.reader(CSVProcessor._iter_lines(stream, chunk_size))
+        if date_parser is None:
+            date_parser = DateParser()
+        
+        try:
+            for row in reader:
+                normalized = CSVProcessor._parse_row(row, headers, date_parser)
+                if normalized:
+                    yield normalized
         
         except csv.Error as e:
             logger.error("csv_parse_error", error=str(e), exc_info=True)
             raise CSVValidationException(f"Ошибка парсинга CSV: {str(e)}")
-        except Exception as e:
-            logger.error("csv_processing_error", error=str(e), exc_info=True)
-            raise CSVValidationException(f"Ошибка обработки CSV: {str(e)}")
     
     @staticmethod
-    def _parse_with_headers(rows: list[list[str]]) -> list[dict[str, Any]]:
+    def detect_headers(first_row: list[str]) -> list[str] | None:
         """
-        Парсить CSV с заголовками
+        Определить формат файла по первой строке
         
         Args:
-            rows: Список строк CSV
+            first_row: Первая строка CSV
             
         Returns:
-            Список словарей с данными
+            Нормализованные заголовки или None для формата Adobe Stock без заголовков
         """
-        headers = [h.strip().lower() for h in rows[0]]
-        data_rows = rows[1:]
+        has_header = any(
+            header.strip().lower() in HEADER_MARKERS
+            for header in first_row
+        )
+        if not has_header:
+            return None
+        return [CSVProcessor._normalize_header(h) for h in first_row]
+    
+    @staticmethod
+    def parse_frame(
+        stream: BinaryIO | TextIO,
+        chunk_size: int = READ_CHUNK_SIZE,
+        date_parser: DateParser | None = None,
+    ) -> SalesFrame:
+        """
+        Потоково парсить CSV в колоночную таблицу
         
-        result = []
-        for row in data_rows:
-            if not row or len(row) < len(headers):
-                continue
+        Строки не накапливаются в виде словарей: каждая сразу
+        раскладывается по массивам SalesFrame.
+        
+        Args:
+            stream: Бинарный файловый объект (или текстовый)
+            chunk_size: Размер блока чтения в байтах
+            date_parser: Парсер дат файла (для получения статистики)
+            
+        Returns:
+            Колоночная таблица продаж
+            
+        Raises:
+            CSVValidationException: Файл пуст или не является корректным CSV
+        """
+        return SalesFrame.from_rows(CSVProcessor.iter_rows(stream, chunk_size, date_parser))
+    
+    @staticmethod
+    def _iter_lines(
+        stream: BinaryIO | TextIO,
+        chunk_size: int,
+    ) -> Iterator[str]:
+        """
+        Читать поток блоками и выдавать строки вместе с переводом строки
+        
+        Перевод строки сохраняется, чтобы csv.reader корректно собирал
+        многострочные значения в кавычках.
+        
+        Args:
+            stream: Бинарный или текстовый файловый объект
+            chunk_size: Размер блока чтения
+            
+        Yields:
+            Строки файла
+        """
+        decoder = codecs.getincrementaldecoder("utf-8-sig")()
+        tail = ""
+        
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
             
-            row_dict = {}
-            for i, header in enumerate(headers):
-                if i < len(row):
-                    row_dict[header] = row[i].strip()
+            text = chunk if isinstance(chunk, str) else decoder.decode(chunk)
+            if not text:
+                continue
             
-            # Нормализуем данные
-            normalized = CSVProcessor._normalize_row(row_dict)
-            if normalized:
-                result.append(normalized)
+            lines = (tail + text).split("\n")
+            tail = lines.pop()
+            for line in lines:
+                yield line + "\n"
         
-        return result
+        tail += decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+    
+    @staticmethod
+    def _normalize_header(header: str) -> str:
+        """Привести заголовок к ключу словаря: 'Asset ID' -> 'asset_id'"""
+        return "_".join(header.strip().lower().split())
     
     @staticmethod
-    def _parse_adobe_stock_format(rows: list[list[str]]) -> list[dict[str, Any]]:
+    def _parse_row(
+        row: list[str],
+        headers: list[str] | None,
+        date_parser: DateParser,
+    ) -> dict[str, Any] | None:
         """
-        Парсить формат Adobe Stock без заголовков
+        Распарсить строку в формате файла
         
-        Формат: Date,Asset ID,Title,Type,Revenue,Category,Filename,Studio,Size
+        Args:
+            row: Строка CSV
+            headers: Нормализованные заголовки или None для формата Adobe Stock
+            date_parser: Парсер дат файла
+            
+        Returns:
+            Нормализованный словарь или None если строка невалидна
+        """
+        if headers is None:
+            return CSVProcessor._parse_adobe_stock_row(row, date_parser)
+        return CSVProcessor._parse_header_row(headers, row, date_parser)
+    
+    @staticmethod
+    def _parse_header_row(
+        headers: list[str],
+        row: list[str],
+        date_parser: DateParser,
+    ) -> dict[str, Any] | None:
+        """
+        Распарсить одну строку CSV с заголовками
         
         Args:
-            rows: Список строк CSV
+            headers: Нормализованные заголовки
+            row: Строка CSV
+            date_parser: Парсер дат файла
             
         Returns:
-            Список словарей с данными
+            Нормализованный словарь или None если строка невалидна
         """
-        result = []
+        if not row or len(row) < len(headers):
+            return None
         
-        for row in rows:
-            if not row or len(row) < 5:
-                continue
+        row_dict = {}
+        for i, header in enumerate(headers):
+            row_dict[header] = row[i].strip()
+        
+        return CSVProcessor._normalize_row(row_dict, date_parser)
+    
+    @staticmethod
+    def _parse_adobe_stock_row(
+        row: list[str],
+        date_parser: DateParser,
+    ) -> dict[str, Any] | None:
+        """
+        Распарсить одну строку формата Adobe Stock
+        
+        Args:
+            row: Строка CSV
+            date_parser: Парсер дат файла
             
-            try:
-                # Парсим строку
-                # Формат: Date,Asset ID,Title,Type,Revenue,Category,Filename,Studio,Size
-                date_str = row[0].strip()
-                asset_id = row[1].strip()
-                title = row[2].strip()
-                purchase_type = row[3].strip()  # subscription/custom
-                revenue_str = row[4].strip().replace('$', '').replace(',', '')
-                
-                # Категория (если есть)
-                category = row[5].strip() if len(row) > 5 else "unknown"
-                
-                # Парсим дату
-                try:
-                    date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                except (ValueError, AttributeError):
-                    # Пытаемся другие форматы
-                    try:
-                        date_obj = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                    except ValueError:
-                        logger.warning("date_parse_warning", date_str=date_str)
-                        date_obj = datetime.utcnow()
-                
-                # Парсим revenue
-                try:
-                    revenue = float(revenue_str)
-                except (ValueError, TypeError):
-                    revenue = 0.0
-                
-                # Считаем impressions и downloads
-                # В этом формате нет этих данных, используем defaults
-                impressions = 1  # По умолчанию
-                downloads = 1 if revenue > 0 else 0
-                
-                row_dict = {
-                    "date": date_obj.isoformat(),
-                    "asset_id": asset_id,
-                    "title": title,
-                    "purchase_type": purchase_type,
-                    "revenue": revenue,
-                    "category": category,
-                    "impressions": impressions,
-                    "downloads": downloads,
-                }
-                
-                result.append(row_dict)
+        Returns:
+            Словарь с данными или None если строка невалидна
+        """
+        if not row or len(row) < 5:
+            return None
+        
+        try:
+            # Формат: Date,Asset ID,Title,Type,Revenue,Category,Filename,Studio,Size
+            date_str = row[0].strip()
+            asset_id = row[1].strip()
+            title = row[2].strip()
+            purchase_type = row[3].strip()  # subscription/custom
+            revenue_str = row[4].strip().replace('$', '').replace(',', '')
             
-            except Exception as e:
-                logger.warning(
-                    "row_parse_warning",
-                    row=row,
-                    error=str(e),
-                )
-                continue
+            # Категория (если есть)
+            category = row[5].strip() if len(row) > 5 else "unknown"
+            
+            # Парсим дату: строки без корректной даты пропускаем
+            date_iso = date_parser.parse(date_str)
+            if date_iso is None:
+                return None
+            
+            # Парсим revenue
+            revenue = CSVProcessor._parse_revenue(revenue_str)
+            
+            # Считаем impressions и downloads
+            # В этом формате нет этих данных, используем defaults
+            impressions = 1  # По умолчанию
+            downloads = 1 if revenue > 0 else 0
+            
+            return {
+                "date": date_iso,
+                "asset_id": asset_id,
+                "title": title,
+                "purchase_type": purchase_type,
+                "revenue": revenue,
+                "category": category,
+                "impressions": impressions,
+                "downloads": downloads,
+            }
         
-        return result
+        except Exception as e:
+            logger.warning(
+                "row_parse_warning",
+                row=row,
+                error=str(e),
+            )
+            return None
     
     @staticmethod
-    def _normalize_row(row_dict: dict[str, Any]) -> dict[str, Any] | None:
+    def _parse_revenue(revenue_str: str) -> float:
+        """
+        Разобрать доход строки
+        
+        float() принимает "nan" и "inf" - такие значения, как и
+        нечисловые, считаются нулевым доходом.
+        
+        Args:
+            revenue_str: Доход без символа валюты и разделителей тысяч
+            
+        Returns:
+            Доход (0.0 для некорректного значения)
+        """
+        try:
+            revenue = float(revenue_str)
+        except (ValueError, TypeError):
+            return 0.0
+        return revenue if math.isfinite(revenue) else 0.0
+    
+    @staticmethod
+    def _normalize_row(
+        row_dict: dict[str, Any],
+        date_parser: DateParser | None = None,
+    ) -> dict[str, Any] | None:
         """
         Нормализовать строку данных
         
         Args:
             row_dict: Словарь с данными строки
+            date_parser: Парсер дат файла (по умолчанию новый)
             
         Returns:
             Нормализованный словарь или None если невалидный
         """
         try:
             # Парсим дату
-            date_str = str(row_dict.get("date", ""))
-            try:
-                date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            except (ValueError, AttributeError):
-                try:
-                    date_obj = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
-                except ValueError:
-                    return None
-            row_dict["date"] = date_obj.isoformat()
+            if date_parser is None:
+                date_parser = DateParser()
+            date_iso = date_parser.parse(str(row_dict.get("date", "")))
+            if date_iso is None:
+                return None
+            row_dict["date"] = date_iso
             
             # Парсим revenue
             revenue_str = str(row_dict.get("revenue", "0")).replace('$', '').replace(',', '')
-            try:
-                row_dict["revenue"] = float(revenue_str)
-            except (ValueError, TypeError):
-                row_dict["revenue"] = 0.0
+            row_dict["revenue"] = CSVProcessor._parse_revenue(revenue_str)
             
             # Парсим impressions
             impressions_str = str(row_dict.get("impressions", "0")).replace(',', '')
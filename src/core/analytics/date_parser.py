@@ -0,0 +1,169 @@
+"""
+Разбор дат из CSV выгрузок
+
+Формат временной метки определяется один раз на файл, дальше строки
+разбираются специализированным шаблоном без создания datetime
+"""
+
+import re
+from datetime import date, datetime
+from typing import Callable
+
+from src.config.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+# Сколько нераспознанных значений сохранять для логов
+FAILED_SAMPLES_LIMIT = 5
+
+_DATE = r"\d{4}-\d\d-\d\d"
+_TIME = r"(?:[01]\d|2[0-3]):[0-5]\d:[0-5]\d"
+_OFFSET = r"[+-](?:[01]\d|2[0-3]):[0-5]\d"
+
+
+def _same(value: str) -> str:
+    """Значение уже в каноническом виде datetime.isoformat()"""
+    return value
+
+
+# Известные форматы: имя, шаблон, приведение к виду datetime.isoformat().
+# Шаблон проверяет только поля времени - корректность календарной даты
+# проверяется один раз на день через кэш по префиксу YYYY-MM-DD.
+_FORMATS: tuple[tuple[str, re.Pattern[str], Callable[[str], str]], ...] = (
+    # 2025-10-23T15:34:14+00:00 (выгрузка Adobe Stock)
+    ("iso_offset", re.compile(f"{_DATE}T{_TIME}{_OFFSET}"), _same),
+    # 2025-10-23T15:34:14Z
+    ("iso_utc", re.compile(f"{_DATE}T{_TIME}Z"), lambda value: value[:-1] + "+00:00"),
+    # 2025-10-23T15:34:14
+    ("iso_naive", re.compile(f"{_DATE}T{_TIME}"), _same),
+    # 2025-10-23 15:34:14
+    ("space", re.compile(f"{_DATE} {_TIME}"), lambda value: f"{value[:10]}T{value[11:]}"),
+    # 2025-10-23
+    ("date", re.compile(_DATE), lambda value: value + "T00:00:00"),
+)
+
+
+class DateParser:
+    """
+    Парсер дат одного CSV файла
+    
+    Формат определяется по первой распознанной дате. Строки этого формата
+    проверяются шаблоном, а календарная дата - по кэшу префиксов YYYY-MM-DD
+    (в выгрузках один день повторяется много раз). Остальные значения
+    разбираются общим путем через datetime. Нераспознанные даты не
+    подменяются текущим временем, а считаются в failed_count.
+    """
+    
+    def __init__(self):
+        """Инициализация парсера"""
+        self.format_name: str | None = None
+        self.parsed_count = 0
+        self.failed_count = 0
+        self.failed_samples: list[str] = []
+        self._match: Callable[[str], re.Match[str] | None] | None = None
+        self._convert: Callable[[str], str] = _same
+        # Префикс YYYY-MM-DD -> корректна ли календарная дата
+        self._days: dict[str, bool] = {}
+    
+    def parse(self, date_str: str) -> str | None:
+        """
+        Разобрать дату и привести к формату datetime.isoformat()
+        
+        Args:
+            date_str: Дата из CSV
+            
+        Returns:
+            Дата в ISO формате или None если дату не удалось разобрать
+        """
+        date_str = date_str.strip()
+        
+        if self._match is None:
+            self._detect_format(date_str)
+        
+        if self._match is not None and self._match(date_str) and self._is_valid_day(date_str[:10]):
+            self.parsed_count += 1
+            return self._convert(date_str)
+        
+        return self._parse_generic(date_str)
+    
+    def stats(self) -> dict[str, int | str | None]:
+        """
+        Получить статистику разбора дат
+        
+        Returns:
+            Словарь с форматом и количеством разобранных и пропущенных дат
+        """
+        return {
+            "format": self.format_name,
+            "parsed": self.parsed_count,
+            "failed": self.failed_count,
+        }
+    
+    def _detect_format(self, date_str: str) -> None:
+        """
+        Определить формат файла по значению даты
+        
+        Args:
+            date_str: Дата из CSV
+        """
+        for name, pattern, convert in _FORMATS:
+            if pattern.fullmatch(date_str) and self._is_valid_day(date_str[:10]):
+                self.format_name = name
+                self._match = pattern.fullmatch
+                self._convert = convert
+                logger.debug("date_format_detected", format=name)
+                return
+    
+    def _is_valid_day(self, day: str) -> bool:
+        """
+        Проверить календарную дату с кэшированием
+        
+        Args:
+            day: Префикс YYYY-MM-DD
+            
+        Returns:
+            True если дата существует
+        """
+        valid = self._days.get(day)
+        if valid is None:
+            try:
+                date.fromisoformat(day)
+                valid = True
+            except ValueError:
+                valid = False
+            self._days[day] = valid
+        return valid
+    
+    def _parse_generic(self, date_str: str) -> str | None:
+        """
+        Разобрать дату произвольного формата через datetime
+        
+        Args:
+            date_str: Дата из CSV
+            
+        Returns:
+            Дата в ISO формате или None если дату не удалось разобрать
+        """
+        try:
+            date_obj = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+        except ValueError:
+            try:
+                date_obj = datetime.strptime(date_str, "%Y-%m-%d %H:%M:%S")
+            except ValueError:
+                self._record_failure(date_str)
+                return None
+        
+        self.parsed_count += 1
+        return date_obj.isoformat()
+    
+    def _record_failure(self, date_str: str) -> None:
+        """
+        Учесть нераспознанную дату
+        
+        Args:
+            date_str: Дата из CSV
+        """
+        self.failed_count += 1
+        if len(self.failed_samples) < FAILED_SAMPLES_LIMIT:
+            self.failed_samples.append(date_str[:64])
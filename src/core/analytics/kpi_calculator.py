@@ -4,109 +4,265 @@
 Расчет CPM, конверсии, трендов и других метрик
 """
 
-from datetime import datetime, timedelta
-from typing import Any
+import heapq
+from datetime import date, datetime, timedelta
+from typing import Any, Iterable
 
 from src.config.logging import get_logger
 
 logger = get_logger(__name__)
 
 
-class KPICalculator:
-    """Калькулятор KPI метрик"""
+# Доход суммируется в целых единицах 0.0001 (как revenue в истории продаж):
+# сумма целых точная и не зависит от порядка сложения, поэтому частичные
+# агрегаты и векторизованный расчет (VectorKPICalculator) дают тот же результат
+REVENUE_SCALE = 10000
+
+
+def _to_units(revenue: float) -> int:
+    """Перевести доход в целые единицы точной суммы"""
+    return round(revenue * REVENUE_SCALE)
+
+
+def _from_units(units: int) -> float:
+    """Перевести точную сумму обратно в float"""
+    return units / REVENUE_SCALE
+
+
+def first_day_from(moment: datetime) -> date:
+    """
+    Первый день, начало которого не раньше moment
     
-    @staticmethod
-    def calculate_kpi(data: list[dict[str, Any]]) -> dict[str, Any]:
+    Граница периода тренда: день входит в период целиком.
+    
+    Args:
+        moment: Граница периода
+        
+    Returns:
+        Дата
+    """
+    day = moment.date()
+    if moment.time() != datetime.min.time():
+        day += timedelta(days=1)
+    return day
+
+
+def _day_key(date_str: str) -> str | None:
+    """
+    Получить ключ дня YYYY-MM-DD из ISO строки даты
+    
+    Даты от CSVProcessor уже нормализованы в ISO формат, поэтому
+    в основном случае достаточно среза без разбора datetime.
+    
+    Args:
+        date_str: Дата в ISO формате
+        
+    Returns:
+        Ключ дня или None если дату не удалось разобрать
+    """
+    if len(date_str) >= 10 and date_str[4] == "-" and date_str[7] == "-":
+        return date_str[:10]
+    try:
+        return datetime.fromisoformat(date_str).strftime("%Y-%m-%d")
+    except (ValueError, TypeError):
+        return None
+
+
+class KPIAccumulator:
+    """
+    Инкрементальный агрегатор KPI метрик
+    
+    Считает все поля KPICalculator.calculate_kpi за один проход по строкам.
+    Частичные агрегаты (например, по частям файла) объединяются через merge.
+    """
+    
+    def __init__(self, top_limit: int = 3):
         """
-        Рассчитать все KPI метрики из данных CSV
+        Инициализация агрегатора
+        
+        Args:
+            top_limit: Количество топ активов в итоговых метриках
+        """
+        self.top_limit = top_limit
+        self.row_count = 0
+        self.total_sales = 0
+        self.total_impressions = 0
+        self.total_downloads = 0
+        # Суммы дохода хранятся в целых единицах, см. _to_units
+        self.revenue = 0
+        # День -> доход
+        self.revenue_by_day: dict[str, int] = {}
+        # Ключ актива -> [title, доход, продажи]
+        self.assets: dict[str, list[Any]] = {}
+        # Тип -> [количество, доход, продажи]
+        self.types: dict[str, list[Any]] = {}
+    
+    def add(self, row: dict[str, Any]) -> None:
+        """
+        Добавить строку данных
+        
+        Args:
+            row: Нормализованная строка из CSVProcessor
+        """
+        revenue = float(row.get("revenue", 0))
+        units = _to_units(revenue)
+        is_sale = revenue > 0
+        
+        self.row_count += 1
+        if is_sale:
+            self.total_sales += 1
+        self.total_impressions += int(row.get("impressions", 0))
+        self.total_downloads += int(row.get("downloads", 0))
+        self.revenue += units
+        
+        # Доход по дням
+        date_str = row.get("date", "")
+        if date_str:
+            day = _day_key(date_str)
+            if day is not None:
+                revenue_by_day = self.revenue_by_day
+                revenue_by_day[day] = revenue_by_day.get(day, 0) + units
+        
+        # Доход по активам (по asset_id или title)
+        asset_id = str(row.get("asset_id", ""))
+        title = str(row.get("title", ""))
+        key = asset_id or title
+        asset = self.assets.get(key)
+        if asset is None:
+            # Обрезаем длинные заголовки
+            self.assets[key] = [title[:50], units, 1 if is_sale else 0]
+        else:
+            asset[1] += units
+            if is_sale:
+                asset[2] += 1
+        
+        # Распределение по типам: category если есть, иначе purchase_type
+        type_key = str(row.get("category", "unknown")).lower()
+        if type_key == "unknown":
+            type_key = str(row.get("purchase_type", "unknown")).lower()
+        type_stats = self.types.get(type_key)
+        if type_stats is None:
+            self.types[type_key] = [1, units, 1 if is_sale else 0]
+        else:
+            type_stats[0] += 1
+            type_stats[1] += units
+            if is_sale:
+                type_stats[2] += 1
+    
+    def merge(self, other: "KPIAccumulator") -> "KPIAccumulator":
+        """
+        Объединить с другим агрегатором
+        
+        other должен содержать строки, идущие после строк текущего
+        агрегатора - тогда результат совпадает с последовательным проходом.
         
         Args:
-            data: Список словарей с данными из CSV
+            other: Агрегатор следующей части данных
             
         Returns:
-            Словарь с KPI метриками
+            Текущий агрегатор
+        """
+        self.row_count += other.row_count
+        self.total_sales += other.total_sales
+        self.total_impressions += other.total_impressions
+        self.total_downloads += other.total_downloads
+        self.revenue += other.revenue
+        
+        for day, units in other.revenue_by_day.items():
+            self.revenue_by_day[day] = self.revenue_by_day.get(day, 0) + units
+        
+        for key, (title, units, sales) in other.assets.items():
+            asset = self.assets.get(key)
+            if asset is None:
+                self.assets[key] = [title, units, sales]
+            else:
+                asset[1] += units
+                asset[2] += sales
+        
+        for key, (count, units, sales) in other.types.items():
+            type_stats = self.types.get(key)
+            if type_stats is None:
+                self.types[key] = [count, units, sales]
+            else:
+                type_stats[0] += count
+                type_stats[1] += units
+                type_stats[2] += sales
+        
+        return self
+    
+    def finalize(self, now: datetime | None = None) -> dict[str, Any]:
         """
-        if not data:
+        Получить итоговые KPI метрики
+        
+        Args:
+            now: Текущее время для расчета тренда (по умолчанию utcnow)
+            
+        Returns:
+            Словарь с KPI метриками в формате KPICalculator.calculate_kpi
+        """
+        if self.row_count == 0:
             return KPICalculator._get_empty_kpi()
         
-        # Базовые метрики
-        total_sales = sum(1 for row in data if row.get("revenue", 0) > 0)
-        total_revenue = sum(float(row.get("revenue", 0)) for row in data)
-        total_impressions = sum(int(row.get("impressions", 0)) for row in data)
-        total_downloads = sum(int(row.get("downloads", 0)) for row in data)
+        total_revenue = _from_units(self.revenue)
         
         # Расчет CPM
-        if total_impressions > 0:
-            cpm = (total_revenue / total_impressions) * 1000
+        if self.total_impressions > 0:
+            cpm = (total_revenue / self.total_impressions) * 1000
         else:
             cpm = 0.0
         
         # Расчет конверсии
-        if total_impressions > 0:
-            conversion_rate = (total_sales / total_impressions) * 100
+        if self.total_impressions > 0:
+            conversion_rate = (self.total_sales / self.total_impressions) * 100
         else:
             conversion_rate = 0.0
         
         # Средний чек
-        if total_sales > 0:
-            average_check = total_revenue / total_sales
+        if self.total_sales > 0:
+            average_check = total_revenue / self.total_sales
         else:
             average_check = 0.0
         
-        # Тренд
-        trend = KPICalculator._calculate_trend(data)
-        
-        # Топ активов
-        top_assets = KPICalculator._get_top_assets(data, limit=3)
-        
-        # Распределение по типам
-        type_distribution = KPICalculator._get_type_distribution(data)
-        
         # Период анализа
-        dates = [
-            datetime.fromisoformat(row.get("date", ""))
-            for row in data
-            if row.get("date")
-        ]
-        
-        if dates:
-            period_start = min(dates).strftime("%Y-%m-%d")
-            period_end = max(dates).strftime("%Y-%m-%d")
+        if self.revenue_by_day:
+            period_start = min(self.revenue_by_day)
+            period_end = max(self.revenue_by_day)
             period = f"{period_start} - {period_end}"
         else:
+            period_start = None
+            period_end = None
             period = "Не определен"
         
         return {
-            "total_sales": total_sales,
+            "total_sales": self.total_sales,
             "total_revenue": round(total_revenue, 2),
-            "total_impressions": total_impressions,
-            "total_downloads": total_downloads,
+            "total_impressions": self.total_impressions,
+            "total_downloads": self.total_downloads,
             "cpm": round(cpm, 2),
             "conversion_rate": round(conversion_rate, 2),
             "average_check": round(average_check, 2),
-            "trend": trend,
-            "top_assets": top_assets,
-            "type_distribution": type_distribution,
+            "trend": self._calculate_trend(now or datetime.utcnow()),
+            "top_assets": self._get_top_assets(),
+            "type_distribution": self._get_type_distribution(),
             "period": period,
-            "period_start": period_start if dates else None,
-            "period_end": period_end if dates else None,
-            "row_count": len(data),
+            "period_start": period_start,
+            "period_end": period_end,
+            "row_count": self.row_count,
         }
     
-    @staticmethod
-    def _calculate_trend(data: list[dict[str, Any]]) -> dict[str, Any]:
+    def _calculate_trend(self, now: datetime) -> dict[str, Any]:
         """
         Рассчитать тренд продаж
         
         Сравнивает последние 30 дней с предыдущим периодом
         
         Args:
-            data: Список данных
+            now: Текущее время
             
         Returns:
             Словарь с информацией о тренде
         """
-        if len(data) < 2:
+        if self.row_count < 2 or len(self.revenue_by_day) < 2:
             return {
                 "direction": "stable",
                 "emoji": "➡️",
@@ -114,44 +270,101 @@ class KPICalculator:
                 "change_percent": 0.0,
             }
         
-        # Группируем по датам
-        revenue_by_date: dict[str, float] = {}
-        for row in data:
-            date_str = row.get("date", "")
-            if date_str:
-                try:
-                    date_obj = datetime.fromisoformat(date_str)
-                    date_key = date_obj.strftime("%Y-%m-%d")
-                    revenue_by_date[date_key] = revenue_by_date.get(date_key, 0) + float(row.get("revenue", 0))
-                except (ValueError, AttributeError):
-                    continue
-        
-        if len(revenue_by_date) < 2:
-            return {
-                "direction": "stable",
-                "emoji": "➡️",
-                "text": "Недостаточно данных для анализа тренда",
-                "change_percent": 0.0,
-            }
+        recent_from = now - timedelta(days=30)
+        previous_from = now - timedelta(days=60)
         
-        # Сортируем по датам
-        sorted_dates = sorted(revenue_by_date.keys())
+        recent = 0
+        previous = 0
+        for day, units in self.revenue_by_day.items():
+            try:
+                day_start = datetime.strptime(day, "%Y-%m-%d")
+            except ValueError:
+                continue
+            if day_start >= recent_from:
+                recent += units
+            elif day_start >= previous_from:
+                previous += units
         
-        # Берем последние 30 дней и предыдущий период
-        now = datetime.utcnow()
-        last_30_days = [
-            date for date in sorted_dates
-            if datetime.strptime(date, "%Y-%m-%d") >= now - timedelta(days=30)
-        ]
-        previous_period = [
-            date for date in sorted_dates
-            if datetime.strptime(date, "%Y-%m-%d") < now - timedelta(days=30)
-            and datetime.strptime(date, "%Y-%m-%d") >= now - timedelta(days=60)
+        return KPICalculator._build_trend(_from_units(recent), _from_units(previous))
+    
+    def _get_top_assets(self) -> list[dict[str, Any]]:
+        """
+        Получить топ активов по доходу
+        
+        Returns:
+            Список топ активов
+        """
+        # nlargest стабилен: при равном доходе порядок как у sorted()
+        top = heapq.nlargest(
+            self.top_limit,
+            ((title, _from_units(units), sales) for title, units, sales in self.assets.values()),
+            key=lambda asset: asset[1],
+        )
+        
+        return [
+            {
+                "title": title,
+                "revenue": round(revenue, 2),
+                "sales": sales,
+            }
+            for title, revenue, sales in top
         ]
+    
+    def _get_type_distribution(self) -> dict[str, Any]:
+        """
+        Получить распределение по типам активов
+        
+        Returns:
+            Словарь с распределением
+        """
+        return {
+            key: {
+                "count": count,
+                "revenue": round(_from_units(units), 2),
+                "sales": sales,
+            }
+            for key, (count, units, sales) in self.types.items()
+        }
+
+
+class KPICalculator:
+    """Калькулятор KPI метрик"""
+    
+    @staticmethod
+    def calculate_kpi(data: Iterable[dict[str, Any]]) -> dict[str, Any]:
+        """
+        Рассчитать все KPI метрики из данных CSV
+        
+        Данные проходятся один раз, поэтому можно передавать
+        генератор CSVProcessor.iter_rows напрямую.
         
-        recent_revenue = sum(revenue_by_date[date] for date in last_30_days)
-        previous_revenue = sum(revenue_by_date[date] for date in previous_period)
+        Args:
+            data: Строки с данными из CSV (список или поток)
+            
+        Returns:
+            Словарь с KPI метриками
+        """
+        accumulator = KPIAccumulator()
+        for row in data:
+            accumulator.add(row)
         
+        return accumulator.finalize()
+    
+    @staticmethod
+    def _build_trend(
+        recent_revenue: float,
+        previous_revenue: float,
+    ) -> dict[str, Any]:
+        """
+        Сформировать тренд по доходу за два периода
+        
+        Args:
+            recent_revenue: Доход за последние 30 дней
+            previous_revenue: Доход за предыдущие 30 дней
+            
+        Returns:
+            Словарь с информацией о тренде
+        """
         if previous_revenue == 0:
             if recent_revenue > 0:
                 return {
@@ -191,105 +404,6 @@ class KPICalculator:
                 "change_percent": round(change_percent, 1),
             }
     
-    @staticmethod
-    def _get_top_assets(
-        data: list[dict[str, Any]],
-        limit: int = 3,
-    ) -> list[dict[str, Any]]:
-        """
-        Получить топ активов по доходу
-        
-        Args:
-            data: Список данных
-            limit: Количество топ активов
-            
-        Returns:
-            Список топ активов
-        """
-        # Группируем по asset_id или title
-        assets: dict[str, dict[str, Any]] = {}
-        
-        for row in data:
-            asset_id = str(row.get("asset_id", ""))
-            title = str(row.get("title", ""))
-            revenue = float(row.get("revenue", 0))
-            
-            key = asset_id or title
-            if key not in assets:
-                assets[key] = {
-                    "asset_id": asset_id,
-                    "title": title[:50] if len(title) > 50 else title,  # Обрезаем длинные заголовки
-                    "revenue": 0.0,
-                    "sales": 0,
-                }
-            
-            assets[key]["revenue"] += revenue
-            if revenue > 0:
-                assets[key]["sales"] += 1
-        
-        # Сортируем по revenue
-        sorted_assets = sorted(
-            assets.values(),
-            key=lambda x: x["revenue"],
-            reverse=True,
-        )
-        
-        # Форматируем для отображения
-        return [
-            {
-                "title": asset["title"],
-                "revenue": round(asset["revenue"], 2),
-                "sales": asset["sales"],
-            }
-            for asset in sorted_assets[:limit]
-        ]
-    
-    @staticmethod
-    def _get_type_distribution(
-        data: list[dict[str, Any]],
-    ) -> dict[str, Any]:
-        """
-        Получить распределение по типам активов
-        
-        Args:
-            data: Список данных
-            
-        Returns:
-            Словарь с распределением
-        """
-        distribution: dict[str, dict[str, Any]] = {}
-        
-        for row in data:
-            category = str(row.get("category", "unknown")).lower()
-            purchase_type = str(row.get("purchase_type", "unknown")).lower()
-            revenue = float(row.get("revenue", 0))
-            
-            # Используем category если есть, иначе purchase_type
-            type_key = category if category != "unknown" else purchase_type
-            
-            if type_key not in distribution:
-                distribution[type_key] = {
-                    "count": 0,
-                    "revenue": 0.0,
-                    "sales": 0,
-                }
-            
-            distribution[type_key]["count"] += 1
-            distribution[type_key]["revenue"] += revenue
-            if revenue > 0:
-                distribution[type_key]["sales"] += 1
-        
-        # Форматируем
-        formatted = {}
-        for key, value in distribution.items():
-            formatted[key] = {
-                "count": value["count"],
-                "revenue": round(value["revenue"], 2),
-                "sales": value["sales"],
-            }
-        
-        return formatted
-    
     @staticmethod
     def _get_empty_kpi() -> dict[str, Any]:
         """Получить пустые KPI метрики"""
@@ -0,0 +1,256 @@
+"""
+Параллельный расчет KPI по частям CSV файла
+
+Файл делится на части по границам записей CSV, каждая часть агрегируется
+в отдельном процессе в KPIAccumulator, частичные агрегаты объединяются
+в исходном порядке частей
+"""
+
+import asyncio
+import csv
+import io
+import mmap
+import os
+import tempfile
+from concurrent.futures import Executor
+from pathlib import Path
+from typing import Any
+
+from src.config.logging import get_logger
+from src.core.analytics.csv_processor import CSVProcessor
+from src.core.analytics.date_parser import DateParser
+from src.core.analytics.kpi_calculator import KPIAccumulator
+from src.core.exceptions import CSVValidationException
+
+logger = get_logger(__name__)
+
+# Части меньше этого размера не выделяются - накладные расходы дороже выигрыша
+MIN_CHUNK_BYTES = 1024 * 1024
+
+
+def next_record_start(content: bytes, record_start: int, pos: int) -> int:
+    """
+    Найти начало записи CSV не раньше pos
+    
+    Перевод строки завершает запись только вне кавычек: от начала записи
+    до него должно быть четное число кавычек (экранированные "" не меняют
+    четность). Так многострочные заголовки в кавычках не разрезаются.
+    
+    Args:
+        content: Содержимое файла (bytes или mmap)
+        record_start: Известное начало записи, не позже pos
+        pos: Позиция, с которой ищется граница
+        
+    Returns:
+        Позиция начала следующей записи или len(content)
+    """
+    # Срезы вместо count(sub, start, end): у mmap нет count
+    quotes = content[record_start:pos].count(b'"')
+    while True:
+        newline = content.find(b"\n", pos)
+        if newline == -1:
+            return len(content)
+        quotes += content[pos:newline].count(b'"')
+        pos = newline + 1
+        if quotes % 2 == 0:
+            return pos
+
+
+def read_header(content: bytes) -> tuple[list[str] | None, int]:
+    """
+    Определить формат файла по первой записи
+    
+    Args:
+        content: Содержимое файла
+        
+    Returns:
+        Кортеж (нормализованные заголовки или None для формата Adobe Stock,
+        позиция начала данных)
+        
+    Raises:
+        CSVValidationException: Файл пуст или не является корректным CSV
+    """
+    first_end = next_record_start(content, 0, 0)
+    try:
+        first_row = next(csv.reader(io.StringIO(content[:first_end].decode("utf-8-sig"))), None)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise CSVValidationException(f"Ошибка парсинга CSV: {str(e)}")
+    
+    if first_row is None:
+        raise CSVValidationException("CSV файл пуст")
+    
+    headers = CSVProcessor.detect_headers(first_row)
+    if headers is None:
+        # Формат Adobe Stock без заголовков - первая запись уже данные
+        return None, 0
+    return headers, first_end
+
+
+def split_chunks(content: bytes, parts: int, start: int = 0) -> list[tuple[int, int]]:
+    """
+    Разделить содержимое на части по границам записей CSV
+    
+    Args:
+        content: Содержимое файла
+        parts: Желаемое количество частей
+        start: Позиция начала данных (после заголовков)
+        
+    Returns:
+        Список диапазонов (начало, конец) в порядке следования
+    """
+    end = len(content)
+    size = max(1, (end - start) // max(1, parts))
+    
+    chunks = []
+    chunk_start = start
+    for i in range(1, parts):
+        target = start + i * size
+        if target <= chunk_start:
+            continue
+        boundary = next_record_start(content, chunk_start, target)
+        if boundary >= end:
+            break
+        chunks.append((chunk_start, boundary))
+        chunk_start = boundary
+    
+    chunks.append((chunk_start, end))
+    return chunks
+
+
+def aggregate_chunk(chunk: bytes | memoryview, headers: list[str] | None) -> tuple[KPIAccumulator, int]:
+    """
+    Агрегировать часть файла
+    
+    Функция выполняется в дочернем процессе.
+    
+    Args:
+        chunk: Часть файла, начинающаяся с начала записи
+        headers: Нормализованные заголовки или None для формата Adobe Stock
+        
+    Returns:
+        Кортеж (частичный агрегат, количество строк с нераспознанной датой)
+    """
+    date_parser = DateParser()
+    accumulator = KPIAccumulator()
+    for row in CSVProcessor.iter_chunk_rows(io.BytesIO(chunk), headers, date_parser):
+        accumulator.add(row)
+    return accumulator, date_parser.failed_count
+
+
+def aggregate_file_chunk(
+    path: Path,
+    start: int,
+    end: int,
+    headers: list[str] | None,
+) -> tuple[KPIAccumulator, int]:
+    """
+    Агрегировать часть файла на диске
+    
+    Функция выполняется в дочернем процессе и сама читает свой диапазон,
+    поэтому содержимое не передается между процессами.
+    
+    Args:
+        path: Путь к файлу
+        start: Начало части (начало записи)
+        end: Конец части
+        headers: Нормализованные заголовки или None для формата Adobe Stock
+        
+    Returns:
+        Кортеж (частичный агрегат, количество строк с нераспознанной датой)
+    """
+    with path.open("rb") as stream:
+        stream.seek(start)
+        return aggregate_chunk(stream.read(end - start), headers)
+
+
+def _plan_chunks(
+    content: bytes | mmap.mmap,
+    parts: int | None,
+) -> tuple[list[str] | None, list[tuple[int, int]]]:
+    """
+    Определить формат файла и разделить его на части
+    
+    Args:
+        content: Содержимое файла (bytes или mmap)
+        parts: Количество частей (None - по числу ядер)
+        
+    Returns:
+        Кортеж (заголовки, диапазоны частей)
+    """
+    headers, body_start = read_header(content)
+    
+    if parts is None:
+        max_parts = (len(content) - body_start) // MIN_CHUNK_BYTES or 1
+        parts = min(os.cpu_count() or 1, max_parts)
+    return headers, split_chunks(content, parts, body_start)
+
+
+async def calculate_kpi_parallel(
+    content: bytes | Path,
+    executor: Executor | None = None,
+    parts: int | None = None,
+) -> dict[str, Any]:
+    """
+    Рассчитать KPI по частям файла в пуле процессов
+    
+    Результат побитово совпадает с KPICalculator.calculate_kpi по всему
+    файлу: суммы дохода в KPIAccumulator точные, а части объединяются
+    в исходном порядке, поэтому совпадает и порядок активов и типов.
+    
+    Args:
+        content: Содержимое CSV файла или путь к нему (дочерние процессы
+            читают свои части с диска сами; содержимое в памяти для пула
+            сначала пишется во временный файл)
+        executor: Пул процессов (None - части считаются в текущем процессе)
+        parts: Количество частей (по умолчанию по числу ядер,
+            но не меньше MIN_CHUNK_BYTES на часть)
+            
+    Returns:
+        Словарь с KPI метриками и количеством пропущенных строк (skipped_rows)
+        
+    Raises:
+        CSVValidationException: Файл пуст или не является корректным CSV
+    """
+    if isinstance(content, Path):
+        size = content.stat().st_size
+        if size == 0:
+            raise CSVValidationException("CSV файл пуст")
+        
+        with content.open("rb") as stream, mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            headers, chunks = _plan_chunks(mapped, parts)
+        jobs = [(aggregate_file_chunk, content, start, end, headers) for start, end in chunks]
+    elif executor is not None:
+        # Части не копируются в памяти и не передаются через pickle:
+        # содержимое один раз пишется во временный файл, дочерние
+        # процессы читают свои диапазоны сами, как для файла на диске
+        with tempfile.NamedTemporaryFile(prefix="iqstocker_", suffix=".csv") as spool:
+            spool.write(content)
+            spool.flush()
+            return await calculate_kpi_parallel(Path(spool.name), executor, parts)
+    else:
+        size = len(content)
+        headers, chunks = _plan_chunks(content, parts)
+        # Срезы memoryview без копирования; части считаются по очереди
+        view = memoryview(content)
+        jobs = ((aggregate_chunk, view[start:end], headers) for start, end in chunks)
+    
+    if executor is None:
+        results = [function(*args) for function, *args in jobs]
+    else:
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(executor, function, *args)
+            for function, *args in jobs
+        ))
+    
+    accumulator = KPIAccumulator()
+    skipped_rows = 0
+    for partial, failed in results:
+        accumulator.merge(partial)
+        skipped_rows += failed
+    
+    logger.debug("csv_kpi_parallel", chunks=len(chunks), size=size)
+    
+    kpi_data = accumulator.finalize()
+    kpi_data["skipped_rows"] = skipped_rows
+    return kpi_data
@@ -0,0 +1,339 @@
+"""
+Конвейер анализа CSV
+
+CPU-часть анализа (парсинг, KPI, текст отчета, строки истории продаж)
+выполняется функциями этого модуля в пуле процессов worker, чтобы
+не блокировать event loop. StreamAnalysis разбирает файл прямо из
+потока скачивания за один проход
+"""
+
+import asyncio
+import io
+from collections import deque
+from concurrent.futures import Executor
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, AsyncIterator
+
+from src.config.logging import get_logger
+from src.core.analytics.csv_processor import CSVProcessor
+from src.core.analytics.date_parser import DateParser
+from src.core.analytics.kpi_calculator import KPIAccumulator
+from src.core.analytics.parallel import next_record_start, calculate_kpi_parallel, read_header
+from src.core.analytics.report_generator import ReportGenerator
+from src.core.analytics.sales_frame import SalesFrame
+from src.core.analytics.vector_kpi import VectorKPICalculator
+from src.core.cache.report_cache import ContentHasher
+from src.core.exceptions import CSVValidationException
+
+logger = get_logger(__name__)
+
+# Размер части потока (порядка 20 тыс. строк): одна часть - одна задача
+# пула процессов и одна пачка вставки в историю продаж
+STREAM_CHUNK_BYTES = 2 * 1024 * 1024
+
+_REVENUE_QUANT = Decimal("0.0001")
+
+
+def analyze_csv(content: bytes | Path) -> tuple[dict[str, Any], str]:
+    """
+    Проанализировать CSV файл целиком
+    
+    Функция выполняется в дочернем процессе: ей передаются сырые байты
+    файла или путь к временному файлу (тогда процесс читает его сам),
+    а обратно возвращаются только KPI и текст отчета.
+    
+    Args:
+        content: Содержимое CSV файла или путь к нему
+        
+    Returns:
+        Кортеж (KPI метрики, текст отчета)
+        
+    Raises:
+        CSVValidationException: Файл пуст или не содержит данных
+    """
+    date_parser = DateParser()
+    if isinstance(content, Path):
+        with content.open("rb") as stream:
+            frame = CSVProcessor.parse_frame(stream, date_parser=date_parser)
+    else:
+        frame = CSVProcessor.parse_frame(io.BytesIO(content), date_parser=date_parser)
+    
+    return analyze_frame(frame, skipped_rows=date_parser.failed_count)
+
+
+def analyze_frame(
+    frame: SalesFrame,
+    skipped_rows: int = 0,
+) -> tuple[dict[str, Any], str]:
+    """
+    Рассчитать KPI и текст отчета по колоночной таблице
+    
+    SalesFrame передается между процессами как набор буферов NumPy,
+    без сериализации отдельных строк.
+    
+    Args:
+        frame: Колоночная таблица продаж
+        skipped_rows: Количество строк, пропущенных при парсинге
+        
+    Returns:
+        Кортеж (KPI метрики, текст отчета)
+        
+    Raises:
+        CSVValidationException: Таблица не содержит данных
+    """
+    if len(frame) == 0:
+        raise CSVValidationException("CSV файл не содержит данных")
+    
+    kpi_data = VectorKPICalculator.calculate_kpi(frame)
+    kpi_data["skipped_rows"] = skipped_rows
+    summary_text = ReportGenerator.generate_summary(kpi_data)
+    
+    return kpi_data, summary_text
+
+
+async def run_analysis(
+    content: bytes | Path,
+    executor: Executor | None = None,
+    inline_max_bytes: int = 0,
+    parallel_min_bytes: int | None = None,
+) -> tuple[dict[str, Any], str]:
+    """
+    Запустить анализ CSV в пуле процессов
+    
+    Маленькие файлы анализируются в текущем процессе - передача
+    в дочерний процесс для них дороже самого анализа. Большие файлы
+    делятся на части, которые агрегируются параллельно.
+    
+    Args:
+        content: Содержимое CSV файла или путь к нему
+        executor: Пул процессов (None - анализ в текущем процессе)
+        inline_max_bytes: Максимальный размер файла для анализа без пула
+        parallel_min_bytes: Минимальный размер файла для анализа по частям
+            (None - всегда одним процессом)
+            
+    Returns:
+        Кортеж (KPI метрики, текст отчета)
+        
+    Raises:
+        CSVValidationException: Файл пуст или не содержит данных
+    """
+    size = content.stat().st_size if isinstance(content, Path) else len(content)
+    
+    if executor is None or size <= inline_max_bytes:
+        return analyze_csv(content)
+    
+    if parallel_min_bytes is not None and size >= parallel_min_bytes:
+        kpi_data = await calculate_kpi_parallel(content, executor)
+        if kpi_data["row_count"] == 0:
+            raise CSVValidationException("CSV файл не содержит данных")
+        return kpi_data, ReportGenerator.generate_summary(kpi_data)
+    
+    logger.debug("csv_analysis_offloaded", size=size)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, analyze_csv, content)
+
+
+def to_sale(row: dict[str, Any]) -> dict[str, Any]:
+    """
+    Преобразовать нормализованную строку CSV в значения SaleFact
+    
+    Args:
+        row: Нормализованная строка CSVProcessor
+        
+    Returns:
+        Значения полей SaleFact без user_id и csv_analysis_id
+    """
+    date_str = row["date"]
+    sold_at = datetime.fromisoformat(date_str)
+    if sold_at.tzinfo is not None:
+        sold_at = sold_at.astimezone(timezone.utc).replace(tzinfo=None)
+    
+    asset_id = str(row.get("asset_id", ""))
+    title = str(row.get("title", ""))
+    
+    return {
+        "asset_id": (asset_id or title)[:255],
+        "sold_at": sold_at,
+        # День по дате из выгрузки, как в KPICalculator
+        "day": date.fromisoformat(date_str[:10]),
+        "purchase_type": str(row.get("purchase_type", "unknown")).lower()[:50],
+        "revenue": Decimal(repr(float(row.get("revenue", 0)))).quantize(_REVENUE_QUANT),
+        "title": title[:255],
+        "category": str(row.get("category", "unknown")).lower()[:50],
+        "impressions": int(row.get("impressions", 0)),
+        "downloads": int(row.get("downloads", 0)),
+    }
+
+
+def parse_chunk(
+    chunk: bytes,
+    headers: list[str] | None,
+) -> tuple[KPIAccumulator, int, list[dict[str, Any]]]:
+    """
+    Разобрать часть файла в частичный агрегат KPI и значения SaleFact
+    
+    Каждая строка разбирается один раз и попадает и в агрегат, и в
+    историю продаж. Функция выполняется в дочернем процессе.
+    
+    Args:
+        chunk: Часть файла, начинающаяся с начала записи
+        headers: Нормализованные заголовки или None для формата Adobe Stock
+        
+    Returns:
+        Кортеж (частичный агрегат, количество строк с нераспознанной датой,
+        значения SaleFact строк части)
+    """
+    date_parser = DateParser()
+    accumulator = KPIAccumulator()
+    sales = []
+    for row in CSVProcessor.iter_chunk_rows(io.BytesIO(chunk), headers, date_parser):
+        accumulator.add(row)
+        sales.append(to_sale(row))
+    return accumulator, date_parser.failed_count, sales
+
+
+class StreamAnalysis:
+    """
+    Анализ CSV за один проход по потоку скачивания
+    
+    Блоки файла по мере получения хэшируются и собираются в части по
+    границам записей CSV. Каждая часть разбирается один раз (в пуле
+    процессов) сразу в частичный агрегат KPI и значения SaleFact.
+    Пачки продаж выдает итератор sales; хэш, KPI и текст отчета
+    доступны после его завершения.
+    
+    Пока вызывающий код записывает пачку в БД, в пуле разбирается не
+    больше max_pending следующих частей, а чтение потока ждет их:
+    память ограничена несколькими частями при любом размере файла.
+    """
+    
+    def __init__(
+        self,
+        blocks: AsyncIterator[bytes],
+        executor: Executor | None = None,
+        inline_max_bytes: int = 0,
+        chunk_bytes: int = STREAM_CHUNK_BYTES,
+        max_pending: int = 2,
+    ):
+        """
+        Инициализация анализа
+        
+        Args:
+            blocks: Асинхронный поток блоков файла
+            executor: Пул процессов (None - разбор в текущем процессе)
+            inline_max_bytes: Максимальный размер части для разбора без пула
+            chunk_bytes: Примерный размер части
+            max_pending: Сколько частей разбирается в пуле одновременно
+        """
+        self.size = 0
+        self.skipped_rows = 0
+        self.content_hash: str | None = None
+        # Ошибка скачивания или разбора (в отличие от ошибок потребителя sales)
+        self.error: Exception | None = None
+        self._blocks = blocks
+        self._executor = executor
+        self._inline_max_bytes = inline_max_bytes
+        self._chunk_bytes = chunk_bytes
+        self._max_pending = max(1, max_pending)
+        self._hasher = ContentHasher()
+        self._accumulator = KPIAccumulator()
+        self.sales = self._run()
+    
+    async def drain(self) -> None:
+        """Дочитать поток без записи продаж (например, после ошибки БД)"""
+        async for _ in self.sales:
+            pass
+    
+    async def aclose(self) -> None:
+        """Прервать разбор: ожидающие части пула отменяются"""
+        await self.sales.aclose()
+    
+    def result(self) -> tuple[dict[str, Any], str]:
+        """
+        Получить KPI и текст отчета после завершения sales
+        
+        Returns:
+            Кортеж (KPI метрики, текст отчета)
+            
+        Raises:
+            CSVValidationException: Файл не содержит данных
+        """
+        kpi_data = self._accumulator.finalize()
+        if kpi_data["row_count"] == 0:
+            raise CSVValidationException("CSV файл не содержит данных")
+        kpi_data["skipped_rows"] = self.skipped_rows
+        return kpi_data, ReportGenerator.generate_summary(kpi_data)
+    
+    async def _run(self) -> AsyncIterator[list[dict[str, Any]]]:
+        """Прочитать поток и выдавать пачки продаж в порядке файла"""
+        loop = asyncio.get_running_loop()
+        buffer = bytearray()
+        pending: deque[asyncio.Future] = deque()
+        headers: list[str] | None = None
+        first = True
+        
+        def submit(chunk: bytes) -> None:
+            nonlocal headers, first
+            if first:
+                # Первая часть начинается с первой записи целиком - по ней
+                # определяется формат файла
+                headers, body_start = read_header(chunk)
+                chunk = chunk[body_start:]
+                first = False
+            
+            if self._executor is None or len(chunk) <= self._inline_max_bytes:
+                future = loop.create_future()
+                future.set_result(parse_chunk(chunk, headers))
+            else:
+                future = loop.run_in_executor(self._executor, parse_chunk, chunk, headers)
+            pending.append(future)
+        
+        async def collect() -> list[dict[str, Any]]:
+            partial, failed, sales = await pending.popleft()
+            # Части объединяются в порядке файла - как при расчете целиком
+            self._accumulator.merge(partial)
+            self.skipped_rows += failed
+            return sales
+        
+        try:
+            async for block in self._blocks:
+                self._hasher.update(block)
+                self.size += len(block)
+                buffer += block
+                
+                while len(buffer) >= self._chunk_bytes:
+                    # Граница в конце буфера может быть внутри значения в
+                    # кавычках - часть отделяется только перед следующей записью
+                    boundary = next_record_start(buffer, 0, self._chunk_bytes)
+                    if boundary >= len(buffer):
+                        break
+                    submit(bytes(buffer[:boundary]))
+                    del buffer[:boundary]
+                    
+                    while len(pending) >= self._max_pending:
+                        sales = await collect()
+                        if sales:
+                            yield sales
+            
+            if self.size == 0:
+                raise CSVValidationException("CSV файл пуст")
+            if buffer:
+                submit(bytes(buffer))
+            
+            while pending:
+                sales = await collect()
+                if sales:
+                    yield sales
+            
+            self.content_hash = self._hasher.hexdigest()
+        
+        except Exception as e:
+            self.error = e
+            raise
+        
+        finally:
+            # Вызывающий код прервал обход - части в пуле больше не нужны
+            for future in pending:
+                future.cancel()
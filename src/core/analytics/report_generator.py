@@ -44,6 +44,14 @@ class ReportGenerator:
             f"",
         ]
         
+        # Строки, пропущенные из-за некорректной даты
+        skipped_rows = kpi_data.get("skipped_rows", 0)
+        if skipped_rows:
+            summary_lines.extend([
+                f"⚠️ Пропущено строк с некорректной датой: {skipped_rows}",
+                f"",
+            ])
+        
         # Распределение по типам
         type_dist = kpi_data.get("type_distribution", {})
         if type_dist:
@@ -0,0 +1,171 @@
+"""
+Колоночное представление продаж из CSV
+
+Хранит строки выгрузки Adobe Stock в виде массивов NumPy
+для векторизованного расчета KPI
+"""
+
+from array import array
+from datetime import date
+from typing import Any, Iterable
+
+import numpy as np
+
+# Ординал 1970-01-01: дни хранятся как количество дней от эпохи
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Значение дня для строк без корректной даты
+NO_DAY = int(np.iinfo(np.int64).min)
+
+
+class SalesFrame:
+    """
+    Колоночная таблица продаж
+    
+    Даты хранятся как int64 дни от эпохи, доход - float64,
+    активы, категории и типы покупок - словарные коды int32.
+    """
+    
+    def __init__(
+        self,
+        day: np.ndarray,
+        revenue: np.ndarray,
+        impressions: np.ndarray,
+        downloads: np.ndarray,
+        asset: np.ndarray,
+        category: np.ndarray,
+        purchase_type: np.ndarray,
+        asset_keys: list[str],
+        asset_titles: list[str],
+        categories: list[str],
+        purchase_types: list[str],
+    ):
+        """
+        Инициализация таблицы
+        
+        Args:
+            day: Дни от эпохи (NO_DAY если даты нет)
+            revenue: Доход
+            impressions: Показы
+            downloads: Скачивания
+            asset: Коды активов
+            category: Коды категорий
+            purchase_type: Коды типов покупки
+            asset_keys: Словарь активов (asset_id или title)
+            asset_titles: Заголовки активов (первые 50 символов)
+            categories: Словарь категорий (в нижнем регистре)
+            purchase_types: Словарь типов покупки (в нижнем регистре)
+        """
+        self.day = day
+        self.revenue = revenue
+        self.impressions = impressions
+        self.downloads = downloads
+        self.asset = asset
+        self.category = category
+        self.purchase_type = purchase_type
+        self.asset_keys = asset_keys
+        self.asset_titles = asset_titles
+        self.categories = categories
+        self.purchase_types = purchase_types
+    
+    def __len__(self) -> int:
+        """Количество строк"""
+        return len(self.revenue)
+    
+    @property
+    def nbytes(self) -> int:
+        """Размер колонок в байтах"""
+        return sum(
+            column.nbytes
+            for column in (
+                self.day,
+                self.revenue,
+                self.impressions,
+                self.downloads,
+                self.asset,
+                self.category,
+                self.purchase_type,
+            )
+        )
+    
+    @classmethod
+    def from_rows(cls, rows: Iterable[dict[str, Any]]) -> "SalesFrame":
+        """
+        Построить таблицу из нормализованных строк CSVProcessor
+        
+        Строки читаются один раз, поэтому можно передавать
+        генератор CSVProcessor.iter_rows.
+        
+        Args:
+            rows: Нормализованные строки
+            
+        Returns:
+            Колоночная таблица
+        """
+        days = array("q")
+        revenues = array("d")
+        impressions = array("q")
+        downloads = array("q")
+        assets = array("i")
+        categories = array("i")
+        purchase_types = array("i")
+        
+        asset_codes: dict[str, int] = {}
+        asset_titles: list[str] = []
+        category_codes: dict[str, int] = {}
+        purchase_type_codes: dict[str, int] = {}
+        # Дни сильно повторяются в выгрузках - разбираем каждый один раз
+        day_cache: dict[str, int] = {}
+        
+        for row in rows:
+            date_str = row.get("date", "")
+            day = NO_DAY
+            if date_str:
+                prefix = date_str[:10]
+                day = day_cache.get(prefix)
+                if day is None:
+                    try:
+                        day = date.fromisoformat(prefix).toordinal() - EPOCH_ORDINAL
+                    except ValueError:
+                        day = NO_DAY
+                    day_cache[prefix] = day
+            days.append(day)
+            
+            revenues.append(float(row.get("revenue", 0)))
+            impressions.append(int(row.get("impressions", 0)))
+            downloads.append(int(row.get("downloads", 0)))
+            
+            asset_id = str(row.get("asset_id", ""))
+            title = str(row.get("title", ""))
+            key = asset_id or title
+            code = asset_codes.get(key)
+            if code is None:
+                code = asset_codes[key] = len(asset_codes)
+                asset_titles.append(title[:50])
+            assets.append(code)
+            
+            category = str(row.get("category", "unknown")).lower()
+            code = category_codes.get(category)
+            if code is None:
+                code = category_codes[category] = len(category_codes)
+            categories.append(code)
+            
+            purchase_type = str(row.get("purchase_type", "unknown")).lower()
+            code = purchase_type_codes.get(purchase_type)
+            if code is None:
+                code = purchase_type_codes[purchase_type] = len(purchase_type_codes)
+            purchase_types.append(code)
+        
+        return cls(
+            day=np.frombuffer(days, dtype=np.int64),
+            revenue=np.frombuffer(revenues, dtype=np.float64),
+            impressions=np.frombuffer(impressions, dtype=np.int64),
+            downloads=np.frombuffer(downloads, dtype=np.int64),
+            asset=np.frombuffer(assets, dtype=np.int32),
+            category=np.frombuffer(categories, dtype=np.int32),
+            purchase_type=np.frombuffer(purchase_types, dtype=np.int32),
+            asset_keys=list(asset_codes),
+            asset_titles=asset_titles,
+            categories=list(category_codes),
+            purchase_types=list(purchase_type_codes),
+        )
@@ -0,0 +1,225 @@
+"""
+Векторизованный калькулятор KPI
+
+Расчет метрик KPICalculator.calculate_kpi операциями над массивами SalesFrame.
+Доход суммируется в целых единицах REVENUE_SCALE, как в KPIAccumulator,
+поэтому результат совпадает с параллельным расчетом по частям
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any
+
+import numpy as np
+
+from src.core.analytics.kpi_calculator import REVENUE_SCALE, KPICalculator, first_day_from
+from src.core.analytics.sales_frame import EPOCH_ORDINAL, NO_DAY, SalesFrame
+
+
+class VectorKPICalculator:
+    """Векторизованный калькулятор KPI метрик"""
+    
+    @staticmethod
+    def calculate_kpi(
+        frame: SalesFrame,
+        now: datetime | None = None,
+        top_limit: int = 3,
+    ) -> dict[str, Any]:
+        """
+        Рассчитать все KPI метрики по колоночной таблице
+        
+        Результат имеет тот же формат, что и KPICalculator.calculate_kpi.
+        
+        Args:
+            frame: Колоночная таблица продаж
+            now: Текущее время для расчета тренда (по умолчанию utcnow)
+            top_limit: Количество топ активов
+            
+        Returns:
+            Словарь с KPI метриками
+        """
+        row_count = len(frame)
+        if row_count == 0:
+            return KPICalculator._get_empty_kpi()
+        
+        is_sale = frame.revenue > 0
+        # Доход в целых единицах: суммы целых значений float64 точные
+        # (пока не превышают 2**53 единиц) и не зависят от порядка сложения
+        units = np.rint(frame.revenue * REVENUE_SCALE)
+        
+        # Базовые метрики
+        total_sales = int(np.count_nonzero(is_sale))
+        total_revenue = float(units.sum()) / REVENUE_SCALE
+        total_impressions = int(frame.impressions.sum())
+        total_downloads = int(frame.downloads.sum())
+        
+        cpm = (total_revenue / total_impressions) * 1000 if total_impressions > 0 else 0.0
+        conversion_rate = (total_sales / total_impressions) * 100 if total_impressions > 0 else 0.0
+        average_check = total_revenue / total_sales if total_sales > 0 else 0.0
+        
+        # Доход по дням
+        has_day = frame.day != NO_DAY
+        days = np.unique(frame.day[has_day])
+        
+        if len(days):
+            period_start = VectorKPICalculator._format_day(days[0])
+            period_end = VectorKPICalculator._format_day(days[-1])
+            period = f"{period_start} - {period_end}"
+        else:
+            period_start = None
+            period_end = None
+            period = "Не определен"
+        
+        return {
+            "total_sales": total_sales,
+            "total_revenue": round(total_revenue, 2),
+            "total_impressions": total_impressions,
+            "total_downloads": total_downloads,
+            "cpm": round(cpm, 2),
+            "conversion_rate": round(conversion_rate, 2),
+            "average_check": round(average_check, 2),
+            "trend": VectorKPICalculator._calculate_trend(
+                frame,
+                units,
+                days,
+                now or datetime.utcnow(),
+            ),
+            "top_assets": VectorKPICalculator._get_top_assets(frame, units, is_sale, top_limit),
+            "type_distribution": VectorKPICalculator._get_type_distribution(frame, units, is_sale),
+            "period": period,
+            "period_start": period_start,
+            "period_end": period_end,
+            "row_count": row_count,
+        }
+    
+    @staticmethod
+    def _calculate_trend(
+        frame: SalesFrame,
+        units: np.ndarray,
+        days: np.ndarray,
+        now: datetime,
+    ) -> dict[str, Any]:
+        """
+        Рассчитать тренд продаж: последние 30 дней против предыдущих 30
+        
+        Args:
+            frame: Колоночная таблица
+            units: Доход строк в единицах REVENUE_SCALE
+            days: Уникальные дни (отсортированы)
+            now: Текущее время
+            
+        Returns:
+            Словарь с информацией о тренде
+        """
+        if len(frame) < 2 or len(days) < 2:
+            return {
+                "direction": "stable",
+                "emoji": "➡️",
+                "text": "Недостаточно данных для анализа тренда",
+                "change_percent": 0.0,
+            }
+        
+        recent_from = first_day_from(now - timedelta(days=30)).toordinal() - EPOCH_ORDINAL
+        previous_from = first_day_from(now - timedelta(days=60)).toordinal() - EPOCH_ORDINAL
+        
+        # Строки без даты (NO_DAY) меньше любой границы и не попадают в периоды
+        recent = frame.day >= recent_from
+        previous = (frame.day >= previous_from) & ~recent
+        
+        return KPICalculator._build_trend(
+            float(units[recent].sum()) / REVENUE_SCALE,
+            float(units[previous].sum()) / REVENUE_SCALE,
+        )
+    
+    @staticmethod
+    def _get_top_assets(
+        frame: SalesFrame,
+        units: np.ndarray,
+        is_sale: np.ndarray,
+        limit: int,
+    ) -> list[dict[str, Any]]:
+        """
+        Получить топ активов по доходу
+        
+        Args:
+            frame: Колоночная таблица
+            units: Доход строк в единицах REVENUE_SCALE
+            is_sale: Маска строк с продажей
+            limit: Количество топ активов
+            
+        Returns:
+            Список топ активов
+        """
+        size = len(frame.asset_keys)
+        revenue = np.bincount(frame.asset, weights=units, minlength=size) / REVENUE_SCALE
+        sales = np.bincount(frame.asset, weights=is_sale, minlength=size)
+        
+        # Сортировка по убыванию дохода, при равенстве - по порядку появления
+        order = np.lexsort((np.arange(size), -revenue))[:limit]
+        
+        return [
+            {
+                "title": frame.asset_titles[code],
+                "revenue": round(float(revenue[code]), 2),
+                "sales": int(sales[code]),
+            }
+            for code in order
+        ]
+    
+    @staticmethod
+    def _get_type_distribution(
+        frame: SalesFrame,
+        units: np.ndarray,
+        is_sale: np.ndarray,
+    ) -> dict[str, Any]:
+        """
+        Получить распределение по типам активов
+        
+        Тип - категория, а если она unknown - тип покупки.
+        
+        Args:
+            frame: Колоночная таблица
+            units: Доход строк в единицах REVENUE_SCALE
+            is_sale: Маска строк с продажей
+            
+        Returns:
+            Словарь с распределением
+        """
+        type_keys: dict[str, int] = {}
+        category_type = np.array(
+            [type_keys.setdefault(key, len(type_keys)) for key in frame.categories],
+            dtype=np.int32,
+        )
+        purchase_type_type = np.array(
+            [type_keys.setdefault(key, len(type_keys)) for key in frame.purchase_types],
+            dtype=np.int32,
+        )
+        unknown = np.array([key == "unknown" for key in frame.categories], dtype=bool)
+        
+        type_codes = np.where(
+            unknown[frame.category],
+            purchase_type_type[frame.purchase_type],
+            category_type[frame.category],
+        )
+        
+        size = len(type_keys)
+        count = np.bincount(type_codes, minlength=size)
+        revenue = np.bincount(type_codes, weights=units, minlength=size) / REVENUE_SCALE
+        sales = np.bincount(type_codes, weights=is_sale, minlength=size)
+        
+        # Порядок ключей - порядок первого появления в данных
+        present, first_index = np.unique(type_codes, return_index=True)
+        names = list(type_keys)
+        
+        return {
+            names[code]: {
+                "count": int(count[code]),
+                "revenue": round(float(revenue[code]), 2),
+                "sales": int(sales[code]),
+            }
+            for code in present[np.argsort(first_index)]
+        }
+    
+    @staticmethod
+    def _format_day(day: int) -> str:
+        """Перевести день от эпохи в строку YYYY-MM-DD"""
+        return date.fromordinal(int(day) + EPOCH_ORDINAL).isoformat()
@@ -0,0 +1,32 @@
+"""
+Подключение к Redis для кэшей приложения
+"""
+
+from redis.asyncio import Redis
+
+from src.config.settings import settings
+
+_redis: Redis | None = None
+
+
+def get_redis() -> Redis:
+    """
+    Получить общий клиент Redis
+    
+    Клиент создается при первом обращении и держит пул соединений.
+    
+    Returns:
+        Клиент Redis
+    """
+    global _redis
+    if _redis is None:
+        _redis = Redis.from_url(settings.redis.get_url())
+    return _redis
+
+
+async def close_redis() -> None:
+    """Закрытие соединений с Redis"""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
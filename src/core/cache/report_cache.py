@@ -0,0 +1,230 @@
+"""
+Кэш отчетов аналитики по содержимому CSV
+
+Повторная загрузка того же файла отвечается готовым отчетом
+без нового анализа и без списания лимита
+"""
+
+import hashlib
+import json
+import time
+from typing import Any
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from src.config.logging import get_logger
+from src.config.settings import settings
+
+logger = get_logger(__name__)
+
+_BOM = b"\xef\xbb\xbf"
+
+
+def compute_content_hash(content: bytes) -> str:
+    """
+    Посчитать SHA-256 нормализованного содержимого CSV
+    
+    Нормализация убирает различия, не влияющие на данные: BOM,
+    переводы строк CRLF и завершающие пустые строки.
+    
+    Args:
+        content: Содержимое файла
+        
+    Returns:
+        Хэш в виде hex строки (64 символа)
+    """
+    hasher = ContentHasher()
+    hasher.update(content)
+    return hasher.hexdigest()
+
+
+class ContentHasher:
+    """
+    Инкрементальный хэш содержимого CSV для потоковой загрузки
+    
+    Результат совпадает с compute_content_hash для всего файла при любом
+    разбиении на блоки. Хвост блока из символов перевода строки
+    придерживается до следующего блока: CRLF может оказаться разрезан,
+    а завершающие пустые строки не должны попасть в хэш.
+    """
+    
+    def __init__(self):
+        """Инициализация хэша"""
+        self._sha = hashlib.sha256()
+        self._pending = b""
+        self._bom_checked = False
+    
+    def update(self, chunk: bytes) -> None:
+        """
+        Добавить очередной блок содержимого
+        
+        Args:
+            chunk: Блок файла
+        """
+        data = self._pending + chunk
+        
+        if not self._bom_checked:
+            # Начало файла может быть началом BOM - ждем, пока хватит байт
+            if len(data) < len(_BOM) and _BOM.startswith(data):
+                self._pending = data
+                return
+            data = data.removeprefix(_BOM)
+            self._bom_checked = True
+        
+        body = data.rstrip(b"\r\n")
+        self._pending = data[len(body):]
+        self._sha.update(body.replace(b"\r\n", b"\n"))
+    
+    def hexdigest(self) -> str:
+        """
+        Получить хэш
+        
+        Returns:
+            Хэш в виде hex строки (64 символа)
+        """
+        tail = self._pending
+        if not self._bom_checked:
+            tail = tail.removeprefix(_BOM)
+        
+        sha = self._sha.copy()
+        sha.update(tail.replace(b"\r\n", b"\n").rstrip(b"\n"))
+        return sha.hexdigest()
+
+
+class ReportCache:
+    """
+    Кэш отчетов в Redis с ключом (пользователь, хэш содержимого)
+    
+    Каждая запись живет ttl_seconds с момента последнего обращения.
+    Для пользователя хранится не больше max_per_user записей: индекс
+    в sorted set упорядочен по времени обращения, самые старые вытесняются.
+    """
+    
+    KEY_PREFIX = "report_cache"
+    
+    def __init__(
+        self,
+        redis: Redis,
+        ttl_seconds: int | None = None,
+        max_per_user: int | None = None,
+    ):
+        """
+        Инициализация кэша
+        
+        Args:
+            redis: Клиент Redis
+            ttl_seconds: Время жизни записи (по умолчанию из настроек)
+            max_per_user: Максимум записей на пользователя (по умолчанию из настроек)
+        """
+        self.redis = redis
+        self.ttl_seconds = ttl_seconds or settings.cache.report_ttl_seconds
+        self.max_per_user = max_per_user or settings.cache.report_max_per_user
+    
+    async def get(self, user_id: int, content_hash: str) -> dict[str, Any] | None:
+        """
+        Получить отчет из кэша
+        
+        Args:
+            user_id: ID пользователя
+            content_hash: Хэш содержимого файла
+            
+        Returns:
+            Словарь с report_id и summary_text или None
+        """
+        key = self._entry_key(user_id, content_hash)
+        try:
+            raw = await self.redis.get(key)
+            if raw is None:
+                return None
+            
+            # Обновляем время обращения и продлеваем жизнь записи
+            index_key = self._index_key(user_id)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.expire(key, self.ttl_seconds)
+                pipe.zadd(index_key, {content_hash: time.time()})
+                pipe.expire(index_key, self.ttl_seconds)
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning("report_cache_get_error", user_id=user_id, error=str(e))
+            return None
+        
+        return json.loads(raw)
+    
+    async def get_by_file(self, user_id: int, file_unique_id: str) -> dict[str, Any] | None:
+        """
+        Получить отчет по Telegram file_unique_id
+        
+        Позволяет ответить готовым отчетом без скачивания файла:
+        file_unique_id ссылается на хэш содержимого, сохраненный worker.
+        
+        Args:
+            user_id: ID пользователя
+            file_unique_id: Telegram file_unique_id документа
+            
+        Returns:
+            Словарь с report_id и summary_text или None
+        """
+        try:
+            content_hash = await self.redis.get(self._file_key(user_id, file_unique_id))
+        except RedisError as e:
+            logger.warning("report_cache_get_error", user_id=user_id, error=str(e))
+            return None
+        
+        if content_hash is None:
+            return None
+        return await self.get(user_id, content_hash.decode())
+    
+    async def set(
+        self,
+        user_id: int,
+        content_hash: str,
+        report_id: int,
+        summary_text: str,
+        file_unique_id: str | None = None,
+    ) -> None:
+        """
+        Сохранить отчет в кэш
+        
+        Args:
+            user_id: ID пользователя
+            content_hash: Хэш содержимого файла
+            report_id: ID отчета
+            summary_text: Текст отчета
+            file_unique_id: Telegram file_unique_id документа (для поиска
+                без скачивания)
+        """
+        key = self._entry_key(user_id, content_hash)
+        index_key = self._index_key(user_id)
+        value = json.dumps({"report_id": report_id, "summary_text": summary_text})
+        
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.set(key, value, ex=self.ttl_seconds)
+                if file_unique_id:
+                    pipe.set(self._file_key(user_id, file_unique_id), content_hash, ex=self.ttl_seconds)
+                pipe.zadd(index_key, {content_hash: time.time()})
+                pipe.expire(index_key, self.ttl_seconds)
+                # Все записи, кроме max_per_user самых свежих
+                pipe.zrange(index_key, 0, -(self.max_per_user + 1))
+                *_, evicted = await pipe.execute()
+            
+            if evicted:
+                async with self.redis.pipeline(transaction=True) as pipe:
+                    pipe.delete(*(self._entry_key(user_id, h.decode()) for h in evicted))
+                    pipe.zrem(index_key, *evicted)
+                    await pipe.execute()
+        except RedisError as e:
+            logger.warning("report_cache_set_error", user_id=user_id, error=str(e))
+    
+    def _entry_key(self, user_id: int, content_hash: str) -> str:
+        """Ключ записи кэша"""
+        return f"{self.KEY_PREFIX}:{user_id}:{content_hash}"
+    
+    def _file_key(self, user_id: int, file_unique_id: str) -> str:
+        """Ключ ссылки file_unique_id на хэш содержимого"""
+        return f"{self.KEY_PREFIX}:{user_id}:file:{file_unique_id}"
+    
+    def _index_key(self, user_id: int) -> str:
+        """Ключ индекса записей пользователя"""
+        return f"{self.KEY_PREFIX}:{user_id}"
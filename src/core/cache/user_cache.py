@@ -0,0 +1,214 @@
+"""
+Кэш пользователя и лимитов в памяти процесса
+
+Горячий путь каждого update (DatabaseMiddleware) берет User и Limits
+из кэша по telegram_id без обращения к PostgreSQL. Записи вытесняются
+по LRU и TTL, изменения пользователя явно инвалидируют запись, а при
+включенном CACHE_USER_PUBSUB инвалидация рассылается другим процессам
+через Redis pub/sub
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import SQLModel
+
+from src.config.logging import get_logger
+from src.config.settings import settings
+from src.core.cache.connection import get_redis
+from src.database.models import Limits, User
+
+logger = get_logger(__name__)
+
+# Канал Redis для рассылки инвалидаций (сообщение - ID пользователя)
+INVALIDATION_CHANNEL = "user_cache:invalidate"
+
+
+def _snapshot(instance: Optional[SQLModel]) -> Optional[dict[str, Any]]:
+    """Значения колонок модели"""
+    if instance is None:
+        return None
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+def _restore(model: type[SQLModel], values: Optional[dict[str, Any]]) -> Optional[SQLModel]:
+    """Новый экземпляр модели в состоянии detached, как после загрузки из БД"""
+    if values is None:
+        return None
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    return instance
+
+
+class UserCache:
+    """
+    LRU + TTL кэш пары (User, Limits) с ключом telegram_id
+    
+    Хранятся снимки значений колонок, а не экземпляры моделей: каждое
+    чтение возвращает новые detached экземпляры, которые можно добавить
+    в сессию без SELECT. Изменения в handler не попадают в кэш.
+    
+    Эпоха растет при каждой инвалидации. Загрузка из БД сохраняется
+    только если эпоха не изменилась с начала загрузки - иначе данные
+    могли устареть до попадания в кэш.
+    """
+    
+    def __init__(
+        self,
+        max_size: int | None = None,
+        ttl_seconds: float | None = None,
+    ):
+        """
+        Инициализация кэша
+        
+        Args:
+            max_size: Максимум записей (по умолчанию из настроек)
+            ttl_seconds: Время жизни записи (по умолчанию из настроек)
+        """
+        self.max_size = max_size or settings.cache.user_max_size
+        self.ttl_seconds = ttl_seconds or settings.cache.user_ttl_seconds
+        self.epoch = 0
+        # telegram_id -> (срок жизни, снимок User, снимок Limits)
+        self._entries: OrderedDict[int, tuple[float, dict[str, Any], Optional[dict[str, Any]]]] = OrderedDict()
+        # user_id -> telegram_id для инвалидации по ID пользователя
+        self._telegram_ids: dict[int, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def get(self, telegram_id: int) -> Optional[tuple[User, Optional[Limits]]]:
+        """
+        Получить пользователя и лимиты
+        
+        Args:
+            telegram_id: Telegram ID пользователя
+            
+        Returns:
+            Кортеж (User, Limits или None) в состоянии detached или None
+        """
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            return None
+        
+        expires_at, user_values, limits_values = entry
+        if expires_at <= time.monotonic():
+            self._remove(telegram_id)
+            return None
+        
+        self._entries.move_to_end(telegram_id)
+        return _restore(User, user_values), _restore(Limits, limits_values)
+    
+    def set(
+        self,
+        user: User,
+        limits: Optional[Limits],
+        epoch: int | None = None,
+    ) -> bool:
+        """
+        Сохранить пользователя и лимиты
+        
+        Args:
+            user: Пользователь
+            limits: Лимиты пользователя или None
+            epoch: Эпоха на начало загрузки из БД (None - без проверки)
+            
+        Returns:
+            True если запись сохранена
+        """
+        if epoch is not None and epoch != self.epoch:
+            return False
+        
+        self._remove(user.telegram_id)
+        self._entries[user.telegram_id] = (
+            time.monotonic() + self.ttl_seconds,
+            _snapshot(user),
+            _snapshot(limits),
+        )
+        self._telegram_ids[user.id] = user.telegram_id
+        
+        while len(self._entries) > self.max_size:
+            _, (_, user_values, _) = self._entries.popitem(last=False)
+            self._telegram_ids.pop(user_values["id"], None)
+        return True
+    
+    def invalidate(self, user_id: int) -> None:
+        """
+        Удалить запись пользователя
+        
+        Args:
+            user_id: ID пользователя
+        """
+        self.epoch += 1
+        telegram_id = self._telegram_ids.get(user_id)
+        if telegram_id is not None:
+            self._remove(telegram_id)
+    
+    def clear(self) -> None:
+        """Удалить все записи"""
+        self.epoch += 1
+        self._entries.clear()
+        self._telegram_ids.clear()
+    
+    def _remove(self, telegram_id: int) -> None:
+        """Удалить запись по telegram_id"""
+        entry = self._entries.pop(telegram_id, None)
+        if entry is not None:
+            self._telegram_ids.pop(entry[1]["id"], None)
+
+
+user_cache = UserCache()
+
+
+async def invalidate_user(user_id: int) -> None:
+    """
+    Инвалидировать пользователя в кэше процесса и разослать инвалидацию
+    
+    Вызывается после коммита изменений User или Limits.
+    
+    Args:
+        user_id: ID пользователя
+    """
+    user_cache.invalidate(user_id)
+    
+    if not settings.cache.user_pubsub:
+        return
+    
+    try:
+        await get_redis().publish(INVALIDATION_CHANNEL, user_id)
+    except RedisError as e:
+        # Остальные процессы увидят изменения после TTL
+        logger.warning("user_cache_publish_error", user_id=user_id, error=str(e))
+
+
+async def listen_invalidations(redis: Redis, cache: UserCache | None = None) -> None:
+    """
+    Применять инвалидации, разосланные другими процессами
+    
+    Работает до отмены задачи. При обрыве соединения кэш очищается
+    (инвалидации могли быть пропущены) и подписка восстанавливается.
+    
+    Args:
+        redis: Клиент Redis
+        cache: Кэш (по умолчанию кэш процесса)
+    """
+    if cache is None:
+        cache = user_cache
+    
+    while True:
+        try:
+            async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                logger.info("user_cache_subscribed", channel=INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        cache.invalidate(int(message["data"]))
+        except (RedisError, OSError) as e:
+            logger.warning("user_cache_subscription_lost", error=str(e))
+            cache.clear()
+            await asyncio.sleep(1)
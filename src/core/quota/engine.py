@@ -0,0 +1,344 @@
+"""
+Квоты анализов и тем в Redis
+
+Счетчики использования пользователя хранятся в hash Redis и меняются
+атомарными Lua скриптами: проверка лимита, списание и сброс по reset_at
+выполняются за один запрос без обращения к таблице limits. Измененные
+счетчики периодически записываются в Limits (flush), после потери
+данных Redis счетчики восстанавливаются из Limits при первом списании.
+
+Лимиты (analytics_limit, themes_limit) в Redis не хранятся: они
+передаются из Limits, где задаются LimitsRepository по типу подписки
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+
+from src.config.logging import get_logger
+from src.config.settings import settings
+from src.core.cache.user_cache import invalidate_user
+from src.database.models import Limits
+from src.database.repositories.limits_repo import RESET_PERIOD, LimitKind, LimitsRepository
+
+logger = get_logger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# KEYS: счетчики пользователя, множество пользователей для записи в БД
+# ARGV: поле used, второе поле used, лимит, сейчас, период сброса, TTL,
+#       ID пользователя, used из БД, второй used из БД, reset_at из БД
+_CONSUME_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[8], ARGV[2], ARGV[9], 'reset_at', ARGV[10])
+end
+local now = tonumber(ARGV[4])
+local reset_at = tonumber(redis.call('HGET', KEYS[1], 'reset_at'))
+if reset_at <= now then
+    reset_at = now + tonumber(ARGV[5])
+    redis.call('HSET', KEYS[1], ARGV[1], 0, ARGV[2], 0, 'reset_at', tostring(reset_at))
+    redis.call('SADD', KEYS[2], ARGV[7])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+local used = tonumber(redis.call('HGET', KEYS[1], ARGV[1]))
+local limit = tonumber(ARGV[3])
+if limit ~= -1 and used >= limit then
+    return {0, used, tostring(reset_at)}
+end
+used = redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+redis.call('SADD', KEYS[2], ARGV[7])
+return {1, used, tostring(reset_at)}
+"""
+
+# KEYS: счетчики пользователя, множество пользователей для записи в БД
+# ARGV: поле used, ID пользователя
+# Возвращает 0, если счетчиков пользователя в Redis нет
+_REFUND_SCRIPT = """
+local used = tonumber(redis.call('HGET', KEYS[1], ARGV[1]))
+if not used then
+    return 0
+end
+if used > 0 then
+    redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+    redis.call('SADD', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
+
+def _to_timestamp(moment: datetime) -> float:
+    """Наивное UTC время в секунды Unix"""
+    return (moment - _EPOCH).total_seconds()
+
+
+def _from_timestamp(timestamp: float) -> datetime:
+    """Секунды Unix в наивное UTC время"""
+    return _EPOCH + timedelta(seconds=timestamp)
+
+
+class QuotaUsage:
+    """Результат списания: разрешено ли и счетчик после операции"""
+    
+    def __init__(self, allowed: bool, used: int, limit: int, reset_at: datetime):
+        """
+        Инициализация результата
+        
+        Args:
+            allowed: Списание прошло
+            used: Использовано после списания
+            limit: Лимит (-1 - безлимит)
+            reset_at: Время следующего сброса
+        """
+        self.allowed = allowed
+        self.used = used
+        self.limit = limit
+        self.reset_at = reset_at
+
+
+class QuotaEngine:
+    """Атомарные квоты пользователей в Redis с записью в Limits"""
+    
+    KEY_PREFIX = "quota"
+    DIRTY_KEY = "quota:dirty"
+    
+    def __init__(
+        self,
+        redis: Redis,
+        key_ttl_seconds: int | None = None,
+        flush_batch_size: int | None = None,
+    ):
+        """
+        Инициализация движка
+        
+        Args:
+            redis: Клиент Redis
+            key_ttl_seconds: Время жизни счетчиков без обращений
+                (по умолчанию из настроек)
+            flush_batch_size: Пользователей за один UPDATE при записи в БД
+                (по умолчанию из настроек)
+        """
+        self.redis = redis
+        self.key_ttl_seconds = key_ttl_seconds or settings.quota.key_ttl_seconds
+        self.flush_batch_size = flush_batch_size or settings.quota.flush_batch_size
+        self._consume = redis.register_script(_CONSUME_SCRIPT)
+        self._refund = redis.register_script(_REFUND_SCRIPT)
+    
+    async def consume(
+        self,
+        limits: Limits,
+        kind: LimitKind,
+        now: Optional[datetime] = None,
+    ) -> QuotaUsage:
+        """
+        Проверить лимит и списать одно использование
+        
+        Если счетчиков в Redis нет, они создаются из limits тем же
+        скриптом. Новые значения счетчика записываются в limits без
+        пометки об изменении, чтобы handler показал актуальные цифры.
+        
+        Args:
+            limits: Лимиты пользователя из БД
+            kind: Тип лимита ("analytics" или "themes")
+            now: Текущее время (по умолчанию utcnow)
+            
+        Returns:
+            Результат списания
+            
+        Raises:
+            RedisError: Redis недоступен
+        """
+        used_field, other_field, limit = self._fields(limits, kind)
+        now = now or datetime.utcnow()
+        
+        allowed, used, reset_at = await self._consume(
+            keys=[self._key(limits.user_id), self.DIRTY_KEY],
+            args=[
+                used_field,
+                other_field,
+                limit,
+                _to_timestamp(now),
+                int(RESET_PERIOD.total_seconds()),
+                self.key_ttl_seconds,
+                limits.user_id,
+                getattr(limits, used_field),
+                getattr(limits, other_field),
+                _to_timestamp(limits.reset_at),
+            ],
+        )
+        
+        usage = QuotaUsage(bool(allowed), int(used), limit, _from_timestamp(float(reset_at)))
+        set_committed_value(limits, used_field, usage.used)
+        set_committed_value(limits, "reset_at", usage.reset_at)
+        return usage
+    
+    async def refund(self, user_id: int, kind: LimitKind) -> bool:
+        """
+        Вернуть списанное использование (операция не выполнилась)
+        
+        Args:
+            user_id: ID пользователя
+            kind: Тип лимита
+            
+        Returns:
+            False, если счетчиков пользователя в Redis нет (истекли по TTL):
+            последние значения уже записаны в limits, возвращать нужно там
+        """
+        try:
+            found = await self._refund(
+                keys=[self._key(user_id), self.DIRTY_KEY],
+                args=[f"{kind}_used", user_id],
+            )
+        except RedisError as e:
+            # Изменение limits в обход Redis перезапишет следующий flush
+            logger.warning("quota_refund_error", user_id=user_id, kind=kind, error=str(e))
+            return True
+        return bool(found)
+    
+    async def flush(self, session: AsyncSession) -> int:
+        """
+        Записать измененные счетчики в Limits
+        
+        Пользователи забираются из множества измененных пачками, каждая
+        пачка - один UPDATE по первичному ключу и одна транзакция. При
+        ошибке БД пачка возвращается в множество.
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Количество записанных пользователей
+        """
+        flushed = 0
+        while user_ids := await self.redis.spop(self.DIRTY_KEY, self.flush_batch_size):
+            user_ids = [int(user_id) for user_id in user_ids]
+            
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for user_id in user_ids:
+                    pipe.hmget(self._key(user_id), "analytics_used", "themes_used", "reset_at")
+                values = await pipe.execute()
+            
+            rows = [
+                {
+                    "user_id": user_id,
+                    "analytics_used": int(analytics_used),
+                    "themes_used": int(themes_used),
+                    "reset_at": _from_timestamp(float(reset_at)),
+                }
+                for user_id, (analytics_used, themes_used, reset_at) in zip(user_ids, values)
+                # Счетчики могли истечь по TTL - тогда в БД уже последние значения
+                if reset_at is not None
+            ]
+            if not rows:
+                continue
+            
+            try:
+                await session.execute(update(Limits), rows)
+                await session.commit()
+            except SQLAlchemyError:
+                await session.rollback()
+                await self.redis.sadd(self.DIRTY_KEY, *user_ids)
+                raise
+            
+            for row in rows:
+                await invalidate_user(row["user_id"])
+            flushed += len(rows)
+        
+        if flushed:
+            logger.info("quota_flushed", users=flushed)
+        return flushed
+    
+    def _key(self, user_id: int) -> str:
+        """Ключ счетчиков пользователя"""
+        return f"{self.KEY_PREFIX}:{user_id}"
+    
+    @staticmethod
+    def _fields(limits: Limits, kind: LimitKind) -> tuple[str, str, int]:
+        """Поле счетчика, второе поле счетчика и лимит для типа"""
+        if kind == "analytics":
+            return "analytics_used", "themes_used", limits.analytics_limit
+        return "themes_used", "analytics_used", limits.themes_limit
+
+
+async def consume_limit(
+    session: AsyncSession,
+    limits_repo: LimitsRepository,
+    quota: Optional[QuotaEngine],
+    user_id: int,
+    kind: LimitKind,
+) -> QuotaUsage | None:
+    """
+    Списать использование через Redis или, без него, одним UPDATE в БД
+    
+    Если квоты ведутся в Redis, а он недоступен, списание отклоняется
+    ошибкой: списание в БД в обход Redis перезапишет следующий flush
+    (счетчик в Redis его не учитывает), а строка limits может отставать
+    от Redis на интервал flush.
+    
+    Args:
+        session: AsyncSession
+        limits_repo: Репозиторий лимитов
+        quota: Движок квот (None - только БД)
+        user_id: ID пользователя
+        kind: Тип лимита
+        
+    Returns:
+        Результат списания или None, если лимитов у пользователя нет
+        
+    Raises:
+        RedisError: Redis недоступен
+    """
+    if quota is not None:
+        # Лимиты обычно уже в сессии (DatabaseMiddleware) - без запроса к БД
+        limits = await limits_repo.get_by_user_id(session, user_id)
+        if limits is None:
+            return None
+        try:
+            return await quota.consume(limits, kind)
+        except RedisError as e:
+            logger.warning("quota_consume_error", user_id=user_id, kind=kind, error=str(e))
+            raise
+    
+    limits = await limits_repo.try_consume(session, user_id, kind)
+    if limits is None:
+        limits = await limits_repo.get_by_user_id(session, user_id)
+        if limits is None:
+            return None
+        used_field, _, limit = QuotaEngine._fields(limits, kind)
+        return QuotaUsage(False, getattr(limits, used_field), limit, limits.reset_at)
+    
+    used_field, _, limit = QuotaEngine._fields(limits, kind)
+    return QuotaUsage(True, getattr(limits, used_field), limit, limits.reset_at)
+
+
+async def refund_limit(
+    session: AsyncSession,
+    limits_repo: LimitsRepository,
+    quota: Optional[QuotaEngine],
+    user_id: int,
+    kind: LimitKind,
+) -> None:
+    """
+    Вернуть списанное использование через Redis или в БД
+    
+    В limits возврат выполняется, если Redis не используется или
+    счетчиков пользователя в нем уже нет.
+    
+    Args:
+        session: AsyncSession
+        limits_repo: Репозиторий лимитов
+        quota: Движок квот (None - только БД)
+        user_id: ID пользователя
+        kind: Тип лимита
+    """
+    if quota is not None and await quota.refund(user_id, kind):
+        return
+    
+    if await limits_repo.refund(session, user_id, kind):
+        await session.commit()
+        await invalidate_user(user_id)
@@ -0,0 +1,231 @@
+"""
+Индекс тем в памяти процесса
+
+Активные темы загружаются при старте бота в массивы ID и текстов по
+категориям: случайная тема выбирается за O(1) без обращения к БД.
+Вместе с ними строится индекс поиска по словам (ThemeSearchIndex).
+После изменения тем (загрузка, деактивация) публикуется уведомление
+в Redis, и индексы всех процессов перезагружаются
+"""
+
+import asyncio
+import random
+from array import array
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config.logging import get_logger
+from src.core.cache.connection import get_redis
+from src.core.themes.search import ThemeSearchIndex
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+
+logger = get_logger(__name__)
+
+# Канал Redis для уведомлений об изменении тем
+THEMES_CHANGED_CHANNEL = "themes:changed"
+
+
+class ThemeIndex:
+    """
+    Активные темы по категориям: массив ID, список текстов и номера тем
+    
+    Номер темы (ThemeTemplate.ordinal) стабилен, выключенные и удаленные
+    темы оставляют пропуски: массив номеров хранит позицию темы в массиве
+    ID или -1 для пропуска.
+    
+    Перезагрузка строит новые массивы и заменяет словарь целиком,
+    поэтому чтение во время загрузки видит либо старый, либо новый индекс.
+    """
+    
+    def __init__(self, theme_template_repo: ThemeTemplateRepository | None = None):
+        """
+        Инициализация индекса
+        
+        Args:
+            theme_template_repo: Репозиторий шаблонов тем
+        """
+        self.theme_template_repo = theme_template_repo or ThemeTemplateRepository()
+        self._categories: dict[str, tuple[array, list[str], array]] = {}
+        self.search_index = ThemeSearchIndex()
+        self.loaded = False
+    
+    def __len__(self) -> int:
+        return sum(len(ids) for ids, _, _ in self._categories.values())
+    
+    async def load(self, session: AsyncSession) -> int:
+        """
+        Загрузить активные темы из БД
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Количество тем в индексе
+        """
+        themes = await self.theme_template_repo.get_active_themes(session)
+        ordinals = await self.theme_template_repo.get_ordinals(session)
+        
+        categories: dict[str, tuple[array, list[str], array]] = {}
+        positions: dict[int, int] = {}
+        for theme_id, category, theme, _ in themes:
+            ids, texts, _ = categories.setdefault(category, (array("q"), [], array("l")))
+            positions[theme_id] = len(ids)
+            ids.append(theme_id)
+            texts.append(theme)
+        
+        for theme_id, category, ordinal in ordinals:
+            # Тема могла измениться между запросами - тогда она без номера
+            if theme_id not in positions or category not in categories:
+                continue
+            slots = categories[category][2]
+            if len(slots) < ordinal:
+                slots.extend([-1] * (ordinal - len(slots)))
+            slots[ordinal - 1] = positions[theme_id]
+        
+        self.search_index = ThemeSearchIndex(themes)
+        self._categories = categories
+        self.loaded = True
+        
+        logger.info("theme_index_loaded", themes=len(self), categories=len(categories))
+        return len(self)
+    
+    def pick(self, category: str) -> Optional[tuple[int, str]]:
+        """
+        Выбрать случайную тему категории
+        
+        Args:
+            category: Категория темы
+            
+        Returns:
+            Кортеж (ID, текст) или None, если тем в категории нет
+        """
+        entry = self._categories.get(category)
+        if not entry:
+            return None
+        
+        ids, texts, _ = entry
+        position = random.randrange(len(ids))
+        return ids[position], texts[position]
+    
+    def get(self, category: str, ordinal: int) -> Optional[tuple[int, str]]:
+        """
+        Получить тему по порядковому номеру в категории
+        
+        Args:
+            category: Категория темы
+            ordinal: Номер (1 <= ordinal <= max_ordinal)
+            
+        Returns:
+            Кортеж (ID, текст) или None, если номер - пропуск
+        """
+        entry = self._categories.get(category)
+        if not entry or not 1 <= ordinal <= len(entry[2]):
+            return None
+        
+        ids, texts, slots = entry
+        position = slots[ordinal - 1]
+        if position < 0:
+            return None
+        return ids[position], texts[position]
+    
+    def count(self, category: str) -> int:
+        """
+        Количество тем категории
+        
+        Args:
+            category: Категория темы
+            
+        Returns:
+            Количество тем
+        """
+        entry = self._categories.get(category)
+        return len(entry[0]) if entry else 0
+    
+    def max_ordinal(self, category: str) -> int:
+        """
+        Размер пространства номеров категории (с пропусками)
+        
+        Args:
+            category: Категория темы
+            
+        Returns:
+            Максимальный номер (0 - тем нет или они не пронумерованы)
+        """
+        entry = self._categories.get(category)
+        return len(entry[2]) if entry else 0
+    
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 10,
+    ) -> list[tuple[int, str, str]]:
+        """
+        Найти темы по словам запроса
+        
+        Args:
+            query: Текст запроса
+            category: Категория (None - все категории)
+            limit: Максимум результатов
+            
+        Returns:
+            Список (id, category, theme) от лучшего совпадения к худшему
+        """
+        return self.search_index.search(query, category, limit)
+
+
+async def notify_themes_changed() -> None:
+    """Уведомить процессы об изменении тем"""
+    try:
+        await get_redis().publish(THEMES_CHANGED_CHANNEL, 1)
+    except RedisError as e:
+        logger.warning("themes_changed_publish_error", error=str(e))
+
+
+async def listen_theme_changes(
+    redis: Redis,
+    index: ThemeIndex,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:
+    """
+    Перезагружать индекс при уведомлениях об изменении тем
+    
+    Работает до отмены задачи. После восстановления подписки индекс
+    перезагружается (уведомления могли быть пропущены).
+    
+    Args:
+        redis: Клиент Redis
+        index: Индекс тем
+        session_factory: Фабрика сессий
+    """
+    reconnected = False
+    while True:
+        try:
+            async with redis.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(THEMES_CHANGED_CHANNEL)
+                logger.info("theme_index_subscribed", channel=THEMES_CHANGED_CHANNEL)
+                if reconnected:
+                    await _reload(index, session_factory)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        await _reload(index, session_factory)
+        except (RedisError, OSError) as e:
+            logger.warning("theme_index_subscription_lost", error=str(e))
+            reconnected = True
+            await asyncio.sleep(1)
+
+
+async def _reload(
+    index: ThemeIndex,
+    session_factory: async_sessionmaker[AsyncSession],
+) -> None:
+    """Перезагрузить индекс; при ошибке БД остается прежний"""
+    try:
+        async with session_factory() as session:
+            await index.load(session)
+    except SQLAlchemyError as e:
+        logger.error("theme_index_reload_error", error=str(e))
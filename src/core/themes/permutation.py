@@ -0,0 +1,55 @@
+"""
+Псевдослучайная перестановка номеров тем
+
+Перестановка [0, size) задается seed и вычисляется для любой позиции
+за O(1) без хранения перемешанного массива: сеть Фейстеля на ближайшем
+сверху домене 2^(2k) и cycle-walking до попадания в [0, size)
+"""
+
+_MASK64 = (1 << 64) - 1
+
+# Число раундов сети Фейстеля
+ROUNDS = 4
+
+
+def _mix(value: int, key: int) -> int:
+    """Раундовая функция: финализатор splitmix64"""
+    z = (value + key + 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return z ^ (z >> 31)
+
+
+def permute(index: int, size: int, seed: int) -> int:
+    """
+    Позиция index в перестановке [0, size), заданной seed
+
+    Для фиксированных size и seed функция - биекция [0, size) на себя.
+
+    Args:
+        index: Позиция в перестановке (0 <= index < size)
+        size: Размер перестановки
+        seed: Ключ перестановки
+
+    Returns:
+        Элемент перестановки в [0, size)
+
+    Raises:
+        ValueError: index вне [0, size)
+    """
+    if not 0 <= index < size:
+        raise ValueError(f"index {index} вне диапазона [0, {size})")
+
+    half_bits = max(1, ((size - 1).bit_length() + 1) // 2)
+    half_mask = (1 << half_bits) - 1
+    keys = [(seed + round_number * 0x632BE59BD9B4E019) & _MASK64 for round_number in range(ROUNDS)]
+
+    # Домен не больше 4 * size: в среднем меньше четырех проходов
+    value = index
+    while True:
+        left, right = value >> half_bits, value & half_mask
+        for key in keys:
+            left, right = right, left ^ (_mix(right, key) & half_mask)
+        value = (left << half_bits) | right
+        if value < size:
+            return value
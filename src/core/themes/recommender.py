@@ -0,0 +1,120 @@
+"""
+Рекомендации тем по продажам пользователя
+
+TF-IDF векторы тем каталога строятся пакетно (в worker). Профиль
+пользователя - сумма TF-IDF векторов названий его самых доходных активов
+с весом по доходу, рекомендации - темы с наибольшим косинусным сходством
+с профилем. Векторы разреженные: сходство считается по инвертированному
+индексу только для тем, разделяющих с профилем хотя бы одно слово
+"""
+
+import heapq
+import math
+from array import array
+from collections import Counter
+from typing import Iterable, Optional
+
+from src.core.themes.search import tokenize
+
+
+def _terms(text: str) -> list[str]:
+    """Слова для TF-IDF: без чисел (размеры, годы, ID в названиях)"""
+    return [token for token in tokenize(text) if not token.isdigit()]
+
+
+class ThemeRecommender:
+    """
+    TF-IDF модель каталога тем
+    
+    Модель неизменяема после построения: после изменения каталога
+    строится новая.
+    """
+    
+    def __init__(self, documents: Iterable[tuple[int, str, Optional[list[str]]]] = ()):
+        """
+        Построить модель
+        
+        Args:
+            documents: Темы (id, theme, keywords)
+        """
+        self._ids = array("q")
+        term_counts: list[Counter] = []
+        document_frequency: Counter = Counter()
+        
+        for theme_id, theme, keywords in documents:
+            counts = Counter(_terms(theme) + _terms(" ".join(keywords or ())))
+            if not counts:
+                continue
+            self._ids.append(theme_id)
+            term_counts.append(counts)
+            document_frequency.update(counts.keys())
+        
+        size = len(self._ids)
+        # Сглаженный IDF: слово из всех тем получает вес 1, а не 0
+        self._idf = {
+            term: math.log((1 + size) / (1 + frequency)) + 1
+            for term, frequency in document_frequency.items()
+        }
+        
+        # слово -> (номера тем, веса слова в нормированных векторах тем)
+        self._postings: dict[str, tuple[array, array]] = {}
+        for position, counts in enumerate(term_counts):
+            vector = self._vector(counts)
+            for term, weight in vector.items():
+                positions, weights = self._postings.setdefault(term, (array("l"), array("d")))
+                positions.append(position)
+                weights.append(weight)
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def recommend(
+        self,
+        titles: Iterable[tuple[str, float]],
+        limit: int = 50,
+    ) -> list[tuple[int, float]]:
+        """
+        Темы, похожие на названия активов пользователя
+        
+        Args:
+            titles: Пары (название актива, вес), например доход актива
+            limit: Максимум рекомендаций
+            
+        Returns:
+            Список (ID темы, косинусное сходство) по убыванию сходства
+        """
+        profile: dict[str, float] = {}
+        for title, weight in titles:
+            if weight <= 0:
+                continue
+            for term, value in self._vector(Counter(_terms(title))).items():
+                profile[term] = profile.get(term, 0.0) + weight * value
+        
+        norm = math.sqrt(sum(value * value for value in profile.values()))
+        if not norm:
+            return []
+        
+        scores: dict[int, float] = {}
+        for term, value in profile.items():
+            positions, weights = self._postings[term]
+            for position, weight in zip(positions, weights):
+                scores[position] = scores.get(position, 0.0) + value * weight
+        
+        best = heapq.nlargest(
+            limit,
+            scores.items(),
+            key=lambda item: (item[1], -self._ids[item[0]]),
+        )
+        return [(self._ids[position], score / norm) for position, score in best]
+    
+    def _vector(self, counts: Counter) -> dict[str, float]:
+        """Нормированный TF-IDF вектор (слова вне каталога не учитываются)"""
+        vector = {
+            term: (1 + math.log(count)) * self._idf[term]
+            for term, count in counts.items()
+            if term in self._idf
+        }
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        if not norm:
+            return {}
+        return {term: value / norm for term, value in vector.items()}
@@ -0,0 +1,151 @@
+"""
+Поиск тем по словам в памяти процесса
+
+Инвертированный индекс: слово -> темы, в которых оно встречается (в тексте
+или ключевых словах). Префиксы ищутся по отсортированному словарю
+двоичным поиском, поэтому запрос по мере ввода ("бухг") находит
+"бухгалтерия". Ранжирование - число совпавших слов запроса, затем
+сумма IDF весов: редкие слова важнее частых
+"""
+
+import heapq
+import math
+import re
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Optional
+
+# Слово - буквы и цифры (без подчеркивания, как парсер tsvector в PostgreSQL)
+_TOKEN_RE = re.compile(r"[^\W_]+")
+
+# Минимальная длина слова запроса для поиска по префиксу
+MIN_PREFIX_LENGTH = 3
+
+# Максимум слов словаря на один префикс
+MAX_PREFIX_EXPANSION = 64
+
+# Вес совпадения по префиксу относительно точного
+PREFIX_WEIGHT = 0.5
+
+# Вес слова, найденного только в ключевых словах темы
+KEYWORD_WEIGHT = 0.5
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Разбить текст на слова без учета регистра
+    
+    Args:
+        text: Текст
+        
+    Returns:
+        Слова в порядке появления
+    """
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class ThemeSearchIndex:
+    """
+    Инвертированный индекс активных тем
+    
+    Индекс неизменяем после построения: перезагрузка тем строит новый
+    и заменяет ссылку целиком (см. ThemeIndex.load).
+    """
+    
+    def __init__(self, documents: Iterable[tuple[int, str, str, Optional[list[str]]]] = ()):
+        """
+        Построить индекс
+        
+        Args:
+            documents: Темы (id, category, theme, keywords)
+        """
+        self._ids = array("q")
+        self._categories: list[str] = []
+        self._themes: list[str] = []
+        # слово -> {номер темы в индексе: вес поля}
+        self._postings: dict[str, dict[int, float]] = {}
+        
+        for theme_id, category, theme, keywords in documents:
+            position = len(self._ids)
+            self._ids.append(theme_id)
+            self._categories.append(category)
+            self._themes.append(theme)
+            
+            for token in tokenize(" ".join(keywords or ())):
+                self._postings.setdefault(token, {})[position] = KEYWORD_WEIGHT
+            for token in tokenize(theme):
+                self._postings.setdefault(token, {})[position] = 1.0
+        
+        self._vocabulary = sorted(self._postings)
+    
+    def __len__(self) -> int:
+        return len(self._ids)
+    
+    def search(
+        self,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 10,
+    ) -> list[tuple[int, str, str]]:
+        """
+        Найти темы по словам запроса
+        
+        Тема подходит, если содержит хотя бы одно слово запроса
+        (точно или с этим словом как префиксом).
+        
+        Args:
+            query: Текст запроса
+            category: Категория (None - все категории)
+            limit: Максимум результатов
+            
+        Returns:
+            Список (id, category, theme) от лучшего совпадения к худшему
+        """
+        scores: dict[int, float] = {}
+        matched: dict[int, int] = {}
+        
+        for token in dict.fromkeys(tokenize(query)):
+            # Лучшее совпадение слова запроса в каждой теме
+            best: dict[int, float] = {}
+            for term, weight in self._expand(token):
+                idf = math.log(1 + len(self._ids) / len(self._postings[term]))
+                for position, field_weight in self._postings[term].items():
+                    score = idf * weight * field_weight
+                    if score > best.get(position, 0.0):
+                        best[position] = score
+            
+            for position, score in best.items():
+                scores[position] = scores.get(position, 0.0) + score
+                matched[position] = matched.get(position, 0) + 1
+        
+        if category is not None:
+            candidates = [position for position in scores if self._categories[position] == category]
+        else:
+            candidates = list(scores)
+        
+        ranked = heapq.nsmallest(
+            limit,
+            candidates,
+            key=lambda position: (-matched[position], -scores[position], self._ids[position]),
+        )
+        return [
+            (self._ids[position], self._categories[position], self._themes[position])
+            for position in ranked
+        ]
+    
+    def _expand(self, token: str) -> list[tuple[str, float]]:
+        """Слова словаря для слова запроса: точное и продолжения префикса"""
+        terms = []
+        if token in self._postings:
+            terms.append((token, 1.0))
+        
+        if len(token) < MIN_PREFIX_LENGTH:
+            return terms
+        
+        start = bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSION + 1]:
+            if not term.startswith(token):
+                break
+            if term != token:
+                terms.append((term, PREFIX_WEIGHT))
+        return terms
@@ -1,32 +1,77 @@
 """
 Загрузчик тем из CSV файла
 
-Парсит CSV файл с темами и загружает их в базу данных
+Потоковый разбор CSV с темами, нормализация и дедупликация в памяти,
+массовая загрузка в theme_templates (COPY в staging-таблицу для PostgreSQL,
+см. bulk.insert_ignore). Повторная загрузка того же каталога ничего не
+добавляет: уникальный ключ (category, theme_key)
 """
 
 import csv
+import hashlib
 import io
-from typing import Any
+from datetime import datetime
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logging import get_logger
-from src.database.models import ThemeRequest
-from src.database.repositories.theme_repo import ThemeRepository
+from src.core.themes.index import notify_themes_changed
+from src.database.models import ThemeTemplate
+from src.database.repositories.bulk import insert_ignore
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
 
 logger = get_logger(__name__)
 
+# Категории тем (см. handlers/themes.py)
+THEME_CATEGORIES = {"vectors", "photos", "videos", "audio", "templates"}
+
+# Строк в одной пачке загрузки
+IMPORT_BATCH_SIZE = 5000
+
+
+def normalize_theme(theme: str) -> str:
+    """
+    Нормализовать текст темы: пробелы по краям и повторные пробелы
+    
+    Args:
+        theme: Текст темы
+        
+    Returns:
+        Нормализованный текст
+    """
+    return " ".join(theme.split())
+
+
+def make_theme_key(theme: str) -> str:
+    """
+    Ключ дедупликации темы: хэш текста без учета регистра и пробелов
+    
+    Args:
+        theme: Текст темы
+        
+    Returns:
+        Hex строка (32 символа)
+    """
+    normalized = normalize_theme(theme).casefold()
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
 
 class ThemesLoader:
     """Загрузчик тем из CSV"""
     
     @staticmethod
-    def parse_themes_csv(content: bytes | str) -> list[dict[str, Any]]:
+    def parse_themes_csv(
+        content: bytes | str,
+        default_category: str = "photos",
+    ) -> list[dict[str, Any]]:
         """
         Парсит CSV файл с темами
         
         Args:
             content: Содержимое CSV файла (bytes или str)
+            default_category: Категория для строк без категории
             
         Returns:
             Список словарей с данными тем
@@ -38,116 +83,160 @@ class ThemesLoader:
             else:
                 content_str = content
             
-            # Парсим CSV
-            reader = csv.reader(io.StringIO(content_str))
-            rows = list(reader)
-            
-            if not rows:
-                return []
-            
-            # Пытаемся определить заголовки
-            has_header = any(
-                header.lower() in ['category', 'category', 'theme', 'тема', 'категория']
-                for header in rows[0]
-            )
-            
-            if has_header:
-                return ThemesLoader._parse_with_headers(rows)
-            else:
-                return ThemesLoader._parse_without_headers(rows)
+            return list(ThemesLoader.iter_themes(io.StringIO(content_str), default_category))
         
         except Exception as e:
             logger.error("themes_csv_parse_error", error=str(e), exc_info=True)
             return []
     
     @staticmethod
-    def _parse_with_headers(rows: list[list[str]]) -> list[dict[str, Any]]:
-        """Парсит CSV с заголовками"""
-        headers = [h.strip().lower() for h in rows[0]]
-        data_rows = rows[1:]
+    def iter_themes(
+        lines: Iterable[str],
+        default_category: str = "photos",
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Потоковый разбор CSV с темами
         
-        result = []
-        for row in data_rows:
-            if not row or len(row) < 2:
-                continue
-            
-            row_dict = {}
-            for i, header in enumerate(headers):
-                if i < len(row):
-                    row_dict[header] = row[i].strip()
+        Поддерживаемые форматы: с заголовками (category/категория,
+        theme/тема/title), без заголовков "category, theme" и одна колонка
+        с темой (категория - default_category). Файл не читается в память
+        целиком, строки берутся по одной.
+        
+        Args:
+            lines: Строки CSV (например, открытый файл)
+            default_category: Категория для строк без категории
             
-            # Нормализуем данные
-            if 'category' in row_dict or 'категория' in row_dict:
-                category = row_dict.get('category') or row_dict.get('категория', 'photos')
-                theme = row_dict.get('theme') or row_dict.get('тема') or row_dict.get('title') or ''
-                
-                if theme:
-                    result.append({
-                        'category': category.lower(),
-                        'theme': theme,
-                    })
+        Yields:
+            Словари с category и нормализованной theme
+        """
+        reader = csv.reader(lines)
+        first_row = next(reader, None)
+        if first_row is None:
+            return
         
-        return result
-    
-    @staticmethod
-    def _parse_without_headers(rows: list[list[str]]) -> list[dict[str, Any]]:
-        """Парсит CSV без заголовков (предполагает формат: category, theme)"""
-        result = []
+        headers = [header.strip().lower() for header in first_row]
+        has_header = any(
+            header in ['category', 'theme', 'тема', 'категория']
+            for header in headers
+        )
+        
+        if has_header:
+            category_column = ThemesLoader._column(headers, 'category', 'категория')
+            theme_column = ThemesLoader._column(headers, 'theme', 'тема', 'title')
+            if theme_column is None:
+                return
+            rows = reader
+        else:
+            category_column = theme_column = None
+            rows = chain([first_row], reader)
         
         for row in rows:
-            if not row or len(row) < 2:
+            if not row:
                 continue
             
-            category = row[0].strip().lower()
-            theme = row[1].strip()
+            if has_header:
+                theme = row[theme_column] if theme_column < len(row) else ''
+                category = row[category_column] if category_column is not None and category_column < len(row) else ''
+            elif len(row) >= 2 and row[0].strip().lower() in THEME_CATEGORIES and row[1].strip():
+                category, theme = row[0], row[1]
+            else:
+                category, theme = '', row[0]
             
-            if category and theme:
-                result.append({
-                    'category': category,
+            theme = normalize_theme(theme)
+            if theme:
+                yield {
+                    'category': category.strip().lower() or default_category,
                     'theme': theme,
-                })
-        
-        return result
+                }
     
     @staticmethod
-    async def load_themes_to_db(
+    def _column(headers: list[str], *names: str) -> int | None:
+        """Номер первой колонки с одним из имен"""
+        for position, header in enumerate(headers):
+            if header in names:
+                return position
+        return None
+    
+    @staticmethod
+    async def import_themes(
         session: AsyncSession,
-        themes_data: list[dict[str, Any]],
-    ) -> int:
+        themes: Iterable[dict[str, Any]],
+        batch_size: int = IMPORT_BATCH_SIZE,
+        theme_template_repo: ThemeTemplateRepository | None = None,
+    ) -> dict[str, int]:
         """
-        Загружает темы в базу данных
+        Загрузить темы в theme_templates
+        
+        Дубликаты внутри файла отсекаются в памяти по (category, theme_key),
+        уже сохраненные темы - уникальным ключом в БД (ON CONFLICT DO NOTHING),
+        поэтому повторная загрузка того же каталога ничего не добавляет.
+        Все пачки вставляются в одной транзакции. Если темы добавлены,
+        порядковые номера пересчитываются и индексы ботов перезагружаются.
         
         Args:
             session: AsyncSession
-            themes_data: Список словарей с данными тем
+            themes: Словари с category и theme (например, из iter_themes)
+            batch_size: Строк в одной пачке вставки
+            theme_template_repo: Репозиторий шаблонов тем
             
         Returns:
-            Количество загруженных тем
+            Словарь с количеством добавленных (inserted) и пропущенных
+            (skipped: дубликаты в файле и уже загруженные) тем
         """
-        theme_repo = ThemeRepository()
-        loaded_count = 0
+        theme_template_repo = theme_template_repo or ThemeTemplateRepository()
+        created_at = datetime.utcnow()
+        seen: set[tuple[str, str]] = set()
+        duplicates = 0
+        inserted = 0
         
-        for theme_data in themes_data:
-            try:
-                category = theme_data.get('category', 'photos')
-                theme = theme_data.get('theme', '')
-                
+        def records() -> Iterator[dict[str, Any]]:
+            nonlocal duplicates
+            for item in themes:
+                theme = normalize_theme(item.get('theme') or '')
                 if not theme:
                     continue
+                category = (item.get('category') or 'photos').strip().lower()
                 
-                # Проверяем, существует ли уже такая тема
-                # TODO: Добавить проверку на дубликаты
-                
-                # Создаем тему (без user_id, как шаблон)
-                # В реальности, темы должны храниться в отдельной таблице ThemeTemplate
-                # Но для MVP используем существующую структуру
+                key = make_theme_key(theme)
+                if (category, key) in seen:
+                    duplicates += 1
+                    continue
+                seen.add((category, key))
                 
-                loaded_count += 1
-            
-            except Exception as e:
-                logger.warning("theme_load_warning", theme=theme_data, error=str(e))
-                continue
+                yield {
+                    'category': category,
+                    'theme': theme,
+                    'theme_key': key,
+                    'is_active': True,
+                    'created_at': created_at,
+                }
+        
+        try:
+            batches = iter(records())
+            while batch := list(islice(batches, batch_size)):
+                rows = await insert_ignore(
+                    session,
+                    ThemeTemplate,
+                    batch,
+                    conflict_columns=['category', 'theme_key'],
+                    returning=['id'],
+                )
+                inserted += len(rows)
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        
+        existing = len(seen) - inserted
+        if inserted:
+            await theme_template_repo.assign_ordinals(session)
+            await notify_themes_changed()
         
-        logger.info("themes_loaded", count=loaded_count)
-        return loaded_count
+        logger.info(
+            "themes_imported",
+            inserted=inserted,
+            duplicates=duplicates,
+            existing=existing,
+        )
+        return {'inserted': inserted, 'skipped': duplicates + existing}
 
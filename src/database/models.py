@@ -3,15 +3,19 @@
 
 Содержит все SQLModel модели для базы данных:
 - User, Limits, CSVAnalysis, AnalyticsReport
+- SaleFact, PortfolioDaily, PortfolioAsset, PortfolioCategory - история продаж
 - ThemeRequest, Payment, SystemMessage, BroadcastMessage
 - ThemeTemplate - шаблоны тем для генерации
+- MetricsSnapshot - снимки метрик админ-панели
+- MetricsRollup - агрегаты метрик по часам и дням
 """
 
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from decimal import Decimal
 from enum import Enum
 from typing import Any
 
-from sqlalchemy import JSON, Text, Column
+from sqlalchemy import JSON, BigInteger, Text, Column, UniqueConstraint
 from sqlmodel import SQLModel, Field
 
 
@@ -57,6 +61,21 @@ class BroadcastStatus(str, Enum):
     FAILED = "failed"
 
 
+class RollupGranularity(str, Enum):
+    """Размер интервала агрегатов метрик"""
+    HOUR = "hour"
+    DAY = "day"
+
+
+class RollupMetric(str, Enum):
+    """Метрики в агрегатах по времени"""
+    REGISTRATIONS = "registrations"
+    ACTIVE_USERS = "active_users"
+    PAYMENTS = "payments"
+    REVENUE = "revenue"
+    ANALYSES = "analyses"
+
+
 class MessageType(str, Enum):
     """Типы системных сообщений"""
     INFO = "info"
@@ -123,10 +142,12 @@ class CSVAnalysis(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     user_id: int = Field(foreign_key="users.id", index=True)
     file_id: str = Field(max_length=255)  # Telegram file_id
+    file_unique_id: str | None = Field(default=None, max_length=255, index=True)  # Telegram file_unique_id
     filename: str = Field(max_length=255)
     row_count: int
     analysis_status: AnalysisStatus = Field(default=AnalysisStatus.PENDING)
     error_message: str | None = Field(default=None)
+    content_hash: str | None = Field(default=None, max_length=64, index=True)  # SHA-256 нормализованного файла
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 
@@ -142,10 +163,78 @@ class AnalyticsReport(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class SaleFact(SQLModel, table=True):
+    """Продажи пользователя из всех загруженных CSV (без дублей)"""
+    
+    __tablename__ = "sale_facts"
+    __table_args__ = (
+        UniqueConstraint(
+            "user_id", "asset_id", "sold_at", "purchase_type", "revenue",
+            name="uq_sale_facts_sale",
+        ),
+    )
+    
+    id: int | None = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="users.id", index=True)
+    asset_id: str = Field(max_length=255)  # asset_id или title, если ID нет
+    sold_at: datetime
+    day: date  # День продажи по дате из выгрузки
+    purchase_type: str = Field(max_length=50)
+    revenue: Decimal = Field(max_digits=14, decimal_places=4)
+    title: str = Field(max_length=255)
+    category: str = Field(max_length=50)
+    impressions: int = Field(default=0)
+    downloads: int = Field(default=0)
+    csv_analysis_id: int | None = Field(default=None, foreign_key="csv_analyses.id")
+
+
+class PortfolioDaily(SQLModel, table=True):
+    """Накопительные показатели портфолио по дням"""
+    
+    __tablename__ = "portfolio_daily"
+    
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    row_count: int = Field(default=0)
+    sales: int = Field(default=0)
+    revenue: Decimal = Field(default=Decimal(0), max_digits=18, decimal_places=4)
+    impressions: int = Field(default=0)
+    downloads: int = Field(default=0)
+
+
+class PortfolioAsset(SQLModel, table=True):
+    """Накопительные показатели портфолио по активам"""
+    
+    __tablename__ = "portfolio_assets"
+    
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    asset_id: str = Field(max_length=255, primary_key=True)
+    title: str = Field(max_length=255)
+    sales: int = Field(default=0)
+    revenue: Decimal = Field(default=Decimal(0), max_digits=18, decimal_places=4)
+
+
+class PortfolioCategory(SQLModel, table=True):
+    """Накопительные показатели портфолио по типам (категория или тип покупки)"""
+    
+    __tablename__ = "portfolio_categories"
+    
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    type_key: str = Field(max_length=50, primary_key=True)
+    row_count: int = Field(default=0)
+    sales: int = Field(default=0)
+    revenue: Decimal = Field(default=Decimal(0), max_digits=18, decimal_places=4)
+    first_seen_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class ThemeTemplate(SQLModel, table=True):
     """Шаблоны тем для генерации"""
     
     __tablename__ = "theme_templates"
+    __table_args__ = (
+        UniqueConstraint("category", "ordinal", name="uq_theme_templates_category_ordinal"),
+        UniqueConstraint("category", "theme_key", name="uq_theme_templates_category_theme_key"),
+    )
     
     id: int | None = Field(default=None, primary_key=True)
     category: str = Field(max_length=50, index=True)  # vectors, photos, videos, audio, templates
@@ -153,9 +242,34 @@ class ThemeTemplate(SQLModel, table=True):
     description: str | None = Field(default=None, sa_column=Column(Text))
     keywords: list[str] | None = Field(default=None, sa_column=Column(JSON))
     is_active: bool = Field(default=True, index=True)
+    ordinal: int | None = Field(default=None)  # Стабильный номер активной темы в категории (с пропусками)
+    theme_key: str | None = Field(default=None, max_length=32)  # Хэш нормализованной темы (дедупликация)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 
+class ThemeCursor(SQLModel, table=True):
+    """Позиция пользователя в перестановке тем категории (выдача без повторов)"""
+    
+    __tablename__ = "theme_cursors"
+    
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    category: str = Field(max_length=50, primary_key=True)
+    seed: int = Field(sa_type=BigInteger)  # Ключ перестановки текущего круга
+    position: int = Field(default=0)  # Сколько тем круга уже выдано
+    catalog_size: int = Field(default=0)  # Размер каталога, для которого построена перестановка
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ThemeRecommendation(SQLModel, table=True):
+    """Рекомендованные темы пользователя по его продажам (пересчитываются в worker)"""
+    
+    __tablename__ = "theme_recommendations"
+    
+    user_id: int = Field(foreign_key="users.id", primary_key=True)
+    theme_ids: list[int] = Field(default_factory=list, sa_column=Column(JSON))  # От лучшей к худшей
+    computed_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class ThemeRequest(SQLModel, table=True):
     """Выданные темы"""
     
@@ -183,7 +297,7 @@ class Payment(SQLModel, table=True):
     subscription_days: int = Field(default=30)
     payment_provider: PaymentProvider = Field(default=PaymentProvider.TRIBUTE)
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
-    completed_at: datetime | None = Field(default=None)
+    completed_at: datetime | None = Field(default=None, index=True)
 
 
 class SystemMessage(SQLModel, table=True):
@@ -215,3 +329,53 @@ class BroadcastMessage(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     started_at: datetime | None = Field(default=None)
     completed_at: datetime | None = Field(default=None)
+
+
+class MetricsSnapshot(SQLModel, table=True):
+    """Снимок метрик админ-панели (последний - для чтения, остальные - история)"""
+    
+    __tablename__ = "metrics_snapshots"
+    
+    id: int | None = Field(default=None, primary_key=True)
+    taken_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    
+    # Пользователи
+    total_users: int = Field(default=0)
+    new_users_24h: int = Field(default=0)
+    active_users_7d: int = Field(default=0)
+    free_users: int = Field(default=0)
+    pro_users: int = Field(default=0)
+    ultra_users: int = Field(default=0)
+    referrals_total: int = Field(default=0)
+    
+    # Платежи (суммы в копейках)
+    payments_today: int = Field(default=0)
+    payments_month: int = Field(default=0)
+    revenue_today: int = Field(default=0, sa_type=BigInteger)
+    revenue_month: int = Field(default=0, sa_type=BigInteger)
+    revenue_total: int = Field(default=0, sa_type=BigInteger)
+    
+    # Аналитика
+    total_analyses: int = Field(default=0)
+    total_reports: int = Field(default=0)
+    avg_cpm: float = Field(default=0.0)
+    top_users_by_analyses: list[list[int]] = Field(default_factory=list, sa_column=Column(JSON))  # [[user_id, count], ...]
+
+
+class MetricsRollup(SQLModel, table=True):
+    """
+    Значение метрики за час или день
+    
+    Разрез (dimension): тариф для платежей и выручки, статус для анализов,
+    пустая строка для метрик без разреза. Первичный ключ начинается
+    с (granularity, metric, bucket), поэтому ряд за период читается
+    по индексу без обращения к исходным таблицам.
+    """
+    
+    __tablename__ = "metrics_rollups"
+    
+    granularity: str = Field(primary_key=True, max_length=8)  # RollupGranularity
+    metric: str = Field(primary_key=True, max_length=32)  # RollupMetric
+    bucket: datetime = Field(primary_key=True)  # Начало часа или дня (UTC)
+    dimension: str = Field(default="", primary_key=True, max_length=32)
+    value: int = Field(default=0, sa_type=BigInteger)  # Суммы в копейках
@@ -2,13 +2,15 @@
 Репозиторий для работы с аналитикой CSV файлов
 """
 
+from datetime import datetime
 from typing import Optional, List
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import desc, func, select, update
 
-from src.database.models import CSVAnalysis, AnalyticsReport, AnalysisStatus
+from src.database.models import CSVAnalysis, AnalyticsReport, AnalysisStatus, RollupGranularity
 from src.database.repositories.base import BaseRepository
+from src.database.repositories.metrics_rollup_repo import truncate_to_bucket
 
 
 class CSVAnalysisRepository(BaseRepository[CSVAnalysis]):
@@ -62,6 +64,49 @@ class CSVAnalysisRepository(BaseRepository[CSVAnalysis]):
         result = await session.execute(statement)
         return list(result.scalars().all())
     
+    async def reset_status(
+        self,
+        session: AsyncSession,
+        from_status: AnalysisStatus,
+        to_status: AnalysisStatus = AnalysisStatus.PENDING,
+        limit: int = 1000,
+    ) -> List[int]:
+        """
+        Перевести анализы из одного статуса в другой, старые первыми
+        
+        Выбор и смена статуса - один UPDATE, поэтому два параллельных
+        вызова не получат одни и те же анализы. Сообщение об ошибке
+        очищается.
+        
+        Args:
+            session: AsyncSession
+            from_status: Текущий статус анализов
+            to_status: Новый статус
+            limit: Максимальное количество записей
+            
+        Returns:
+            Список ID переведенных анализов
+        """
+        selected = (
+            select(CSVAnalysis.id)
+            .where(CSVAnalysis.analysis_status == from_status)
+            .order_by(CSVAnalysis.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        statement = (
+            update(CSVAnalysis)
+            .where(CSVAnalysis.id.in_(selected))
+            .values(analysis_status=to_status, error_message=None)
+            .returning(CSVAnalysis.id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(statement)
+        analysis_ids = sorted(result.scalars().all())
+        await session.commit()
+        return analysis_ids
+    
     async def update_status(
         self,
         session: AsyncSession,
@@ -89,7 +134,117 @@ class CSVAnalysisRepository(BaseRepository[CSVAnalysis]):
             await session.commit()
             await session.refresh(analysis)
         return analysis
-
+    
+    async def set_content_info(
+        self,
+        session: AsyncSession,
+        analysis_id: int,
+        content_hash: str,
+        row_count: Optional[int] = None,
+    ) -> Optional[CSVAnalysis]:
+        """
+        Сохранить сведения о содержимом файла, известные после скачивания
+        
+        Args:
+            session: AsyncSession
+            analysis_id: ID анализа
+            content_hash: Хэш содержимого файла
+            row_count: Количество строк данных (если уже известно)
+            
+        Returns:
+            Обновленный анализ или None
+        """
+        analysis = await self.get_by_id(session, analysis_id)
+        if analysis:
+            analysis.content_hash = content_hash
+            if row_count is not None:
+                analysis.row_count = row_count
+            await session.commit()
+            await session.refresh(analysis)
+        return analysis
+    
+    
+    async def get_top_users(
+        self,
+        session: AsyncSession,
+        limit: int = 10,
+    ) -> List[tuple[int, int]]:
+        """
+        Получить пользователей с наибольшим количеством анализов
+        
+        Args:
+            session: AsyncSession
+            limit: Количество пользователей
+            
+        Returns:
+            Список (user_id, количество анализов) по убыванию количества
+        """
+        analyses = func.count().label("analyses")
+        statement = (
+            select(CSVAnalysis.user_id, analyses)
+            .group_by(CSVAnalysis.user_id)
+            .order_by(analyses.desc(), CSVAnalysis.user_id)
+            .limit(limit)
+        )
+        result = await session.execute(statement)
+        return [(user_id, count) for user_id, count in result.all()]
+    
+    
+    async def count_by_bucket(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+        since: Optional[datetime] = None,
+    ) -> List[tuple[datetime, AnalysisStatus, int]]:
+        """
+        Посчитать анализы по часам или дням и статусам
+        
+        Args:
+            session: AsyncSession
+            granularity: Размер интервала
+            since: Начало периода по created_at (None - вся история)
+            
+        Returns:
+            Список (начало интервала, статус, количество)
+        """
+        bucket = truncate_to_bucket(granularity, CSVAnalysis.created_at)
+        statement = (
+            select(bucket, CSVAnalysis.analysis_status, func.count())
+            .group_by(bucket, CSVAnalysis.analysis_status)
+        )
+        if since is not None:
+            statement = statement.where(CSVAnalysis.created_at >= since)
+        
+        result = await session.execute(statement)
+        return [tuple(row) for row in result.all()]
+    
+    async def count_active_users_by_bucket(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+        since: Optional[datetime] = None,
+    ) -> List[tuple[datetime, int]]:
+        """
+        Посчитать активных пользователей (загрузивших CSV) по часам или дням
+        
+        Уникальные пользователи считаются отдельно для каждого размера
+        интервала: сумма часовых значений не равна дневному.
+        
+        Args:
+            session: AsyncSession
+            granularity: Размер интервала
+            since: Начало периода по created_at (None - вся история)
+            
+        Returns:
+            Список (начало интервала, количество пользователей)
+        """
+        bucket = truncate_to_bucket(granularity, CSVAnalysis.created_at)
+        statement = select(bucket, func.count(CSVAnalysis.user_id.distinct())).group_by(bucket)
+        if since is not None:
+            statement = statement.where(CSVAnalysis.created_at >= since)
+        
+        result = await session.execute(statement)
+        return [tuple(row) for row in result.all()]
 
 class AnalyticsReportRepository(BaseRepository[AnalyticsReport]):
     """Репозиторий для работы с отчетами"""
@@ -97,6 +252,26 @@ class AnalyticsReportRepository(BaseRepository[AnalyticsReport]):
     def __init__(self):
         super().__init__(AnalyticsReport)
     
+    async def get_cpm_stats(
+        self,
+        session: AsyncSession,
+    ) -> tuple[int, float]:
+        """
+        Посчитать отчеты и средний CPM одним запросом
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Кортеж (количество отчетов, средний CPM по отчетам с CPM)
+        """
+        statement = select(
+            func.count(),
+            func.avg(AnalyticsReport.kpi_data["cpm"].as_float()),
+        ).select_from(AnalyticsReport)
+        total, avg_cpm = (await session.execute(statement)).one()
+        return total, float(avg_cpm or 0)
+    
     async def get_by_csv_analysis_id(
         self,
         session: AsyncSession,
@@ -118,6 +293,72 @@ class AnalyticsReportRepository(BaseRepository[AnalyticsReport]):
         result = await session.execute(statement)
         return result.scalar_one_or_none()
     
+    async def get_by_content_hash(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        content_hash: str,
+        exclude_analysis_id: Optional[int] = None,
+    ) -> Optional[AnalyticsReport]:
+        """
+        Получить последний отчет пользователя по хэшу содержимого файла
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            content_hash: Хэш содержимого CSV
+            exclude_analysis_id: ID анализа, который не нужно учитывать
+            
+        Returns:
+            Отчет или None
+        """
+        statement = (
+            select(AnalyticsReport)
+            .join(CSVAnalysis)
+            .where(
+                CSVAnalysis.user_id == user_id,
+                CSVAnalysis.content_hash == content_hash,
+                CSVAnalysis.analysis_status == AnalysisStatus.COMPLETED,
+            )
+            .order_by(desc(AnalyticsReport.created_at))
+            .limit(1)
+        )
+        if exclude_analysis_id is not None:
+            statement = statement.where(CSVAnalysis.id != exclude_analysis_id)
+        result = await session.execute(statement)
+        return result.scalar_one_or_none()
+    
+    async def get_by_file_unique_id(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        file_unique_id: str,
+    ) -> Optional[AnalyticsReport]:
+        """
+        Получить последний отчет пользователя по Telegram file_unique_id
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            file_unique_id: Telegram file_unique_id документа
+            
+        Returns:
+            Отчет или None
+        """
+        statement = (
+            select(AnalyticsReport)
+            .join(CSVAnalysis)
+            .where(
+                CSVAnalysis.user_id == user_id,
+                CSVAnalysis.file_unique_id == file_unique_id,
+                CSVAnalysis.analysis_status == AnalysisStatus.COMPLETED,
+            )
+            .order_by(desc(AnalyticsReport.created_at))
+            .limit(1)
+        )
+        result = await session.execute(statement)
+        return result.scalar_one_or_none()
+    
     async def get_by_user_id(
         self,
         session: AsyncSession,
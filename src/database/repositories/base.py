@@ -8,7 +8,7 @@ from typing import Generic, TypeVar, Type, Optional, List
 from uuid import UUID
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete, update
+from sqlalchemy import func, select, delete, update
 from sqlmodel import SQLModel
 
 ModelType = TypeVar("ModelType", bound=SQLModel)
@@ -145,7 +145,6 @@ class BaseRepository(Generic[ModelType]):
         Returns:
             Количество записей
         """
-        statement = select(self.model)
-        result = await session.execute(statement)
-        return len(list(result.scalars().all()))
+        statement = select(func.count()).select_from(self.model)
+        return (await session.execute(statement)).scalar_one()
 
@@ -0,0 +1,176 @@
+"""
+Массовая вставка строк в БД
+
+Для PostgreSQL (asyncpg) строки загружаются через COPY во временную
+staging-таблицу и переносятся одним INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+Для остальных диалектов (SQLite для локального запуска) - многострочный
+INSERT ... ON CONFLICT DO NOTHING пачками
+"""
+
+from typing import Any, Iterator, List, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import SQLModel
+
+from src.config.logging import get_logger
+
+logger = get_logger(__name__)
+
+# Лимит параметров одного запроса: протокол PostgreSQL и SQLite (консервативное
+# значение старых версий)
+POSTGRES_MAX_PARAMS = 32767
+SQLITE_MAX_PARAMS = 999
+
+
+def dialect_insert(session: AsyncSession, model: type[SQLModel]):
+    """
+    Получить INSERT с поддержкой ON CONFLICT для диалекта сессии
+    
+    Args:
+        session: AsyncSession
+        model: SQLModel класс модели
+        
+    Returns:
+        Конструкция insert для PostgreSQL или SQLite
+    """
+    if session.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(model)
+    return postgresql.insert(model)
+
+
+def param_chunks(
+    session: AsyncSession,
+    records: list[dict[str, Any]],
+) -> Iterator[list[dict[str, Any]]]:
+    """
+    Разбить строки многострочного INSERT по лимиту параметров запроса
+    
+    Args:
+        session: AsyncSession
+        records: Значения полей модели
+        
+    Yields:
+        Пачки строк
+    """
+    if not records:
+        return
+    
+    max_params = SQLITE_MAX_PARAMS if session.get_bind().dialect.name == "sqlite" else POSTGRES_MAX_PARAMS
+    chunk_size = max(1, max_params // len(records[0]))
+    for start in range(0, len(records), chunk_size):
+        yield records[start:start + chunk_size]
+
+
+def supports_copy(session: AsyncSession) -> bool:
+    """
+    Проверить, доступен ли COPY для сессии
+    
+    Args:
+        session: AsyncSession
+        
+    Returns:
+        True для PostgreSQL через asyncpg
+    """
+    dialect = session.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "asyncpg"
+
+
+async def insert_ignore(
+    session: AsyncSession,
+    model: type[SQLModel],
+    records: list[dict[str, Any]],
+    conflict_columns: Sequence[str],
+    returning: Sequence[str],
+) -> List[Any]:
+    """
+    Вставить строки, пропуская конфликтующие с уже сохраненными
+    
+    Все записи должны содержать одинаковый набор полей.
+    Транзакция не фиксируется - коммит остается за вызывающим кодом.
+    
+    Args:
+        session: AsyncSession
+        model: SQLModel класс модели
+        records: Значения полей модели
+        conflict_columns: Колонки уникального ключа
+        returning: Колонки, возвращаемые для вставленных строк
+        
+    Returns:
+        Вставленные строки (только колонки returning)
+    """
+    if not records:
+        return []
+    
+    if supports_copy(session):
+        return await _copy_insert_ignore(session, model, records, conflict_columns, returning)
+    
+    returning_columns = [model.__table__.c[name] for name in returning]
+    
+    inserted: List[Any] = []
+    for chunk in param_chunks(session, records):
+        statement = (
+            dialect_insert(session, model)
+            .values(chunk)
+            .on_conflict_do_nothing(index_elements=list(conflict_columns))
+            .returning(*returning_columns)
+        )
+        result = await session.execute(statement)
+        inserted.extend(result.all())
+    return inserted
+
+
+async def _copy_insert_ignore(
+    session: AsyncSession,
+    model: type[SQLModel],
+    records: list[dict[str, Any]],
+    conflict_columns: Sequence[str],
+    returning: Sequence[str],
+) -> List[Any]:
+    """
+    Вставка через COPY в staging-таблицу и INSERT ... ON CONFLICT DO NOTHING
+    
+    Args:
+        session: AsyncSession
+        model: SQLModel класс модели
+        records: Значения полей модели
+        conflict_columns: Колонки уникального ключа
+        returning: Колонки, возвращаемые для вставленных строк
+        
+    Returns:
+        Вставленные строки (только колонки returning)
+    """
+    table = model.__tablename__
+    staging = f"{table}_staging"
+    columns = list(records[0])
+    column_list = ", ".join(columns)
+    
+    # Временная таблица живет в соединении: создаем один раз, без ограничений
+    # целевой таблицы, только с нужными колонками
+    await session.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DELETE ROWS AS "
+        f"SELECT {column_list} FROM {table} WITH NO DATA"
+    ))
+    
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        staging,
+        records=[tuple(record[column] for column in columns) for record in records],
+        columns=columns,
+    )
+    
+    result = await session.execute(text(
+        f"INSERT INTO {table} ({column_list}) "
+        f"SELECT {column_list} FROM {staging} "
+        f"ON CONFLICT ({', '.join(conflict_columns)}) DO NOTHING "
+        f"RETURNING {', '.join(returning)}"
+    ).columns(*(model.__table__.c[name] for name in returning)))
+    inserted = list(result.all())
+    
+    # Staging очищается и без коммита: несколько пачек могут идти в одной транзакции
+    await session.execute(text(f"TRUNCATE {staging}"))
+    
+    logger.debug("bulk_copy_inserted", table=table, rows=len(records), inserted=len(inserted))
+    return inserted
@@ -3,14 +3,20 @@
 """
 
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Literal, Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import case, or_, select, update
 
+from src.core.cache.user_cache import invalidate_user
 from src.database.models import Limits, SubscriptionTier
 from src.database.repositories.base import BaseRepository
 
+# Период, после которого счетчики использования обнуляются
+RESET_PERIOD = timedelta(days=30)
+
+LimitKind = Literal["analytics", "themes"]
+
 
 class LimitsRepository(BaseRepository[Limits]):
     """Репозиторий для работы с лимитами"""
@@ -59,7 +65,7 @@ class LimitsRepository(BaseRepository[Limits]):
             user_id=user_id,
             analytics_limit=analytics_limit,
             themes_limit=themes_limit,
-            reset_at=datetime.utcnow() + timedelta(days=30),
+            reset_at=datetime.utcnow() + RESET_PERIOD,
         )
         
         return await self.create(session, limits)
@@ -89,6 +95,7 @@ class LimitsRepository(BaseRepository[Limits]):
             limits.updated_at = datetime.utcnow()
             await session.commit()
             await session.refresh(limits)
+            await invalidate_user(user_id)
         return limits
     
     async def reset_if_needed(
@@ -110,10 +117,11 @@ class LimitsRepository(BaseRepository[Limits]):
         if limits and limits.reset_at <= datetime.utcnow():
             limits.analytics_used = 0
             limits.themes_used = 0
-            limits.reset_at = datetime.utcnow() + timedelta(days=30)
+            limits.reset_at = datetime.utcnow() + RESET_PERIOD
             limits.updated_at = datetime.utcnow()
             await session.commit()
             await session.refresh(limits)
+            await invalidate_user(user_id)
         return limits
     
     async def increment_analytics(
@@ -137,6 +145,7 @@ class LimitsRepository(BaseRepository[Limits]):
             limits.updated_at = datetime.utcnow()
             await session.commit()
             await session.refresh(limits)
+            await invalidate_user(user_id)
         return limits
     
     async def increment_themes(
@@ -160,8 +169,97 @@ class LimitsRepository(BaseRepository[Limits]):
             limits.updated_at = datetime.utcnow()
             await session.commit()
             await session.refresh(limits)
+            await invalidate_user(user_id)
         return limits
     
+    async def try_consume(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        kind: LimitKind,
+    ) -> Optional[Limits]:
+        """
+        Атомарно проверить лимит и списать одно использование
+        
+        Один UPDATE ... RETURNING: если период истек, счетчики
+        обнуляются, списание проходит только при -1 (безлимит) или
+        used < limit. Конкурентные вызовы не могут превысить лимит.
+        
+        Транзакция не фиксируется - коммит остается за вызывающим кодом,
+        чтобы списание и созданная запись попали в одну транзакцию.
+        После коммита нужно вызвать invalidate_user.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            kind: Тип лимита ("analytics" или "themes")
+            
+        Returns:
+            Лимиты с новыми счетчиками или None, если лимит исчерпан
+            или лимитов нет
+        """
+        if kind == "analytics":
+            used, limit, other_used = Limits.analytics_used, Limits.analytics_limit, Limits.themes_used
+        else:
+            used, limit, other_used = Limits.themes_used, Limits.themes_limit, Limits.analytics_used
+        
+        now = datetime.utcnow()
+        expired = Limits.reset_at <= now
+        
+        statement = (
+            update(Limits)
+            .where(
+                Limits.user_id == user_id,
+                or_(limit == -1, case((expired, 0), else_=used) < limit),
+            )
+            .values({
+                used: case((expired, 1), else_=used + 1),
+                other_used: case((expired, 0), else_=other_used),
+                Limits.reset_at: case((expired, now + RESET_PERIOD), else_=Limits.reset_at),
+                Limits.updated_at: now,
+            })
+            .returning(Limits)
+            # Экземпляр в identity map получает новые значения из RETURNING
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        result = await session.execute(statement)
+        return result.scalars().one_or_none()
+    
+    async def refund(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        kind: LimitKind,
+    ) -> bool:
+        """
+        Вернуть одно списанное использование
+        
+        Счетчик уменьшается только в текущем периоде и не уходит ниже нуля.
+        Транзакция не фиксируется - коммит остается за вызывающим кодом.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            kind: Тип лимита ("analytics" или "themes")
+            
+        Returns:
+            True, если счетчик уменьшен
+        """
+        used = Limits.analytics_used if kind == "analytics" else Limits.themes_used
+        statement = (
+            update(Limits)
+            .where(
+                Limits.user_id == user_id,
+                used > 0,
+                Limits.reset_at > datetime.utcnow(),
+            )
+            .values({used: used - 1, Limits.updated_at: datetime.utcnow()})
+            .returning(Limits.user_id)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.execute(statement)
+        return result.scalar_one_or_none() is not None
+    
     def _get_limits_for_tier(
         self,
         tier: SubscriptionTier,
@@ -0,0 +1,147 @@
+"""
+Постраничные списки админ-панели
+
+Keyset-пагинация по (created_at, id): следующая страница начинается
+после последней строки предыдущей, поэтому стоимость страницы не зависит
+от ее номера. Общее количество для больших выборок - оценка планировщика
+PostgreSQL по статистике таблицы, для малых - точный COUNT
+"""
+
+import base64
+import json
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Выборки меньше этого размера считаются точно
+EXACT_COUNT_LIMIT = 1000
+
+
+def escape_like(value: str) -> str:
+    """Экранировать спецсимволы LIKE"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def naive_utc(moment: datetime) -> datetime:
+    """Время фильтра в UTC без часового пояса, как в колонках БД"""
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Курсор страницы по последней строке
+    
+    Args:
+        created_at: Время создания строки
+        row_id: ID строки
+        
+    Returns:
+        Непрозрачная строка для параметра cursor
+    """
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Разобрать курсор страницы
+    
+    Args:
+        cursor: Строка из encode_cursor
+        
+    Returns:
+        Кортеж (created_at, id) последней строки предыдущей страницы
+        
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+
+async def keyset_page(
+    session: AsyncSession,
+    statement: Select,
+    created_at: Any,
+    row_id: Any,
+    cursor: Optional[str],
+    limit: int,
+) -> tuple[list[Any], Optional[str]]:
+    """
+    Получить страницу от новых строк к старым
+    
+    Условие (created_at, id) < курсор и сортировка по тем же колонкам
+    читают индекс (created_at, id) с нужного места.
+    
+    Args:
+        session: AsyncSession
+        statement: SELECT модели с фильтрами, без сортировки и лимита
+        created_at: Колонка времени создания
+        row_id: Колонка ID
+        cursor: Курсор предыдущей страницы (None - первая страница)
+        limit: Размер страницы
+        
+    Returns:
+        Кортеж (строки страницы, курсор следующей страницы или None)
+        
+    Raises:
+        ValueError: Если курсор поврежден
+    """
+    if cursor:
+        statement = statement.where(tuple_(created_at, row_id) < tuple_(*decode_cursor(cursor)))
+    
+    # Лишняя строка показывает, есть ли следующая страница
+    statement = statement.order_by(created_at.desc(), row_id.desc()).limit(limit + 1)
+    rows = list((await session.execute(statement)).scalars().all())
+    if len(rows) <= limit:
+        return rows, None
+    
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_at.key), getattr(last, row_id.key))
+
+
+async def estimate_count(
+    session: AsyncSession,
+    statement: Select,
+) -> tuple[int, bool]:
+    """
+    Количество строк выборки: точное для малых, оценка для больших
+    
+    Точный COUNT ограничен EXACT_COUNT_LIMIT строками. Если выборка
+    больше, в PostgreSQL берется оценка из плана запроса (EXPLAIN, по
+    статистике таблицы) - без прохода по всем строкам.
+    
+    Args:
+        session: AsyncSession
+        statement: SELECT с фильтрами, без сортировки и лимита
+        
+    Returns:
+        Кортеж (количество, True если это оценка)
+    """
+    limited = statement.limit(EXACT_COUNT_LIMIT).subquery()
+    total = (await session.execute(select(func.count()).select_from(limited))).scalar_one()
+    if total < EXACT_COUNT_LIMIT:
+        return total, False
+    
+    bind = session.get_bind()
+    if bind.dialect.name != "postgresql":
+        return total, True
+    
+    # Значения фильтров подставляются литералами: EXPLAIN не принимает
+    # параметры, а exec_driver_sql передает текст драйверу без разбора
+    compiled = statement.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True})
+    connection = await session.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}")
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return max(total, int(plan[0]["Plan"]["Plan Rows"])), True
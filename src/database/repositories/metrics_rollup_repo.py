@@ -0,0 +1,149 @@
+"""
+Репозиторий агрегатов метрик по часам и дням
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, List, Optional
+
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import MetricsRollup, RollupGranularity
+from src.database.repositories.base import BaseRepository
+from src.database.repositories.bulk import param_chunks
+
+# Длина интервала агрегата
+BUCKET_STEPS = {
+    RollupGranularity.HOUR: timedelta(hours=1),
+    RollupGranularity.DAY: timedelta(days=1),
+}
+
+
+def truncate_to_bucket(granularity: RollupGranularity, column: Any):
+    """
+    Начало интервала для значения колонки (date_trunc в PostgreSQL)
+    
+    Единица подставляется литералом, а не параметром: иначе выражения
+    в SELECT и GROUP BY получают разные параметры и не совпадают.
+    
+    Args:
+        granularity: Размер интервала
+        column: Колонка со временем
+        
+    Returns:
+        SQL выражение начала интервала
+    """
+    return func.date_trunc(literal_column(f"'{granularity.value}'"), column)
+
+
+def bucket_start(granularity: RollupGranularity, moment: datetime) -> datetime:
+    """
+    Начало интервала, содержащего момент времени
+    
+    Args:
+        granularity: Размер интервала
+        moment: Момент времени (UTC)
+        
+    Returns:
+        Начало часа или дня
+    """
+    if granularity is RollupGranularity.DAY:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class MetricsRollupRepository(BaseRepository[MetricsRollup]):
+    """Репозиторий агрегатов метрик"""
+    
+    def __init__(self):
+        super().__init__(MetricsRollup)
+    
+    async def get_last_bucket(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+    ) -> Optional[datetime]:
+        """
+        Получить последний рассчитанный интервал
+        
+        Args:
+            session: AsyncSession
+            granularity: Размер интервала
+            
+        Returns:
+            Начало интервала или None, если агрегатов еще нет
+        """
+        statement = select(func.max(MetricsRollup.bucket)).where(
+            MetricsRollup.granularity == granularity.value
+        )
+        return (await session.execute(statement)).scalar_one()
+    
+    async def replace_since(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+        since: Optional[datetime],
+        rows: list[dict[str, Any]],
+    ) -> int:
+        """
+        Заменить агрегаты начиная с интервала
+        
+        Старые строки удаляются: значение, ставшее нулем (например, анализ
+        перешел из pending в completed), не должно оставаться в ряду.
+        
+        Транзакция не фиксируется - коммит остается за вызывающим кодом.
+        
+        Args:
+            session: AsyncSession
+            granularity: Размер интервала
+            since: Первый пересчитанный интервал (None - вся история)
+            rows: Строки metric, bucket, dimension, value
+            
+        Returns:
+            Количество записанных строк
+        """
+        statement = delete(MetricsRollup).where(MetricsRollup.granularity == granularity.value)
+        if since is not None:
+            statement = statement.where(MetricsRollup.bucket >= since)
+        await session.execute(statement)
+        
+        records = [{**row, "granularity": granularity.value} for row in rows]
+        for chunk in param_chunks(session, records):
+            await session.execute(insert(MetricsRollup).values(chunk))
+        return len(records)
+    
+    async def get_series(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+        metric: str,
+        start: datetime,
+        end: datetime,
+    ) -> List[tuple[datetime, str, int]]:
+        """
+        Получить агрегаты метрики за период
+        
+        Диапазон первичного ключа: читаются только строки периода.
+        
+        Args:
+            session: AsyncSession
+            granularity: Размер интервала
+            metric: Метрика (RollupMetric)
+            start: Начало первого интервала
+            end: Начало последнего интервала (включительно)
+            
+        Returns:
+            Список (начало интервала, разрез, значение) по возрастанию времени
+        """
+        statement = (
+            select(MetricsRollup.bucket, MetricsRollup.dimension, MetricsRollup.value)
+            .where(
+                MetricsRollup.granularity == granularity.value,
+                MetricsRollup.metric == metric,
+                MetricsRollup.bucket >= start,
+                MetricsRollup.bucket <= end,
+            )
+            .order_by(MetricsRollup.bucket, MetricsRollup.dimension)
+        )
+        result = await session.execute(statement)
+        return [tuple(row) for row in result.all()]
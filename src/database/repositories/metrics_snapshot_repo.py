@@ -0,0 +1,108 @@
+"""
+Репозиторий снимков метрик админ-панели
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import MetricsSnapshot
+from src.database.repositories.base import BaseRepository
+
+
+class MetricsSnapshotRepository(BaseRepository[MetricsSnapshot]):
+    """Репозиторий снимков метрик"""
+    
+    def __init__(self):
+        super().__init__(MetricsSnapshot)
+    
+    async def get_latest(
+        self,
+        session: AsyncSession,
+    ) -> Optional[MetricsSnapshot]:
+        """
+        Получить последний снимок
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Снимок или None, если снимков еще нет
+        """
+        statement = select(MetricsSnapshot).order_by(MetricsSnapshot.id.desc()).limit(1)
+        result = await session.execute(statement)
+        return result.scalar_one_or_none()
+    
+    async def get_since(
+        self,
+        session: AsyncSession,
+        since: datetime,
+    ) -> List[MetricsSnapshot]:
+        """
+        Получить историю снимков для графиков
+        
+        Args:
+            session: AsyncSession
+            since: Начало периода
+            
+        Returns:
+            Снимки по возрастанию времени
+        """
+        statement = (
+            select(MetricsSnapshot)
+            .where(MetricsSnapshot.taken_at >= since)
+            .order_by(MetricsSnapshot.taken_at)
+        )
+        result = await session.execute(statement)
+        return list(result.scalars().all())
+    
+    async def bump(
+        self,
+        session: AsyncSession,
+        **deltas: int,
+    ) -> None:
+        """
+        Увеличить счетчики последнего снимка одним UPDATE
+        
+        Снимок между пересчетами остается актуальным: события
+        (регистрация, платеж) прибавляются к нему сразу.
+        
+        Args:
+            session: AsyncSession
+            **deltas: Приращения счетчиков по именам колонок
+        """
+        latest_id = select(func.max(MetricsSnapshot.id)).scalar_subquery()
+        statement = (
+            update(MetricsSnapshot)
+            .where(MetricsSnapshot.id == latest_id)
+            .values({
+                name: getattr(MetricsSnapshot, name) + delta
+                for name, delta in deltas.items()
+            })
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(statement)
+        await session.commit()
+    
+    async def delete_older_than(
+        self,
+        session: AsyncSession,
+        before: datetime,
+    ) -> int:
+        """
+        Удалить снимки старше заданного времени
+        
+        Args:
+            session: AsyncSession
+            before: Граница хранения истории
+            
+        Returns:
+            Количество удаленных снимков
+        """
+        result = await session.execute(
+            delete(MetricsSnapshot).where(MetricsSnapshot.taken_at < before)
+        )
+        await session.commit()
+        return result.rowcount
@@ -2,14 +2,19 @@
 Репозиторий для работы с платежами
 """
 
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 from datetime import datetime
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import desc, func, select
 
-from src.database.models import Payment, PaymentStatus, SubscriptionTier
+from src.database.models import Payment, PaymentStatus, RollupGranularity, SubscriptionTier
 from src.database.repositories.base import BaseRepository
+from src.database.repositories.listing import estimate_count, keyset_page
+from src.database.repositories.metrics_rollup_repo import truncate_to_bucket
+
+# Строк, получаемых из серверного курсора за одно обращение при выгрузке
+EXPORT_BATCH_SIZE = 1000
 
 
 class PaymentRepository(BaseRepository[Payment]):
@@ -120,6 +125,195 @@ class PaymentRepository(BaseRepository[Payment]):
         result = await session.execute(statement)
         return list(result.scalars().all())
     
+    async def get_page(
+        self,
+        session: AsyncSession,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        status: Optional[PaymentStatus] = None,
+        subscription_tier: Optional[SubscriptionTier] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+    ) -> tuple[List[Payment], Optional[str]]:
+        """
+        Получить страницу платежей от новых к старым
+        
+        Args:
+            session: AsyncSession
+            cursor: Курсор предыдущей страницы (None - первая страница)
+            limit: Размер страницы
+            status: Фильтр по статусу
+            subscription_tier: Фильтр по тарифу
+            from_date: Создан не раньше
+            to_date: Создан не позже
+            
+        Returns:
+            Кортеж (платежи, курсор следующей страницы или None)
+            
+        Raises:
+            ValueError: Если курсор поврежден
+        """
+        statement = self._filtered(select(Payment), status, subscription_tier, from_date, to_date)
+        return await keyset_page(session, statement, Payment.created_at, Payment.id, cursor, limit)
+    
+    async def get_filtered_totals(
+        self,
+        session: AsyncSession,
+        status: Optional[PaymentStatus] = None,
+        subscription_tier: Optional[SubscriptionTier] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+    ) -> dict[str, int | bool]:
+        """
+        Посчитать платежи и выручку по фильтрам
+        
+        Args:
+            session: AsyncSession
+            status: Фильтр по статусу
+            subscription_tier: Фильтр по тарифу
+            from_date: Создан не раньше
+            to_date: Создан не позже
+            
+        Returns:
+            Словарь: total (для больших выборок - оценка), total_estimated,
+            revenue (сумма завершенных платежей в копейках)
+        """
+        statement = self._filtered(select(Payment.id), status, subscription_tier, from_date, to_date)
+        total, total_estimated = await estimate_count(session, statement)
+        
+        revenue_statement = self._filtered(
+            select(func.coalesce(func.sum(Payment.amount), 0)).where(Payment.status == PaymentStatus.COMPLETED),
+            status,
+            subscription_tier,
+            from_date,
+            to_date,
+        )
+        revenue = (await session.execute(revenue_statement)).scalar_one()
+        return {"total": total, "total_estimated": total_estimated, "revenue": int(revenue)}
+    
+    async def stream_filtered(
+        self,
+        session: AsyncSession,
+        status: Optional[PaymentStatus] = None,
+        subscription_tier: Optional[SubscriptionTier] = None,
+        from_date: Optional[datetime] = None,
+        to_date: Optional[datetime] = None,
+        batch_size: int = EXPORT_BATCH_SIZE,
+    ) -> AsyncIterator[Payment]:
+        """
+        Выгрузить платежи по фильтрам в порядке создания
+        
+        Строки читаются серверным курсором пачками по batch_size, поэтому
+        в памяти процесса находится только текущая пачка.
+        
+        Args:
+            session: AsyncSession
+            status: Фильтр по статусу
+            subscription_tier: Фильтр по тарифу
+            from_date: Создан не раньше
+            to_date: Создан не позже
+            batch_size: Строк за одно обращение к курсору
+            
+        Yields:
+            Платежи от старых к новым
+        """
+        statement = (
+            self._filtered(select(Payment), status, subscription_tier, from_date, to_date)
+            .order_by(Payment.created_at, Payment.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await session.stream(statement)
+        async for payment in result.scalars():
+            yield payment
+    
+    @staticmethod
+    def _filtered(
+        statement,
+        status: Optional[PaymentStatus],
+        subscription_tier: Optional[SubscriptionTier],
+        from_date: Optional[datetime],
+        to_date: Optional[datetime],
+    ):
+        """Фильтры списка платежей админ-панели"""
+        if status:
+            statement = statement.where(Payment.status == status)
+        if subscription_tier:
+            statement = statement.where(Payment.subscription_tier == subscription_tier)
+        if from_date:
+            statement = statement.where(Payment.created_at >= from_date)
+        if to_date:
+            statement = statement.where(Payment.created_at <= to_date)
+        return statement
+    
+    async def get_revenue_stats(
+        self,
+        session: AsyncSession,
+        day_since: datetime,
+        month_since: datetime,
+    ) -> dict[str, int]:
+        """
+        Посчитать завершенные платежи и выручку одним запросом
+        
+        Агрегаты COUNT(*) и SUM(amount) с FILTER (WHERE completed_at >= ...)
+        за один проход по завершенным платежам, без загрузки строк.
+        
+        Args:
+            session: AsyncSession
+            day_since: Начало периода "за сутки"
+            month_since: Начало периода "за месяц"
+            
+        Returns:
+            Словарь: payments_today, payments_month, revenue_today,
+            revenue_month, revenue_total (суммы в копейках)
+        """
+        today = Payment.completed_at >= day_since
+        month = Payment.completed_at >= month_since
+        statement = (
+            select(
+                func.count().filter(today).label("payments_today"),
+                func.count().filter(month).label("payments_month"),
+                func.coalesce(func.sum(Payment.amount).filter(today), 0).label("revenue_today"),
+                func.coalesce(func.sum(Payment.amount).filter(month), 0).label("revenue_month"),
+                func.coalesce(func.sum(Payment.amount), 0).label("revenue_total"),
+            )
+            .where(Payment.status == PaymentStatus.COMPLETED)
+        )
+        
+        row = (await session.execute(statement)).one()
+        return {key: int(value) for key, value in row._mapping.items()}
+    
+    async def get_completed_by_bucket(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+        since: Optional[datetime] = None,
+    ) -> List[tuple[datetime, SubscriptionTier, int, int]]:
+        """
+        Посчитать завершенные платежи и выручку по часам или дням и тарифам
+        
+        Args:
+            session: AsyncSession
+            granularity: Размер интервала
+            since: Начало периода по completed_at (None - вся история)
+            
+        Returns:
+            Список (начало интервала, тариф, количество, сумма в копейках)
+        """
+        bucket = truncate_to_bucket(granularity, Payment.completed_at)
+        statement = (
+            select(bucket, Payment.subscription_tier, func.count(), func.sum(Payment.amount))
+            .where(Payment.status == PaymentStatus.COMPLETED, Payment.completed_at.is_not(None))
+            .group_by(bucket, Payment.subscription_tier)
+        )
+        if since is not None:
+            statement = statement.where(Payment.completed_at >= since)
+        
+        result = await session.execute(statement)
+        return [
+            (started_at, tier, count, int(amount))
+            for started_at, tier, count, amount in result.all()
+        ]
+    
     async def update_status(
         self,
         session: AsyncSession,
@@ -0,0 +1,270 @@
+"""
+Репозиторий истории продаж и накопительных агрегатов портфолио
+"""
+
+from datetime import date
+from typing import Any, List, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import (
+    PortfolioAsset,
+    PortfolioCategory,
+    PortfolioDaily,
+    SaleFact,
+)
+from src.database.repositories.base import BaseRepository
+from src.database.repositories.bulk import dialect_insert, insert_ignore, param_chunks
+
+# Ключ дедупликации продаж (см. uq_sale_facts_sale)
+SALE_KEY = ["user_id", "asset_id", "sold_at", "purchase_type", "revenue"]
+
+
+class PortfolioRepository(BaseRepository[SaleFact]):
+    """Репозиторий истории продаж пользователя"""
+    
+    def __init__(self):
+        super().__init__(SaleFact)
+    
+    async def insert_facts(
+        self,
+        session: AsyncSession,
+        facts: list[dict[str, Any]],
+    ) -> List[Any]:
+        """
+        Добавить продажи, пропуская уже сохраненные
+        
+        В PostgreSQL строки загружаются через COPY (см. bulk.insert_ignore).
+        
+        Args:
+            session: AsyncSession
+            facts: Значения полей SaleFact
+            
+        Returns:
+            Только действительно добавленные строки
+        """
+        return await insert_ignore(
+            session,
+            SaleFact,
+            facts,
+            conflict_columns=SALE_KEY,
+            returning=[
+                "day",
+                "asset_id",
+                "title",
+                "purchase_type",
+                "category",
+                "revenue",
+                "impressions",
+                "downloads",
+            ],
+        )
+    
+    async def upsert_daily(
+        self,
+        session: AsyncSession,
+        rows: list[dict[str, Any]],
+    ) -> None:
+        """
+        Прибавить показатели к дневным агрегатам
+        
+        Args:
+            session: AsyncSession
+            rows: Значения полей PortfolioDaily (приращения)
+        """
+        for chunk in param_chunks(session, rows):
+            statement = dialect_insert(session, PortfolioDaily).values(chunk)
+            excluded = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "day"],
+                set_={
+                    "row_count": PortfolioDaily.row_count + excluded.row_count,
+                    "sales": PortfolioDaily.sales + excluded.sales,
+                    "revenue": PortfolioDaily.revenue + excluded.revenue,
+                    "impressions": PortfolioDaily.impressions + excluded.impressions,
+                    "downloads": PortfolioDaily.downloads + excluded.downloads,
+                },
+            )
+            await session.execute(statement)
+    
+    async def upsert_assets(
+        self,
+        session: AsyncSession,
+        rows: list[dict[str, Any]],
+    ) -> None:
+        """
+        Прибавить показатели к агрегатам по активам
+        
+        Args:
+            session: AsyncSession
+            rows: Значения полей PortfolioAsset (приращения)
+        """
+        for chunk in param_chunks(session, rows):
+            statement = dialect_insert(session, PortfolioAsset).values(chunk)
+            excluded = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "asset_id"],
+                set_={
+                    "sales": PortfolioAsset.sales + excluded.sales,
+                    "revenue": PortfolioAsset.revenue + excluded.revenue,
+                },
+            )
+            await session.execute(statement)
+    
+    async def upsert_categories(
+        self,
+        session: AsyncSession,
+        rows: list[dict[str, Any]],
+    ) -> None:
+        """
+        Прибавить показатели к агрегатам по типам
+        
+        Args:
+            session: AsyncSession
+            rows: Значения полей PortfolioCategory (приращения)
+        """
+        for chunk in param_chunks(session, rows):
+            statement = dialect_insert(session, PortfolioCategory).values(chunk)
+            excluded = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=["user_id", "type_key"],
+                set_={
+                    "row_count": PortfolioCategory.row_count + excluded.row_count,
+                    "sales": PortfolioCategory.sales + excluded.sales,
+                    "revenue": PortfolioCategory.revenue + excluded.revenue,
+                },
+            )
+            await session.execute(statement)
+    
+    async def get_totals(
+        self,
+        session: AsyncSession,
+        user_id: int,
+    ) -> Optional[dict[str, Any]]:
+        """
+        Получить итоговые показатели по дневным агрегатам
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            
+        Returns:
+            Словарь с итогами или None если истории нет
+        """
+        statement = select(
+            func.count(),
+            func.sum(PortfolioDaily.row_count),
+            func.sum(PortfolioDaily.sales),
+            func.sum(PortfolioDaily.revenue),
+            func.sum(PortfolioDaily.impressions),
+            func.sum(PortfolioDaily.downloads),
+            func.min(PortfolioDaily.day),
+            func.max(PortfolioDaily.day),
+        ).where(PortfolioDaily.user_id == user_id)
+        result = await session.execute(statement)
+        days, row_count, sales, revenue, impressions, downloads, first_day, last_day = result.one()
+        if not days:
+            return None
+        
+        return {
+            "days": days,
+            "row_count": int(row_count),
+            "sales": int(sales),
+            "revenue": revenue,
+            "impressions": int(impressions),
+            "downloads": int(downloads),
+            "first_day": first_day,
+            "last_day": last_day,
+        }
+    
+    async def get_daily_since(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        since: date,
+    ) -> List[PortfolioDaily]:
+        """
+        Получить дневные агрегаты начиная с даты
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            since: Первый день
+            
+        Returns:
+            Список дневных агрегатов
+        """
+        statement = (
+            select(PortfolioDaily)
+            .where(PortfolioDaily.user_id == user_id, PortfolioDaily.day >= since)
+            .order_by(PortfolioDaily.day)
+        )
+        result = await session.execute(statement)
+        return list(result.scalars().all())
+    
+    async def get_top_assets(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        limit: int = 3,
+    ) -> List[PortfolioAsset]:
+        """
+        Получить топ активов по доходу
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            limit: Количество активов
+            
+        Returns:
+            Список активов
+        """
+        statement = (
+            select(PortfolioAsset)
+            .where(PortfolioAsset.user_id == user_id)
+            .order_by(PortfolioAsset.revenue.desc(), PortfolioAsset.asset_id)
+            .limit(limit)
+        )
+        result = await session.execute(statement)
+        return list(result.scalars().all())
+    
+    async def get_user_ids_with_assets(
+        self,
+        session: AsyncSession,
+    ) -> List[int]:
+        """
+        Получить ID пользователей, у которых есть история продаж
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Список ID пользователей
+        """
+        statement = select(PortfolioAsset.user_id).distinct().order_by(PortfolioAsset.user_id)
+        result = await session.execute(statement)
+        return list(result.scalars().all())
+    
+    async def get_categories(
+        self,
+        session: AsyncSession,
+        user_id: int,
+    ) -> List[PortfolioCategory]:
+        """
+        Получить агрегаты по типам в порядке первого появления
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            
+        Returns:
+            Список агрегатов по типам
+        """
+        statement = (
+            select(PortfolioCategory)
+            .where(PortfolioCategory.user_id == user_id)
+            .order_by(PortfolioCategory.first_seen_at, PortfolioCategory.type_key)
+        )
+        result = await session.execute(statement)
+        return list(result.scalars().all())
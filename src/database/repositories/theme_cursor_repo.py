@@ -0,0 +1,71 @@
+"""
+Репозиторий позиций пользователей в перестановках тем
+"""
+
+import random
+from datetime import datetime
+
+from sqlalchemy import case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import ThemeCursor
+from src.database.repositories.base import BaseRepository
+from src.database.repositories.bulk import dialect_insert
+
+
+class ThemeCursorRepository(BaseRepository[ThemeCursor]):
+    """Репозиторий позиций в перестановках тем"""
+    
+    def __init__(self):
+        super().__init__(ThemeCursor)
+    
+    async def advance(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        category: str,
+        catalog_size: int,
+    ) -> tuple[int, int, int]:
+        """
+        Получить следующую позицию в перестановке и сдвинуть курсор
+        
+        Один INSERT ... ON CONFLICT DO UPDATE ... RETURNING. Круг идет по
+        перестановке того размера каталога, с которым он начался; новый
+        круг со свежим seed и текущим размером начинается только когда
+        круг исчерпан. Поэтому изменения каталога и процессы с разным
+        размером каталога не сбрасывают курсор.
+        
+        Транзакция не фиксируется - коммит остается за вызывающим кодом.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            category: Категория темы
+            catalog_size: Текущий размер каталога категории
+            
+        Returns:
+            Кортеж (seed перестановки, выданная позиция, размер каталога круга);
+            позиция в [0, размер каталога круга)
+        """
+        statement = dialect_insert(session, ThemeCursor).values(
+            user_id=user_id,
+            category=category,
+            seed=random.getrandbits(62),
+            position=1,
+            catalog_size=catalog_size,
+            updated_at=datetime.utcnow(),
+        )
+        excluded = statement.excluded
+        same_round = ThemeCursor.position < ThemeCursor.catalog_size
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "category"],
+            set_={
+                "seed": case((same_round, ThemeCursor.seed), else_=excluded.seed),
+                "position": case((same_round, ThemeCursor.position + 1), else_=1),
+                "catalog_size": case((same_round, ThemeCursor.catalog_size), else_=excluded.catalog_size),
+                "updated_at": excluded.updated_at,
+            },
+        ).returning(ThemeCursor.seed, ThemeCursor.position, ThemeCursor.catalog_size)
+        
+        seed, position, round_size = (await session.execute(statement)).one()
+        return seed, position - 1, round_size
@@ -0,0 +1,70 @@
+"""
+Репозиторий рекомендованных тем пользователей
+"""
+
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import ThemeRecommendation
+from src.database.repositories.base import BaseRepository
+from src.database.repositories.bulk import dialect_insert
+
+
+class ThemeRecommendationRepository(BaseRepository[ThemeRecommendation]):
+    """Репозиторий рекомендованных тем"""
+    
+    def __init__(self):
+        super().__init__(ThemeRecommendation)
+    
+    async def get_theme_ids(
+        self,
+        session: AsyncSession,
+        user_id: int,
+    ) -> List[int]:
+        """
+        Получить рекомендованные темы пользователя
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            
+        Returns:
+            ID тем от лучшей к худшей (пусто, если рекомендаций нет)
+        """
+        statement = select(ThemeRecommendation.theme_ids).where(
+            ThemeRecommendation.user_id == user_id,
+        )
+        return (await session.execute(statement)).scalar() or []
+    
+    async def save(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        theme_ids: List[int],
+    ) -> None:
+        """
+        Сохранить рекомендации пользователя (заменяя прежние)
+        
+        Транзакция не фиксируется - коммит остается за вызывающим кодом.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            theme_ids: ID тем от лучшей к худшей
+        """
+        statement = dialect_insert(session, ThemeRecommendation).values(
+            user_id=user_id,
+            theme_ids=theme_ids,
+            computed_at=datetime.utcnow(),
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "theme_ids": statement.excluded.theme_ids,
+                "computed_at": statement.excluded.computed_at,
+            },
+        )
+        await session.execute(statement)
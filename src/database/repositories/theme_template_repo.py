@@ -4,16 +4,37 @@ Repository для шаблонов тем
 Доступ к данным шаблонов тем для генерации
 """
 
+import random
 from typing import Optional
 
-from sqlalchemy import select
+from sqlalchemy import Text, cast, func, literal_column, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.core.themes.search import tokenize
 from src.database.models import ThemeTemplate
 from src.database.repositories.base import BaseRepository
+from src.database.repositories.listing import escape_like
 
 logger = None  # Логирование будет добавлено при необходимости
 
+# Конфигурация полнотекстового поиска: без стемминга, темы на разных языках
+SEARCH_CONFIG = literal_column("'simple'::regconfig")
+
+
+def search_document():
+    """
+    tsvector темы и ключевых слов
+    
+    Выражение совпадает с индексом ix_theme_templates_search
+    (миграция 008): константы без параметров, иначе индекс не используется.
+    """
+    return func.to_tsvector(
+        SEARCH_CONFIG,
+        func.coalesce(ThemeTemplate.theme, literal_column("''"))
+        .op("||")(literal_column("' '"))
+        .op("||")(func.coalesce(cast(ThemeTemplate.keywords, Text), literal_column("''"))),
+    )
+
 
 class ThemeTemplateRepository(BaseRepository[ThemeTemplate]):
     """Repository для шаблонов тем"""
@@ -29,6 +50,11 @@ class ThemeTemplateRepository(BaseRepository[ThemeTemplate]):
         """
         Получить случайную тему по категории
         
+        Выбор по порядковому номеру: максимум ordinal и поиск по
+        (category, ordinal) - два обращения к индексу вместо сортировки
+        всех тем категории. Если темы еще не пронумерованы -
+        ORDER BY random().
+        
         Args:
             session: AsyncSession
             category: Категория темы
@@ -36,7 +62,11 @@ class ThemeTemplateRepository(BaseRepository[ThemeTemplate]):
         Returns:
             Случайная тема или None
         """
-        from sqlalchemy import func
+        max_ordinal = await self.get_max_ordinal(session, category)
+        if max_ordinal:
+            template = await self.get_by_ordinal(session, category, random.randint(1, max_ordinal))
+            if template is not None:
+                return template
         
         statement = (
             select(ThemeTemplate)
@@ -48,8 +78,267 @@ class ThemeTemplateRepository(BaseRepository[ThemeTemplate]):
             .limit(1)
         )
         
-        result = await session.exec(statement)
-        return result.first()
+        result = await session.execute(statement)
+        return result.scalars().first()
+    
+    async def get_max_ordinal(
+        self,
+        session: AsyncSession,
+        category: str,
+    ) -> int:
+        """
+        Получить размер пространства номеров категории
+        
+        Номера стабильны: выключенные и удаленные темы оставляют пропуски,
+        поэтому максимум может быть больше количества активных тем.
+        
+        Args:
+            session: AsyncSession
+            category: Категория темы
+            
+        Returns:
+            Максимальный порядковый номер (0 - тем нет или они не пронумерованы)
+        """
+        statement = select(func.max(ThemeTemplate.ordinal)).where(
+            ThemeTemplate.category == category,
+        )
+        return (await session.execute(statement)).scalar() or 0
+    
+    async def get_by_ordinal(
+        self,
+        session: AsyncSession,
+        category: str,
+        ordinal: int,
+    ) -> Optional[ThemeTemplate]:
+        """
+        Получить активную тему по порядковому номеру в категории
+        
+        Args:
+            session: AsyncSession
+            category: Категория темы
+            ordinal: Порядковый номер (1..N)
+            
+        Returns:
+            Тема или None
+        """
+        statement = select(ThemeTemplate).where(
+            ThemeTemplate.category == category,
+            ThemeTemplate.ordinal == ordinal,
+            ThemeTemplate.is_active == True,
+        )
+        result = await session.execute(statement)
+        return result.scalars().first()
+    
+    async def assign_ordinals(self, session: AsyncSession) -> None:
+        """
+        Пронумеровать новые активные темы
+        
+        Вызывается после загрузки тем. Темы без номера получают номера
+        после максимального в категории (в порядке ID), уже выданные
+        номера не меняются.
+        
+        Args:
+            session: AsyncSession
+        """
+        await self._assign_ordinals(session)
+        await session.commit()
+    
+    async def set_active(
+        self,
+        session: AsyncSession,
+        template_ids: list[int],
+        is_active: bool,
+    ) -> int:
+        """
+        Включить или выключить темы
+        
+        Выключенная тема теряет номер, остальные номера не меняются -
+        в нумерации остается пропуск. Включенная тема получает номер
+        после максимального в категории. После изменения вызовите
+        notify_themes_changed.
+        
+        Args:
+            session: AsyncSession
+            template_ids: ID тем
+            is_active: Новое значение
+            
+        Returns:
+            Количество измененных тем
+        """
+        values = {"is_active": is_active}
+        if not is_active:
+            values["ordinal"] = None
+        
+        result = await session.execute(
+            update(ThemeTemplate)
+            .where(
+                ThemeTemplate.id.in_(template_ids),
+                ThemeTemplate.is_active != is_active,
+            )
+            .values(**values)
+        )
+        if result.rowcount and is_active:
+            await self._assign_ordinals(session, template_ids)
+        await session.commit()
+        return result.rowcount
+    
+    async def _assign_ordinals(
+        self,
+        session: AsyncSession,
+        template_ids: Optional[list[int]] = None,
+    ) -> None:
+        """
+        Выдать номера активным темам без номера, без коммита
+        
+        Args:
+            session: AsyncSession
+            template_ids: ID тем (None - все темы без номера)
+        """
+        numbered = select(ThemeTemplate.category, func.max(ThemeTemplate.ordinal).label("max_ordinal")).group_by(
+            ThemeTemplate.category,
+        ).subquery()
+        
+        unnumbered = (
+            select(
+                ThemeTemplate.id,
+                (
+                    func.coalesce(numbered.c.max_ordinal, 0)
+                    + func.row_number().over(
+                        partition_by=ThemeTemplate.category,
+                        order_by=ThemeTemplate.id,
+                    )
+                ).label("ordinal"),
+            )
+            .outerjoin(numbered, numbered.c.category == ThemeTemplate.category)
+            .where(
+                ThemeTemplate.is_active == True,
+                ThemeTemplate.ordinal.is_(None),
+            )
+        )
+        if template_ids is not None:
+            unnumbered = unnumbered.where(ThemeTemplate.id.in_(template_ids))
+        unnumbered = unnumbered.subquery()
+        
+        await session.execute(
+            update(ThemeTemplate)
+            .where(ThemeTemplate.id == unnumbered.c.id)
+            .values(ordinal=unnumbered.c.ordinal)
+        )
+    
+    async def get_ordinals(
+        self,
+        session: AsyncSession,
+    ) -> list[tuple[int, str, int]]:
+        """
+        Получить номера активных тем для индекса в памяти
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Список (id, category, ordinal) пронумерованных тем
+        """
+        statement = select(ThemeTemplate.id, ThemeTemplate.category, ThemeTemplate.ordinal).where(
+            ThemeTemplate.is_active == True,
+            ThemeTemplate.ordinal.is_not(None),
+        )
+        result = await session.execute(statement)
+        return [tuple(row) for row in result.all()]
+    
+    async def get_active_themes(
+        self,
+        session: AsyncSession,
+    ) -> list[tuple[int, str, str, Optional[list[str]]]]:
+        """
+        Получить все активные темы для индекса в памяти
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Список (id, category, theme, keywords) в порядке категорий и ID
+        """
+        statement = (
+            select(ThemeTemplate.id, ThemeTemplate.category, ThemeTemplate.theme, ThemeTemplate.keywords)
+            .where(ThemeTemplate.is_active == True)
+            .order_by(ThemeTemplate.category, ThemeTemplate.id)
+        )
+        result = await session.execute(statement)
+        return [tuple(row) for row in result.all()]
+    
+    async def search(
+        self,
+        session: AsyncSession,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 10,
+    ) -> list[ThemeTemplate]:
+        """
+        Найти активные темы по словам запроса на стороне БД
+        
+        В PostgreSQL каждое слово запроса ищется как префикс в tsvector темы
+        и ключевых слов (GIN индекс), совпадения упорядочены по ts_rank.
+        Дополнительно подходят темы, содержащие запрос подстрокой - для
+        ILIKE используется триграммный индекс (pg_trgm). В остальных
+        диалектах - только поиск подстроки.
+        
+        Args:
+            session: AsyncSession
+            query: Текст запроса
+            category: Категория (None - все категории)
+            limit: Максимальное количество записей
+            
+        Returns:
+            Список тем от лучшего совпадения к худшему
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        
+        substring = ThemeTemplate.theme.ilike(f"%{escape_like(' '.join(query.split()))}%", escape="\\")
+        statement = select(ThemeTemplate).where(ThemeTemplate.is_active == True)
+        if category is not None:
+            statement = statement.where(ThemeTemplate.category == category)
+        
+        if session.get_bind().dialect.name == "postgresql":
+            # Слова состоят только из букв и цифр - безопасны для синтаксиса tsquery
+            ts_query = func.to_tsquery(SEARCH_CONFIG, " | ".join(f"{token}:*" for token in dict.fromkeys(tokens)))
+            document = search_document()
+            statement = (
+                statement
+                .where(or_(document.op("@@")(ts_query), substring))
+                .order_by(func.ts_rank(document, ts_query).desc(), ThemeTemplate.id)
+            )
+        else:
+            statement = statement.where(substring).order_by(ThemeTemplate.id)
+        
+        result = await session.execute(statement.limit(limit))
+        return list(result.scalars().all())
+    
+    async def get_active_by_ids(
+        self,
+        session: AsyncSession,
+        theme_ids: list[int],
+    ) -> list[ThemeTemplate]:
+        """
+        Получить активные темы по списку ID в порядке списка
+        
+        Args:
+            session: AsyncSession
+            theme_ids: ID тем
+            
+        Returns:
+            Список тем (удаленные и неактивные пропускаются)
+        """
+        if not theme_ids:
+            return []
+        
+        statement = select(ThemeTemplate).where(
+            ThemeTemplate.id.in_(theme_ids),
+            ThemeTemplate.is_active == True,
+        )
+        templates = {template.id: template for template in (await session.execute(statement)).scalars()}
+        return [templates[theme_id] for theme_id in theme_ids if theme_id in templates]
     
     async def get_all_by_category(
         self,
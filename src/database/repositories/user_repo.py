@@ -6,10 +6,13 @@ from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import func, select
 
-from src.database.models import User, SubscriptionTier
+from src.core.cache.user_cache import invalidate_user
+from src.database.models import Limits, RollupGranularity, User, SubscriptionTier
 from src.database.repositories.base import BaseRepository
+from src.database.repositories.listing import escape_like, estimate_count, keyset_page
+from src.database.repositories.metrics_rollup_repo import truncate_to_bucket
 
 
 class UserRepository(BaseRepository[User]):
@@ -37,6 +40,35 @@ class UserRepository(BaseRepository[User]):
         result = await session.execute(statement)
         return result.scalar_one_or_none()
     
+    async def get_with_limits(
+        self,
+        session: AsyncSession,
+        telegram_id: int,
+    ) -> tuple[Optional[User], Optional[Limits]]:
+        """
+        Получить пользователя и его лимиты одним запросом
+        
+        Оба объекта попадают в identity map сессии, поэтому последующие
+        get_by_id для них в той же сессии не обращаются к БД.
+        
+        Args:
+            session: AsyncSession
+            telegram_id: Telegram ID пользователя
+            
+        Returns:
+            Кортеж (пользователь или None, лимиты или None)
+        """
+        statement = (
+            select(User, Limits)
+            .outerjoin(Limits, Limits.user_id == User.id)
+            .where(User.telegram_id == telegram_id)
+        )
+        result = await session.execute(statement)
+        row = result.one_or_none()
+        if row is None:
+            return None, None
+        return row[0], row[1]
+    
     async def get_active_subscriptions(
         self,
         session: AsyncSession,
@@ -64,6 +96,126 @@ class UserRepository(BaseRepository[User]):
         result = await session.execute(statement)
         return list(result.scalars().all())
     
+    async def get_dashboard_counts(
+        self,
+        session: AsyncSession,
+        new_since: datetime,
+        active_since: datetime,
+    ) -> dict[str, int]:
+        """
+        Посчитать пользователей для дашборда одним запросом
+        
+        Все счетчики - агрегаты COUNT(*) FILTER (WHERE ...) за один
+        проход по таблице, без загрузки строк.
+        
+        Args:
+            session: AsyncSession
+            new_since: Начало периода новых пользователей
+            active_since: Начало периода активности
+            
+        Returns:
+            Словарь: total_users, new_users, active_users, free_users,
+            pro_users, ultra_users, referrals_total
+        """
+        statement = select(
+            func.count().label("total_users"),
+            func.count().filter(User.created_at >= new_since).label("new_users"),
+            func.count().filter(User.updated_at >= active_since).label("active_users"),
+            func.count().filter(User.subscription_tier == SubscriptionTier.FREE).label("free_users"),
+            func.count().filter(User.subscription_tier == SubscriptionTier.PRO).label("pro_users"),
+            func.count().filter(User.subscription_tier == SubscriptionTier.ULTRA).label("ultra_users"),
+            func.count().filter(User.referrer_id.is_not(None)).label("referrals_total"),
+        ).select_from(User)
+        
+        row = (await session.execute(statement)).one()
+        return dict(row._mapping)
+    
+    async def count_registrations_by_bucket(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+        since: Optional[datetime] = None,
+    ) -> list[tuple[datetime, int]]:
+        """
+        Посчитать регистрации по часам или дням
+        
+        Args:
+            session: AsyncSession
+            granularity: Размер интервала
+            since: Начало периода (None - вся история)
+            
+        Returns:
+            Список (начало интервала, количество регистраций)
+        """
+        bucket = truncate_to_bucket(granularity, User.created_at)
+        statement = select(bucket, func.count()).group_by(bucket)
+        if since is not None:
+            statement = statement.where(User.created_at >= since)
+        
+        result = await session.execute(statement)
+        return [tuple(row) for row in result.all()]
+    
+    async def get_page(
+        self,
+        session: AsyncSession,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        subscription_tier: Optional[SubscriptionTier] = None,
+        search: Optional[str] = None,
+    ) -> tuple[list[User], Optional[str]]:
+        """
+        Получить страницу пользователей от новых к старым
+        
+        Args:
+            session: AsyncSession
+            cursor: Курсор предыдущей страницы (None - первая страница)
+            limit: Размер страницы
+            subscription_tier: Фильтр по подписке
+            search: Telegram ID (число) или подстрока username
+            
+        Returns:
+            Кортеж (пользователи, курсор следующей страницы или None)
+            
+        Raises:
+            ValueError: Если курсор поврежден
+        """
+        statement = self._filtered(select(User), subscription_tier, search)
+        return await keyset_page(session, statement, User.created_at, User.id, cursor, limit)
+    
+    async def count_filtered(
+        self,
+        session: AsyncSession,
+        subscription_tier: Optional[SubscriptionTier] = None,
+        search: Optional[str] = None,
+    ) -> tuple[int, bool]:
+        """
+        Посчитать пользователей по фильтрам (для больших выборок - оценка)
+        
+        Args:
+            session: AsyncSession
+            subscription_tier: Фильтр по подписке
+            search: Telegram ID (число) или подстрока username
+            
+        Returns:
+            Кортеж (количество, True если это оценка)
+        """
+        statement = self._filtered(select(User.id), subscription_tier, search)
+        return await estimate_count(session, statement)
+    
+    @staticmethod
+    def _filtered(statement, subscription_tier: Optional[SubscriptionTier], search: Optional[str]):
+        """Фильтры списка пользователей админ-панели"""
+        if subscription_tier:
+            statement = statement.where(User.subscription_tier == subscription_tier)
+        
+        search = (search or "").strip()
+        if search.isdigit():
+            statement = statement.where(User.telegram_id == int(search))
+        elif search:
+            # ILIKE '%...%' использует триграммный индекс ix_users_username_trgm
+            statement = statement.where(User.username.ilike(f"%{escape_like(search)}%", escape="\\"))
+        return statement
+    
     async def get_referrals(
         self,
         session: AsyncSession,
@@ -106,6 +258,7 @@ class UserRepository(BaseRepository[User]):
             user.updated_at = datetime.utcnow()
             await session.commit()
             await session.refresh(user)
+            await invalidate_user(user_id)
         return user
     
     async def decrement_iq_points(
@@ -132,5 +285,6 @@ class UserRepository(BaseRepository[User]):
                 user.updated_at = datetime.utcnow()
                 await session.commit()
                 await session.refresh(user)
+                await invalidate_user(user_id)
         return user
 
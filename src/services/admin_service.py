@@ -15,9 +15,8 @@ from src.core.exceptions import UserNotFoundException
 from src.database.models import (
     User,
     Payment,
-    PaymentStatus,
-    SubscriptionTier,
     CSVAnalysis,
+    MetricsSnapshot,
     AnalyticsReport,
 )
 from src.database.repositories.user_repo import UserRepository
@@ -26,9 +25,13 @@ from src.database.repositories.analytics_repo import (
     CSVAnalysisRepository,
     AnalyticsReportRepository,
 )
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
 
 logger = get_logger(__name__)
 
+# Сколько хранить историю снимков метрик
+METRICS_HISTORY_DAYS = 90
+
 
 class AdminService:
     """Сервис для админ-панели"""
@@ -39,6 +42,7 @@ class AdminService:
         payment_repo: PaymentRepository,
         csv_analysis_repo: CSVAnalysisRepository,
         analytics_report_repo: AnalyticsReportRepository,
+        metrics_snapshot_repo: Optional[MetricsSnapshotRepository] = None,
     ):
         """
         Инициализация сервиса
@@ -48,11 +52,14 @@ class AdminService:
             payment_repo: Репозиторий платежей
             csv_analysis_repo: Репозиторий CSV анализов
             analytics_report_repo: Репозиторий отчетов
+            metrics_snapshot_repo: Репозиторий снимков метрик
+                (None - статистика всегда считается заново)
         """
         self.user_repo = user_repo
         self.payment_repo = payment_repo
         self.csv_analysis_repo = csv_analysis_repo
         self.analytics_report_repo = analytics_report_repo
+        self.metrics_snapshot_repo = metrics_snapshot_repo
     
     async def get_dashboard_stats(
         self,
@@ -67,86 +74,8 @@ class AdminService:
         Returns:
             Словарь со статистикой
         """
-        now = datetime.utcnow()
-        yesterday = now - timedelta(days=1)
-        week_ago = now - timedelta(days=7)
-        month_ago = now - timedelta(days=30)
-        
-        # Общая статистика пользователей
-        all_users = await self.user_repo.get_all(session, limit=10000)
-        total_users = len(all_users)
-        
-        # Новые пользователи за 24 часа
-        new_users_24h = sum(
-            1 for u in all_users
-            if u.created_at >= yesterday
-        )
-        
-        # Активные пользователи за неделю
-        active_users_7d = sum(
-            1 for u in all_users
-            if u.updated_at >= week_ago
-        )
-        
-        # Статистика по подпискам
-        free_users = sum(1 for u in all_users if u.subscription_tier == SubscriptionTier.FREE)
-        pro_users = sum(1 for u in all_users if u.subscription_tier == SubscriptionTier.PRO)
-        ultra_users = sum(1 for u in all_users if u.subscription_tier == SubscriptionTier.ULTRA)
-        
-        # Статистика платежей
-        completed_payments = await self.payment_repo.get_by_status(
-            session,
-            PaymentStatus.COMPLETED,
-            limit=10000,
-        )
-        
-        payments_today = sum(
-            1 for p in completed_payments
-            if p.completed_at and p.completed_at >= yesterday
-        )
-        
-        payments_month = sum(
-            1 for p in completed_payments
-            if p.completed_at and p.completed_at >= month_ago
-        )
-        
-        total_revenue_today = sum(
-            p.amount for p in completed_payments
-            if p.completed_at and p.completed_at >= yesterday
-        ) / 100  # Конвертируем копейки в рубли
-        
-        total_revenue_month = sum(
-            p.amount for p in completed_payments
-            if p.completed_at and p.completed_at >= month_ago
-        ) / 100
-        
-        total_revenue = sum(p.amount for p in completed_payments) / 100
-        
-        # Статистика рефералов
-        referrals_total = sum(
-            1 for u in all_users
-            if u.referrer_id is not None
-        )
-        
-        # Статистика анализов
-        all_analyses = await self.csv_analysis_repo.get_all(session, limit=10000)
-        total_analyses = len(all_analyses)
-        
-        return {
-            "total_users": total_users,
-            "new_users_24h": new_users_24h,
-            "active_users_7d": active_users_7d,
-            "free_users": free_users,
-            "pro_users": pro_users,
-            "ultra_users": ultra_users,
-            "payments_today": payments_today,
-            "payments_month": payments_month,
-            "total_revenue_today": total_revenue_today,
-            "total_revenue_month": total_revenue_month,
-            "total_revenue": total_revenue,
-            "referrals_total": referrals_total,
-            "total_analyses": total_analyses,
-        }
+        counters = await self._collect_dashboard(session, datetime.utcnow())
+        return self._dashboard_stats(MetricsSnapshot(**counters))
     
     async def get_user_detail(
         self,
@@ -201,33 +130,159 @@ class AdminService:
         Returns:
             Словарь со статистикой аналитики
         """
-        all_reports = await self.analytics_report_repo.get_all(session, limit=10000)
-        
-        # Подсчитываем средний CPM
-        cpms = [
-            report.kpi_data.get("cpm", 0)
-            for report in all_reports
-            if report.kpi_data and "cpm" in report.kpi_data
-        ]
-        avg_cpm = sum(cpms) / len(cpms) if cpms else 0
-        
-        # Топ пользователей по анализам
-        all_analyses = await self.csv_analysis_repo.get_all(session, limit=10000)
-        user_analyses_count = {}
-        for analysis in all_analyses:
-            user_analyses_count[analysis.user_id] = (
-                user_analyses_count.get(analysis.user_id, 0) + 1
-            )
-        
-        top_users_by_analyses = sorted(
-            user_analyses_count.items(),
-            key=lambda x: x[1],
-            reverse=True,
-        )[:10]
+        total_reports, avg_cpm = await self.analytics_report_repo.get_cpm_stats(session)
+        top_users_by_analyses = await self.csv_analysis_repo.get_top_users(session, limit=10)
         
         return {
-            "total_reports": len(all_reports),
+            "total_reports": total_reports,
             "avg_cpm": round(avg_cpm, 2),
             "top_users_by_analyses": top_users_by_analyses,
         }
-
+    
+    async def refresh_metrics_snapshot(
+        self,
+        session: AsyncSession,
+    ) -> MetricsSnapshot:
+        """
+        Пересчитать статистику и сохранить новый снимок
+        
+        Вызывается периодически из worker. Снимки старше
+        METRICS_HISTORY_DAYS удаляются.
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Новый снимок
+        """
+        taken_at = datetime.utcnow()
+        counters = await self._collect_dashboard(session, taken_at)
+        analytics = await self.get_analytics_stats(session)
+        
+        snapshot = await self.metrics_snapshot_repo.create(
+            session,
+            MetricsSnapshot(
+                taken_at=taken_at,
+                **counters,
+                total_reports=analytics["total_reports"],
+                avg_cpm=analytics["avg_cpm"],
+                top_users_by_analyses=[list(row) for row in analytics["top_users_by_analyses"]],
+            ),
+        )
+        await self.metrics_snapshot_repo.delete_older_than(
+            session,
+            taken_at - timedelta(days=METRICS_HISTORY_DAYS),
+        )
+        
+        logger.info("metrics_snapshot_refreshed", snapshot_id=snapshot.id)
+        return snapshot
+    
+    async def get_dashboard_snapshot(
+        self,
+        session: AsyncSession,
+    ) -> dict[str, int | float]:
+        """
+        Получить статистику для дашборда из последнего снимка
+        
+        Одно чтение последней строки metrics_snapshots. Если снимков еще
+        нет, он создается.
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Словарь со статистикой (как get_dashboard_stats)
+        """
+        snapshot = await self._latest_snapshot(session)
+        if snapshot is None:
+            return await self.get_dashboard_stats(session)
+        return self._dashboard_stats(snapshot)
+    
+    async def get_analytics_snapshot(
+        self,
+        session: AsyncSession,
+    ) -> dict:
+        """
+        Получить статистику по аналитике из последнего снимка
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Словарь со статистикой аналитики (как get_analytics_stats)
+        """
+        snapshot = await self._latest_snapshot(session)
+        if snapshot is None:
+            return await self.get_analytics_stats(session)
+        
+        return {
+            "total_reports": snapshot.total_reports,
+            "avg_cpm": snapshot.avg_cpm,
+            "top_users_by_analyses": [tuple(row) for row in snapshot.top_users_by_analyses or []],
+        }
+    
+    async def _latest_snapshot(self, session: AsyncSession) -> Optional[MetricsSnapshot]:
+        """Последний снимок; без снимков создается первый (None - снимки отключены)"""
+        if self.metrics_snapshot_repo is None:
+            return None
+        
+        snapshot = await self.metrics_snapshot_repo.get_latest(session)
+        if snapshot is None:
+            snapshot = await self.refresh_metrics_snapshot(session)
+        return snapshot
+    
+    async def _collect_dashboard(
+        self,
+        session: AsyncSession,
+        now: datetime,
+    ) -> dict[str, int]:
+        """
+        Счетчики дашборда: по одному агрегатному запросу на таблицу,
+        время не зависит от количества пользователей и платежей
+        
+        Returns:
+            Значения колонок MetricsSnapshot (суммы в копейках)
+        """
+        yesterday = now - timedelta(days=1)
+        users = await self.user_repo.get_dashboard_counts(
+            session,
+            new_since=yesterday,
+            active_since=now - timedelta(days=7),
+        )
+        payments = await self.payment_repo.get_revenue_stats(
+            session,
+            day_since=yesterday,
+            month_since=now - timedelta(days=30),
+        )
+        
+        return {
+            "total_users": users["total_users"],
+            "new_users_24h": users["new_users"],
+            "active_users_7d": users["active_users"],
+            "free_users": users["free_users"],
+            "pro_users": users["pro_users"],
+            "ultra_users": users["ultra_users"],
+            "referrals_total": users["referrals_total"],
+            **payments,
+            "total_analyses": await self.csv_analysis_repo.count(session),
+        }
+    
+    @staticmethod
+    def _dashboard_stats(snapshot: MetricsSnapshot) -> dict[str, int | float]:
+        """Статистика дашборда из счетчиков снимка"""
+        return {
+            "total_users": snapshot.total_users,
+            "new_users_24h": snapshot.new_users_24h,
+            "active_users_7d": snapshot.active_users_7d,
+            "free_users": snapshot.free_users,
+            "pro_users": snapshot.pro_users,
+            "ultra_users": snapshot.ultra_users,
+            "payments_today": snapshot.payments_today,
+            "payments_month": snapshot.payments_month,
+            # Копейки в рубли
+            "total_revenue_today": snapshot.revenue_today / 100,
+            "total_revenue_month": snapshot.revenue_month / 100,
+            "total_revenue": snapshot.revenue_total / 100,
+            "referrals_total": snapshot.referrals_total,
+            "total_analyses": snapshot.total_analyses,
+        }
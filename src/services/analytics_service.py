@@ -4,12 +4,16 @@
 Обработка CSV, проверка лимитов, создание анализов и отчетов
 """
 
+from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logging import get_logger
+from src.core.cache.report_cache import ReportCache
+from src.core.cache.user_cache import invalidate_user
 from src.core.exceptions import LimitExceededException, UserNotFoundException
+from src.core.quota.engine import QuotaEngine, consume_limit, refund_limit
 from src.database.models import CSVAnalysis, AnalysisStatus
 from src.database.repositories.analytics_repo import (
     CSVAnalysisRepository,
@@ -28,6 +32,8 @@ class AnalyticsService:
         csv_analysis_repo: CSVAnalysisRepository,
         analytics_report_repo: AnalyticsReportRepository,
         limits_repo: LimitsRepository,
+        report_cache: Optional[ReportCache] = None,
+        quota: Optional[QuotaEngine] = None,
     ):
         """
         Инициализация сервиса
@@ -36,10 +42,14 @@ class AnalyticsService:
             csv_analysis_repo: Репозиторий CSV анализов
             analytics_report_repo: Репозиторий отчетов
             limits_repo: Репозиторий лимитов
+            report_cache: Кэш отчетов по содержимому файла
+            quota: Квоты в Redis (None - списание в таблице limits)
         """
         self.csv_analysis_repo = csv_analysis_repo
         self.analytics_report_repo = analytics_report_repo
         self.limits_repo = limits_repo
+        self.report_cache = report_cache
+        self.quota = quota
     
     async def can_use_analytics(
         self,
@@ -60,12 +70,8 @@ class AnalyticsService:
         if not limits:
             return False
         
-        # Сбрасываем лимиты если нужно
-        await self.limits_repo.reset_if_needed(session, user_id)
-        limits = await self.limits_repo.get_by_user_id(session, user_id)
-        
-        # -1 означает безлимит
-        if limits.analytics_limit == -1:
+        # -1 означает безлимит; истекший период обнулится при списании
+        if limits.analytics_limit == -1 or limits.reset_at <= datetime.utcnow():
             return True
         
         return limits.analytics_used < limits.analytics_limit
@@ -76,7 +82,8 @@ class AnalyticsService:
         user_id: int,
         file_id: str,
         filename: str,
-        row_count: int,
+        row_count: int = 0,
+        file_unique_id: Optional[str] = None,
     ) -> CSVAnalysis:
         """
         Создать новый анализ CSV файла
@@ -86,19 +93,23 @@ class AnalyticsService:
             user_id: ID пользователя
             file_id: Telegram file_id
             filename: Имя файла
-            row_count: Количество строк в файле
+            row_count: Количество строк в файле (0 - станет известно
+                после скачивания в worker)
+            file_unique_id: Telegram file_unique_id документа
             
         Returns:
             Созданный анализ
             
         Raises:
             LimitExceededException: Превышен лимит анализов
+            RedisError: Квоты ведутся в Redis, а он недоступен
         """
-        # Проверяем лимиты
-        if not await self.can_use_analytics(session, user_id):
-            limits = await self.limits_repo.get_by_user_id(session, user_id)
+        # Проверяем и списываем лимит одним запросом
+        usage = await consume_limit(session, self.limits_repo, self.quota, user_id, "analytics")
+        if usage is None or not usage.allowed:
+            used, limit = (usage.used, usage.limit) if usage else (0, 0)
             raise LimitExceededException(
-                f"Превышен лимит анализов. Использовано: {limits.analytics_used}/{limits.analytics_limit}"
+                f"Превышен лимит анализов. Использовано: {used}/{limit}"
             )
         
         # Создаем анализ
@@ -108,12 +119,19 @@ class AnalyticsService:
             filename=filename,
             row_count=row_count,
             analysis_status=AnalysisStatus.PENDING,
+            file_unique_id=file_unique_id,
         )
         
-        analysis = await self.csv_analysis_repo.create(session, analysis)
-        
-        # Увеличиваем счетчик использованных анализов
-        await self.limits_repo.increment_analytics(session, user_id)
+        # Коммит фиксирует анализ вместе со списанием лимита в БД
+        try:
+            analysis = await self.csv_analysis_repo.create(session, analysis)
+        except Exception:
+            # Без Redis списание в БД откатывается вместе с записью
+            if self.quota is not None:
+                await session.rollback()
+                await refund_limit(session, self.limits_repo, self.quota, user_id, "analytics")
+            raise
+        await invalidate_user(user_id)
         
         logger.info(
             "csv_analysis_created",
@@ -125,6 +143,87 @@ class AnalyticsService:
         
         return analysis
     
+    async def cancel_analysis(
+        self,
+        session: AsyncSession,
+        analysis: CSVAnalysis,
+        error_message: str,
+    ) -> None:
+        """
+        Отменить анализ, который не удалось поставить в очередь
+        
+        Анализ переводится в FAILED (его можно повторить через /reprocess),
+        списанный лимит возвращается.
+        
+        Args:
+            session: AsyncSession
+            analysis: Созданный анализ
+            error_message: Причина отмены
+        """
+        await self.csv_analysis_repo.update_status(
+            session,
+            analysis.id,
+            AnalysisStatus.FAILED,
+            error_message=error_message,
+        )
+        await refund_limit(session, self.limits_repo, self.quota, analysis.user_id, "analytics")
+        await invalidate_user(analysis.user_id)
+        
+        logger.warning(
+            "csv_analysis_cancelled",
+            analysis_id=analysis.id,
+            user_id=analysis.user_id,
+            error=error_message,
+        )
+    
+    async def find_cached_summary(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        file_unique_id: str,
+    ) -> Optional[str]:
+        """
+        Найти готовый отчет по тому же файлу без его скачивания
+        
+        Сначала проверяется Redis, затем отчеты в БД (с прогревом кэша).
+        Загрузка того же содержимого под другим file_unique_id
+        распознается в worker по хэшу содержимого.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            file_unique_id: Telegram file_unique_id документа
+            
+        Returns:
+            Текст отчета или None
+        """
+        if self.report_cache is not None:
+            cached = await self.report_cache.get_by_file(user_id, file_unique_id)
+            if cached is not None:
+                logger.info("report_cache_hit", user_id=user_id, source="redis")
+                return cached["summary_text"]
+        
+        report = await self.analytics_report_repo.get_by_file_unique_id(
+            session,
+            user_id,
+            file_unique_id,
+        )
+        if report is None:
+            return None
+        
+        logger.info("report_cache_hit", user_id=user_id, source="database")
+        if self.report_cache is not None:
+            analysis = await self.csv_analysis_repo.get_by_id(session, report.csv_analysis_id)
+            if analysis and analysis.content_hash:
+                await self.report_cache.set(
+                    user_id,
+                    analysis.content_hash,
+                    report.id,
+                    report.summary_text,
+                    file_unique_id=file_unique_id,
+                )
+        return report.summary_text
+    
     async def get_user_analyses(
         self,
         session: AsyncSession,
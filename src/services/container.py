@@ -0,0 +1,90 @@
+"""
+Контейнер репозиториев и сервисов
+
+Репозитории и сервисы не хранят состояние между запросами, поэтому
+создаются один раз на процесс и передаются handlers через middleware
+"""
+
+from src.core.cache.report_cache import ReportCache
+from src.core.quota.engine import QuotaEngine
+from src.core.themes.index import ThemeIndex
+from src.database.repositories.analytics_repo import (
+    CSVAnalysisRepository,
+    AnalyticsReportRepository,
+)
+from src.database.repositories.limits_repo import LimitsRepository
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
+from src.database.repositories.payment_repo import PaymentRepository
+from src.database.repositories.portfolio_repo import PortfolioRepository
+from src.database.repositories.theme_cursor_repo import ThemeCursorRepository
+from src.database.repositories.theme_recommendation_repo import ThemeRecommendationRepository
+from src.database.repositories.theme_repo import ThemeRepository
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+from src.database.repositories.user_repo import UserRepository
+from src.services.admin_service import AdminService
+from src.services.analytics_service import AnalyticsService
+from src.services.payment_service import PaymentService
+from src.services.portfolio_service import PortfolioService
+from src.services.referral_service import ReferralService
+from src.services.theme_service import ThemeService
+from src.services.user_service import UserService
+
+
+class ServiceContainer:
+    """Репозитории и сервисы бота"""
+    
+    def __init__(
+        self,
+        report_cache: ReportCache | None = None,
+        quota: QuotaEngine | None = None,
+        theme_index: ThemeIndex | None = None,
+    ):
+        """
+        Инициализация контейнера
+        
+        Args:
+            report_cache: Кэш отчетов аналитики
+            quota: Квоты в Redis (None - лимиты списываются в БД)
+            theme_index: Индекс тем в памяти (None - темы выбираются в БД)
+        """
+        # Репозитории
+        self.user_repo = UserRepository()
+        self.limits_repo = LimitsRepository()
+        self.payment_repo = PaymentRepository()
+        self.csv_analysis_repo = CSVAnalysisRepository()
+        self.analytics_report_repo = AnalyticsReportRepository()
+        self.theme_repo = ThemeRepository()
+        self.theme_template_repo = ThemeTemplateRepository()
+        self.theme_cursor_repo = ThemeCursorRepository()
+        self.theme_recommendation_repo = ThemeRecommendationRepository()
+        self.portfolio_repo = PortfolioRepository()
+        self.metrics_snapshot_repo = MetricsSnapshotRepository()
+        
+        # Сервисы
+        self.user_service = UserService(self.user_repo, self.limits_repo, self.metrics_snapshot_repo)
+        self.referral_service = ReferralService(self.user_repo)
+        self.payment_service = PaymentService(self.payment_repo, self.metrics_snapshot_repo)
+        self.analytics_service = AnalyticsService(
+            self.csv_analysis_repo,
+            self.analytics_report_repo,
+            self.limits_repo,
+            report_cache,
+            quota,
+        )
+        self.theme_service = ThemeService(
+            self.theme_repo,
+            self.limits_repo,
+            self.theme_template_repo,
+            quota,
+            theme_index,
+            self.theme_cursor_repo,
+            self.theme_recommendation_repo,
+        )
+        self.portfolio_service = PortfolioService(self.portfolio_repo)
+        self.admin_service = AdminService(
+            self.user_repo,
+            self.payment_repo,
+            self.csv_analysis_repo,
+            self.analytics_report_repo,
+            self.metrics_snapshot_repo,
+        )
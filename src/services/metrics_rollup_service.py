@@ -0,0 +1,191 @@
+"""
+Сервис агрегатов метрик по времени
+
+Worker пересчитывает часовые и дневные агрегаты регистраций, активных
+пользователей, платежей и анализов за последние интервалы (при пустой
+таблице - за всю историю). Графики админ-панели читают готовые агрегаты:
+стоимость запроса зависит от количества интервалов, а не от объема
+исходных таблиц
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logging import get_logger
+from src.database.models import RollupGranularity, RollupMetric
+from src.database.repositories.analytics_repo import CSVAnalysisRepository
+from src.database.repositories.listing import naive_utc
+from src.database.repositories.metrics_rollup_repo import (
+    BUCKET_STEPS,
+    MetricsRollupRepository,
+    bucket_start,
+)
+from src.database.repositories.payment_repo import PaymentRepository
+from src.database.repositories.user_repo import UserRepository
+
+logger = get_logger(__name__)
+
+# Сколько последних интервалов пересчитывается при каждом запуске: статус
+# анализа меняется после создания, запуск worker мог быть пропущен
+ROLLUP_LOOKBACK = {
+    RollupGranularity.HOUR: timedelta(hours=2),
+    RollupGranularity.DAY: timedelta(days=1),
+}
+
+# Максимум точек в одном ряду
+MAX_SERIES_POINTS = 5000
+
+
+class MetricsRollupService:
+    """Сервис агрегатов метрик по часам и дням"""
+    
+    def __init__(
+        self,
+        user_repo: UserRepository,
+        payment_repo: PaymentRepository,
+        csv_analysis_repo: CSVAnalysisRepository,
+        rollup_repo: MetricsRollupRepository,
+    ):
+        """
+        Инициализация сервиса
+        
+        Args:
+            user_repo: Репозиторий пользователей
+            payment_repo: Репозиторий платежей
+            csv_analysis_repo: Репозиторий CSV анализов
+            rollup_repo: Репозиторий агрегатов метрик
+        """
+        self.user_repo = user_repo
+        self.payment_repo = payment_repo
+        self.csv_analysis_repo = csv_analysis_repo
+        self.rollup_repo = rollup_repo
+    
+    async def refresh(
+        self,
+        session: AsyncSession,
+        now: Optional[datetime] = None,
+    ) -> dict[str, int]:
+        """
+        Пересчитать часовые и дневные агрегаты
+        
+        Пересчитываются интервалы начиная с последнего сохраненного
+        (но не позже окна ROLLUP_LOOKBACK), поэтому пропущенные запуски
+        догоняются. Часовые и дневные агрегаты обновляются в одной транзакции.
+        
+        Args:
+            session: AsyncSession
+            now: Текущее время (UTC)
+            
+        Returns:
+            Количество записанных строк по размеру интервала
+        """
+        now = now or datetime.utcnow()
+        written = {}
+        
+        try:
+            for granularity in RollupGranularity:
+                window_start = bucket_start(granularity, now - ROLLUP_LOOKBACK[granularity])
+                last_bucket = await self.rollup_repo.get_last_bucket(session, granularity)
+                since = None if last_bucket is None else min(last_bucket, window_start)
+                
+                rows = await self._collect(session, granularity, since)
+                written[granularity.value] = await self.rollup_repo.replace_since(
+                    session,
+                    granularity,
+                    since,
+                    rows,
+                )
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        
+        logger.info("metrics_rollups_refreshed", **written)
+        return written
+    
+    async def get_series(
+        self,
+        session: AsyncSession,
+        metric: RollupMetric,
+        granularity: RollupGranularity,
+        start: datetime,
+        end: datetime,
+    ) -> list[dict[str, Any]]:
+        """
+        Получить ряд метрики за период
+        
+        Интервалы без событий возвращаются с нулем, чтобы график
+        не пропускал точки.
+        
+        Args:
+            session: AsyncSession
+            metric: Метрика
+            granularity: Размер интервала
+            start: Начало периода
+            end: Конец периода (включительно)
+            
+        Returns:
+            Точки по возрастанию времени: bucket, value и breakdown
+            (значения по тарифам или статусам, для метрик с разрезом)
+            
+        Raises:
+            ValueError: Если период пустой или точек больше MAX_SERIES_POINTS
+        """
+        first = bucket_start(granularity, naive_utc(start))
+        last = bucket_start(granularity, naive_utc(end))
+        step = BUCKET_STEPS[granularity]
+        if last < first:
+            raise ValueError("Конец периода раньше начала")
+        if (last - first) // step + 1 > MAX_SERIES_POINTS:
+            raise ValueError(f"Больше {MAX_SERIES_POINTS} точек, выберите период меньше или интервал крупнее")
+        
+        rows = await self.rollup_repo.get_series(session, granularity, metric.value, first, last)
+        values: dict[datetime, dict[str, int]] = {}
+        for bucket, dimension, value in rows:
+            values.setdefault(bucket, {})[dimension] = value
+        
+        points = []
+        bucket = first
+        while bucket <= last:
+            breakdown = values.get(bucket, {})
+            points.append({
+                "bucket": bucket,
+                "value": sum(breakdown.values()),
+                "breakdown": {dimension: value for dimension, value in breakdown.items() if dimension},
+            })
+            bucket += step
+        return points
+    
+    async def _collect(
+        self,
+        session: AsyncSession,
+        granularity: RollupGranularity,
+        since: Optional[datetime],
+    ) -> list[dict[str, Any]]:
+        """Агрегаты всех метрик из исходных таблиц начиная с since"""
+        rows = []
+        
+        def add(metric: RollupMetric, bucket: datetime, value: int, dimension: str = "") -> None:
+            rows.append({
+                "metric": metric.value,
+                "bucket": bucket,
+                "dimension": dimension,
+                "value": value,
+            })
+        
+        for bucket, count in await self.user_repo.count_registrations_by_bucket(session, granularity, since):
+            add(RollupMetric.REGISTRATIONS, bucket, count)
+        
+        for bucket, count in await self.csv_analysis_repo.count_active_users_by_bucket(session, granularity, since):
+            add(RollupMetric.ACTIVE_USERS, bucket, count)
+        
+        for bucket, status, count in await self.csv_analysis_repo.count_by_bucket(session, granularity, since):
+            add(RollupMetric.ANALYSES, bucket, count, status.value)
+        
+        for bucket, tier, count, amount in await self.payment_repo.get_completed_by_bucket(session, granularity, since):
+            add(RollupMetric.PAYMENTS, bucket, count, tier.value)
+            add(RollupMetric.REVENUE, bucket, amount, tier.value)
+        
+        return rows
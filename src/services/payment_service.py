@@ -7,6 +7,7 @@
 from datetime import datetime, timedelta
 from typing import Optional
 
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logging import get_logger
@@ -14,6 +15,7 @@ from src.config.settings import settings
 from src.core.exceptions import PaymentException, UserNotFoundException
 from src.core.utils.tribute_client import TributeClient
 from src.database.models import Payment, PaymentStatus, PaymentProvider, SubscriptionTier
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
 from src.database.repositories.payment_repo import PaymentRepository
 
 logger = get_logger(__name__)
@@ -25,14 +27,18 @@ class PaymentService:
     def __init__(
         self,
         payment_repo: PaymentRepository,
+        metrics_snapshot_repo: Optional[MetricsSnapshotRepository] = None,
     ):
         """
         Инициализация сервиса
         
         Args:
             payment_repo: Репозиторий платежей
+            metrics_snapshot_repo: Репозиторий снимков метрик
+                (платежи сразу учитываются в админ-панели)
         """
         self.payment_repo = payment_repo
+        self.metrics_snapshot_repo = metrics_snapshot_repo
         self.tribute_client = TributeClient(
             api_key=settings.tribute.api_key,
             base_url=settings.tribute.base_url,
@@ -215,6 +221,9 @@ class PaymentService:
             )
             raise PaymentException("Сумма платежа не совпадает")
         
+        # Повторный webhook того же платежа не учитывается в метриках
+        newly_completed = payment.status != PaymentStatus.COMPLETED
+        
         # Обновляем статус
         payment.status = PaymentStatus.COMPLETED
         payment.completed_at = datetime.utcnow()
@@ -231,6 +240,21 @@ class PaymentService:
             amount=amount,
         )
         
+        if newly_completed and self.metrics_snapshot_repo is not None:
+            try:
+                await self.metrics_snapshot_repo.bump(
+                    session,
+                    payments_today=1,
+                    payments_month=1,
+                    revenue_today=payment.amount,
+                    revenue_month=payment.amount,
+                    revenue_total=payment.amount,
+                )
+            except SQLAlchemyError as e:
+                # Снимок поправит следующий пересчет
+                await session.rollback()
+                logger.warning("metrics_bump_error", payment_id=payment.id, error=str(e))
+        
         return payment
     
     async def refund_payment(
@@ -0,0 +1,302 @@
+"""
+Сервис накопительной аналитики портфолио
+
+Каждая обработанная загрузка CSV добавляется в историю продаж пользователя,
+агрегаты по дням, активам и типам обновляются только по новым строкам
+"""
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logging import get_logger
+from src.core.analytics.kpi_calculator import KPICalculator, first_day_from
+from src.core.analytics.pipeline import to_sale
+from src.database.repositories.portfolio_repo import PortfolioRepository
+
+logger = get_logger(__name__)
+
+# Размер пачки строк: одна пачка - один COPY и одна транзакция
+MERGE_BATCH_SIZE = 20000
+
+
+class PortfolioService:
+    """Сервис накопительной аналитики портфолио"""
+    
+    def __init__(self, portfolio_repo: PortfolioRepository):
+        """
+        Инициализация сервиса
+        
+        Args:
+            portfolio_repo: Репозиторий истории продаж
+        """
+        self.portfolio_repo = portfolio_repo
+    
+    async def merge_rows(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        rows: Iterable[dict[str, Any]],
+        csv_analysis_id: Optional[int] = None,
+        batch_size: int = MERGE_BATCH_SIZE,
+    ) -> int:
+        """
+        Добавить строки загрузки в историю продаж пользователя
+        
+        Уже сохраненные продажи (тот же asset_id, время, тип покупки
+        и доход) пропускаются. Агрегаты обновляются по вставленным
+        строкам, каждая пачка фиксируется отдельной транзакцией.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            rows: Нормализованные строки CSVProcessor
+            csv_analysis_id: ID анализа, из которого пришли строки
+            batch_size: Размер пачки строк
+            
+        Returns:
+            Количество новых продаж
+        """
+        rows = iter(rows)
+        
+        async def batches() -> AsyncIterator[list[dict[str, Any]]]:
+            while batch := list(islice(rows, batch_size)):
+                yield [to_sale(row) for row in batch]
+        
+        return await self.merge_sales(session, user_id, batches(), csv_analysis_id)
+    
+    async def merge_sales(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        batches: AsyncIterable[list[dict[str, Any]]],
+        csv_analysis_id: Optional[int] = None,
+    ) -> int:
+        """
+        Добавить уже разобранные продажи в историю пользователя
+        
+        Пачки приходят из pipeline.StreamAnalysis (разбор в пуле процессов
+        worker), здесь остается только запись в БД.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            batches: Пачки значений SaleFact (pipeline.to_sale)
+            csv_analysis_id: ID анализа, из которого пришли строки
+            
+        Returns:
+            Количество новых продаж
+        """
+        inserted = 0
+        total = 0
+        
+        async for batch in batches:
+            total += len(batch)
+            facts = [
+                {**sale, "user_id": user_id, "csv_analysis_id": csv_analysis_id}
+                for sale in batch
+            ]
+            new_facts = await self.portfolio_repo.insert_facts(session, facts)
+            await self._apply_rollups(session, user_id, new_facts)
+            await session.commit()
+            inserted += len(new_facts)
+        
+        logger.info(
+            "portfolio_merged",
+            user_id=user_id,
+            csv_analysis_id=csv_analysis_id,
+            rows=total,
+            inserted=inserted,
+        )
+        return inserted
+    
+    async def get_kpi(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        now: Optional[datetime] = None,
+        top_limit: int = 3,
+    ) -> dict[str, Any]:
+        """
+        Рассчитать KPI по всей истории продаж
+        
+        Использует только агрегаты, поэтому не зависит от числа продаж.
+        Формат результата как у KPICalculator.calculate_kpi.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            now: Текущее время для расчета тренда (по умолчанию utcnow)
+            top_limit: Количество топ активов
+            
+        Returns:
+            Словарь с KPI метриками
+        """
+        totals = await self.portfolio_repo.get_totals(session, user_id)
+        if totals is None:
+            return KPICalculator._get_empty_kpi()
+        
+        now = now or datetime.utcnow()
+        total_revenue = float(totals["revenue"])
+        total_sales = totals["sales"]
+        total_impressions = totals["impressions"]
+        
+        cpm = (total_revenue / total_impressions) * 1000 if total_impressions > 0 else 0.0
+        conversion_rate = (total_sales / total_impressions) * 100 if total_impressions > 0 else 0.0
+        average_check = total_revenue / total_sales if total_sales > 0 else 0.0
+        
+        top_assets = await self.portfolio_repo.get_top_assets(session, user_id, top_limit)
+        categories = await self.portfolio_repo.get_categories(session, user_id)
+        
+        period_start = totals["first_day"].isoformat()
+        period_end = totals["last_day"].isoformat()
+        
+        return {
+            "total_sales": total_sales,
+            "total_revenue": round(total_revenue, 2),
+            "total_impressions": total_impressions,
+            "total_downloads": totals["downloads"],
+            "cpm": round(cpm, 2),
+            "conversion_rate": round(conversion_rate, 2),
+            "average_check": round(average_check, 2),
+            "trend": await self._calculate_trend(session, user_id, totals, now),
+            "top_assets": [
+                {
+                    "title": asset.title,
+                    "revenue": round(float(asset.revenue), 2),
+                    "sales": asset.sales,
+                }
+                for asset in top_assets
+            ],
+            "type_distribution": {
+                category.type_key: {
+                    "count": category.row_count,
+                    "revenue": round(float(category.revenue), 2),
+                    "sales": category.sales,
+                }
+                for category in categories
+            },
+            "period": f"{period_start} - {period_end}",
+            "period_start": period_start,
+            "period_end": period_end,
+            "row_count": totals["row_count"],
+        }
+    
+    async def _calculate_trend(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        totals: dict[str, Any],
+        now: datetime,
+    ) -> dict[str, Any]:
+        """
+        Рассчитать тренд: последние 30 дней против предыдущих 30
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            totals: Итоговые показатели
+            now: Текущее время
+            
+        Returns:
+            Словарь с информацией о тренде
+        """
+        if totals["row_count"] < 2 or totals["days"] < 2:
+            return {
+                "direction": "stable",
+                "emoji": "➡️",
+                "text": "Недостаточно данных для анализа тренда",
+                "change_percent": 0.0,
+            }
+        
+        # День входит в период, если его начало не раньше границы
+        recent_from = first_day_from(now - timedelta(days=30))
+        previous_from = first_day_from(now - timedelta(days=60))
+        
+        recent = Decimal(0)
+        previous = Decimal(0)
+        for daily in await self.portfolio_repo.get_daily_since(session, user_id, previous_from):
+            if daily.day >= recent_from:
+                recent += daily.revenue
+            else:
+                previous += daily.revenue
+        
+        return KPICalculator._build_trend(float(recent), float(previous))
+    
+    async def _apply_rollups(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        new_facts: list[Any],
+    ) -> None:
+        """
+        Обновить агрегаты по новым продажам
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            new_facts: Вставленные строки (day, asset_id, title, purchase_type,
+                category, revenue, impressions, downloads)
+        """
+        if not new_facts:
+            return
+        
+        now = datetime.utcnow()
+        daily: dict[date, dict[str, Any]] = {}
+        assets: dict[str, dict[str, Any]] = {}
+        types: dict[str, dict[str, Any]] = {}
+        
+        for day, asset_id, title, purchase_type, category, revenue, impressions, downloads in new_facts:
+            is_sale = 1 if revenue > 0 else 0
+            
+            day_stats = daily.get(day)
+            if day_stats is None:
+                day_stats = daily[day] = {
+                    "user_id": user_id,
+                    "day": day,
+                    "row_count": 0,
+                    "sales": 0,
+                    "revenue": Decimal(0),
+                    "impressions": 0,
+                    "downloads": 0,
+                }
+            day_stats["row_count"] += 1
+            day_stats["sales"] += is_sale
+            day_stats["revenue"] += revenue
+            day_stats["impressions"] += impressions
+            day_stats["downloads"] += downloads
+            
+            asset = assets.get(asset_id)
+            if asset is None:
+                asset = assets[asset_id] = {
+                    "user_id": user_id,
+                    "asset_id": asset_id,
+                    "title": title[:50],
+                    "sales": 0,
+                    "revenue": Decimal(0),
+                }
+            asset["sales"] += is_sale
+            asset["revenue"] += revenue
+            
+            # Тип: категория, а если она unknown - тип покупки
+            type_key = category if category != "unknown" else purchase_type
+            type_stats = types.get(type_key)
+            if type_stats is None:
+                type_stats = types[type_key] = {
+                    "user_id": user_id,
+                    "type_key": type_key,
+                    "row_count": 0,
+                    "sales": 0,
+                    "revenue": Decimal(0),
+                    "first_seen_at": now,
+                }
+            type_stats["row_count"] += 1
+            type_stats["sales"] += is_sale
+            type_stats["revenue"] += revenue
+        
+        await self.portfolio_repo.upsert_daily(session, list(daily.values()))
+        await self.portfolio_repo.upsert_assets(session, list(assets.values()))
+        await self.portfolio_repo.upsert_categories(session, list(types.values()))
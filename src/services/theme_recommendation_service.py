@@ -0,0 +1,124 @@
+"""
+Сервис рекомендаций тем по продажам
+
+Пакетный пересчет рекомендаций в worker: после загрузки CSV для автора
+файла и раз в сутки для всех пользователей с историей продаж. Бот только
+читает готовый список (ThemeService.get_recommended_themes)
+"""
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.logging import get_logger
+from src.core.themes.recommender import ThemeRecommender
+from src.database.repositories.portfolio_repo import PortfolioRepository
+from src.database.repositories.theme_recommendation_repo import ThemeRecommendationRepository
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+
+logger = get_logger(__name__)
+
+# Самых доходных активов в профиле пользователя
+PROFILE_ASSETS = 50
+
+# Рекомендаций, сохраняемых на пользователя
+RECOMMENDATIONS_PER_USER = 50
+
+# Пользователей в одной транзакции при полном пересчете
+REFRESH_BATCH_SIZE = 200
+
+
+class ThemeRecommendationService:
+    """Сервис пересчета рекомендаций тем"""
+    
+    def __init__(
+        self,
+        portfolio_repo: PortfolioRepository,
+        theme_template_repo: ThemeTemplateRepository,
+        recommendation_repo: ThemeRecommendationRepository,
+    ):
+        """
+        Инициализация сервиса
+        
+        Args:
+            portfolio_repo: Репозиторий истории продаж
+            theme_template_repo: Репозиторий шаблонов тем
+            recommendation_repo: Репозиторий рекомендованных тем
+        """
+        self.portfolio_repo = portfolio_repo
+        self.theme_template_repo = theme_template_repo
+        self.recommendation_repo = recommendation_repo
+    
+    async def build_model(self, session: AsyncSession) -> ThemeRecommender:
+        """
+        Построить TF-IDF модель по активным темам каталога
+        
+        Args:
+            session: AsyncSession
+            
+        Returns:
+            Модель рекомендаций
+        """
+        themes = await self.theme_template_repo.get_active_themes(session)
+        recommender = ThemeRecommender(
+            (theme_id, theme, keywords) for theme_id, _, theme, keywords in themes
+        )
+        logger.info("theme_recommender_built", themes=len(recommender))
+        return recommender
+    
+    async def refresh_user(
+        self,
+        session: AsyncSession,
+        recommender: ThemeRecommender,
+        user_id: int,
+        commit: bool = True,
+    ) -> int:
+        """
+        Пересчитать рекомендации пользователя
+        
+        Args:
+            session: AsyncSession
+            recommender: Модель рекомендаций
+            user_id: ID пользователя
+            commit: Зафиксировать транзакцию
+            
+        Returns:
+            Количество рекомендованных тем
+        """
+        assets = await self.portfolio_repo.get_top_assets(session, user_id, limit=PROFILE_ASSETS)
+        recommendations = recommender.recommend(
+            ((asset.title, float(asset.revenue)) for asset in assets),
+            limit=RECOMMENDATIONS_PER_USER,
+        )
+        
+        await self.recommendation_repo.save(
+            session,
+            user_id,
+            [theme_id for theme_id, _ in recommendations],
+        )
+        if commit:
+            await session.commit()
+        return len(recommendations)
+    
+    async def refresh_all(
+        self,
+        session: AsyncSession,
+        recommender: ThemeRecommender,
+    ) -> int:
+        """
+        Пересчитать рекомендации всех пользователей с историей продаж
+        
+        Args:
+            session: AsyncSession
+            recommender: Модель рекомендаций
+            
+        Returns:
+            Количество пользователей
+        """
+        user_ids = await self.portfolio_repo.get_user_ids_with_assets(session)
+        
+        for start in range(0, len(user_ids), REFRESH_BATCH_SIZE):
+            for user_id in user_ids[start:start + REFRESH_BATCH_SIZE]:
+                await self.refresh_user(session, recommender, user_id, commit=False)
+            await session.commit()
+        
+        logger.info("theme_recommendations_refreshed", users=len(user_ids))
+        return len(user_ids)
@@ -5,19 +5,29 @@
 """
 
 import random
+from datetime import datetime
 from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logging import get_logger
+from src.core.cache.user_cache import invalidate_user
 from src.core.exceptions import LimitExceededException
-from src.database.models import ThemeRequest
+from src.core.quota.engine import QuotaEngine, consume_limit, refund_limit
+from src.core.themes.index import ThemeIndex
+from src.core.themes.permutation import permute
+from src.database.models import ThemeRequest, ThemeTemplate
 from src.database.repositories.limits_repo import LimitsRepository
+from src.database.repositories.theme_cursor_repo import ThemeCursorRepository
+from src.database.repositories.theme_recommendation_repo import ThemeRecommendationRepository
 from src.database.repositories.theme_repo import ThemeRepository
 from src.database.repositories.theme_template_repo import ThemeTemplateRepository
 
 logger = get_logger(__name__)
 
+# Сколько позиций перестановки пробовать при пропусках в нумерации тем
+DEAL_ATTEMPTS = 8
+
 
 class ThemeService:
     """Сервис для генерации тем"""
@@ -27,6 +37,10 @@ class ThemeService:
         theme_repo: ThemeRepository,
         limits_repo: LimitsRepository,
         theme_template_repo: ThemeTemplateRepository | None = None,
+        quota: Optional[QuotaEngine] = None,
+        theme_index: Optional[ThemeIndex] = None,
+        theme_cursor_repo: Optional[ThemeCursorRepository] = None,
+        theme_recommendation_repo: Optional[ThemeRecommendationRepository] = None,
     ):
         """
         Инициализация сервиса
@@ -35,10 +49,20 @@ class ThemeService:
             theme_repo: Репозиторий тем
             limits_repo: Репозиторий лимитов
             theme_template_repo: Репозиторий шаблонов тем
+            quota: Квоты в Redis (None - списание в таблице limits)
+            theme_index: Индекс тем в памяти (None - выбор темы в БД)
+            theme_cursor_repo: Репозиторий позиций в перестановках тем
+                (None - случайная тема, возможны повторы)
+            theme_recommendation_repo: Репозиторий рекомендованных тем
+                (None - без рекомендаций)
         """
         self.theme_repo = theme_repo
         self.limits_repo = limits_repo
         self.theme_template_repo = theme_template_repo
+        self.quota = quota
+        self.theme_index = theme_index
+        self.theme_cursor_repo = theme_cursor_repo
+        self.theme_recommendation_repo = theme_recommendation_repo
     
     async def can_use_themes(
         self,
@@ -59,12 +83,8 @@ class ThemeService:
         if not limits:
             return False
         
-        # Сбрасываем лимиты если нужно
-        await self.limits_repo.reset_if_needed(session, user_id)
-        limits = await self.limits_repo.get_by_user_id(session, user_id)
-        
-        # -1 означает безлимит
-        if limits.themes_limit == -1:
+        # -1 означает безлимит; истекший период обнулится при списании
+        if limits.themes_limit == -1 or limits.reset_at <= datetime.utcnow():
             return True
         
         return limits.themes_used < limits.themes_limit
@@ -88,28 +108,36 @@ class ThemeService:
             
         Raises:
             LimitExceededException: Превышен лимит тем
+            RedisError: Квоты ведутся в Redis, а он недоступен
         """
-        # Проверяем лимиты
-        if not await self.can_use_themes(session, user_id):
-            limits = await self.limits_repo.get_by_user_id(session, user_id)
+        # Проверяем и списываем лимит одним запросом
+        usage = await consume_limit(session, self.limits_repo, self.quota, user_id, "themes")
+        if usage is None or not usage.allowed:
+            used, limit = (usage.used, usage.limit) if usage else (0, 0)
             raise LimitExceededException(
-                f"Превышен лимит тем. Использовано: {limits.themes_used}/{limits.themes_limit}"
+                f"Превышен лимит тем. Использовано: {used}/{limit}"
             )
         
-        # Генерация темы из БД
-        theme_text = await self._generate_theme_from_db(session, category)
-        
-        # Создаем запрос темы
-        theme_request = ThemeRequest(
-            user_id=user_id,
-            theme=theme_text,
-            category=category,
-        )
-        
-        theme_request = await self.theme_repo.create(session, theme_request)
-        
-        # Увеличиваем счетчик использованных тем
-        await self.limits_repo.increment_themes(session, user_id)
+        try:
+            # Генерация темы из БД
+            theme_text = await self._generate_theme_from_db(session, user_id, category)
+            
+            # Создаем запрос темы
+            theme_request = ThemeRequest(
+                user_id=user_id,
+                theme=theme_text,
+                category=category,
+            )
+            
+            # Коммит фиксирует тему вместе со списанием лимита в БД
+            theme_request = await self.theme_repo.create(session, theme_request)
+        except Exception:
+            # Без Redis списание в БД откатывается вместе с записью
+            if self.quota is not None:
+                await session.rollback()
+                await refund_limit(session, self.limits_repo, self.quota, user_id, "themes")
+            raise
+        await invalidate_user(user_id)
         
         logger.info(
             "theme_generated",
@@ -139,21 +167,98 @@ class ThemeService:
         """
         return await self.theme_repo.get_by_user_id(session, user_id, limit)
     
+    async def search_themes(
+        self,
+        session: AsyncSession,
+        query: str,
+        category: Optional[str] = None,
+        limit: int = 10,
+    ) -> list[tuple[int, str, str]]:
+        """
+        Найти темы по словам запроса
+        
+        Поиск не списывает лимит тем. Если индекс тем загружен, поиск идет
+        в памяти, иначе - в БД (ThemeTemplateRepository.search).
+        
+        Args:
+            session: AsyncSession
+            query: Текст запроса
+            category: Категория (None - все категории)
+            limit: Максимум результатов
+            
+        Returns:
+            Список (id, category, theme) от лучшего совпадения к худшему
+        """
+        if self.theme_index is not None and self.theme_index.loaded:
+            return self.theme_index.search(query, category, limit)
+        
+        if self.theme_template_repo is None:
+            return []
+        
+        templates = await self.theme_template_repo.search(session, query, category, limit)
+        return [(template.id, template.category, template.theme) for template in templates]
+    
+    async def get_recommended_themes(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        limit: int = 10,
+    ) -> list[ThemeTemplate]:
+        """
+        Получить темы, похожие на самые продаваемые активы пользователя
+        
+        Список заранее рассчитан в worker (ThemeRecommendationService),
+        здесь только чтение. Лимит тем не списывается.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            limit: Максимум тем
+            
+        Returns:
+            Список тем от самой похожей (пусто, если продаж еще нет)
+        """
+        if self.theme_recommendation_repo is None or self.theme_template_repo is None:
+            return []
+        
+        theme_ids = await self.theme_recommendation_repo.get_theme_ids(session, user_id)
+        templates = await self.theme_template_repo.get_active_by_ids(session, theme_ids[:limit * 2])
+        return templates[:limit]
+    
     async def _generate_theme_from_db(
         self,
         session: AsyncSession,
+        user_id: int,
         category: str,
     ) -> str:
         """
         Генерация темы из БД
         
+        С theme_cursor_repo темы выдаются без повторов: каждому
+        пользователю - по своей перестановке каталога категории, пока
+        каталог не исчерпан.
+        
         Args:
             session: AsyncSession
+            user_id: ID пользователя
             category: Категория темы
             
         Returns:
             Текст темы
         """
+        use_index = self.theme_index is not None and self.theme_index.loaded
+        
+        if self.theme_cursor_repo is not None:
+            theme = await self._deal_theme(session, user_id, category, use_index)
+            if theme is not None:
+                return theme
+        
+        # Случайная тема из индекса в памяти - без запроса к БД
+        if use_index:
+            picked = self.theme_index.pick(category)
+            if picked is not None:
+                return picked[1]
+        
         # Пытаемся получить случайную тему из БД
         if self.theme_template_repo:
             template = await self.theme_template_repo.get_random_by_category(
@@ -173,4 +278,59 @@ class ThemeService:
         }
         
         return themes_by_category.get(category, "Общая тема для контента")
-
+    
+    async def _deal_theme(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        category: str,
+        use_index: bool,
+    ) -> Optional[str]:
+        """
+        Выдать следующую тему из перестановки пользователя
+        
+        Номера тем стабильны: на позиции может оказаться пропуск
+        (выключенная или удаленная тема) или номер больше текущего
+        каталога. Тогда курсор сдвигается дальше, но не больше
+        DEAL_ATTEMPTS раз - дальше вызывающий код выбирает случайную тему.
+        
+        Args:
+            session: AsyncSession
+            user_id: ID пользователя
+            category: Категория темы
+            use_index: Брать темы из индекса в памяти
+            
+        Returns:
+            Текст темы или None, если тема не найдена
+        """
+        if use_index:
+            catalog_size = self.theme_index.max_ordinal(category)
+        elif self.theme_template_repo:
+            catalog_size = await self.theme_template_repo.get_max_ordinal(session, category)
+        else:
+            return None
+        
+        if catalog_size == 0:
+            return None
+        
+        for _ in range(DEAL_ATTEMPTS):
+            seed, position, round_size = await self.theme_cursor_repo.advance(
+                session,
+                user_id,
+                category,
+                catalog_size,
+            )
+            ordinal = permute(position, round_size, seed) + 1
+            
+            if use_index:
+                picked = self.theme_index.get(category, ordinal)
+                if picked is not None:
+                    return picked[1]
+                continue
+            
+            template = await self.theme_template_repo.get_by_ordinal(session, category, ordinal)
+            if template is not None:
+                return template.theme
+        
+        logger.warning("theme_deal_gaps_exhausted", user_id=user_id, category=category)
+        return None
@@ -7,13 +7,16 @@
 from datetime import datetime, timedelta
 from typing import Optional
 
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logging import get_logger
+from src.core.cache.user_cache import invalidate_user
 from src.core.exceptions import UserNotFoundException
 from src.database.models import User, SubscriptionTier
 from src.database.repositories.user_repo import UserRepository
 from src.database.repositories.limits_repo import LimitsRepository
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
 
 logger = get_logger(__name__)
 
@@ -25,6 +28,7 @@ class UserService:
         self,
         user_repo: UserRepository,
         limits_repo: LimitsRepository,
+        metrics_snapshot_repo: Optional[MetricsSnapshotRepository] = None,
     ):
         """
         Инициализация сервиса
@@ -32,9 +36,12 @@ class UserService:
         Args:
             user_repo: Репозиторий пользователей
             limits_repo: Репозиторий лимитов
+            metrics_snapshot_repo: Репозиторий снимков метрик
+                (регистрации сразу учитываются в админ-панели)
         """
         self.user_repo = user_repo
         self.limits_repo = limits_repo
+        self.metrics_snapshot_repo = metrics_snapshot_repo
     
     async def get_or_create(
         self,
@@ -64,6 +71,7 @@ class UserService:
                 user.updated_at = datetime.utcnow()
                 await session.commit()
                 await session.refresh(user)
+                await invalidate_user(user.id)
             
             logger.info(
                 "user_found",
@@ -98,6 +106,21 @@ class UserService:
             referrer_id=referrer_id,
         )
         
+        if self.metrics_snapshot_repo is not None:
+            try:
+                await self.metrics_snapshot_repo.bump(
+                    session,
+                    total_users=1,
+                    new_users_24h=1,
+                    active_users_7d=1,
+                    free_users=1,
+                    referrals_total=1 if referrer_id else 0,
+                )
+            except SQLAlchemyError as e:
+                # Снимок поправит следующий пересчет
+                await session.rollback()
+                logger.warning("metrics_bump_error", user_id=user.id, error=str(e))
+        
         return user
     
     async def get_by_telegram_id(
@@ -167,6 +190,7 @@ class UserService:
         
         await session.commit()
         await session.refresh(user)
+        await invalidate_user(user_id)
         
         # Обновляем лимиты для новой подписки
         await self.limits_repo.update_for_subscription(
@@ -218,6 +242,7 @@ class UserService:
         
         await session.commit()
         await session.refresh(user)
+        await invalidate_user(user_id)
         
         logger.info(
             "subscription_extended",
@@ -254,6 +279,7 @@ class UserService:
         
         await session.commit()
         await session.refresh(user)
+        await invalidate_user(user_id)
         
         logger.info("user_banned", user_id=user_id)
         
@@ -286,6 +312,7 @@ class UserService:
         
         await session.commit()
         await session.refresh(user)
+        await invalidate_user(user_id)
         
         logger.info("user_unbanned", user_id=user_id)
         
@@ -0,0 +1,41 @@
+"""
+Потоковое скачивание файлов Telegram в worker
+
+Файл не сохраняется ни в память целиком, ни на диск: блоки из сети
+сразу передаются в разбор (pipeline.StreamAnalysis)
+"""
+
+from typing import AsyncIterator
+
+from aiogram import Bot
+
+from src.config.logging import get_logger
+from src.config.settings import settings
+
+logger = get_logger(__name__)
+
+# Размер блока при скачивании
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+async def stream_telegram_file(bot: Bot, file_id: str) -> AsyncIterator[bytes]:
+    """
+    Открыть поток блоков файла Telegram
+    
+    Args:
+        bot: Экземпляр бота
+        file_id: Telegram file_id
+        
+    Returns:
+        Асинхронный поток блоков файла
+    """
+    telegram_file = await bot.get_file(file_id)
+    url = bot.session.api.file_url(bot.token, telegram_file.file_path)
+    
+    logger.info("telegram_file_download_started", file_id=file_id, size=telegram_file.file_size)
+    return bot.session.stream_content(
+        url=url,
+        timeout=settings.worker.download_timeout,
+        chunk_size=DOWNLOAD_CHUNK_SIZE,
+        raise_for_status=True,
+    )
@@ -4,40 +4,66 @@ ARQ Workers для IQStocker v2.0
 Фоновые задачи для обработки CSV и других асинхронных операций
 """
 
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any
 
-from arq import create_pool
-from arq.connections import RedisSettings
+from aiogram import Bot
+from arq import create_pool, cron, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.config.logging import get_logger
 from src.config.settings import settings
-from src.core.analytics.csv_processor import CSVProcessor
-from src.core.analytics.kpi_calculator import KPICalculator
-from src.core.analytics.report_generator import ReportGenerator
+from src.core.analytics.pipeline import StreamAnalysis
+from src.core.cache.report_cache import ReportCache
+from src.core.quota.engine import QuotaEngine, refund_limit
 from src.database.connection import AsyncSessionLocal, get_session
 from src.database.models import AnalysisStatus, AnalyticsReport
 from src.database.repositories.analytics_repo import (
     CSVAnalysisRepository,
     AnalyticsReportRepository,
 )
+from src.database.repositories.limits_repo import LimitsRepository
+from src.database.repositories.metrics_rollup_repo import MetricsRollupRepository
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
+from src.database.repositories.payment_repo import PaymentRepository
+from src.database.repositories.portfolio_repo import PortfolioRepository
+from src.database.repositories.theme_recommendation_repo import ThemeRecommendationRepository
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+from src.database.repositories.user_repo import UserRepository
+from src.services.admin_service import AdminService
+from src.services.metrics_rollup_service import MetricsRollupService
+from src.services.portfolio_service import PortfolioService
+from src.services.theme_recommendation_service import ThemeRecommendationService
+from src.workers.downloader import stream_telegram_file
+from src.workers.queue import get_arq_redis_settings
 
 logger = get_logger(__name__)
 
 
-async def process_csv(ctx: dict[str, Any], csv_analysis_id: int) -> None:
+async def process_csv(
+    ctx: dict[str, Any],
+    csv_analysis_id: int,
+    file_size: int | None = None,
+) -> None:
     """
-    Обработать CSV файл и создать отчет
+    Скачать CSV файл из Telegram, проанализировать и создать отчет
+    
+    Файл разбирается прямо из потока скачивания за один проход: каждая
+    часть дает и агрегат KPI, и строки истории продаж.
     
     Args:
         ctx: Контекст ARQ worker
         csv_analysis_id: ID анализа CSV
+        file_size: Размер файла из сообщения (только для логов)
     """
-    logger.info("csv_processing_started", csv_analysis_id=csv_analysis_id)
+    logger.info("csv_processing_started", csv_analysis_id=csv_analysis_id, file_size=file_size)
     
     async with AsyncSessionLocal() as session:
+        csv_analysis_repo = CSVAnalysisRepository()
+        stream = None
         try:
-            csv_analysis_repo = CSVAnalysisRepository()
             analytics_report_repo = AnalyticsReportRepository()
             
             # Получаем анализ
@@ -53,37 +79,81 @@ async def process_csv(ctx: dict[str, Any], csv_analysis_id: int) -> None:
                 AnalysisStatus.PROCESSING,
             )
             
-            # TODO: Скачать файл через Telegram Bot API
-            # Для MVP используем file_id напрямую
-            # file = await bot.get_file(analysis.file_id)
-            # content = await bot.download_file(file.file_path)
-            
-            # Заглушка для MVP - нужно будет реализовать загрузку файла
-            logger.warning(
-                "csv_file_download_placeholder",
-                csv_analysis_id=csv_analysis_id,
-                file_id=analysis.file_id,
+            # Парсинг - CPU-работа: части потока разбираются в пуле процессов,
+            # в event loop остаются скачивание и запись в БД
+            stream = StreamAnalysis(
+                await stream_telegram_file(ctx["bot"], analysis.file_id),
+                executor=ctx.get("process_pool"),
+                inline_max_bytes=settings.worker.inline_max_bytes,
+                max_pending=settings.worker.get_process_pool_size(),
             )
             
-            # Временно возвращаемся - нужно загрузить файл
-            # Пока создаем тестовый контент
-            # content = await download_telegram_file(analysis.file_id)
-            
-            # Парсим CSV
-            # parsed_data = CSVProcessor.parse_csv(content)
-            
-            # TODO: Реальная загрузка файла через Telegram API
-            # Пока используем заглушку
-            parsed_data = []
+            # Продажи добавляются в историю портфолио по ходу разбора.
+            # Строки, которые уже есть в истории (в том числе при повторной
+            # загрузке того же файла), не меняют агрегаты
+            try:
+                await PortfolioService(PortfolioRepository()).merge_sales(
+                    session,
+                    analysis.user_id,
+                    stream.sales,
+                    csv_analysis_id=csv_analysis_id,
+                )
+            except Exception as e:
+                # Ошибка скачивания или разбора - анализ не удался
+                if stream.error is not None:
+                    raise
+                await session.rollback()
+                logger.error(
+                    "portfolio_merge_failed",
+                    csv_analysis_id=csv_analysis_id,
+                    error=str(e),
+                    exc_info=True,
+                )
+                # KPI нужны для отчета - дочитываем поток без записи
+                await stream.drain()
             
-            # Валидируем данные
-            CSVProcessor.validate_csv(parsed_data)
+            # Тот же файл пользователя уже анализировался - переиспользуем отчет
+            existing_report = await analytics_report_repo.get_by_content_hash(
+                session,
+                analysis.user_id,
+                stream.content_hash,
+                exclude_analysis_id=csv_analysis_id,
+            )
             
-            # Рассчитываем KPI
-            kpi_data = KPICalculator.calculate_kpi(parsed_data)
+            if existing_report is not None:
+                kpi_data = existing_report.kpi_data
+                summary_text = existing_report.summary_text
+                logger.info(
+                    "csv_report_reused",
+                    csv_analysis_id=csv_analysis_id,
+                    report_id=existing_report.id,
+                )
+                
+                # Отчет не создавался - лимит, списанный при загрузке, возвращается
+                await refund_limit(
+                    session,
+                    LimitsRepository(),
+                    QuotaEngine(ctx["redis"]) if settings.quota.enabled and "redis" in ctx else None,
+                    analysis.user_id,
+                    "analytics",
+                )
+            else:
+                kpi_data, summary_text = stream.result()
+                
+                if kpi_data.get("skipped_rows"):
+                    logger.warning(
+                        "csv_rows_skipped",
+                        csv_analysis_id=csv_analysis_id,
+                        skipped_rows=kpi_data["skipped_rows"],
+                    )
             
-            # Генерируем текст отчета
-            summary_text = ReportGenerator.generate_summary(kpi_data)
+            # Хэш и число строк известны только после скачивания
+            await csv_analysis_repo.set_content_info(
+                session,
+                csv_analysis_id,
+                stream.content_hash,
+                row_count=kpi_data.get("row_count"),
+            )
             
             # Создаем отчет
             report_obj = AnalyticsReport(
@@ -91,7 +161,7 @@ async def process_csv(ctx: dict[str, Any], csv_analysis_id: int) -> None:
                 kpi_data=kpi_data,
                 summary_text=summary_text,
             )
-            await analytics_report_repo.create(session, report_obj)
+            report_obj = await analytics_report_repo.create(session, report_obj)
             
             # Обновляем статус на COMPLETED
             await csv_analysis_repo.update_status(
@@ -100,9 +170,40 @@ async def process_csv(ctx: dict[str, Any], csv_analysis_id: int) -> None:
                 AnalysisStatus.COMPLETED,
             )
             
+            # Кэшируем отчет для повторных загрузок того же файла
+            if "redis" in ctx:
+                await ReportCache(ctx["redis"]).set(
+                    analysis.user_id,
+                    stream.content_hash,
+                    report_obj.id,
+                    summary_text,
+                    file_unique_id=analysis.file_unique_id,
+                )
+            
+            # Рекомендации тем по обновленной истории продаж
+            if existing_report is None:
+                try:
+                    recommendation_service = _recommendation_service()
+                    if "theme_recommender" not in ctx:
+                        ctx["theme_recommender"] = await recommendation_service.build_model(session)
+                    await recommendation_service.refresh_user(
+                        session,
+                        ctx["theme_recommender"],
+                        analysis.user_id,
+                    )
+                except Exception as e:
+                    await session.rollback()
+                    logger.error(
+                        "theme_recommendations_failed",
+                        csv_analysis_id=csv_analysis_id,
+                        error=str(e),
+                        exc_info=True,
+                    )
+            
             logger.info(
                 "csv_processing_completed",
                 csv_analysis_id=csv_analysis_id,
+                size=stream.size,
                 total_sales=kpi_data.get("total_sales", 0),
             )
         
@@ -116,6 +217,7 @@ async def process_csv(ctx: dict[str, Any], csv_analysis_id: int) -> None:
             
             # Обновляем статус на FAILED
             try:
+                await session.rollback()
                 await csv_analysis_repo.update_status(
                     session,
                     csv_analysis_id,
@@ -124,26 +226,153 @@ async def process_csv(ctx: dict[str, Any], csv_analysis_id: int) -> None:
                 )
             except Exception:
                 pass
+        
+        finally:
+            # Прерванный разбор отменяет части, ожидающие в пуле
+            if stream is not None:
+                await stream.aclose()
+
+
+async def flush_quotas(ctx: dict[str, Any]) -> None:
+    """
+    Записать счетчики квот из Redis в таблицу limits
+    
+    Args:
+        ctx: Контекст ARQ worker
+    """
+    if not settings.quota.enabled:
+        return
+    
+    async with AsyncSessionLocal() as session:
+        await QuotaEngine(ctx["redis"]).flush(session)
+
+
+async def refresh_metrics(ctx: dict[str, Any]) -> None:
+    """
+    Пересчитать снимок метрик админ-панели
+    
+    Args:
+        ctx: Контекст ARQ worker
+    """
+    admin_service = AdminService(
+        UserRepository(),
+        PaymentRepository(),
+        CSVAnalysisRepository(),
+        AnalyticsReportRepository(),
+        MetricsSnapshotRepository(),
+    )
+    async with AsyncSessionLocal() as session:
+        await admin_service.refresh_metrics_snapshot(session)
+
+
+async def rollup_metrics(ctx: dict[str, Any]) -> None:
+    """
+    Пересчитать часовые и дневные агрегаты метрик за последние интервалы
+    
+    Args:
+        ctx: Контекст ARQ worker
+    """
+    rollup_service = MetricsRollupService(
+        UserRepository(),
+        PaymentRepository(),
+        CSVAnalysisRepository(),
+        MetricsRollupRepository(),
+    )
+    async with AsyncSessionLocal() as session:
+        await rollup_service.refresh(session)
+
+
+async def refresh_theme_recommendations(ctx: dict[str, Any]) -> None:
+    """
+    Перестроить модель по текущему каталогу тем и пересчитать
+    рекомендации всех пользователей
+    
+    Args:
+        ctx: Контекст ARQ worker
+    """
+    recommendation_service = _recommendation_service()
+    async with AsyncSessionLocal() as session:
+        ctx["theme_recommender"] = await recommendation_service.build_model(session)
+        await recommendation_service.refresh_all(session, ctx["theme_recommender"])
+
+
+def _recommendation_service() -> ThemeRecommendationService:
+    """Сервис рекомендаций тем"""
+    return ThemeRecommendationService(
+        PortfolioRepository(),
+        ThemeTemplateRepository(),
+        ThemeRecommendationRepository(),
+    )
+
+
+async def startup(ctx: dict[str, Any]) -> None:
+    """
+    Запуск worker: бот для скачивания файлов и пул процессов для анализа CSV
+    
+    Args:
+        ctx: Контекст ARQ worker
+    """
+    ctx["bot"] = Bot(token=settings.bot.token)
+    
+    pool_size = settings.worker.get_process_pool_size()
+    # spawn: дочерние процессы не наследуют event loop и соединения worker
+    ctx["process_pool"] = ProcessPoolExecutor(
+        max_workers=pool_size,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    logger.info("worker_started", process_pool_size=pool_size)
+
+
+async def shutdown(ctx: dict[str, Any]) -> None:
+    """
+    Остановка worker: завершение пула процессов и сессии бота
+    
+    Args:
+        ctx: Контекст ARQ worker
+    """
+    # Последняя запись квот: счетчики не должны ждать следующего запуска
+    try:
+        await flush_quotas(ctx)
+    except Exception as e:
+        logger.error("quota_flush_error", error=str(e), exc_info=True)
+    
+    process_pool = ctx.pop("process_pool", None)
+    if process_pool is not None:
+        # Ожидание дочерних процессов не должно блокировать event loop
+        await asyncio.to_thread(process_pool.shutdown, wait=True, cancel_futures=True)
+    
+    bot = ctx.pop("bot", None)
+    if bot is not None:
+        await bot.session.close()
+    logger.info("worker_stopped")
 
 
 # Настройки ARQ Worker
 class WorkerSettings:
     """Настройки ARQ Worker"""
     
-    redis_settings = RedisSettings(
-        host=settings.redis.host,
-        port=settings.redis.port,
-        database=settings.redis.db,
-    )
+    redis_settings = get_arq_redis_settings()
+    
+    # Результат process_csv не читается; без сохраненного результата
+    # тот же _job_id можно поставить снова сразу после завершения (/reprocess)
+    functions = [func(process_csv, keep_result=0)]
+    
+    on_startup = startup
+    on_shutdown = shutdown
     
-    functions = [process_csv]
+    # Одновременные задачи: CPU-часть каждой выполняется в пуле процессов
+    max_jobs = settings.worker.max_jobs
     
-    # Настройки для cron задач (если нужны)
+    # Периодические задачи
     cron_jobs = [
-        # {
-        #     "function": "some_periodic_task",
-        #     "cron": "0 0 * * *",  # Каждый день в полночь
-        # },
+        # Каждую минуту: запись квот из Redis в limits
+        cron(flush_quotas),
+        # Каждые 5 минут: снимок метрик админ-панели
+        cron(refresh_metrics, minute=set(range(0, 60, 5))),
+        # Каждые 10 минут: агрегаты метрик по часам и дням для графиков
+        cron(rollup_metrics, minute=set(range(1, 60, 10))),
+        # Раз в сутки ночью: рекомендации тем по новому каталогу
+        cron(refresh_theme_recommendations, hour={4}, minute={0}),
     ]
 
 
@@ -0,0 +1,213 @@
+"""
+Клиент очереди задач ARQ
+
+Одно соединение с Redis на процесс бота: задачи ставятся без нового
+TCP-подключения на каждую загрузку
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Iterable, Optional, TypeVar
+
+from arq import ArqRedis, create_pool
+from arq.connections import RedisSettings
+from arq.jobs import Job
+from redis.exceptions import RedisError
+
+from src.config.logging import get_logger
+from src.config.settings import settings
+
+logger = get_logger(__name__)
+
+# Интервал проверки соединения перед постановкой задачи, секунды
+HEALTH_CHECK_INTERVAL = 30
+
+# Сколько задач enqueue_many ставит одновременно
+ENQUEUE_BATCH_SIZE = 100
+
+T = TypeVar("T")
+
+
+def get_arq_redis_settings() -> RedisSettings:
+    """
+    Настройки подключения ARQ к Redis
+    
+    Returns:
+        RedisSettings для create_pool и worker
+    """
+    return RedisSettings(
+        host=settings.redis.host,
+        port=settings.redis.port,
+        database=settings.redis.db,
+    )
+
+
+class JobQueue:
+    """
+    Клиент очереди задач с общим пулом соединений
+    
+    Пул создается при первой задаче (или в connect) и переиспользуется.
+    Если соединение не проверялось дольше health_check_interval, перед
+    задачей выполняется PING; при ошибке пул пересоздается.
+    """
+    
+    def __init__(
+        self,
+        redis_settings: Optional[RedisSettings] = None,
+        health_check_interval: int = HEALTH_CHECK_INTERVAL,
+    ):
+        """
+        Инициализация клиента
+        
+        Args:
+            redis_settings: Настройки Redis (по умолчанию из настроек приложения)
+            health_check_interval: Интервал проверки соединения, секунды
+        """
+        self.redis_settings = redis_settings or get_arq_redis_settings()
+        self.health_check_interval = health_check_interval
+        self._pool: Optional[ArqRedis] = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+    
+    async def connect(self) -> None:
+        """Установить соединение заранее (при запуске бота)"""
+        await self._get_pool()
+    
+    async def close(self) -> None:
+        """Закрыть соединение"""
+        async with self._lock:
+            await self._drop_pool()
+    
+    async def enqueue(self, function: str, *args: Any, **kwargs: Any) -> Optional[Job]:
+        """
+        Поставить задачу в очередь
+        
+        При ошибке соединения пул пересоздается и постановка повторяется
+        один раз. Чтобы повтор не создал дубль, передавайте _job_id.
+        
+        Args:
+            function: Имя функции worker
+            *args: Аргументы задачи
+            **kwargs: Именованные аргументы задачи и параметры ARQ (_job_id, _defer_by, ...)
+            
+        Returns:
+            Задача или None, если задача с таким _job_id уже есть
+            
+        Raises:
+            RedisError: Redis недоступен
+        """
+        return await self._with_reconnect(
+            function,
+            lambda pool: pool.enqueue_job(function, *args, **kwargs),
+        )
+    
+    async def enqueue_many(
+        self,
+        function: str,
+        args_list: Iterable[tuple[Any, ...]],
+        batch_size: int = ENQUEUE_BATCH_SIZE,
+        job_id: Optional[Callable[..., str]] = None,
+    ) -> int:
+        """
+        Поставить пачку однотипных задач
+        
+        Задачи ставятся параллельно группами по batch_size через общий пул,
+        так что задержка Redis оплачивается один раз на группу, а не на задачу.
+        При ошибке соединения пул пересоздается и группа ставится повторно
+        один раз - уже поставленные задачи группы не дублируются только
+        при заданном job_id.
+        
+        Args:
+            function: Имя функции worker
+            args_list: Аргументы каждой задачи
+            batch_size: Размер группы
+            job_id: Функция, строящая _job_id по аргументам задачи
+            
+        Returns:
+            Количество поставленных задач
+            
+        Raises:
+            RedisError: Redis недоступен
+        """
+        args_list = list(args_list)
+        enqueued = 0
+        
+        for start in range(0, len(args_list), batch_size):
+            group = [
+                (args, {"_job_id": job_id(*args)} if job_id is not None else {})
+                for args in args_list[start:start + batch_size]
+            ]
+            jobs = await self._with_reconnect(
+                function,
+                lambda pool: asyncio.gather(*(
+                    pool.enqueue_job(function, *args, **kwargs)
+                    for args, kwargs in group
+                )),
+            )
+            enqueued += sum(job is not None for job in jobs)
+        
+        logger.info("jobs_enqueued", function=function, requested=len(args_list), enqueued=enqueued)
+        return enqueued
+    
+    async def _with_reconnect(
+        self,
+        function: str,
+        call: Callable[[ArqRedis], Awaitable[T]],
+    ) -> T:
+        """
+        Выполнить операцию с пулом, при ошибке соединения повторив один раз
+        
+        Args:
+            function: Имя функции worker (для лога)
+            call: Операция над пулом
+            
+        Returns:
+            Результат операции
+            
+        Raises:
+            RedisError: Redis недоступен
+        """
+        pool = await self._get_pool()
+        try:
+            return await call(pool)
+        except (RedisError, OSError) as e:
+            logger.warning("job_queue_reconnect", function=function, error=str(e))
+            pool = await self._get_pool(force_reconnect=True)
+            return await call(pool)
+    
+    async def _get_pool(self, force_reconnect: bool = False) -> ArqRedis:
+        """
+        Получить рабочий пул, при необходимости проверив и пересоздав его
+        
+        Args:
+            force_reconnect: Пересоздать пул без проверки
+            
+        Returns:
+            Пул соединений ARQ
+        """
+        async with self._lock:
+            if self._pool is not None and not force_reconnect:
+                if time.monotonic() - self._checked_at < self.health_check_interval:
+                    return self._pool
+                try:
+                    await self._pool.ping()
+                    self._checked_at = time.monotonic()
+                    return self._pool
+                except (RedisError, OSError) as e:
+                    logger.warning("job_queue_health_check_failed", error=str(e))
+            
+            await self._drop_pool()
+            self._pool = await create_pool(self.redis_settings)
+            self._checked_at = time.monotonic()
+            logger.info("job_queue_connected", host=self.redis_settings.host)
+            return self._pool
+    
+    async def _drop_pool(self) -> None:
+        """Закрыть текущий пул, игнорируя ошибки соединения"""
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        try:
+            await pool.aclose()
+        except (RedisError, OSError):
+            pass
@@ -0,0 +1,159 @@
+"""
+Unit тесты для AdminService
+
+Тестирование статистики дашборда на агрегатных запросах и снимков метрик
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.models import (
+    AnalysisStatus,
+    AnalyticsReport,
+    CSVAnalysis,
+    Payment,
+    PaymentStatus,
+    SubscriptionTier,
+    User,
+)
+from src.database.repositories.analytics_repo import (
+    AnalyticsReportRepository,
+    CSVAnalysisRepository,
+)
+from src.database.repositories.limits_repo import LimitsRepository
+from src.database.repositories.metrics_snapshot_repo import MetricsSnapshotRepository
+from src.database.repositories.payment_repo import PaymentRepository
+from src.database.repositories.user_repo import UserRepository
+from src.services.admin_service import AdminService
+from src.services.user_service import UserService
+
+
+@pytest.mark.asyncio
+async def test_dashboard_stats(test_session):
+    """Тест: счетчики пользователей, платежей и анализов"""
+    now = datetime.utcnow()
+    old = now - timedelta(days=40)
+    
+    referrer = User(telegram_id=1, created_at=old, updated_at=old)
+    test_session.add(referrer)
+    await test_session.commit()
+    
+    test_session.add_all([
+        User(telegram_id=2, subscription_tier=SubscriptionTier.PRO, referrer_id=referrer.id),
+        User(telegram_id=3, subscription_tier=SubscriptionTier.ULTRA, created_at=old, updated_at=now - timedelta(days=3)),
+    ])
+    await test_session.commit()
+    
+    def payment(number: int, amount: int, completed_at, status=PaymentStatus.COMPLETED) -> Payment:
+        return Payment(
+            user_id=referrer.id,
+            tribute_transaction_id=f"tx-{number}",
+            amount=amount,
+            status=status,
+            subscription_tier=SubscriptionTier.PRO,
+            completed_at=completed_at,
+        )
+    
+    test_session.add_all([
+        payment(1, 99000, now - timedelta(hours=2)),
+        payment(2, 50000, now - timedelta(days=10)),
+        payment(3, 10000, old),
+        payment(4, 77700, None, status=PaymentStatus.PENDING),
+        CSVAnalysis(user_id=referrer.id, file_id="f", filename="a.csv", row_count=1, analysis_status=AnalysisStatus.COMPLETED),
+    ])
+    await test_session.commit()
+    
+    service = AdminService(
+        UserRepository(),
+        PaymentRepository(),
+        CSVAnalysisRepository(),
+        AnalyticsReportRepository(),
+    )
+    stats = await service.get_dashboard_stats(test_session)
+    
+    assert stats == {
+        "total_users": 3,
+        "new_users_24h": 1,
+        "active_users_7d": 2,
+        "free_users": 1,
+        "pro_users": 1,
+        "ultra_users": 1,
+        "payments_today": 1,
+        "payments_month": 2,
+        "total_revenue_today": 990.0,
+        "total_revenue_month": 1490.0,
+        "total_revenue": 1590.0,
+        "referrals_total": 1,
+        "total_analyses": 1,
+    }
+
+
+@pytest.mark.asyncio
+async def test_metrics_snapshot_refresh_and_bump(test_session):
+    """Тест: админ-панель читает снимок, события сразу увеличивают счетчики"""
+    metrics_repo = MetricsSnapshotRepository()
+    service = AdminService(
+        UserRepository(),
+        PaymentRepository(),
+        CSVAnalysisRepository(),
+        AnalyticsReportRepository(),
+        metrics_repo,
+    )
+    user_service = UserService(UserRepository(), LimitsRepository(), metrics_repo)
+    
+    user = await user_service.get_or_create(test_session, telegram_id=10)
+    analyses = [
+        CSVAnalysis(user_id=user.id, file_id=f"f-{number}", filename="a.csv", row_count=1)
+        for number in range(2)
+    ]
+    test_session.add_all(analyses)
+    await test_session.commit()
+    test_session.add_all([
+        AnalyticsReport(csv_analysis_id=analysis.id, kpi_data={"cpm": cpm}, summary_text="")
+        for analysis, cpm in zip(analyses, (2.5, 3.5))
+    ])
+    await test_session.commit()
+    
+    # Первое чтение создает снимок
+    stats = await service.get_dashboard_snapshot(test_session)
+    assert stats["total_users"] == 1
+    assert await service.get_analytics_snapshot(test_session) == {
+        "total_reports": 2,
+        "avg_cpm": 3.0,
+        "top_users_by_analyses": [(user.id, 2)],
+    }
+    
+    await user_service.get_or_create(test_session, telegram_id=11, referrer_id=user.id)
+    stats = await service.get_dashboard_snapshot(test_session)
+    assert stats["total_users"] == 2
+    assert stats["free_users"] == 2
+    assert stats["referrals_total"] == 1
+    
+    # Пересчет добавляет снимок в историю с теми же значениями
+    snapshot = await service.refresh_metrics_snapshot(test_session)
+    assert snapshot.total_users == 2
+    assert len(await metrics_repo.get_since(test_session, datetime.utcnow() - timedelta(hours=1))) == 2
+
+
+@pytest.mark.asyncio
+async def test_reset_failed_analyses(test_session):
+    """Тест: /reprocess переводит анализы с ошибкой в ожидание один раз"""
+    user = await UserRepository().create(test_session, User(telegram_id=10))
+    test_session.add_all([
+        CSVAnalysis(user_id=user.id, file_id=str(i), filename=f"{i}.csv", row_count=0,
+                    analysis_status=status, error_message="boom" if status == AnalysisStatus.FAILED else None)
+        for i, status in enumerate([AnalysisStatus.FAILED, AnalysisStatus.COMPLETED, AnalysisStatus.FAILED])
+    ])
+    await test_session.commit()
+    repo = CSVAnalysisRepository()
+    
+    analysis_ids = await repo.reset_status(test_session, AnalysisStatus.FAILED, AnalysisStatus.PENDING)
+    
+    assert len(analysis_ids) == 2
+    assert await repo.reset_status(test_session, AnalysisStatus.FAILED, AnalysisStatus.PENDING) == []
+    for analysis_id in analysis_ids:
+        analysis = await repo.get_by_id(test_session, analysis_id)
+        await test_session.refresh(analysis)
+        assert analysis.analysis_status == AnalysisStatus.PENDING
+        assert analysis.error_message is None
@@ -0,0 +1,74 @@
+"""
+Unit тесты для массовой вставки
+
+Тестирование COPY в PostgreSQL и запасного пути для SQLite
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from src.database.models import SaleFact, SQLModel, User
+from src.database.repositories.bulk import insert_ignore, supports_copy
+from src.database.repositories.portfolio_repo import SALE_KEY
+
+
+def _make_facts(user_id: int, count: int) -> list[dict]:
+    """Создать значения SaleFact"""
+    return [
+        {
+            "user_id": user_id,
+            "asset_id": str(i % 50),
+            "sold_at": datetime(2024, 1, 1 + i % 28, i % 24),
+            "day": date(2024, 1, 1 + i % 28),
+            "purchase_type": "custom",
+            "revenue": Decimal("1.2500"),
+            "title": f"Asset {i % 50}",
+            "category": "photos",
+            "impressions": 1,
+            "downloads": 1,
+            "csv_analysis_id": None,
+        }
+        for i in range(count)
+    ]
+
+
+async def _insert_twice(session: AsyncSession) -> tuple[int, int, int]:
+    """Вставить пересекающиеся пачки и вернуть (вставлено, вставлено, всего)
+    
+    Вторая пачка содержит еще и дубль внутри себя.
+    """
+    session.add(User(telegram_id=444))
+    await session.flush()
+    user_id = (await session.execute(select(User.id))).scalar_one()
+    
+    facts = _make_facts(user_id, 700)
+    first = await insert_ignore(session, SaleFact, facts[:500], SALE_KEY, ["day", "revenue"])
+    second = await insert_ignore(session, SaleFact, facts[300:] + facts[-1:], SALE_KEY, ["day", "revenue"])
+    total = (await session.execute(select(func.count()).select_from(SaleFact))).scalar_one()
+    return len(first), len(second), total
+
+
+@pytest.mark.asyncio
+async def test_insert_ignore_copy(test_session):
+    """Тест вставки через COPY с пропуском дублей"""
+    assert supports_copy(test_session)
+    
+    assert await _insert_twice(test_session) == (500, 200, 700)
+
+
+@pytest.mark.asyncio
+async def test_insert_ignore_sqlite_fallback():
+    """Тест запасного пути через INSERT ... ON CONFLICT DO NOTHING в SQLite"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    
+    async with async_sessionmaker(engine, class_=AsyncSession)() as session:
+        assert not supports_copy(session)
+        assert await _insert_twice(session) == (500, 200, 700)
+    
+    await engine.dispose()
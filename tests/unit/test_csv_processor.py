@@ -4,9 +4,12 @@ Unit тесты для CSVProcessor
 Тестирование парсинга CSV файлов
 """
 
+import io
+
 import pytest
 
 from src.core.analytics.csv_processor import CSVProcessor
+from src.core.analytics.kpi_calculator import KPICalculator
 from src.core.exceptions import CSVValidationException
 
 
@@ -42,3 +45,49 @@ def test_parse_csv_empty():
     with pytest.raises(CSVValidationException):
         CSVProcessor.parse_csv(content)
 
+
+
+def test_iter_rows_streams_small_chunks():
+    """Тест потокового парсинга с BOM и многострочным заголовком"""
+    content = (
+        "\ufeff2024-01-01T10:00:00+00:00,123456789,\"Multiline\ntitle, with comma\",custom,$2.50,photos\n"
+        "2024-01-02T11:00:00+00:00,987654321,Другое изображение,subscription,$1.00,videos\n"
+    ).encode("utf-8")
+    
+    rows = list(CSVProcessor.iter_rows(io.BytesIO(content), chunk_size=3))
+    
+    assert len(rows) == 2
+    assert rows[0]["title"] == "Multiline\ntitle, with comma"
+    assert rows[0]["date"].startswith("2024-01-01")
+    assert rows[1]["title"] == "Другое изображение"
+    assert rows[1]["category"] == "videos"
+
+
+def test_iter_rows_matches_parse_csv():
+    """Тест совпадения потокового и обычного парсинга"""
+    content = b"""Date,Asset ID,Title,Type,Impressions,Downloads,Revenue
+2024-01-01,123456789,Example Image,Photo,1234,5,2.50
+2024-01-02,987654321,Another Image,Photo,2000,10,5.00"""
+    
+    assert list(CSVProcessor.iter_rows(io.BytesIO(content), chunk_size=7)) == CSVProcessor.parse_csv(content)
+
+
+def test_iter_rows_empty_stream():
+    """Тест потокового парсинга пустого файла"""
+    with pytest.raises(CSVValidationException):
+        list(CSVProcessor.iter_rows(io.BytesIO(b"")))
+
+
+def test_non_finite_revenue_is_zero():
+    """Тест: доход nan/inf не ломает анализ и считается нулем"""
+    content = b"""2024-01-01T10:00:00+00:00,1,A,custom,$nan,photos
+2024-01-02T10:00:00+00:00,2,B,custom,inf,photos
+2024-01-03T10:00:00+00:00,3,C,custom,$2.50,photos
+"""
+    rows = list(CSVProcessor.iter_rows(io.BytesIO(content)))
+    
+    assert [row["revenue"] for row in rows] == [0.0, 0.0, 2.5]
+    assert KPICalculator.calculate_kpi(rows)["total_revenue"] == 2.5
+    
+    with_headers = CSVProcessor.parse_csv("Date,Asset ID,Title,Revenue\n2024-01-01,1,A,-Infinity\n")
+    assert with_headers[0]["revenue"] == 0.0
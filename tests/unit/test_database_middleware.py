@@ -0,0 +1,141 @@
+"""
+Unit тесты для DatabaseMiddleware
+
+Тестирование загрузки пользователя с лимитами одним запросом
+и кэша пользователей
+"""
+
+import pytest
+from aiogram.types import User as TelegramUser
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.bot.middlewares import DatabaseMiddleware
+from src.core.cache import user_cache as user_cache_module
+from src.core.cache.user_cache import UserCache
+from src.database.models import Limits, User
+from src.services.container import ServiceContainer
+
+
+@pytest.fixture
+def session_factory(test_engine):
+    """Фабрика сессий тестовой БД"""
+    return async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+def statements(test_engine):
+    """SQL запросы, выполненные после подготовки данных"""
+    executed: list[str] = []
+    
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+    
+    event.listen(test_engine.sync_engine, "before_cursor_execute", on_execute)
+    yield executed
+    event.remove(test_engine.sync_engine, "before_cursor_execute", on_execute)
+
+
+async def _create_user(session_factory, telegram_id: int) -> None:
+    """Создать пользователя с лимитами"""
+    async with session_factory() as session:
+        user = User(telegram_id=telegram_id)
+        session.add(user)
+        await session.flush()
+        session.add(Limits(user_id=user.id, analytics_used=2))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_user_and_limits_loaded_once(session_factory, statements):
+    """Тест: пользователь и лимиты загружаются одним запросом и переиспользуются"""
+    await _create_user(session_factory, telegram_id=555)
+    statements.clear()
+    
+    services = ServiceContainer()
+    middleware = DatabaseMiddleware(session_factory, services)
+    
+    async def handler(event, data):
+        # Повторное чтение лимитов в той же сессии берется из identity map
+        limits = await services.limits_repo.get_by_user_id(data["session"], data["user"].id)
+        assert limits is data["limits"]
+        return data["user"], data["limits"]
+    
+    user, limits = await middleware(
+        handler,
+        object(),
+        {"event_from_user": TelegramUser(id=555, is_bot=False, first_name="Test")},
+    )
+    
+    assert user.telegram_id == 555
+    assert limits.analytics_used == 2
+    selects = [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 1
+
+
+@pytest.mark.asyncio
+async def test_unknown_user(session_factory):
+    """Тест: незарегистрированный пользователь передается как None"""
+    middleware = DatabaseMiddleware(session_factory, ServiceContainer())
+    
+    async def handler(event, data):
+        return data["user"], data["limits"], data["session"]
+    
+    user, limits, session = await middleware(
+        handler,
+        object(),
+        {"event_from_user": TelegramUser(id=777, is_bot=False, first_name="Test")},
+    )
+    
+    assert user is None
+    assert limits is None
+    assert isinstance(session, AsyncSession)
+
+
+@pytest.mark.asyncio
+async def test_cached_user_skips_database(session_factory, statements):
+    """Тест: повторный update берет пользователя из кэша без запросов к БД"""
+    await _create_user(session_factory, telegram_id=556)
+    
+    services = ServiceContainer()
+    middleware = DatabaseMiddleware(session_factory, services, user_cache=UserCache(max_size=10, ttl_seconds=60))
+    data = {"event_from_user": TelegramUser(id=556, is_bot=False, first_name="Test")}
+    
+    async def handler(event, data):
+        session = data["session"]
+        # Экземпляры из кэша привязаны к сессии handler
+        assert await session.get(User, data["user"].id) is data["user"]
+        assert data["limits"] in session
+        return data["user"], data["limits"]
+    
+    await middleware(handler, object(), dict(data))
+    statements.clear()
+    
+    user, limits = await middleware(handler, object(), dict(data))
+    
+    assert statements == []
+    assert user.telegram_id == 556
+    assert limits.analytics_used == 2
+
+
+@pytest.mark.asyncio
+async def test_cache_invalidated_after_limits_change(session_factory, monkeypatch):
+    """Тест: изменение лимитов инвалидирует запись кэша"""
+    await _create_user(session_factory, telegram_id=557)
+    
+    services = ServiceContainer()
+    cache = UserCache(max_size=10, ttl_seconds=60)
+    monkeypatch.setattr(user_cache_module, "user_cache", cache)
+    middleware = DatabaseMiddleware(session_factory, services, user_cache=cache)
+    data = {"event_from_user": TelegramUser(id=557, is_bot=False, first_name="Test")}
+    
+    async def consume(event, data):
+        await services.limits_repo.increment_analytics(data["session"], data["user"].id)
+    
+    async def read(event, data):
+        return data["limits"]
+    
+    await middleware(consume, object(), dict(data))
+    
+    limits = await middleware(read, object(), dict(data))
+    assert limits.analytics_used == 3
@@ -0,0 +1,69 @@
+"""
+Unit тесты для DateParser
+
+Тестирование определения формата и разбора дат
+"""
+
+import io
+from datetime import datetime
+
+import pytest
+
+from src.core.analytics.csv_processor import CSVProcessor
+from src.core.analytics.date_parser import DateParser
+
+
+@pytest.mark.parametrize(
+    ("value", "format_name"),
+    [
+        ("2025-10-23T15:34:14+00:00", "iso_offset"),
+        ("2025-10-23T15:34:14-05:30", "iso_offset"),
+        ("2025-10-23T15:34:14Z", "iso_utc"),
+        ("2025-10-23T15:34:14", "iso_naive"),
+        ("2025-10-23 15:34:14", "space"),
+        ("2025-10-23", "date"),
+    ],
+)
+def test_parse_matches_isoformat(value, format_name):
+    """Тест совпадения быстрого разбора с datetime.isoformat()"""
+    parser = DateParser()
+    
+    result = parser.parse(value)
+    
+    assert parser.format_name == format_name
+    assert result == datetime.fromisoformat(value.replace("Z", "+00:00")).isoformat()
+
+
+def test_parse_falls_back_for_other_formats():
+    """Тест разбора значения другого формата после определения формата файла"""
+    parser = DateParser()
+    parser.parse("2025-10-23T15:34:14+00:00")
+    
+    assert parser.parse("2025-10-23T15:34:14.500+00:00") == "2025-10-23T15:34:14.500000+00:00"
+    assert parser.parsed_count == 2
+
+
+def test_parse_counts_failures():
+    """Тест учета нераспознанных дат без подмены текущим временем"""
+    parser = DateParser()
+    
+    assert parser.parse("2025-10-23T15:34:14+00:00") is not None
+    assert parser.parse("2025-02-30T10:00:00+00:00") is None
+    assert parser.parse("вчера") is None
+    
+    assert parser.stats() == {"format": "iso_offset", "parsed": 1, "failed": 2}
+    assert parser.failed_samples == ["2025-02-30T10:00:00+00:00", "вчера"]
+
+
+def test_iter_rows_skips_invalid_dates():
+    """Тест пропуска строк Adobe Stock с некорректной датой"""
+    content = """2024-01-01T10:00:00+00:00,123456789,Example Image,custom,$2.50,photos
+not-a-date,987654321,Another Image,subscription,$1.00,photos
+2024-01-02T11:00:00+00:00,555,Third Image,subscription,$1.00,videos"""
+    parser = DateParser()
+    
+    rows = list(CSVProcessor.iter_rows(io.BytesIO(content.encode("utf-8")), date_parser=parser))
+    
+    assert [row["asset_id"] for row in rows] == ["123456789", "555"]
+    assert parser.failed_count == 1
+
@@ -0,0 +1,119 @@
+"""
+Unit тесты для клиента очереди задач
+
+Тестирование переиспользования соединения, переподключения и пакетной постановки
+"""
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.workers import queue as queue_module
+from src.workers.queue import JobQueue
+
+
+class FakePool:
+    """Пул ARQ в памяти: задачи с одинаковым _job_id не дублируются"""
+    
+    def __init__(self, broken: bool = False):
+        self.broken = broken
+        self.jobs: list[tuple] = []
+        self.job_ids: set[str] = set()
+        self.closed = False
+    
+    async def ping(self):
+        if self.broken:
+            raise RedisConnectionError("connection lost")
+        return True
+    
+    async def enqueue_job(self, function, *args, _job_id=None):
+        if self.broken:
+            raise RedisConnectionError("connection lost")
+        if _job_id in self.job_ids:
+            return None
+        if _job_id is not None:
+            self.job_ids.add(_job_id)
+        self.jobs.append((function, *args))
+        return object()
+    
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Созданные клиентом пулы"""
+    created: list[FakePool] = []
+    
+    async def fake_create_pool(redis_settings):
+        created.append(FakePool())
+        return created[-1]
+    
+    monkeypatch.setattr(queue_module, "create_pool", fake_create_pool)
+    return created
+
+
+async def test_pool_is_reused(pools):
+    """Тест одного соединения на все задачи"""
+    job_queue = JobQueue(health_check_interval=60)
+    
+    await job_queue.enqueue("process_csv", 1, _job_id="process_csv:1")
+    await job_queue.enqueue("process_csv", 2, _job_id="process_csv:2")
+    assert await job_queue.enqueue("process_csv", 2, _job_id="process_csv:2") is None
+    
+    assert len(pools) == 1
+    assert pools[0].jobs == [("process_csv", 1), ("process_csv", 2)]
+
+
+async def test_reconnect_after_failed_health_check(pools):
+    """Тест пересоздания пула, если соединение потеряно"""
+    job_queue = JobQueue(health_check_interval=0)
+    await job_queue.connect()
+    pools[0].broken = True
+    
+    await job_queue.enqueue("process_csv", 1)
+    
+    assert len(pools) == 2
+    assert pools[0].closed
+    assert pools[1].jobs == [("process_csv", 1)]
+
+
+async def test_enqueue_retries_on_connection_error(pools):
+    """Тест повтора постановки после ошибки соединения"""
+    job_queue = JobQueue(health_check_interval=60)
+    await job_queue.connect()
+    pools[0].broken = True
+    
+    await job_queue.enqueue("process_csv", 1, _job_id="process_csv:1")
+    
+    assert len(pools) == 2
+    assert pools[1].jobs == [("process_csv", 1)]
+
+
+async def test_enqueue_many(pools):
+    """Тест пакетной постановки задач"""
+    job_queue = JobQueue()
+    
+    enqueued = await job_queue.enqueue_many("process_csv", [(i,) for i in range(250)], batch_size=100)
+    await job_queue.close()
+    
+    assert enqueued == 250
+    assert [args for _, *args in pools[0].jobs] == [[i] for i in range(250)]
+    assert pools[0].closed
+
+
+async def test_enqueue_many_retries_with_job_ids(pools):
+    """Тест повтора пачки после ошибки соединения без дублей"""
+    job_queue = JobQueue(health_check_interval=60)
+    await job_queue.connect()
+    pools[0].broken = True
+    
+    enqueued = await job_queue.enqueue_many(
+        "process_csv",
+        [(1,), (2,)],
+        job_id=lambda analysis_id: f"process_csv:{analysis_id}",
+    )
+    
+    assert enqueued == 2
+    assert len(pools) == 2
+    assert pools[1].job_ids == {"process_csv:1", "process_csv:2"}
+    assert await job_queue.enqueue_many("process_csv", [(2,)], job_id=lambda i: f"process_csv:{i}") == 0
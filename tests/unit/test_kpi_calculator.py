@@ -0,0 +1,67 @@
+"""
+Unit тесты для KPICalculator
+
+Тестирование однопроходного расчета KPI
+"""
+
+from datetime import datetime, timedelta
+
+from src.core.analytics.kpi_calculator import KPIAccumulator, KPICalculator
+
+
+def _make_rows(now: datetime) -> list[dict]:
+    """Создать тестовые строки за последние 60 дней"""
+    rows = []
+    for i in range(40):
+        date = now - timedelta(days=i * 1.5)
+        rows.append({
+            "date": date.replace(microsecond=0).isoformat() + "+00:00",
+            "asset_id": str(i % 7),
+            "title": f"Asset {i % 7}",
+            "purchase_type": "subscription" if i % 2 else "custom",
+            "revenue": 0.1 * (i % 5),
+            "category": "photos" if i % 3 else "unknown",
+            "impressions": 1,
+            "downloads": 1 if i % 5 else 0,
+        })
+    return rows
+
+
+def test_calculate_kpi_basic():
+    """Тест базовых метрик"""
+    now = datetime.utcnow()
+    rows = _make_rows(now)
+    
+    kpi = KPICalculator.calculate_kpi(iter(rows))
+    
+    assert kpi["row_count"] == 40
+    assert kpi["total_sales"] == sum(1 for r in rows if r["revenue"] > 0)
+    assert kpi["total_revenue"] == round(sum(r["revenue"] for r in rows), 2)
+    assert len(kpi["top_assets"]) == 3
+    assert set(kpi["type_distribution"]) == {"photos", "custom", "subscription"}
+    assert kpi["period_end"] == now.strftime("%Y-%m-%d")
+
+
+def test_accumulator_merge_matches_single_pass():
+    """Тест совпадения объединенных частичных агрегатов с одним проходом"""
+    now = datetime.utcnow()
+    rows = _make_rows(now)
+    
+    full = KPIAccumulator()
+    for row in rows:
+        full.add(row)
+    
+    parts = [KPIAccumulator() for _ in range(3)]
+    for i, row in enumerate(rows):
+        parts[i * 3 // len(rows)].add(row)
+    merged = parts[0].merge(parts[1]).merge(parts[2])
+    
+    assert merged.finalize(now) == full.finalize(now)
+
+
+def test_calculate_kpi_empty():
+    """Тест расчета KPI без данных"""
+    kpi = KPICalculator.calculate_kpi([])
+    
+    assert kpi["row_count"] == 0
+    assert kpi["top_assets"] == []
@@ -0,0 +1,92 @@
+"""
+Unit тесты для LimitsRepository
+
+Тестирование атомарного списания лимитов
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.database.models import Limits, User
+from src.database.repositories.limits_repo import LimitsRepository
+
+
+async def _create_limits(session: AsyncSession, **values) -> Limits:
+    """Создать пользователя с лимитами"""
+    user = User(telegram_id=424242)
+    session.add(user)
+    await session.flush()
+    limits = Limits(user_id=user.id, **values)
+    session.add(limits)
+    await session.commit()
+    return limits
+
+
+@pytest.mark.asyncio
+async def test_try_consume_until_limit(test_session):
+    """Тест: списание проходит до лимита и обновляет лимиты в сессии"""
+    limits = await _create_limits(test_session, analytics_used=0, analytics_limit=2)
+    repo = LimitsRepository()
+    
+    first = await repo.try_consume(test_session, limits.user_id, "analytics")
+    second = await repo.try_consume(test_session, limits.user_id, "analytics")
+    third = await repo.try_consume(test_session, limits.user_id, "analytics")
+    
+    assert first is limits
+    assert second.analytics_used == 2
+    assert third is None
+    assert limits.analytics_used == 2
+    assert limits.themes_used == 0
+
+
+@pytest.mark.asyncio
+async def test_try_consume_unlimited(test_session):
+    """Тест: -1 означает безлимит"""
+    limits = await _create_limits(test_session, themes_used=500, themes_limit=-1)
+    
+    consumed = await LimitsRepository().try_consume(test_session, limits.user_id, "themes")
+    
+    assert consumed.themes_used == 501
+
+
+@pytest.mark.asyncio
+async def test_try_consume_resets_expired_period(test_session):
+    """Тест: истекший период обнуляет счетчики в том же запросе"""
+    limits = await _create_limits(
+        test_session,
+        analytics_used=5,
+        analytics_limit=5,
+        themes_used=7,
+        reset_at=datetime.utcnow() - timedelta(minutes=1),
+    )
+    
+    consumed = await LimitsRepository().try_consume(test_session, limits.user_id, "analytics")
+    
+    assert consumed.analytics_used == 1
+    assert consumed.themes_used == 0
+    assert consumed.reset_at > datetime.utcnow() + timedelta(days=29)
+
+
+@pytest.mark.asyncio
+async def test_try_consume_concurrent(test_engine):
+    """Тест: конкурентные списания не превышают лимит"""
+    session_factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        limits = await _create_limits(session, themes_used=0, themes_limit=3)
+    
+    repo = LimitsRepository()
+    
+    async def consume() -> bool:
+        async with session_factory() as session:
+            consumed = await repo.try_consume(session, limits.user_id, "themes")
+            await session.commit()
+            return consumed is not None
+    
+    results = await asyncio.gather(*(consume() for _ in range(10)))
+    
+    assert sum(results) == 3
+    async with session_factory() as session:
+        assert (await repo.get_by_user_id(session, limits.user_id)).themes_used == 3
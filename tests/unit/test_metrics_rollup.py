@@ -0,0 +1,118 @@
+"""
+Unit тесты для MetricsRollupService
+
+Тестирование часовых и дневных агрегатов метрик и рядов за период
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.models import (
+    AnalysisStatus,
+    CSVAnalysis,
+    Payment,
+    PaymentStatus,
+    RollupGranularity,
+    RollupMetric,
+    SubscriptionTier,
+    User,
+)
+from src.database.repositories.analytics_repo import CSVAnalysisRepository
+from src.database.repositories.metrics_rollup_repo import MetricsRollupRepository
+from src.database.repositories.payment_repo import PaymentRepository
+from src.database.repositories.user_repo import UserRepository
+from src.services.metrics_rollup_service import MAX_SERIES_POINTS, MetricsRollupService
+
+NOW = datetime(2026, 3, 10, 12, 30)
+
+
+def make_service() -> MetricsRollupService:
+    return MetricsRollupService(
+        UserRepository(),
+        PaymentRepository(),
+        CSVAnalysisRepository(),
+        MetricsRollupRepository(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_rollup_series(test_session):
+    """Тест: агрегаты по всей истории и ряды с нулями и разрезами"""
+    service = make_service()
+    yesterday = NOW - timedelta(days=1)
+    
+    users = [
+        User(telegram_id=1, created_at=yesterday),
+        User(telegram_id=2, created_at=NOW - timedelta(minutes=10)),
+        User(telegram_id=3, created_at=NOW - timedelta(minutes=20)),
+    ]
+    test_session.add_all(users)
+    await test_session.commit()
+    
+    test_session.add_all([
+        CSVAnalysis(user_id=users[0].id, file_id="a", filename="a.csv", row_count=1, created_at=NOW - timedelta(minutes=5)),
+        CSVAnalysis(user_id=users[0].id, file_id="b", filename="b.csv", row_count=1, created_at=NOW - timedelta(minutes=3),
+                    analysis_status=AnalysisStatus.COMPLETED),
+        CSVAnalysis(user_id=users[1].id, file_id="c", filename="c.csv", row_count=1, created_at=NOW - timedelta(hours=2)),
+        Payment(user_id=users[0].id, tribute_transaction_id="tx-1", amount=99000, status=PaymentStatus.COMPLETED,
+                subscription_tier=SubscriptionTier.PRO, completed_at=NOW - timedelta(minutes=1)),
+        Payment(user_id=users[1].id, tribute_transaction_id="tx-2", amount=199000, status=PaymentStatus.COMPLETED,
+                subscription_tier=SubscriptionTier.ULTRA, completed_at=NOW - timedelta(minutes=2)),
+        Payment(user_id=users[2].id, tribute_transaction_id="tx-3", amount=99000,
+                subscription_tier=SubscriptionTier.PRO),
+    ])
+    await test_session.commit()
+    
+    await service.refresh(test_session, now=NOW)
+    
+    registrations = await service.get_series(
+        test_session, RollupMetric.REGISTRATIONS, RollupGranularity.DAY, yesterday, NOW,
+    )
+    assert [(point["bucket"].day, point["value"]) for point in registrations] == [(9, 1), (10, 2)]
+    
+    revenue = await service.get_series(
+        test_session, RollupMetric.REVENUE, RollupGranularity.HOUR, NOW - timedelta(hours=2), NOW,
+    )
+    assert [point["value"] for point in revenue] == [0, 0, 298000]
+    assert revenue[-1]["breakdown"] == {"pro": 99000, "ultra": 199000}
+    
+    # Уникальные пользователи считаются отдельно для часа и дня
+    hourly_active = await service.get_series(
+        test_session, RollupMetric.ACTIVE_USERS, RollupGranularity.HOUR, NOW - timedelta(hours=2), NOW,
+    )
+    assert [point["value"] for point in hourly_active] == [1, 0, 1]
+    daily_active = await service.get_series(
+        test_session, RollupMetric.ACTIVE_USERS, RollupGranularity.DAY, NOW, NOW,
+    )
+    assert daily_active[0]["value"] == 2
+    
+    # Смена статуса пересчитывается в окне последних интервалов
+    analyses = await CSVAnalysisRepository().get_all(test_session)
+    for analysis in analyses:
+        analysis.analysis_status = AnalysisStatus.COMPLETED
+    await test_session.commit()
+    await service.refresh(test_session, now=NOW + timedelta(minutes=10))
+    
+    statuses = await service.get_series(
+        test_session, RollupMetric.ANALYSES, RollupGranularity.DAY, NOW, NOW,
+    )
+    assert statuses[0]["breakdown"] == {"completed": 3}
+
+
+@pytest.mark.asyncio
+async def test_series_range_validation(test_session):
+    """Тест: пустой и слишком длинный период отклоняются"""
+    service = make_service()
+    
+    with pytest.raises(ValueError):
+        await service.get_series(test_session, RollupMetric.PAYMENTS, RollupGranularity.DAY, NOW, NOW - timedelta(days=1))
+    
+    with pytest.raises(ValueError):
+        await service.get_series(
+            test_session,
+            RollupMetric.PAYMENTS,
+            RollupGranularity.HOUR,
+            NOW - timedelta(hours=MAX_SERIES_POINTS),
+            NOW,
+        )
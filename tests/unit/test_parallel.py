@@ -0,0 +1,91 @@
+"""
+Unit тесты для параллельного расчета KPI
+
+Тестирование разбиения файла на части и объединения агрегатов
+"""
+
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.core.analytics.csv_processor import CSVProcessor
+from src.core.analytics.kpi_calculator import KPICalculator
+from src.core.analytics.parallel import calculate_kpi_parallel, read_header, split_chunks
+from src.core.exceptions import CSVValidationException
+
+
+def _make_content(rows: int) -> bytes:
+    """Создать CSV формата Adobe Stock с многострочными заголовками в кавычках"""
+    lines = []
+    for i in range(rows):
+        title = f'"Title {i},\nline ""two"""' if i % 3 == 0 else f"Title {i}"
+        lines.append(
+            f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00+00:00,{i % 17},{title},"
+            f"{'custom' if i % 2 else 'subscription'},${0.01 * (i % 97):.2f},"
+            f"{'photos' if i % 5 else 'unknown'},file.jpg,Studio,XXL"
+        )
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+    
+    
+def test_split_chunks_keeps_quoted_records():
+    """Тест разбиения только по границам записей"""
+    content = _make_content(300)
+    
+    chunks = split_chunks(content, 7)
+    
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == len(content)
+    assert all(prev[1] == nxt[0] for prev, nxt in zip(chunks, chunks[1:]))
+    for start, end in chunks:
+        assert content[start:end].count(b'"') % 2 == 0
+        
+        
+def test_read_header():
+    """Тест определения формата по первой записи"""
+    content = b"Date,Asset ID,Revenue\n2024-01-01,1,2.50\n"
+    
+    assert read_header(content) == (["date", "asset_id", "revenue"], 22)
+    assert read_header(_make_content(3)) == (None, 0)
+    with pytest.raises(CSVValidationException):
+        read_header(b"")
+        
+        
+@pytest.mark.parametrize("parts", [1, 3, 8])
+async def test_calculate_kpi_parallel_matches_serial(parts):
+    """Тест побитового совпадения с последовательным расчетом"""
+    content = _make_content(500)
+    
+    expected = KPICalculator.calculate_kpi(CSVProcessor.iter_rows(io.BytesIO(content)))
+    actual = await calculate_kpi_parallel(content, parts=parts)
+    
+    assert actual.pop("skipped_rows") == 0
+    assert actual == expected
+    
+    
+async def test_calculate_kpi_parallel_in_process_pool():
+    """Тест расчета частей в пуле процессов"""
+    content = b"Date,Asset ID,Title,Revenue\n" + b"".join(
+        f"2024-01-{1 + i % 28:02d},{i % 5},Asset,{i % 4}.25\n".encode() for i in range(100)
+    ) + b"bad,1,Asset,1.00\n"
+    
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        actual = await calculate_kpi_parallel(content, pool, parts=4)
+        
+    expected = KPICalculator.calculate_kpi(CSVProcessor.iter_rows(io.BytesIO(content)))
+    assert actual.pop("skipped_rows") == 1
+    assert actual == expected
+    
+    
+async def test_calculate_kpi_parallel_from_file(tmp_path):
+    """Тест расчета по временному файлу: части читаются с диска"""
+    content = _make_content(500)
+    path = tmp_path / "upload.csv"
+    path.write_bytes(content)
+    
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        actual = await calculate_kpi_parallel(path, pool, parts=3)
+        
+    expected = await calculate_kpi_parallel(content, parts=3)
+    assert actual == expected
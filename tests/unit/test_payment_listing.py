@@ -0,0 +1,103 @@
+"""
+Unit тесты для списка и выгрузки платежей админ-панели
+
+Тестирование фильтров в БД, keyset-пагинации и потоковой выгрузки
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.admin.views import payments as payments_view
+from src.database.models import Payment, PaymentStatus, SubscriptionTier, User
+from src.database.repositories.payment_repo import PaymentRepository
+
+START = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+async def payments(test_session):
+    """Шесть платежей: по дню, чередуются тариф и статус"""
+    user = User(telegram_id=1)
+    test_session.add(user)
+    await test_session.commit()
+    
+    test_session.add_all([
+        Payment(
+            user_id=user.id,
+            tribute_transaction_id=f"tx-{number}",
+            amount=1000 * (number + 1),
+            status=PaymentStatus.COMPLETED if number % 3 else PaymentStatus.PENDING,
+            subscription_tier=SubscriptionTier.PRO if number % 2 else SubscriptionTier.ULTRA,
+            created_at=START + timedelta(days=number),
+        )
+        for number in range(6)
+    ])
+    await test_session.commit()
+
+
+@pytest.mark.asyncio
+async def test_filtered_pages(test_session, payments):
+    """Тест: страницы по курсору и суммы с фильтрами"""
+    payment_repo = PaymentRepository()
+    
+    page, cursor = await payment_repo.get_page(test_session, limit=4)
+    assert [p.tribute_transaction_id for p in page] == ["tx-5", "tx-4", "tx-3", "tx-2"]
+    page, cursor = await payment_repo.get_page(test_session, cursor=cursor, limit=4)
+    assert [p.tribute_transaction_id for p in page] == ["tx-1", "tx-0"]
+    assert cursor is None
+    
+    filters = {
+        "status": PaymentStatus.COMPLETED,
+        "from_date": START + timedelta(days=1),
+        "to_date": START + timedelta(days=4),
+    }
+    page, _ = await payment_repo.get_page(test_session, **filters)
+    assert [p.tribute_transaction_id for p in page] == ["tx-4", "tx-2", "tx-1"]
+    assert await payment_repo.get_filtered_totals(test_session, **filters) == {
+        "total": 3,
+        "total_estimated": False,
+        "revenue": 5000 + 3000 + 2000,
+    }
+    
+    totals = await payment_repo.get_filtered_totals(test_session, subscription_tier=SubscriptionTier.PRO)
+    assert (totals["total"], totals["revenue"]) == (3, 2000 + 6000)
+
+
+@pytest.mark.asyncio
+async def test_stream_filtered(test_session, payments):
+    """Тест: выгрузка серверным курсором от старых к новым"""
+    streamed = [
+        payment.tribute_transaction_id
+        async for payment in PaymentRepository().stream_filtered(
+            test_session,
+            subscription_tier=SubscriptionTier.ULTRA,
+            batch_size=2,
+        )
+    ]
+    assert streamed == ["tx-0", "tx-2", "tx-4"]
+
+
+@pytest.mark.asyncio
+async def test_export_chunks(test_engine, payments, monkeypatch):
+    """Тест: CSV и NDJSON выгрузка собирается из блоков"""
+    monkeypatch.setattr(
+        payments_view,
+        "AsyncSessionLocal",
+        async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False),
+    )
+    monkeypatch.setattr(payments_view, "EXPORT_CHUNK_SIZE", 100)
+    filters = payments_view._filters(PaymentStatus.PENDING, None, None, None)
+    
+    chunks = [chunk async for chunk in payments_view._export_chunks("csv", filters)]
+    assert len(chunks) > 1
+    rows = list(csv.DictReader(io.StringIO("".join(chunks))))
+    assert [row["tribute_transaction_id"] for row in rows] == ["tx-0", "tx-3"]
+    assert rows[1]["subscription_tier"] == "pro"
+    
+    lines = "".join([chunk async for chunk in payments_view._export_chunks("ndjson", filters)]).splitlines()
+    assert [json.loads(line)["amount"] for line in lines] == [1000, 4000]
@@ -0,0 +1,140 @@
+"""
+Unit тесты для конвейера анализа CSV
+
+Тестирование анализа в текущем процессе и в пуле процессов
+"""
+
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.core.analytics.csv_processor import CSVProcessor
+from src.core.analytics.kpi_calculator import KPICalculator
+from src.core.analytics.parallel import calculate_kpi_parallel
+from src.core.analytics.pipeline import StreamAnalysis, analyze_csv, run_analysis, to_sale
+from src.core.cache.report_cache import compute_content_hash
+from src.core.exceptions import CSVValidationException
+
+
+CONTENT = b"""2024-01-01T10:00:00+00:00,123456789,Example Image,custom,$2.50,photos
+bad-date,987654321,Another Image,subscription,$1.00,photos
+2024-01-02T11:00:00+00:00,555,Third Image,subscription,$1.00,videos
+"""
+
+
+def test_analyze_csv_matches_kpi_calculator():
+    """Тест совпадения KPI конвейера с KPICalculator"""
+    kpi_data, summary_text = analyze_csv(CONTENT)
+    
+    expected = KPICalculator.calculate_kpi(CSVProcessor.iter_rows(io.BytesIO(CONTENT)))
+    
+    assert kpi_data.pop("skipped_rows") == 1
+    assert {k: v for k, v in kpi_data.items() if k != "trend"} == {
+        k: v for k, v in expected.items() if k != "trend"
+    }
+    assert "Пропущено строк с некорректной датой: 1" in summary_text
+
+
+def test_analyze_csv_empty():
+    """Тест анализа пустого файла"""
+    with pytest.raises(CSVValidationException):
+        analyze_csv(b"")
+
+
+async def test_run_analysis_in_process_pool():
+    """Тест анализа в пуле процессов"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        kpi_data, _ = await run_analysis(CONTENT, executor=pool)
+        
+        with pytest.raises(CSVValidationException):
+            await run_analysis(b"\n", executor=pool)
+    
+    assert kpi_data["row_count"] == 2
+    assert kpi_data["total_revenue"] == 3.5
+
+
+def _fractional_content(rows: int) -> bytes:
+    """CSV с дробным доходом, на котором суммы float по порядку строк расходятся"""
+    lines = []
+    for i in range(rows):
+        lines.append(
+            f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T10:00:00+00:00,{i % 13},Title {i % 13},"
+            f"{'custom' if i % 2 else 'subscription'},${(0.1, 0.7, 0.33, 1.01)[i % 4]},"
+            f"{'photos' if i % 5 else 'unknown'}"
+        )
+    # Сумма по порядку строк 0.1 + 0.2 + 0.005 = 0.30500000000000005 (0.31),
+    # точная сумма - 0.305 (0.3)
+    for i, revenue in enumerate(("0.1", "0.2", "0.005")):
+        lines.append(f"2024-02-0{i + 1}T10:00:00+00:00,900,Audio,custom,${revenue},audio")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def test_serial_and_parallel_paths_match():
+    """Тест: файл у границы parallel_min_bytes дает одинаковый результат на обоих путях"""
+    content = _fractional_content(5000)
+    
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        serial, _ = await run_analysis(content, executor=pool, parallel_min_bytes=len(content) + 1)
+        parallel, _ = await run_analysis(content, executor=pool, parallel_min_bytes=len(content))
+        chunked = await calculate_kpi_parallel(content, pool, parts=7)
+    
+    assert serial["type_distribution"]["audio"]["revenue"] == 0.3
+    assert serial == parallel
+    assert serial == chunked
+
+
+async def _blocks(content: bytes, size: int = 4096):
+    """Отдать содержимое блоками, как поток загрузки"""
+    for start in range(0, len(content), size):
+        yield content[start:start + size]
+
+
+async def test_stream_analysis_in_process_pool():
+    """Тест: один проход по потоку дает те же KPI, продажи и хэш, что и файл целиком"""
+    content = _fractional_content(3000) + b'2024-03-01T10:00:00+00:00,77,"Multi\nline",custom,$1.00,photos\n'
+    
+    expected_sales = [to_sale(row) for row in CSVProcessor.iter_rows(io.BytesIO(content))]
+    expected_kpi, expected_summary = analyze_csv(content)
+    
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as pool:
+        stream = StreamAnalysis(_blocks(content), pool, chunk_bytes=16 * 1024)
+        batches = [batch async for batch in stream.sales]
+    
+    assert len(batches) > 1
+    assert [sale for batch in batches for sale in batch] == expected_sales
+    assert stream.result() == (expected_kpi, expected_summary)
+    assert stream.size == len(content)
+    assert stream.content_hash == compute_content_hash(content)
+    
+    inline = StreamAnalysis(_blocks(content))
+    assert [sale async for batch in inline.sales for sale in batch] == expected_sales
+    assert inline.result()[0] == expected_kpi
+
+
+async def test_stream_analysis_with_headers_and_drain():
+    """Тест: формат определяется по первой части, drain дочитывает поток"""
+    content = b"Date,Asset ID,Title,Type,Revenue,Category\n" + _fractional_content(500)
+    stream = StreamAnalysis(_blocks(content, size=100), chunk_bytes=1024)
+    
+    first = await anext(stream.sales)
+    await stream.drain()
+    
+    kpi_data, _ = stream.result()
+    assert first[0]["asset_id"] == "0"
+    assert kpi_data["row_count"] == 503
+    assert stream.content_hash == compute_content_hash(content)
+
+
+async def test_stream_analysis_empty():
+    """Тест: пустой поток и поток без данных"""
+    stream = StreamAnalysis(_blocks(b""))
+    with pytest.raises(CSVValidationException):
+        await stream.drain()
+    assert isinstance(stream.error, CSVValidationException)
+    
+    stream = StreamAnalysis(_blocks(b"\n"))
+    await stream.drain()
+    with pytest.raises(CSVValidationException):
+        stream.result()
@@ -0,0 +1,63 @@
+"""
+Unit тесты для PortfolioService
+
+Тестирование накопления истории продаж и KPI по агрегатам
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.core.analytics.kpi_calculator import KPICalculator
+from src.database.models import User
+from src.database.repositories.portfolio_repo import PortfolioRepository
+from src.database.repositories.user_repo import UserRepository
+from src.services.portfolio_service import PortfolioService
+
+
+def _make_rows(now: datetime, start: int, stop: int) -> list[dict]:
+    """Создать нормализованные строки продаж"""
+    rows = []
+    for i in range(start, stop):
+        sold_at = now - timedelta(days=i, hours=i % 7)
+        rows.append({
+            "date": sold_at.replace(microsecond=0).isoformat() + "+00:00",
+            "asset_id": str(i % 9),
+            "title": f"Asset {i % 9}",
+            "purchase_type": "subscription" if i % 2 else "custom",
+            "revenue": round(0.37 * (i % 9) + 0.01 * i, 2),
+            "category": "photos" if i % 3 else "unknown",
+            "impressions": 1,
+            "downloads": 1,
+        })
+    return rows
+
+
+@pytest.mark.asyncio
+async def test_merge_rows_deduplicates_and_matches_full_kpi(test_session):
+    """Тест дедупликации загрузок и совпадения KPI с расчетом по всем строкам"""
+    user = await UserRepository().create(test_session, User(telegram_id=222))
+    portfolio_service = PortfolioService(PortfolioRepository())
+    now = datetime.utcnow()
+    
+    first_upload = _make_rows(now, 0, 60)
+    second_upload = _make_rows(now, 40, 100)  # Пересекается с первой на 20 строк
+    
+    assert await portfolio_service.merge_rows(test_session, user.id, first_upload, batch_size=25) == 60
+    assert await portfolio_service.merge_rows(test_session, user.id, second_upload, batch_size=25) == 40
+    
+    kpi = await portfolio_service.get_kpi(test_session, user.id, now)
+    expected = KPICalculator.calculate_kpi(_make_rows(now, 0, 100))
+    
+    assert kpi == expected
+
+
+@pytest.mark.asyncio
+async def test_get_kpi_without_history(test_session):
+    """Тест KPI для пользователя без истории"""
+    user = await UserRepository().create(test_session, User(telegram_id=333))
+    portfolio_service = PortfolioService(PortfolioRepository())
+    
+    kpi = await portfolio_service.get_kpi(test_session, user.id)
+    
+    assert kpi["row_count"] == 0
@@ -0,0 +1,236 @@
+"""
+Unit тесты для квот в Redis
+
+Тестирование записи счетчиков в limits, отказа без Redis и списания в БД
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.core.quota.engine import QuotaEngine, consume_limit, refund_limit
+from src.database.models import AnalysisStatus, Limits, User
+from src.database.repositories.analytics_repo import AnalyticsReportRepository, CSVAnalysisRepository
+from src.database.repositories.limits_repo import LimitsRepository
+from src.services.analytics_service import AnalyticsService
+
+
+class FakePipeline:
+    """Pipeline, выполняющий HMGET по словарю"""
+    
+    def __init__(self, redis: "FakeRedis"):
+        self.redis = redis
+        self.keys: list[str] = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        return None
+    
+    def hmget(self, key, *fields):
+        self.keys.append((key, fields))
+    
+    async def execute(self):
+        return [
+            [self.redis.hashes[key].get(field) if key in self.redis.hashes else None for field in fields]
+            for key, fields in self.keys
+        ]
+
+
+class FakeRedis:
+    """Redis в памяти: hash счетчиков и множество измененных пользователей"""
+    
+    def __init__(self, broken: bool = False):
+        self.broken = broken
+        self.hashes: dict[str, dict[str, bytes]] = {}
+        self.dirty: set[bytes] = set()
+    
+    def register_script(self, script):
+        handler = self._run_refund if "-1)" in script else self._run_consume
+        
+        async def run(keys, args):
+            if self.broken:
+                raise RedisConnectionError("connection lost")
+            return handler(keys, args)
+        return run
+    
+    def _run_refund(self, keys, args):
+        """Возврат как в _REFUND_SCRIPT"""
+        counters = self.hashes.get(keys[0])
+        if counters is None:
+            return 0
+        used = int(counters[args[0]])
+        if used > 0:
+            counters[args[0]] = str(used - 1).encode()
+            self.dirty.add(str(args[1]).encode())
+        return 1
+    
+    def _run_consume(self, keys, args):
+        """Списание как в _CONSUME_SCRIPT (без сброса периода)"""
+        used_field, other_field, limit = args[0], args[1], int(args[2])
+        counters = self.hashes.get(keys[0])
+        if counters is None:
+            counters = self.hashes[keys[0]] = {
+                used_field: str(args[7]).encode(),
+                other_field: str(args[8]).encode(),
+                "reset_at": str(args[9]).encode(),
+            }
+        used = int(counters[used_field])
+        if limit != -1 and used >= limit:
+            return [0, used, counters["reset_at"]]
+        counters[used_field] = str(used + 1).encode()
+        self.dirty.add(str(args[6]).encode())
+        return [1, used + 1, counters["reset_at"]]
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+    
+    async def spop(self, key, count):
+        popped = [self.dirty.pop() for _ in range(min(count, len(self.dirty)))]
+        return popped or None
+    
+    async def sadd(self, key, *members):
+        self.dirty.update(str(member).encode() for member in members)
+
+
+async def _create_limits(session, **values) -> Limits:
+    """Создать пользователя с лимитами"""
+    user = User(telegram_id=515151)
+    session.add(user)
+    await session.flush()
+    limits = Limits(user_id=user.id, **values)
+    session.add(limits)
+    await session.commit()
+    return limits
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_counters(test_session):
+    """Тест: счетчики из Redis записываются в limits, истекшие ключи пропускаются"""
+    limits = await _create_limits(test_session, analytics_used=1, themes_used=2)
+    reset_at = datetime.utcnow() + timedelta(days=10)
+    
+    redis = FakeRedis()
+    redis.hashes[f"quota:{limits.user_id}"] = {
+        "analytics_used": b"4",
+        "themes_used": b"0",
+        "reset_at": str((reset_at - datetime(1970, 1, 1)).total_seconds()).encode(),
+    }
+    redis.dirty = {str(limits.user_id).encode(), b"999999"}
+    
+    flushed = await QuotaEngine(redis, key_ttl_seconds=60, flush_batch_size=1).flush(test_session)
+    
+    assert flushed == 1
+    assert redis.dirty == set()
+    await test_session.refresh(limits)
+    assert limits.analytics_used == 4
+    assert limits.themes_used == 0
+    assert abs(limits.reset_at - reset_at) < timedelta(milliseconds=1)
+
+
+@pytest.mark.asyncio
+async def test_consume_fails_closed_until_redis_recovers(test_session):
+    """Тест: без Redis списание отклоняется, после восстановления flush не теряет списаний"""
+    limits = await _create_limits(test_session, themes_used=8, themes_limit=10)
+    redis = FakeRedis(broken=True)
+    quota = QuotaEngine(redis, key_ttl_seconds=60, flush_batch_size=10)
+    repo = LimitsRepository()
+    
+    with pytest.raises(RedisConnectionError):
+        await consume_limit(test_session, repo, quota, limits.user_id, "themes")
+    await test_session.refresh(limits)
+    assert limits.themes_used == 8
+    
+    redis.broken = False
+    first = await consume_limit(test_session, repo, quota, limits.user_id, "themes")
+    second = await consume_limit(test_session, repo, quota, limits.user_id, "themes")
+    third = await consume_limit(test_session, repo, quota, limits.user_id, "themes")
+    assert (first.allowed, second.allowed, third.allowed) == (True, True, False)
+    
+    assert await quota.flush(test_session) == 1
+    await test_session.refresh(limits)
+    assert limits.themes_used == 10
+
+
+@pytest.mark.asyncio
+async def test_consume_in_database_without_redis(test_session):
+    """Тест: без движка квот лимит списывается в таблице limits"""
+    limits = await _create_limits(test_session, themes_used=9, themes_limit=10)
+    repo = LimitsRepository()
+    
+    first = await consume_limit(test_session, repo, None, limits.user_id, "themes")
+    second = await consume_limit(test_session, repo, None, limits.user_id, "themes")
+    
+    assert (first.allowed, first.used, first.limit) == (True, 10, 10)
+    assert (second.allowed, second.used) == (False, 10)
+
+
+@pytest.mark.asyncio
+async def test_refund_in_database(test_session):
+    """Тест: без счетчиков в Redis лимит возвращается в limits, но не ниже нуля"""
+    limits = await _create_limits(test_session, analytics_used=1)
+    repo = LimitsRepository()
+    
+    await refund_limit(test_session, repo, None, limits.user_id, "analytics")
+    await refund_limit(test_session, repo, None, limits.user_id, "analytics")
+    
+    await test_session.refresh(limits)
+    assert limits.analytics_used == 0
+
+
+class FailingCSVAnalysisRepository(CSVAnalysisRepository):
+    """Репозиторий, который не может сохранить анализ"""
+    
+    def __init__(self, before_fail):
+        super().__init__()
+        self.before_fail = before_fail
+    
+    async def create(self, session, obj):
+        await self.before_fail(session)
+        raise RuntimeError("insert failed")
+
+
+@pytest.mark.asyncio
+async def test_failed_create_refunds_after_counters_expired(test_session):
+    """Тест: если счетчики в Redis истекли, лимит возвращается в limits"""
+    limits = await _create_limits(test_session, analytics_used=3, analytics_limit=10)
+    redis = FakeRedis()
+    quota = QuotaEngine(redis, key_ttl_seconds=60, flush_batch_size=10)
+    
+    async def flush_and_expire(session):
+        # Списание записано в БД, затем ключ истек по TTL
+        await quota.flush(session)
+        redis.hashes.clear()
+    
+    service = AnalyticsService(
+        FailingCSVAnalysisRepository(flush_and_expire),
+        AnalyticsReportRepository(),
+        LimitsRepository(),
+        quota=quota,
+    )
+    
+    with pytest.raises(RuntimeError):
+        await service.create_analysis(test_session, limits.user_id, "file", "a.csv")
+    
+    await test_session.refresh(limits)
+    assert limits.analytics_used == 3
+
+
+@pytest.mark.asyncio
+async def test_cancel_analysis_refunds_limit(test_session):
+    """Тест: анализ, не поставленный в очередь, отменяется с возвратом лимита"""
+    limits = await _create_limits(test_session, analytics_used=1, analytics_limit=10)
+    service = AnalyticsService(CSVAnalysisRepository(), AnalyticsReportRepository(), LimitsRepository())
+    
+    analysis = await service.create_analysis(test_session, limits.user_id, "file", "a.csv")
+    await test_session.refresh(limits)
+    assert limits.analytics_used == 2
+    
+    await service.cancel_analysis(test_session, analysis, "queue down")
+    
+    await test_session.refresh(limits)
+    await test_session.refresh(analysis)
+    assert limits.analytics_used == 1
+    assert analysis.analysis_status == AnalysisStatus.FAILED
@@ -0,0 +1,72 @@
+"""
+Unit тесты для кэша отчетов по содержимому CSV
+
+Тестирование хэша содержимого и поиска готового отчета
+"""
+
+import pytest
+
+from src.core.cache.report_cache import ContentHasher, compute_content_hash
+from src.database.models import AnalysisStatus, AnalyticsReport, CSVAnalysis, User
+from src.database.repositories.analytics_repo import (
+    AnalyticsReportRepository,
+    CSVAnalysisRepository,
+)
+from src.database.repositories.user_repo import UserRepository
+
+
+def test_content_hash_ignores_bom_and_line_endings():
+    """Тест нормализации содержимого перед хэшированием"""
+    content = b"2024-01-01,1,Image,custom,$1.00\n2024-01-02,2,Image,custom,$2.00\n"
+    
+    variant = b"\xef\xbb\xbf" + content.replace(b"\n", b"\r\n") + b"\r\n"
+    
+    assert compute_content_hash(variant) == compute_content_hash(content)
+    assert compute_content_hash(content + b"x") != compute_content_hash(content)
+    assert len(compute_content_hash(content)) == 64
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 64])
+def test_content_hasher_matches_whole_file(chunk_size):
+    """Тест совпадения инкрементального хэша с хэшем всего файла"""
+    content = b"\xef\xbb\xbf2024-01-01,1,Image\r\n2024-01-02,2,Image\r\n\r\n\n"
+    
+    hasher = ContentHasher()
+    for start in range(0, len(content), chunk_size):
+        hasher.update(content[start:start + chunk_size])
+    
+    assert hasher.hexdigest() == compute_content_hash(content)
+
+
+@pytest.mark.asyncio
+async def test_get_report_by_content_hash(test_session):
+    """Тест поиска завершенного отчета пользователя по хэшу"""
+    user = await UserRepository().create(test_session, User(telegram_id=111))
+    csv_analysis_repo = CSVAnalysisRepository()
+    analytics_report_repo = AnalyticsReportRepository()
+    content_hash = compute_content_hash(b"data")
+    
+    done = await csv_analysis_repo.create(test_session, CSVAnalysis(
+        user_id=user.id,
+        file_id="file",
+        filename="downloads.csv",
+        row_count=1,
+        analysis_status=AnalysisStatus.COMPLETED,
+        content_hash=content_hash,
+    ))
+    report = await analytics_report_repo.create(test_session, AnalyticsReport(
+        csv_analysis_id=done.id,
+        kpi_data={"total_sales": 1},
+        summary_text="summary",
+    ))
+    
+    found = await analytics_report_repo.get_by_content_hash(test_session, user.id, content_hash)
+    assert found.id == report.id
+    
+    assert await analytics_report_repo.get_by_content_hash(
+        test_session,
+        user.id,
+        content_hash,
+        exclude_analysis_id=done.id,
+    ) is None
+    assert await analytics_report_repo.get_by_content_hash(test_session, user.id + 1, content_hash) is None
@@ -0,0 +1,152 @@
+"""
+Unit тесты для выдачи тем без повторов
+
+Тестирование перестановки и курсоров пользователей
+"""
+
+import pytest
+
+from src.core.themes.index import ThemeIndex
+from src.core.themes.permutation import permute
+from src.database.models import Limits, ThemeTemplate, User
+from src.database.repositories.limits_repo import LimitsRepository
+from src.database.repositories.theme_cursor_repo import ThemeCursorRepository
+from src.database.repositories.theme_repo import ThemeRepository
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+from src.services.theme_service import ThemeService
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 1000, 2049])
+def test_permute_is_bijection(size):
+    """Тест: перестановка покрывает [0, size) без повторов"""
+    for seed in (0, 42, 2**61 + 7):
+        assert sorted(permute(i, size, seed) for i in range(size)) == list(range(size))
+
+
+def test_permute_depends_on_seed():
+    """Тест: разные seed дают разный порядок"""
+    first = [permute(i, 100, 1) for i in range(100)]
+    second = [permute(i, 100, 2) for i in range(100)]
+    assert first != second
+    with pytest.raises(ValueError):
+        permute(100, 100, 1)
+
+
+async def _create_user_with_themes(session, count: int) -> User:
+    """Создать пользователя без лимита тем и каталог тем"""
+    user = User(telegram_id=616161)
+    session.add(user)
+    await session.flush()
+    session.add(Limits(user_id=user.id, themes_limit=-1))
+    session.add_all(ThemeTemplate(category="photos", theme=f"Тема {i}") for i in range(count))
+    await session.commit()
+    return user
+
+
+@pytest.mark.parametrize("use_index", [True, False])
+@pytest.mark.asyncio
+async def test_themes_do_not_repeat_until_exhausted(test_session, use_index):
+    """Тест: каждая тема каталога выдается один раз, затем начинается новый круг"""
+    user = await _create_user_with_themes(test_session, count=12)
+    template_repo = ThemeTemplateRepository()
+    await template_repo.assign_ordinals(test_session)
+    
+    theme_index = None
+    if use_index:
+        theme_index = ThemeIndex(template_repo)
+        await theme_index.load(test_session)
+    
+    service = ThemeService(
+        ThemeRepository(),
+        LimitsRepository(),
+        template_repo,
+        theme_index=theme_index,
+        theme_cursor_repo=ThemeCursorRepository(),
+    )
+    
+    first_round = [(await service.generate_theme(test_session, user.id, "photos")).theme for _ in range(12)]
+    assert sorted(first_round) == sorted(f"Тема {i}" for i in range(12))
+    
+    second_round = [(await service.generate_theme(test_session, user.id, "photos")).theme for _ in range(12)]
+    assert sorted(second_round) == sorted(first_round)
+
+
+@pytest.mark.asyncio
+async def test_deactivated_theme_is_skipped(test_session):
+    """Тест: пропуск в нумерации не ломает выдачу без повторов"""
+    user = await _create_user_with_themes(test_session, count=12)
+    template_repo = ThemeTemplateRepository()
+    await template_repo.assign_ordinals(test_session)
+    service = ThemeService(
+        ThemeRepository(),
+        LimitsRepository(),
+        template_repo,
+        theme_cursor_repo=ThemeCursorRepository(),
+    )
+    
+    # Тема выключена в обход репозитория - номер остался за ней
+    templates = await template_repo.get_all(test_session)
+    disabled = templates[5]
+    disabled.is_active = False
+    await test_session.commit()
+    
+    dealt = [(await service.generate_theme(test_session, user.id, "photos")).theme for _ in range(11)]
+    assert sorted(dealt) == sorted(t.theme for t in templates if t.id != disabled.id)
+
+
+@pytest.mark.asyncio
+async def test_ordinals_are_stable(test_session):
+    """Тест: выключение и удаление оставляют пропуски, новые темы - в конец"""
+    await _create_user_with_themes(test_session, count=5)
+    template_repo = ThemeTemplateRepository()
+    await template_repo.assign_ordinals(test_session)
+    templates = sorted(await template_repo.get_all(test_session), key=lambda t: t.id)
+    
+    assert await template_repo.set_active(test_session, [templates[1].id], False) == 1
+    assert await template_repo.delete(test_session, templates[3].id)
+    templates = [t for t in templates if t.id != templates[3].id]
+    for template in templates:
+        await test_session.refresh(template)
+    assert [t.ordinal for t in templates] == [1, None, 3, 5]
+    
+    assert await template_repo.set_active(test_session, [templates[1].id], True) == 1
+    await test_session.refresh(templates[1])
+    assert templates[1].ordinal == 6
+    assert await template_repo.get_max_ordinal(test_session, "photos") == 6
+    
+    theme_index = ThemeIndex(template_repo)
+    await theme_index.load(test_session)
+    assert theme_index.max_ordinal("photos") == 6
+    assert theme_index.get("photos", 2) is None
+    assert theme_index.get("photos", 6) == (templates[1].id, templates[1].theme)
+
+
+@pytest.mark.asyncio
+async def test_catalog_change_keeps_round(test_session):
+    """Тест: изменение каталога посреди круга не сбрасывает перестановку"""
+    user = await _create_user_with_themes(test_session, count=6)
+    template_repo = ThemeTemplateRepository()
+    await template_repo.assign_ordinals(test_session)
+    service = ThemeService(
+        ThemeRepository(),
+        LimitsRepository(),
+        template_repo,
+        theme_cursor_repo=ThemeCursorRepository(),
+    )
+    
+    dealt = [(await service.generate_theme(test_session, user.id, "photos")).theme for _ in range(3)]
+    
+    # Новые темы и выключение еще не выданной темы
+    test_session.add_all(ThemeTemplate(category="photos", theme=f"Новая {i}") for i in range(2))
+    await test_session.commit()
+    await template_repo.assign_ordinals(test_session)
+    templates = await template_repo.get_all(test_session)
+    disabled = next(t for t in templates if t.theme.startswith("Тема") and t.theme not in dealt)
+    await template_repo.set_active(test_session, [disabled.id], False)
+    
+    dealt += [(await service.generate_theme(test_session, user.id, "photos")).theme for _ in range(2)]
+    assert sorted(dealt) == sorted(f"Тема {i}" for i in range(6) if f"Тема {i}" != disabled.theme)
+    
+    # Следующий круг - по всему текущему каталогу
+    next_round = [(await service.generate_theme(test_session, user.id, "photos")).theme for _ in range(7)]
+    assert sorted(next_round) == sorted(t.theme for t in templates if t.id != disabled.id)
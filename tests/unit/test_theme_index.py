@@ -0,0 +1,67 @@
+"""
+Unit тесты для индекса тем
+
+Тестирование выбора темы в памяти и нумерации тем в БД
+"""
+
+import pytest
+from sqlalchemy import select
+
+from src.core.themes.index import ThemeIndex
+from src.database.models import ThemeTemplate
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+
+
+async def _create_templates(session) -> list[ThemeTemplate]:
+    """Создать темы двух категорий, одна неактивна"""
+    templates = [
+        ThemeTemplate(category="photos", theme="Горы"),
+        ThemeTemplate(category="photos", theme="Море"),
+        ThemeTemplate(category="photos", theme="Архив", is_active=False),
+        ThemeTemplate(category="photos", theme="Город"),
+        ThemeTemplate(category="vectors", theme="Иконки"),
+    ]
+    session.add_all(templates)
+    await session.commit()
+    return templates
+
+
+@pytest.mark.asyncio
+async def test_index_picks_active_themes_of_category(test_session):
+    """Тест: индекс содержит только активные темы своей категории"""
+    await _create_templates(test_session)
+    
+    index = ThemeIndex()
+    assert await index.load(test_session) == 4
+    
+    picked = {index.pick("photos")[1] for _ in range(200)}
+    assert picked == {"Горы", "Море", "Город"}
+    assert index.pick("vectors")[1] == "Иконки"
+    assert index.pick("audio") is None
+    assert index.count("photos") == 3
+
+
+@pytest.mark.asyncio
+async def test_assign_ordinals_is_stable(test_session):
+    """Тест: номера тем не меняются при выключении и включении других тем"""
+    templates = await _create_templates(test_session)
+    repo = ThemeTemplateRepository()
+    
+    await repo.assign_ordinals(test_session)
+    await repo.set_active(test_session, [templates[0].id], False)
+    await repo.set_active(test_session, [templates[2].id], True)
+    await repo.assign_ordinals(test_session)
+    
+    result = await test_session.execute(
+        select(ThemeTemplate.theme, ThemeTemplate.ordinal)
+        .where(ThemeTemplate.category == "photos")
+        .order_by(ThemeTemplate.id)
+    )
+    assert result.all() == [("Горы", None), ("Море", 2), ("Архив", 4), ("Город", 3)]
+    
+    third = await repo.get_by_ordinal(test_session, "photos", 3)
+    assert third.theme == "Город"
+    assert await repo.get_by_ordinal(test_session, "photos", 1) is None
+    
+    picked = {(await repo.get_random_by_category(test_session, "photos")).theme for _ in range(50)}
+    assert picked == {"Море", "Архив", "Город"}
@@ -0,0 +1,77 @@
+"""
+Unit тесты для рекомендаций тем
+
+Тестирование TF-IDF модели и пересчета рекомендаций по продажам
+"""
+
+from decimal import Decimal
+
+import pytest
+
+from src.core.themes.recommender import ThemeRecommender
+from src.database.models import PortfolioAsset, ThemeTemplate, User
+from src.database.repositories.portfolio_repo import PortfolioRepository
+from src.database.repositories.theme_recommendation_repo import ThemeRecommendationRepository
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+from src.services.theme_recommendation_service import ThemeRecommendationService
+from src.services.theme_service import ThemeService
+
+CATALOG = [
+    (1, "Accounting and Finance", ["calculator", "tax"]),
+    (2, "Active Seniors Outdoors", None),
+    (3, "Financial Statement Analysis", None),
+    (4, "Tropical Beach Vacation", ["summer"]),
+]
+
+
+def test_recommend_matches_sold_titles():
+    """Тест: темы, похожие на названия проданных активов"""
+    recommender = ThemeRecommender(CATALOG)
+    
+    recommendations = recommender.recommend([
+        ("Calculator on financial statement, accounting 2024", 10.0),
+        ("Happy seniors walking", 1.0),
+    ])
+    
+    theme_ids = [theme_id for theme_id, _ in recommendations]
+    assert set(theme_ids[:2]) == {1, 3}
+    assert 2 in theme_ids
+    assert 4 not in theme_ids
+    assert all(0 < score <= 1 for _, score in recommendations)
+
+
+def test_recommend_without_known_words():
+    """Тест: без общих с каталогом слов рекомендаций нет"""
+    recommender = ThemeRecommender(CATALOG)
+    
+    assert recommender.recommend([("Zebra 12345", 5.0)]) == []
+    assert recommender.recommend([("Accounting", 0.0)]) == []
+
+
+@pytest.mark.asyncio
+async def test_refresh_and_serve_recommendations(test_session):
+    """Тест: рекомендации пересчитываются пакетно и читаются ThemeService"""
+    user = User(telegram_id=700001, username="seller")
+    test_session.add(user)
+    test_session.add_all([
+        ThemeTemplate(category="photos", theme=theme, keywords=keywords)
+        for _, theme, keywords in CATALOG
+    ])
+    await test_session.commit()
+    test_session.add_all([
+        PortfolioAsset(user_id=user.id, asset_id="1", title="Beach at sunset, summer vacation", sales=3, revenue=Decimal("9.5")),
+        PortfolioAsset(user_id=user.id, asset_id="2", title="Old photo", sales=1, revenue=Decimal("0")),
+    ])
+    await test_session.commit()
+    
+    template_repo = ThemeTemplateRepository()
+    recommendation_repo = ThemeRecommendationRepository()
+    service = ThemeRecommendationService(PortfolioRepository(), template_repo, recommendation_repo)
+    recommender = await service.build_model(test_session)
+    
+    assert await service.refresh_all(test_session, recommender) == 1
+    
+    theme_service = ThemeService(None, None, template_repo, theme_recommendation_repo=recommendation_repo)
+    templates = await theme_service.get_recommended_themes(test_session, user.id)
+    assert [template.theme for template in templates] == ["Tropical Beach Vacation"]
+    assert await theme_service.get_recommended_themes(test_session, user.id + 1) == []
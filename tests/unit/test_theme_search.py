@@ -0,0 +1,66 @@
+"""
+Unit тесты для поиска тем
+
+Тестирование индекса поиска в памяти и поиска в БД
+"""
+
+import pytest
+
+from src.core.themes.search import ThemeSearchIndex, tokenize
+from src.database.models import ThemeTemplate
+from src.database.repositories.theme_template_repo import ThemeTemplateRepository
+
+DOCUMENTS = [
+    (1, "photos", "Accounting and Finance", ["money", "office"]),
+    (2, "photos", "Active Seniors Outdoors", None),
+    (3, "vectors", "Accounting Icons", None),
+    (4, "photos", "Senior Couple at Home", ["retirement"]),
+    (5, "videos", "Office Life", ["accounting"]),
+]
+
+
+def test_tokenize_casefolds_and_drops_punctuation():
+    """Тест: слова без регистра, знаков и подчеркиваний"""
+    assert tokenize("Active-Seniors, snake_case 2024!") == ["active", "seniors", "snake", "case", "2024"]
+
+
+def test_search_ranks_by_matched_words_and_field():
+    """Тест: больше совпавших слов - выше, текст темы важнее ключевых слов"""
+    index = ThemeSearchIndex(DOCUMENTS)
+    
+    results = index.search("active seniors")
+    assert results[0] == (2, "photos", "Active Seniors Outdoors")
+    
+    ids = [theme_id for theme_id, _, _ in index.search("accounting")]
+    assert ids[-1] == 5
+    assert set(ids) == {1, 3, 5}
+
+
+def test_search_by_prefix_and_category():
+    """Тест: поиск по началу слова и фильтр категории"""
+    index = ThemeSearchIndex(DOCUMENTS)
+    
+    assert {theme_id for theme_id, _, _ in index.search("accoun")} == {1, 3, 5}
+    assert index.search("accoun", category="vectors") == [(3, "vectors", "Accounting Icons")]
+    assert index.search("se") == []
+    assert index.search("") == []
+
+
+@pytest.mark.asyncio
+async def test_repository_search(test_session):
+    """Тест: поиск в БД по префиксам слов, ключевым словам и подстроке"""
+    test_session.add_all([
+        ThemeTemplate(category=category, theme=theme, keywords=keywords)
+        for _, category, theme, keywords in DOCUMENTS
+    ] + [ThemeTemplate(category="photos", theme="Accounting Archive", is_active=False)])
+    await test_session.commit()
+    repo = ThemeTemplateRepository()
+    
+    themes = [template.theme for template in await repo.search(test_session, "accoun")]
+    assert set(themes) == {"Accounting and Finance", "Accounting Icons", "Office Life"}
+    
+    themes = [template.theme for template in await repo.search(test_session, "retirement", category="photos")]
+    assert themes == ["Senior Couple at Home"]
+    
+    themes = [template.theme for template in await repo.search(test_session, "ple at ho")]
+    assert themes == ["Senior Couple at Home"]
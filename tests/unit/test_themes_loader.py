@@ -0,0 +1,82 @@
+"""
+Unit тесты для загрузчика тем
+
+Тестирование разбора CSV, дедупликации и повторной загрузки каталога
+"""
+
+import io
+
+import pytest
+from sqlalchemy import select
+
+from src.core.utils import themes_loader
+from src.core.utils.themes_loader import ThemesLoader, make_theme_key
+from src.database.models import ThemeTemplate
+
+
+@pytest.fixture(autouse=True)
+def no_notify(monkeypatch):
+    """Без уведомлений в Redis"""
+    async def notify():
+        return None
+    
+    monkeypatch.setattr(themes_loader, "notify_themes_changed", notify)
+
+
+def test_iter_themes_single_column_uses_default_category():
+    """Тест: файл из одной колонки с завершающими запятыми"""
+    lines = io.StringIO("Abuse,\n  Ancient   Rome ,\n,\nvectors,Icons\n")
+    
+    themes = list(ThemesLoader.iter_themes(lines, default_category="photos"))
+    
+    assert themes == [
+        {"category": "photos", "theme": "Abuse"},
+        {"category": "photos", "theme": "Ancient Rome"},
+        {"category": "vectors", "theme": "Icons"},
+    ]
+
+
+def test_iter_themes_with_headers():
+    """Тест: колонки по заголовкам"""
+    lines = io.StringIO("Тема,Категория\nГоры,Videos\nМоре,\n")
+    
+    themes = list(ThemesLoader.iter_themes(lines))
+    
+    assert themes == [
+        {"category": "videos", "theme": "Горы"},
+        {"category": "photos", "theme": "Море"},
+    ]
+
+
+def test_theme_key_ignores_case_and_spaces():
+    """Тест: ключ не зависит от регистра и пробелов"""
+    assert make_theme_key("Ancient  Rome") == make_theme_key(" ancient rome ")
+    assert make_theme_key("Ancient Rome") != make_theme_key("Ancient Greece")
+
+
+@pytest.mark.asyncio
+async def test_import_themes_deduplicates_and_is_idempotent(test_session):
+    """Тест: дубликаты пропускаются, повторная загрузка ничего не добавляет"""
+    themes = [
+        {"category": "photos", "theme": "Горы"},
+        {"category": "photos", "theme": "горы "},
+        {"category": "photos", "theme": "Море"},
+        {"category": "vectors", "theme": "Горы"},
+    ]
+    
+    report = await ThemesLoader.import_themes(test_session, themes, batch_size=2)
+    assert report == {"inserted": 3, "skipped": 1}
+    
+    report = await ThemesLoader.import_themes(test_session, themes + [{"category": "photos", "theme": "Лес"}])
+    assert report == {"inserted": 1, "skipped": 4}
+    
+    result = await test_session.execute(
+        select(ThemeTemplate.category, ThemeTemplate.theme, ThemeTemplate.ordinal)
+        .order_by(ThemeTemplate.id)
+    )
+    assert result.all() == [
+        ("photos", "Горы", 1),
+        ("photos", "Море", 2),
+        ("vectors", "Горы", 1),
+        ("photos", "Лес", 3),
+    ]
@@ -0,0 +1,71 @@
+"""
+Unit тесты для UserCache
+
+Тестирование вытеснения по LRU и TTL и инвалидации
+"""
+
+from src.core.cache import user_cache as user_cache_module
+from src.core.cache.user_cache import UserCache
+from src.database.models import Limits, User
+
+
+def _user(user_id: int) -> User:
+    """Пользователь с ID и Telegram ID"""
+    return User(id=user_id, telegram_id=1000 + user_id)
+
+
+def test_get_returns_fresh_copies():
+    """Тест: каждое чтение возвращает новые экземпляры со значениями снимка"""
+    cache = UserCache(max_size=10, ttl_seconds=60)
+    user = _user(1)
+    cache.set(user, Limits(user_id=1, analytics_used=3))
+    
+    user.iq_points = 100
+    
+    cached_user, cached_limits = cache.get(1001)
+    assert cached_user is not user
+    assert cached_user.iq_points == 0
+    assert cached_limits.analytics_used == 3
+    assert cache.get(1001)[0] is not cached_user
+
+
+def test_lru_eviction():
+    """Тест: при переполнении вытесняется давно не читавшаяся запись"""
+    cache = UserCache(max_size=2, ttl_seconds=60)
+    cache.set(_user(1), None)
+    cache.set(_user(2), None)
+    cache.get(1001)
+    cache.set(_user(3), None)
+    
+    assert cache.get(1002) is None
+    assert cache.get(1001) is not None
+    assert cache.get(1003) is not None
+    assert len(cache) == 2
+
+
+def test_ttl_expiration(monkeypatch):
+    """Тест: запись истекает через ttl_seconds"""
+    now = [100.0]
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+    cache = UserCache(max_size=10, ttl_seconds=5)
+    cache.set(_user(1), None)
+    
+    now[0] = 104.0
+    assert cache.get(1001) is not None
+    now[0] = 105.0
+    assert cache.get(1001) is None
+    assert len(cache) == 0
+
+
+def test_invalidate_by_user_id_and_epoch():
+    """Тест: инвалидация удаляет запись и отклоняет загрузку, начатую до нее"""
+    cache = UserCache(max_size=10, ttl_seconds=60)
+    cache.set(_user(1), None)
+    
+    epoch = cache.epoch
+    cache.invalidate(1)
+    
+    assert cache.get(1001) is None
+    assert cache.set(_user(1), None, epoch) is False
+    assert cache.get(1001) is None
+    assert cache.set(_user(1), None, cache.epoch) is True
@@ -0,0 +1,89 @@
+"""
+Unit тесты для списка пользователей админ-панели
+
+Тестирование keyset-пагинации, фильтров в БД и подсчета
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.models import SubscriptionTier, User
+from src.database.repositories import listing
+from src.database.repositories.listing import decode_cursor, encode_cursor
+from src.database.repositories.user_repo import UserRepository
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages(test_session):
+    """Тест: страницы по курсору без пропусков и повторов"""
+    created_at = datetime(2026, 1, 1)
+    test_session.add_all([
+        # Одинаковое время создания: порядок внутри - по id
+        User(telegram_id=number, created_at=created_at + timedelta(minutes=number // 2))
+        for number in range(7)
+    ])
+    await test_session.commit()
+    user_repo = UserRepository()
+    
+    seen = []
+    cursor = None
+    while True:
+        users, cursor = await user_repo.get_page(test_session, cursor=cursor, limit=3)
+        seen.extend(user.telegram_id for user in users)
+        if cursor is None:
+            break
+    
+    assert seen == [6, 5, 4, 3, 2, 1, 0]
+    assert await user_repo.count_filtered(test_session) == (7, False)
+    
+    with pytest.raises(ValueError):
+        await user_repo.get_page(test_session, cursor="broken")
+
+
+@pytest.mark.asyncio
+async def test_filters(test_session):
+    """Тест: фильтр по подписке, поиск по username и telegram_id"""
+    test_session.add_all([
+        User(telegram_id=101, username="Stock_Master", subscription_tier=SubscriptionTier.PRO),
+        User(telegram_id=102, username="stockphoto"),
+        User(telegram_id=103, username="100%_real"),
+    ])
+    await test_session.commit()
+    user_repo = UserRepository()
+    
+    users, _ = await user_repo.get_page(test_session, search="STOCK")
+    assert {user.telegram_id for user in users} == {101, 102}
+    
+    users, _ = await user_repo.get_page(test_session, search="stock", subscription_tier=SubscriptionTier.PRO)
+    assert [user.telegram_id for user in users] == [101]
+    
+    # Спецсимволы LIKE ищутся как обычные символы
+    users, _ = await user_repo.get_page(test_session, search="0%_")
+    assert [user.telegram_id for user in users] == [103]
+    
+    users, _ = await user_repo.get_page(test_session, search="102")
+    assert [user.telegram_id for user in users] == [102]
+    assert await user_repo.count_filtered(test_session, search="stock") == (2, False)
+
+
+@pytest.mark.asyncio
+async def test_estimated_count(test_session, monkeypatch):
+    """Тест: большие выборки считаются по плану запроса"""
+    monkeypatch.setattr(listing, "EXACT_COUNT_LIMIT", 2)
+    test_session.add_all([User(telegram_id=number, username=f"user{number}") for number in range(5)])
+    await test_session.commit()
+    
+    total, estimated = await UserRepository().count_filtered(
+        test_session,
+        subscription_tier=SubscriptionTier.FREE,
+        search="user",
+    )
+    assert estimated
+    assert total >= 2
+
+
+def test_cursor_roundtrip():
+    """Тест: курсор кодирует время с микросекундами и ID"""
+    created_at = datetime(2026, 5, 17, 8, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
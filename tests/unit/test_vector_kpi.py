@@ -0,0 +1,65 @@
+"""
+Unit тесты для SalesFrame и VectorKPICalculator
+
+Сверка векторизованного расчета с KPICalculator
+"""
+
+from datetime import datetime, timedelta
+
+from src.core.analytics.kpi_calculator import KPIAccumulator
+from src.core.analytics.sales_frame import SalesFrame
+from src.core.analytics.vector_kpi import VectorKPICalculator
+
+
+def _make_rows(now: datetime) -> list[dict]:
+    """Создать тестовые строки за последние 90 дней"""
+    rows = []
+    for i in range(90):
+        date = now - timedelta(days=i, hours=i % 5)
+        rows.append({
+            "date": date.replace(microsecond=0).isoformat() + "+00:00",
+            "asset_id": str(i % 11),
+            "title": f"Asset {i % 11}",
+            "purchase_type": "subscription" if i % 2 else "custom",
+            "revenue": 0.33 * (i % 4),
+            "category": "photos" if i % 3 else "unknown",
+            "impressions": 2,
+            "downloads": 1 if i % 4 else 0,
+        })
+    return rows
+
+
+def test_from_rows_encodes_columns():
+    """Тест словарного кодирования колонок"""
+    now = datetime.utcnow()
+    rows = _make_rows(now)
+    
+    frame = SalesFrame.from_rows(iter(rows))
+    
+    assert len(frame) == 90
+    assert frame.asset_keys == [str(i) for i in range(11)]
+    assert frame.categories == ["unknown", "photos"]
+    assert frame.nbytes > 0
+
+
+def test_vector_kpi_matches_accumulator():
+    """Тест совпадения векторизованного расчета с однопроходным"""
+    now = datetime.utcnow()
+    rows = _make_rows(now)
+    
+    accumulator = KPIAccumulator()
+    for row in rows:
+        accumulator.add(row)
+    
+    expected = accumulator.finalize(now)
+    actual = VectorKPICalculator.calculate_kpi(SalesFrame.from_rows(rows), now)
+    
+    assert actual == expected
+
+
+def test_vector_kpi_empty():
+    """Тест расчета KPI по пустой таблице"""
+    kpi = VectorKPICalculator.calculate_kpi(SalesFrame.from_rows([]))
+    
+    assert kpi["row_count"] == 0
+    assert kpi["top_assets"] == []